@@ -0,0 +1,131 @@
+import argparse
+import configparser
+import logging
+import logging.config
+import sys
+from logging import INFO, getLogger
+from pathlib import Path
+from typing import Iterable, Iterator, TextIO
+
+from media_downloader.link_search.async_link_searcher import AsyncLinkSearcher
+from media_downloader.link_search.link_searcher import LinkSearcher
+from media_downloader.link_search.pixiv.ugoira_encoder import ugoira_encoder
+from media_downloader.link_search.work_url_extractor import WorkURLExtractor
+from media_downloader.util import CustomLogger, Result
+
+logging.setLoggerClass(CustomLogger)
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+def read_urls(lines: Iterable[str]) -> Iterator[str]:
+    """作品URLリストを1行ずつ読み込む
+
+    空行と#で始まる行（コメント）は読み飛ばす
+
+    Args:
+        lines (Iterable[str]): 読み込み対象の各行
+
+    Yields:
+        str: 作品URL
+    """
+    for line in lines:
+        url = line.strip()
+        if url == "" or url.startswith("#"):
+            continue
+        yield url
+
+
+def batch_main(argv: list[str] | None = None, stdin: TextIO | None = None) -> Result:
+    """作品URLをファイルまたは標準入力からまとめて受け取り、並行にDLする
+
+    Args:
+        argv (list[str] | None): コマンドライン引数、Noneの場合sys.argvを使う
+        stdin (TextIO | None): URLファイル指定がない場合の入力元、Noneの場合sys.stdinを使う
+
+    Returns:
+        Result: すべてのURLの処理に成功した場合SUCCESS, 1つでも失敗した場合FAILED
+    """
+    parser = argparse.ArgumentParser(description="MediaDownloader batch mode")
+    parser.add_argument("url_file", nargs="?", help="作品URLを1行ずつ記載したファイル、省略時は標準入力から読み込む")
+    parser.add_argument(
+        "-w", "--workers", type=int, default=LinkSearcher.MAX_WORKERS, help="並行して処理するワーカー数"
+    )
+    parser.add_argument(
+        "-e",
+        "--engine",
+        choices=["thread", "async"],
+        default="thread",
+        help="thread: URLごとにワーカースレッドで処理する, async: 1つのイベントループ上で並行に処理する",
+    )
+    parser.add_argument(
+        "--in-flight",
+        type=int,
+        default=AsyncLinkSearcher.MAX_IN_FLIGHT,
+        help="async エンジンで同時に処理するURL数",
+    )
+    parser.add_argument(
+        "-x",
+        "--extract",
+        action="store_true",
+        help="入力を任意のテキスト（HTML, ブックマークのエクスポート, チャットログなど）として扱い、作品URLを抽出する",
+    )
+    args = parser.parse_args(argv)
+
+    # configファイルロード
+    CONFIG_FILE_NAME = "./config/config.ini"
+    config = configparser.ConfigParser()
+    if not config.read(CONFIG_FILE_NAME, encoding="utf8"):
+        raise IOError
+
+    logging.config.fileConfig("./log/logging.ini", disable_existing_loggers=False)
+    for name in logging.root.manager.loggerDict:
+        # 自分以外のすべてのライブラリのログ出力を抑制
+        if "media_downloader" not in name:
+            getLogger(name).disabled = True
+
+    # URLリスト読み込み
+    def load_urls(fin: TextIO) -> list[str]:
+        if args.extract:
+            # 入力全体は読み込まず、順に走査して作品ごとに1つの作品URLを抽出する
+            return [extracted.url for extracted in WorkURLExtractor().extract_file(fin)]
+        return list(read_urls(fin))
+
+    if args.url_file:
+        errors = "replace" if args.extract else "strict"
+        with Path(args.url_file).open("r", encoding="utf8", errors=errors) as fin:
+            urls = load_urls(fin)
+    else:
+        urls = load_urls(stdin or sys.stdin)
+    logger.info(f"Batch download -> {len(urls)} urls.")
+
+    if args.engine == "async":
+        # pixiv など非同期版の無い Fetcher は --workers 個のワーカースレッドで処理する
+        async_link_searcher = AsyncLinkSearcher.from_link_searcher(LinkSearcher.create(config), args.workers)
+        fetch_many_result = async_link_searcher.run(urls, args.in_flight)
+    else:
+        link_searcher = LinkSearcher.create(config)
+        fetch_many_result = link_searcher.fetch_many(urls, args.workers)
+
+    # 別プロセスで生成中のうごイラの保存を待つ
+    ugoira_encoder.wait()
+    ugoira_stats = ugoira_encoder.stats()
+    if ugoira_stats.completed or ugoira_stats.failed:
+        logger.info(
+            f"Ugoira encode done: {ugoira_stats.completed} encoded, {ugoira_stats.failed} failed "
+            f"({ugoira_stats.encode_time:.2f}s)."
+        )
+
+    for url, result in fetch_many_result.results:
+        logger.info(f"{url} -> {result.name}")
+    failed_urls = fetch_many_result.failed_urls
+    logger.info(
+        f"Batch download done: {len(urls) - len(failed_urls)}/{len(urls)} succeeded "
+        f"({fetch_many_result.elapsed_time:.2f}s)."
+    )
+    return Result.FAILED if failed_urls else Result.SUCCESS
+
+
+if __name__ == "__main__":
+    result = batch_main()
+    sys.exit(0 if result == Result.SUCCESS else 1)
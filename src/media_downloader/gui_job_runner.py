@@ -0,0 +1,251 @@
+import enum
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from logging import INFO, getLogger
+from typing import Any, Callable
+
+from media_downloader.link_search.download_progress import WorkProgress, download_progress
+from media_downloader.util import CustomLogger
+
+logging.setLoggerClass(CustomLogger)
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+class JobResult(enum.Enum):
+    SUCCESS = enum.auto()
+    FAILED = enum.auto()
+    CANCELLED = enum.auto()
+
+
+@dataclass(frozen=True)
+class JobProgress:
+    """GUIから依頼されたDLの進捗"""
+
+    queued: int  # 実行待ちのジョブ数
+    active: int  # 実行中のジョブ数
+    done: int  # 成功したジョブ数
+    failed: int  # 失敗したジョブ数
+    cancelled: int  # 取り消したジョブ数
+    bytes_per_sec: float  # 直近の受信速度[byte/s]
+    works: dict[str, WorkProgress] = field(default_factory=dict)  # DL中の作品名 -> 進捗
+
+    def __str__(self) -> str:
+        """画面表示用の文字列
+
+        Returns:
+            str: 「待機 {n} / 実行中 {n} / 完了 {n}（失敗 {n}, 中止 {n}） {速度}」の後に作品ごとのページ数を並べたもの
+        """
+        text = f"待機 {self.queued} / 実行中 {self.active} / 完了 {self.done}"
+        text += f"（失敗 {self.failed}, 中止 {self.cancelled}）  {self.bytes_per_sec / 1024 / 1024:.2f} MB/s"
+        pages = [f"{name}: {w.pages_done}/{w.pages_total}" for name, w in self.works.items()]
+        if pages:
+            text += "\n" + ", ".join(pages)
+        return text
+
+
+class GuiJobRunner:
+    """GUIから依頼されたDLを、Tk のイベントループとは別のスレッドで実行するクラス
+
+    依頼されたジョブは順に最大 max_workers 件ずつ並行して実行し、実行中も新たな依頼を受け付ける
+    進捗は interval ごとに、各ジョブの結果は完了時に、post_event を通して画面に通知する
+    post_event には Window.post_event（スレッドセーフなキューに積む）を渡し、画面の更新は Tk のスレッドで行う
+
+    cancel は実行待ちのジョブを破棄し、実行中のジョブには download_progress を通して取り消しを要求する
+    実行中のDLはチャンクやページの区切りで中断し、次回同じ作品をDLする際に続きから再開する
+    取り消し要求は実行中のジョブがすべて終了した時点で解除し、その間に依頼されたジョブはその後に実行する
+    """
+
+    # 進捗を通知するイベントのキー、値は {"progress": JobProgress}
+    PROGRESS_EVENT = "-JOB_PROGRESS-"
+    # ジョブの完了を通知するイベントのキー、値は {"name": ジョブ名, "result": JobResult}
+    DONE_EVENT = "-JOB_DONE-"
+    # 同時に実行するジョブ数
+    DEFAULT_MAX_WORKERS = 2
+    # 進捗を通知する間隔[s]
+    DEFAULT_INTERVAL = 0.5
+
+    def __init__(
+        self,
+        post_event: Callable[[str, dict], None],
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        interval: float = DEFAULT_INTERVAL,
+    ):
+        """初期化処理
+
+        スレッドは最初にジョブを依頼した際に起動する
+
+        Args:
+            post_event (Callable[[str, dict], None]): 画面にイベントを通知する関数、Window.post_event
+            max_workers (int): 同時に実行するジョブ数
+            interval (float): 進捗を通知する間隔[s]
+        """
+        if not callable(post_event):
+            raise TypeError("post_event must be callable.")
+        if not isinstance(max_workers, int) or max_workers < 1:
+            raise ValueError("max_workers must be positive int.")
+        if not isinstance(interval, int | float) or interval <= 0:
+            raise ValueError("interval must be positive number.")
+        self.post_event = post_event
+        self.max_workers = max_workers
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._queue: deque[tuple[str, Callable[[], Any]]] = deque()
+        self._active = 0
+        self._done = 0
+        self._failed = 0
+        self._cancelled = 0
+        self._cancelling = False
+        self._closed = False
+        self._threads: list[threading.Thread] = []
+        self._bytes_per_sec = 0.0
+
+    def submit(self, name: str, job: Callable[[], Any]) -> None:
+        """ジョブの実行を依頼する
+
+        Args:
+            name (str): ジョブ名、結果の通知に使う（作品ページURLなど）
+            job (Callable[[], Any]): 実行する関数、例外を送出した場合は失敗として扱う
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("GuiJobRunner is already shut down.")
+            self._queue.append((name, job))
+            self._start_threads()
+            self._cond.notify()
+
+    def cancel(self) -> int:
+        """実行待ちのジョブを破棄し、実行中のジョブの取り消しを要求する
+
+        Returns:
+            int: 破棄した実行待ちのジョブ数
+        """
+        with self._cond:
+            dropped = len(self._queue)
+            self._queue.clear()
+            self._cancelled += dropped
+            if self._active > 0:
+                self._cancelling = True
+                download_progress.cancel()
+        logger.info(f"Job cancel requested: {dropped} queued job(s) dropped")
+        return dropped
+
+    def progress(self) -> JobProgress:
+        """現時点の進捗を取得する
+
+        Returns:
+            JobProgress: 進捗
+        """
+        works = download_progress.snapshot().works
+        with self._cond:
+            return JobProgress(
+                len(self._queue), self._active, self._done, self._failed, self._cancelled, self._bytes_per_sec, works
+            )
+
+    def shutdown(self) -> None:
+        """実行待ちのジョブを破棄し、実行中のジョブの取り消しを要求してスレッドを終了させる
+
+        実行中のジョブの終了は待たない
+        """
+        self.cancel()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _start_threads(self) -> None:
+        """ジョブを実行するスレッドと進捗を通知するスレッドを起動する、_cond を取得した状態で呼び出す"""
+        if self._threads:
+            return
+        for i in range(self.max_workers):
+            self._threads.append(threading.Thread(target=self._run_worker, name=f"gui_job_{i}", daemon=True))
+        self._threads.append(threading.Thread(target=self._run_progress, name="gui_job_progress", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def _run_worker(self) -> None:
+        """実行待ちのジョブを1つずつ取り出して実行する"""
+        while True:
+            with self._cond:
+                # 取り消し中は実行中のジョブがすべて終了するまで次のジョブを始めない
+                self._cond.wait_for(lambda: self._closed or (self._queue and not self._cancelling))
+                if self._closed:
+                    return
+                name, job = self._queue.popleft()
+                self._active += 1
+
+            try:
+                job()
+                result = JobResult.SUCCESS
+            except Exception as e:
+                # 取り消し要求後の例外は、非同期処理の例外グループなども含めて取り消しとして扱う
+                result = JobResult.CANCELLED if download_progress.is_cancelled else JobResult.FAILED
+                logger.info(f"Job {result.name.lower()}: {name} -> {e}")
+
+            with self._cond:
+                self._active -= 1
+                if result == JobResult.SUCCESS:
+                    self._done += 1
+                elif result == JobResult.FAILED:
+                    self._failed += 1
+                else:
+                    self._cancelled += 1
+                if self._cancelling and self._active == 0:
+                    # 実行中のジョブがすべて中断したため、取り消し要求を解除して残りのジョブを再開する
+                    self._cancelling = False
+                    download_progress.reset()
+                    self._cond.notify_all()
+            self.post_event(self.DONE_EVENT, {"name": name, "result": result})
+
+    def _run_progress(self) -> None:
+        """interval ごとに進捗を通知する、何も実行していない間は通知しない"""
+        last_bytes = download_progress.snapshot().bytes_total
+        last_time = time.monotonic()
+        was_busy = False
+        while True:
+            with self._cond:
+                if self._cond.wait_for(lambda: self._closed, self.interval):
+                    return
+                is_busy = bool(self._queue) or self._active > 0
+            now = time.monotonic()
+            bytes_total = download_progress.snapshot().bytes_total
+            with self._cond:
+                self._bytes_per_sec = (bytes_total - last_bytes) / max(now - last_time, 1e-9) if is_busy else 0.0
+            last_bytes, last_time = bytes_total, now
+            # 実行が終わった直後は最終状態を1回だけ通知する
+            if is_busy or was_busy:
+                self.post_event(self.PROGRESS_EVENT, {"progress": self.progress()})
+            was_busy = is_busy
+
+
+if __name__ == "__main__":
+    import random
+
+    # 擬似的なジョブを実行し、進捗と結果を表示する
+    def post_event(key: str, values: dict) -> None:
+        print(key, values.get("progress") or values)
+
+    def job(name: str) -> Callable[[], None]:
+        def run() -> None:
+            download_progress.start_work(name, 5)
+            try:
+                for _ in range(5):
+                    time.sleep(random.random() * 0.3)
+                    download_progress.add_bytes(1024 * 1024)
+                    download_progress.raise_if_cancelled()
+                    download_progress.page_done(name)
+            finally:
+                download_progress.finish_work(name)
+
+        return run
+
+    runner = GuiJobRunner(post_event)
+    for i in range(4):
+        runner.submit(f"work{i}", job(f"作品名{i}"))
+    time.sleep(1.0)
+    runner.cancel()
+    runner.submit("work4", job("作品名4"))
+    time.sleep(3.0)
+    runner.shutdown()
@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import deque
+
+from TkEasyGUI import Multiline, Window
+
+
+class GuiLogSink:
+    """GUI画面のログ表示欄にログを追記するクラス
+
+    ログ表示欄の全文を取得して書き戻すのではなく、前回の表示以降のログのみを末尾に追記する
+    ログは一旦キューに溜め、一定間隔（interval）ごとにまとめて1回で追記する
+    表示欄に残す行数は max_lines までとし、超えた分は古い行から削除する
+
+    write はどのスレッドからでも呼び出せる、Tk の操作は attach を呼び出したスレッド（Tk のスレッド）でのみ行う
+    Tk のスレッドでは window.read 中にタイマーで追記する
+    Tk のスレッドで時間のかかる処理をしている間は、write の呼び出し時に interval ごとに追記して画面を更新する
+    """
+
+    # 追記する間隔[s]
+    DEFAULT_INTERVAL = 0.05
+    # 表示欄に残す最大行数
+    DEFAULT_MAX_LINES = 5000
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, max_lines: int = DEFAULT_MAX_LINES):
+        """初期化処理
+
+        Args:
+            interval (float): 追記する間隔[s]
+            max_lines (int): 表示欄に残す最大行数
+        """
+        if not isinstance(interval, int | float) or interval <= 0:
+            raise ValueError("interval must be positive number.")
+        if not isinstance(max_lines, int) or max_lines < 1:
+            raise ValueError("max_lines must be positive int.")
+        self.interval = interval
+        self.max_lines = max_lines
+        self._lock = threading.Lock()
+        # 表示待ちのログ、表示されずに max_lines を超えた分は古いものから捨てる
+        self._pending: deque[str] = deque(maxlen=max_lines)
+        self._window: Window | None = None
+        self._key = ""
+        self._tk_thread: threading.Thread | None = None
+        self._lines = 0
+        self._last_flush = 0.0
+
+    @property
+    def is_attached(self) -> bool:
+        """ログ表示欄が設定されているか"""
+        with self._lock:
+            return self._window is not None
+
+    def attach(self, window: Window, key: str = "-OUTPUT-") -> None:
+        """ログ表示欄を設定し、一定間隔での追記を開始する
+
+        Tk のスレッドから呼び出す
+
+        Args:
+            window (Window): ログ表示欄を持つウィンドウ
+            key (str): ログ表示欄（Multiline）のキー
+        """
+        with self._lock:
+            self._window = window
+            self._key = key
+            self._tk_thread = threading.current_thread()
+            self._lines = 0
+        self._tick()
+
+    def detach(self) -> None:
+        """ログ表示欄の設定を解除する、表示待ちのログは捨てる
+
+        Tk のスレッドから呼び出す
+        """
+        with self._lock:
+            self._window = None
+            self._tk_thread = None
+            self._pending.clear()
+
+    def write(self, msg: str) -> None:
+        """ログを表示待ちに追加する
+
+        Args:
+            msg (str): ログ
+        """
+        with self._lock:
+            if self._window is None:
+                return
+            self._pending.append(msg)
+            window = self._window
+            is_tk_thread = threading.current_thread() is self._tk_thread
+            is_due = time.monotonic() - self._last_flush >= self.interval
+        if is_tk_thread and is_due:
+            # Tk のスレッドが処理中でタイマーが動かないため、ここで追記して画面を更新する
+            self.flush()
+            window.refresh()
+
+    def flush(self) -> int:
+        """表示待ちのログをまとめてログ表示欄に追記する
+
+        Tk のスレッドから呼び出す
+
+        Returns:
+            int: 追記したログの数
+        """
+        with self._lock:
+            window = self._window
+            messages = list(self._pending)
+            self._pending.clear()
+            self._last_flush = time.monotonic()
+        if window is None or not messages:
+            return 0
+
+        text = "\n".join(messages)
+        multiline: Multiline = window[self._key]
+        readonly = multiline.readonly
+        if readonly:
+            multiline.set_readonly(False)
+        multiline.print(text, autoscroll=True)
+        self._lines += text.count("\n") + 1
+        if self._lines > self.max_lines:
+            # 古い行から削除する
+            excess = self._lines - self.max_lines
+            multiline.widget.delete("1.0", f"{excess + 1}.0")
+            self._lines = self.max_lines
+        if readonly:
+            multiline.set_readonly(True)
+        return len(messages)
+
+    def _tick(self) -> None:
+        """表示待ちのログを追記し、次の追記を予約する"""
+        self.flush()
+        with self._lock:
+            window = self._window
+        if window is not None:
+            window.set_timeout(self._tick, int(self.interval * 1000))
+
+
+# プロセス全体で共有するGUI画面のログ表示欄
+gui_log_sink = GuiLogSink()
+
+
+if __name__ == "__main__":
+    import TkEasyGUI as sg
+
+    # 別スレッドから大量のログを出力しても画面が固まらないことを確認する
+    layout = [[sg.Multiline(key="-OUTPUT-", size=(100, 20), readonly=True, autoscroll=True)]]
+    window = sg.Window("GuiLogSink", layout, finalize=True)
+    sink = GuiLogSink(max_lines=1000)
+    sink.attach(window)
+
+    def worker() -> None:
+        for i in range(10000):
+            sink.write(f"page {i}")
+
+    threading.Thread(target=worker, daemon=True).start()
+    while True:
+        event, values = window.read()
+        if event == sg.WIN_CLOSED:
+            break
+    sink.detach()
+    window.close()
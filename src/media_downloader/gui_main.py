@@ -1,12 +1,16 @@
 import configparser
+import functools
 import logging
 import logging.config
 import subprocess
+import threading
 from logging import INFO, getLogger
 from pathlib import Path
 
 import TkEasyGUI as sg
 
+from media_downloader.gui_job_runner import GuiJobRunner, JobResult
+from media_downloader.gui_log_sink import gui_log_sink
 from media_downloader.link_search.link_searcher import LinkSearcher
 from media_downloader.util import CustomLogger, Result
 
@@ -40,6 +44,7 @@ def gui_main() -> Result:
             sg.Text("作品ページURL", size=(18, 1)),
             sg.InputText(key="-WORK_URL-", default_text="", size=(61, 1)),
             sg.Button("実行", key="-RUN-"),
+            sg.Button("中止", key="-CANCEL-"),
         ],
         [
             sg.Text("チェック対象", size=(18, 1)),
@@ -55,7 +60,7 @@ def gui_main() -> Result:
             sg.FolderBrowse("参照", initial_folder=save_base_path),
             sg.Button("開く", key="-FOLDER_OPEN-", pad=((7, 2), (0, 0))),
         ],
-        [sg.Text("", size=(70, 2))],
+        [sg.Text("", key="-STATUS-", size=(70, 2))],
         [
             sg.Multiline(
                 key="-OUTPUT-",
@@ -85,6 +90,25 @@ def gui_main() -> Result:
 
     logger.info("---ここにログが表示されます---", window=window)
 
+    # DLは別スレッドで実行し、進捗と結果はイベントとして受け取る
+    # 実行中も次のURLを受け付け、順に実行する
+    job_runner = GuiJobRunner(window.post_event)
+
+    # LinkSearcher はチェック対象の組み合わせごとに初期化して使い回す
+    link_searchers: dict[tuple[str, str, str], LinkSearcher] = {}
+    link_searchers_lock = threading.Lock()
+
+    def fetch(work_url: str, trace: tuple[str, str, str]) -> None:
+        with link_searchers_lock:
+            if trace not in link_searchers:
+                logger.info("初期化中...")
+                config["pixiv"]["is_pixiv_trace"] = trace[0]
+                config["nijie"]["is_nijie_trace"] = trace[1]
+                config["nico_seiga"]["is_seiga_trace"] = trace[2]
+                link_searchers[trace] = LinkSearcher.create(config)
+                logger.info("初期化完了！")
+        link_searchers[trace].fetch(work_url)
+
     while True:
         event, values = window.read()
         if event in [sg.WIN_CLOSED, "-EXIT-"]:
@@ -92,23 +116,33 @@ def gui_main() -> Result:
         if event == "-RUN-":
             try:
                 work_url = values["-WORK_URL-"]
-                logger.info("初期化中...")
-                config["pixiv"]["is_pixiv_trace"] = "True" if values["-CB_pixiv-"] else "False"
-                config["nijie"]["is_nijie_trace"] = "True" if values["-CB_nijie-"] else "False"
-                config["nico_seiga"]["is_seiga_trace"] = "True" if values["-CB_nico_seiga-"] else "False"
-                link_searcher = LinkSearcher.create(config)
-                logger.info("初期化完了！")
-
-                link_searcher.fetch(work_url)
+                trace = tuple(
+                    "True" if values[key] else "False" for key in ["-CB_pixiv-", "-CB_nijie-", "-CB_nico_seiga-"]
+                )
             except Exception:
                 logger.info("Process failed...")
             else:
-                logger.info("Process done: success!")
+                job_runner.submit(work_url, functools.partial(fetch, work_url, trace))
+                logger.info(f"Process queued: {work_url}")
+        if event == "-CANCEL-":
+            job_runner.cancel()
+        if event == GuiJobRunner.PROGRESS_EVENT:
+            window["-STATUS-"].set_text(str(values["progress"]))
+        if event == GuiJobRunner.DONE_EVENT:
+            match values["result"]:
+                case JobResult.SUCCESS:
+                    logger.info(f"Process done: success! {values['name']}")
+                case JobResult.CANCELLED:
+                    logger.info(f"Process cancelled. {values['name']}")
+                case _:
+                    logger.info(f"Process failed... {values['name']}")
         if event == "-FOLDER_OPEN-":
             save_path = values["-SAVE_PATH-"]
             subprocess.Popen(["explorer", save_path], shell=True)
 
     # ウィンドウ終了処理
+    job_runner.shutdown()
+    gui_log_sink.detach()
     window.close()
     return Result.SUCCESS
 
@@ -0,0 +1,93 @@
+import asyncio
+import re
+from abc import ABCMeta, abstractmethod
+from dataclasses import dataclass
+from typing import Any, ClassVar
+
+from media_downloader.link_search.url import URL
+from media_downloader.link_search.work_key import WorkKey
+
+
+@dataclass(frozen=True)
+class AsyncFetcherBase(metaclass=ABCMeta):
+    """外部リンク探索処理を担うクラスの基底クラスの非同期版
+
+    FetcherBase と同じく、派生クラスはis_target_urlとfetchをオーバーライドして実装する必要がある
+    どちらもコルーチンとして実装し、待機中はイベントループに処理を譲る
+    """
+
+    # 担当urlのホスト名、LinkSearcher はホスト名が一致するurlのみ is_target_url で判定する
+    # 空の場合はすべてのurlについて is_target_url で判定する
+    TARGET_HOSTS: ClassVar[tuple[str, ...]] = ()
+
+    def __init__(self):
+        pass
+
+    @abstractmethod
+    async def is_target_url(self, url: URL) -> bool:
+        """自分（担当者）が処理できるurlかどうか返す関数
+
+        派生クラスでオーバーライドする
+
+        Args:
+            url (URL): 処理対象url
+
+        Returns:
+            bool: 担当urlだった場合True, そうでない場合False
+        """
+        return False
+
+    def work_key(self, url: URL) -> WorkKey | None:
+        """担当urlが指す作品のキーを返す
+
+        LinkSearcher はキーが同じurlの fetch を同時に実行せず、1回にまとめる
+        派生クラスでオーバーライドしない場合はまとめない
+
+        Args:
+            url (URL): 処理対象url、is_target_url で担当と判定したもの
+
+        Returns:
+            WorkKey | None: 作品キー、まとめない場合None
+        """
+        return None
+
+    @abstractmethod
+    async def fetch(self, url: URL) -> Any:
+        """自分（担当者）が担当する処理
+
+        派生クラスでオーバーライドする。
+
+        Args:
+            url (URL): 処理対象url
+
+        Returns:
+            Any: 処理結果、各DownloaderのDownloadResultを想定
+        """
+        pass
+
+
+class AsyncConcreteFetcher_0(AsyncFetcherBase):
+    """具体的な担当者その0"""
+
+    def __init__(self):
+        super().__init__()
+
+    async def is_target_url(self, url: URL) -> bool:
+        pattern = r"^https://www.anyurl/sample/index_0.html$"
+        is_target = re.search(pattern, url.original_url) is not None
+        if is_target:
+            print("AsyncConcreteFetcher_0.is_target_url catch")
+        return is_target
+
+    async def fetch(self, url: URL) -> None:
+        await asyncio.sleep(0)
+        print("AsyncConcreteFetcher_0.fetch called")
+
+
+if __name__ == "__main__":
+    url = URL("https://www.anyurl/sample/index_0.html")
+
+    # 具体的な担当者のインスタンスを生成
+    fetcher = AsyncConcreteFetcher_0()
+    print(asyncio.run(fetcher.is_target_url(url)))
+    print(asyncio.run(fetcher.fetch(url)))
@@ -0,0 +1,219 @@
+import asyncio
+import configparser
+import enum
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logging import INFO, getLogger
+from typing import Any, Awaitable, Callable, Iterable, Self
+
+from media_downloader.link_search.async_fetcher_base import AsyncFetcherBase
+from media_downloader.link_search.fetcher_base import FetcherBase
+from media_downloader.link_search.fetcher_index import FetcherIndex
+from media_downloader.link_search.http_client_pool import http_client_pool
+from media_downloader.link_search.in_flight_registry import in_flight_registry
+from media_downloader.link_search.link_searcher import FetchManyResult, LinkSearcher
+from media_downloader.link_search.nico_seiga.async_nico_seiga_fetcher import AsyncNicoSeigaFetcher
+from media_downloader.link_search.nico_seiga.nico_seiga_fetcher import NicoSeigaFetcher
+from media_downloader.link_search.nijie.async_nijie_fetcher import AsyncNijieFetcher
+from media_downloader.link_search.nijie.nijie_fetcher import NijieFetcher
+from media_downloader.link_search.url import URL
+from media_downloader.log_message import MSG
+from media_downloader.util import CustomLogger, Result
+
+logging.setLoggerClass(CustomLogger)
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+class AsyncLinkSearcher:
+    """LinkSearcher の非同期版、1つのイベントループ上で多数のURLを並行して処理する
+
+    非同期版のある Fetcher（nijie, ニコニコ静画）はイベントループ上で直接実行し、
+    待機中（通信、レート制限）は他のURLの処理に譲るため、スレッドを増やさずに多数のDLを並行して進められる
+    非同期版の無い Fetcher（pixivpy3 を使う pixiv, pixivノベル）は、
+    少数のワーカースレッドを持つ executor 上で実行してイベントループを止めないようにする
+    """
+
+    # fetch_many で同時に処理するURL数の既定値
+    MAX_IN_FLIGHT = 64
+
+    # 同期版の Fetcher から非同期版の Fetcher を生成する関数
+    ASYNC_FETCHER_FACTORIES: dict[type, Callable[[FetcherBase], AsyncFetcherBase]] = {
+        NijieFetcher: AsyncNijieFetcher.from_fetcher,
+        NicoSeigaFetcher: AsyncNicoSeigaFetcher.from_fetcher,
+    }
+
+    def __init__(self, executor_workers: int = LinkSearcher.MAX_WORKERS):
+        """初期化処理
+
+        Args:
+            executor_workers (int): 非同期版の無い Fetcher を実行するワーカースレッド数の上限
+        """
+        if not isinstance(executor_workers, int) or executor_workers < 1:
+            raise ValueError("executor_workers must be positive int.")
+        self.fetcher_list: list[AsyncFetcherBase | FetcherBase] = []
+        # ホスト名 -> 担当しうるfetcher の索引
+        self.fetcher_index = FetcherIndex()
+        self.executor_workers = executor_workers
+
+    def register(self, fetcher) -> None:
+        interface_check = hasattr(fetcher, "is_target_url") and hasattr(fetcher, "fetch")
+        if not interface_check:
+            raise TypeError("Invalid fetcher.")
+        self.fetcher_list.append(fetcher)
+        self.fetcher_index.add(fetcher)
+        fetcher_class = fetcher.__class__.__name__
+        logger.info(MSG.LINKSEARCHER_REGISTERED.value.format(fetcher_class))
+
+    async def _find_fetcher(self, url: str) -> AsyncFetcherBase | FetcherBase | None:
+        """urlを担当するfetcherを探す
+
+        Args:
+            url (str): 処理対象url
+
+        Returns:
+            AsyncFetcherBase | FetcherBase | None: 担当fetcher, 見つからなかった場合やurlが不正な場合None
+        """
+        if not URL.is_valid(url):
+            return None
+        candidates = self.fetcher_index.candidates(url)
+        if not candidates:
+            return None
+        target_url = URL(url)
+        # CoR、LinkSearcher と同じくホスト名の一致するfetcherのみを判定する
+        for p in candidates:
+            if isinstance(p, AsyncFetcherBase):
+                is_target = await p.is_target_url(target_url)
+            else:
+                is_target = p.is_target_url(target_url)
+            if is_target:
+                return p
+        return None
+
+    async def fetch_many(self, urls: Iterable[str], max_in_flight: int = MAX_IN_FLIGHT) -> FetchManyResult:
+        """複数のURLを並行に処理する
+
+        LinkSearcher.fetch_many と同じく、個々のURLの失敗は例外として送出せず、結果に Result.FAILED として記録する
+        処理が終わったら、このイベントループ上で使った httpx.AsyncClient を閉じる
+
+        Args:
+            urls (Iterable[str]): 処理対象urlのリスト
+            max_in_flight (int): 同時に処理するURL数の上限
+
+        Returns:
+            FetchManyResult: URLごとの処理結果と全体の処理時間
+        """
+        if not isinstance(max_in_flight, int) or max_in_flight < 1:
+            raise ValueError("max_in_flight must be positive int.")
+
+        loop = asyncio.get_running_loop()
+        in_flight = asyncio.Semaphore(max_in_flight)
+        executor = ThreadPoolExecutor(max_workers=self.executor_workers, thread_name_prefix="async_fetch_many")
+
+        def start_fetch(fetcher: AsyncFetcherBase | FetcherBase, url: str) -> Awaitable[Any]:
+            if isinstance(fetcher, AsyncFetcherBase):
+                return fetcher.fetch(url)
+            # 非同期版の無い Fetcher はイベントループを止めないよう executor 上で実行する
+            return loop.run_in_executor(executor, fetcher.fetch, url)
+
+        async def fetch_one(fetcher: AsyncFetcherBase | FetcherBase, url: str) -> Result | enum.Enum:
+            async with in_flight:
+                fetcher_class = fetcher.__class__.__name__
+                logger.info(MSG.LINKSEARCHER_FETCHER_FOUND.value.format(url, fetcher_class))
+                try:
+                    # 同じ作品を指すURLは1回のみ取得し、同じ結果を返す
+                    work_key = LinkSearcher.work_key(fetcher, url)
+                    result = await in_flight_registry.run_async(work_key, lambda: start_fetch(fetcher, url))
+                except Exception as e:
+                    logger.info(MSG.LINKSEARCHER_FETCH_FAILED.value.format(url, e))
+                    return Result.FAILED
+                return result if isinstance(result, enum.Enum) else Result.SUCCESS
+
+        async def failed() -> Result:
+            return Result.FAILED
+
+        start_time = time.perf_counter()
+        try:
+            coroutines = []
+            for url in urls:
+                fetcher = await self._find_fetcher(url)
+                if not fetcher:
+                    logger.info(MSG.LINKSEARCHER_FETCHER_NOT_FOUND.value.format(url))
+                    coroutines.append((url, failed()))
+                    continue
+                coroutines.append((url, fetch_one(fetcher, url)))
+            results = await asyncio.gather(*[coroutine for _, coroutine in coroutines])
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            await http_client_pool.aclose()
+        elapsed_time = time.perf_counter() - start_time
+        fetch_many_result = FetchManyResult([(url, r) for (url, _), r in zip(coroutines, results)], elapsed_time)
+        failed_num = len(fetch_many_result.failed_urls)
+        logger.info(MSG.LINKSEARCHER_FETCH_MANY_DONE.value.format(len(results), failed_num, elapsed_time))
+        return fetch_many_result
+
+    def run(self, urls: Iterable[str], max_in_flight: int = MAX_IN_FLIGHT) -> FetchManyResult:
+        """新しいイベントループで fetch_many を実行する、同期処理からの呼び出し口
+
+        Args:
+            urls (Iterable[str]): 処理対象urlのリスト
+            max_in_flight (int): 同時に処理するURL数の上限
+
+        Returns:
+            FetchManyResult: URLごとの処理結果と全体の処理時間
+        """
+        return asyncio.run(self.fetch_many(urls, max_in_flight))
+
+    @classmethod
+    def from_link_searcher(cls, link_searcher: LinkSearcher, executor_workers: int = LinkSearcher.MAX_WORKERS) -> Self:
+        """LinkSearcher に登録済の Fetcher を引き継いで生成する
+
+        非同期版のある Fetcher は非同期版に置き換え、それ以外はそのまま executor 上で実行する
+
+        Args:
+            link_searcher (LinkSearcher): Fetcher 登録済の LinkSearcher
+            executor_workers (int): 非同期版の無い Fetcher を実行するワーカースレッド数の上限
+
+        Returns:
+            Self: AsyncLinkSearcher
+        """
+        als = cls(executor_workers)
+        for fetcher in link_searcher.fetcher_list:
+            factory = cls.ASYNC_FETCHER_FACTORIES.get(type(fetcher))
+            als.register(factory(fetcher) if factory else fetcher)
+        return als
+
+    @classmethod
+    def create(cls, config: configparser.ConfigParser) -> Self:
+        """設定ファイルから各 Fetcher を登録して生成する
+
+        各種設定の反映と Fetcher の登録は LinkSearcher.create と同じ
+
+        Args:
+            config (configparser.ConfigParser): 設定
+
+        Returns:
+            Self: AsyncLinkSearcher
+        """
+        return cls.from_link_searcher(LinkSearcher.create(config))
+
+
+if __name__ == "__main__":
+    import logging.config
+
+    logging.config.fileConfig("./log/logging.ini", disable_existing_loggers=False)
+
+    urls = [
+        "https://www.pixiv.net/artworks/86704541",
+        "http://nijie.info/view_popup.php?id=251267",
+        "https://seiga.nicovideo.jp/seiga/im5360137?query=1",
+    ]
+
+    CONFIG_FILE_NAME = "./config/config.ini"
+    config = configparser.ConfigParser()
+    if not config.read(CONFIG_FILE_NAME, encoding="utf8"):
+        raise IOError
+
+    als = AsyncLinkSearcher.create(config)
+    print(als.run(urls))
@@ -0,0 +1,126 @@
+import asyncio
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+import httpx
+
+from media_downloader.link_search.download_progress import DownloadCancelledError, download_progress
+from media_downloader.link_search.http_client_pool import http_client_pool
+from media_downloader.link_search.rate_limiter import rate_limiter
+from media_downloader.link_search.stream_downloader import StreamDownloader
+from media_downloader.link_search.url import URL
+
+
+@dataclass(frozen=True)
+class AsyncStreamDownloader:
+    """ストリーミングでファイルをDLするクラスの非同期版
+
+    一時ファイル、進捗情報、Range リクエストによる再開の扱いは StreamDownloader と同じ
+    待機（レート制限、ホストごとの同時DL数、通信）はすべてイベントループに譲るため、
+    1スレッドで多数のDLを並行して進められる
+    一時ファイルへの書き込みはチャンク単位で小さいため、イベントループ上でそのまま行う
+    保存先への確定（DL済作品の台帳への記録を含む）はファイル全体を読むため、別スレッドで行う
+    タスクが取り消された場合は、通信が切れた場合と同じく次回続きから再開できるように残しておく
+    """
+
+    session: httpx.AsyncClient  # DLに使うセッション
+
+    def __post_init__(self) -> None:
+        self._is_valid()
+
+    def _is_valid(self) -> bool:
+        if not isinstance(self.session, httpx.AsyncClient):
+            raise TypeError("session is not httpx.AsyncClient.")
+        return True
+
+    async def download(
+        self,
+        url: str | URL,
+        save_path: Path,
+        headers: dict | None = None,
+        cookies: dict | None = None,
+        suffix_resolver: Callable[[bytes], str] | None = None,
+        resume: bool = True,
+        commit: Callable[[Path, Path], None] | None = None,
+    ) -> Path:
+        """url の内容をDLして save_path に保存する
+
+        引数と戻り値は StreamDownloader.download と同じ
+
+        Args:
+            url (str | URL): DL対象のurl
+            save_path (Path): 保存先パス
+            headers (dict | None): リクエストに使うヘッダー
+            cookies (dict | None): リクエストに使うクッキー
+            suffix_resolver (Callable[[bytes], str] | None): 先頭 HEAD_SIZE バイトから拡張子を決める関数
+            resume (bool): 前回中断したDLがあれば続きから再開するか
+            commit (Callable[[Path, Path], None] | None): 一時ファイルを保存先に確定させる関数
+
+        Returns:
+            Path: 実際に保存したパス
+        """
+        if isinstance(url, URL):
+            url = url.original_url
+        if not isinstance(save_path, Path):
+            raise TypeError("save_path is not Path.")
+
+        part_path = StreamDownloader.part_path(save_path)
+        offset, request_headers = StreamDownloader._prepare(url, save_path, headers, resume)
+
+        total = None
+        try:
+            await rate_limiter.acquire_async(url)
+            async with (
+                http_client_pool.async_slot(url),
+                self.session.stream("GET", url, headers=request_headers, cookies=cookies) as response,
+            ):
+                if offset > 0 and response.status_code == httpx.codes.REQUESTED_RANGE_NOT_SATISFIABLE:
+                    # 一時ファイルがサーバー上のファイルと一致しない
+                    restart = True
+                else:
+                    restart = False
+                    mode, total = StreamDownloader._start(url, save_path, offset, response)
+                    with part_path.open(mode=mode) as fout:
+                        async for chunk in response.aiter_bytes(StreamDownloader.CHUNK_SIZE):
+                            fout.write(chunk)
+                            download_progress.add_bytes(len(chunk))
+                            download_progress.raise_if_cancelled()
+        except (httpx.TransportError, DownloadCancelledError):
+            # 通信が途中で切れた場合、DLが取り消された場合は続きから再開できるように残しておく
+            if not resume:
+                StreamDownloader._discard(save_path)
+            raise
+        except Exception:
+            StreamDownloader._discard(save_path)
+            raise
+
+        if restart:
+            StreamDownloader._discard(save_path)
+            return await self.download(url, save_path, headers, cookies, suffix_resolver, resume=False, commit=commit)
+
+        # 台帳への記録ではファイル全体のハッシュを計算するため、他のDLを止めないよう別スレッドで行う
+        return await asyncio.to_thread(
+            StreamDownloader._finish, url, save_path, total, suffix_resolver, resume, commit
+        )
+
+
+if __name__ == "__main__":
+    import time
+
+    async def main() -> None:
+        url = "https://www.python.org/static/img/python-logo.png"
+        save_directory = Path("./async_stream_downloader_sample")
+        save_directory.mkdir(exist_ok=True)
+        downloader = AsyncStreamDownloader(http_client_pool.get_async("python"))
+        start = time.perf_counter()
+        save_paths = await asyncio.gather(*[
+            downloader.download(url, save_directory / f"python-logo_{i:03}.png") for i in range(8)
+        ])
+        print(f"{time.perf_counter() - start:.3f}s")
+        for save_path in save_paths:
+            save_path.unlink()
+        save_directory.rmdir()
+        await http_client_pool.aclose()
+
+    asyncio.run(main())
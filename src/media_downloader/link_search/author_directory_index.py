@@ -0,0 +1,223 @@
+import os
+import re
+import threading
+from pathlib import Path
+from typing import ClassVar
+
+import orjson
+
+
+class AuthorDirectoryIndex:
+    """作者ID → 作者ディレクトリ名の索引
+
+    base_path 直下の {作者名}({作者ID}) 形式のディレクトリを作者IDで引けるようにする
+    各 SaveDirectoryPath.create で毎回 base_path 以下を走査する代わりにこの索引を参照する
+
+    索引は base_path/INDEX_FILE_NAME に保存し、次回以降の実行でも再利用する
+    読み込み時に base_path の更新日時が索引ファイルより新しければ（ディレクトリが追加・削除されていれば）作り直す
+    同じ作者IDのディレクトリが複数ある場合は更新日時が最も新しいものを使う
+
+    新しい作者は resolve で登録した時点ではディレクトリが無く、make_author_directory で作成するまで作成待ちとして扱う
+    作成待ちの作者はディレクトリが無くても索引から消さず、作成後に索引ファイルを保存し直して base_path より新しくする
+    """
+
+    # 索引ファイル名
+    INDEX_FILE_NAME = ".author_directory_index.json"
+    # 作者ディレクトリ名から作者IDを取り出す正規表現
+    AUTHOR_DIRECTORY_PATTERN = re.compile(r".*\(([0-9]*)\)$")
+
+    # base_path ごとに共有するインスタンス
+    _instances: ClassVar[dict[Path, "AuthorDirectoryIndex"]] = {}
+    _instances_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def __init__(self, base_path: Path) -> None:
+        if not isinstance(base_path, Path):
+            raise TypeError("base_path is not Path.")
+        self.base_path = base_path
+        self._lock = threading.Lock()
+        self._index: dict[int, str] = {}
+        # 登録済でディレクトリの作成を待っている作者ID -> 作者ディレクトリ名
+        self._pending: dict[int, str] = {}
+        self._load()
+
+    @classmethod
+    def get(cls, base_path: Path) -> "AuthorDirectoryIndex":
+        """base_path に対応する索引を取得する
+
+        同じ base_path に対しては同じインスタンスを返す
+
+        Args:
+            base_path (Path): 保存ディレクトリベースパス
+
+        Returns:
+            AuthorDirectoryIndex: base_path の索引
+        """
+        if not isinstance(base_path, Path):
+            raise TypeError("base_path is not Path.")
+        key = base_path.absolute()
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = AuthorDirectoryIndex(base_path)
+            return cls._instances[key]
+
+    @classmethod
+    def reset(cls) -> None:
+        """共有しているインスタンスをすべて破棄する"""
+        with cls._instances_lock:
+            cls._instances.clear()
+
+    @property
+    def index_path(self) -> Path:
+        """索引ファイルのパス"""
+        return self.base_path / self.INDEX_FILE_NAME
+
+    def _load(self) -> None:
+        """索引ファイルを読み込む、古い場合は作り直す"""
+        if not self.base_path.is_dir():
+            return
+        index_path = self.index_path
+        if index_path.is_file() and self.base_path.stat().st_mtime_ns <= index_path.stat().st_mtime_ns:
+            try:
+                data = orjson.loads(index_path.read_bytes())
+                self._index = {int(author_id): dir_name for author_id, dir_name in data.items()}
+                return
+            except (orjson.JSONDecodeError, AttributeError, ValueError):
+                pass
+        self.rebuild()
+
+    def _save(self) -> None:
+        """索引ファイルに保存する"""
+        if not self.base_path.is_dir():
+            return
+        index_path = self.index_path
+        tmp_path = index_path.with_name(index_path.name + ".tmp")
+        tmp_path.write_bytes(orjson.dumps({str(author_id): dir_name for author_id, dir_name in self._index.items()}))
+        os.replace(tmp_path, index_path)
+        # 書き込みで base_path の更新日時も変わるため、索引ファイルの方を新しくしておく
+        os.utime(index_path)
+
+    def rebuild(self) -> None:
+        """base_path 以下を走査して索引を作り直す"""
+        with self._lock:
+            candidates: dict[int, list[os.DirEntry]] = {}
+            with os.scandir(self.base_path) as it:
+                for entry in it:
+                    if not entry.is_dir():
+                        continue
+                    result = self.AUTHOR_DIRECTORY_PATTERN.match(entry.name)
+                    if result and result.group(1):
+                        candidates.setdefault(int(result.group(1)), []).append(entry)
+
+            # 同じ作者IDのディレクトリが複数ある場合のみ更新日時を調べる
+            self._index = {
+                author_id: max(entries, key=lambda e: e.stat().st_mtime).name if len(entries) > 1 else entries[0].name
+                for author_id, entries in candidates.items()
+            }
+            # 作成待ちの作者は、ディレクトリが作られていなければ登録を残す
+            self._pending = {
+                author_id: dir_name for author_id, dir_name in self._pending.items() if author_id not in self._index
+            }
+            self._index.update(self._pending)
+            self._save()
+
+    def find(self, author_id: int) -> str | None:
+        """作者IDに対応するディレクトリ名を返す
+
+        Args:
+            author_id (int): 作者ID
+
+        Returns:
+            str | None: 作者ディレクトリ名、存在しない場合None
+        """
+        with self._lock:
+            dir_name = self._index.get(author_id)
+            is_pending = self._pending.get(author_id) == dir_name
+        if dir_name is None:
+            return None
+        if is_pending or (self.base_path / dir_name).is_dir():
+            return dir_name
+
+        # 索引作成後に削除・リネームされていた
+        self.rebuild()
+        with self._lock:
+            return self._index.get(author_id)
+
+    def register(self, author_id: int, dir_name: str) -> None:
+        """作者ディレクトリを索引に追加する
+
+        Args:
+            author_id (int): 作者ID
+            dir_name (str): 作者ディレクトリ名
+        """
+        with self._lock:
+            if self._index.get(author_id) == dir_name:
+                return
+            self._index[author_id] = dir_name
+            if not (self.base_path / dir_name).is_dir():
+                self._pending[author_id] = dir_name
+            self._save()
+
+    def created(self, dir_name: str) -> None:
+        """作者ディレクトリが作成されたことを索引に反映する
+
+        作成によって base_path の更新日時が索引ファイルより新しくなるため、索引ファイルを保存し直す
+        登録せずに作成されたものは、作成したものを最も新しい作者ディレクトリとして登録する
+
+        Args:
+            dir_name (str): 作成した作者ディレクトリ名
+        """
+        result = self.AUTHOR_DIRECTORY_PATTERN.match(dir_name)
+        with self._lock:
+            author_ids = [author_id for author_id, name in self._pending.items() if name == dir_name]
+            if not author_ids and result and result.group(1):
+                author_id = int(result.group(1))
+                if self._index.get(author_id) != dir_name:
+                    self._index[author_id] = dir_name
+                    author_ids = [author_id]
+            if not author_ids:
+                return
+            for author_id in author_ids:
+                self._pending.pop(author_id, None)
+            self._save()
+
+    @classmethod
+    def make_author_directory(cls, author_path: Path) -> None:
+        """作者ディレクトリを作成し、対応する索引に作成済として反映する
+
+        各Downloaderは作者ディレクトリを直接 mkdir せずにこれを使う
+
+        Args:
+            author_path (Path): 作者ディレクトリパス、{base_path}/{作者名}({作者ID}) の形を想定している
+        """
+        if not isinstance(author_path, Path):
+            raise TypeError("author_path is not Path.")
+        author_path.mkdir(parents=True, exist_ok=True)
+        cls.get(author_path.parent).created(author_path.name)
+
+    def resolve(self, author_id: int, author_name: str) -> str:
+        """作者IDに対応するディレクトリ名を返す、存在しない場合は新しく登録する
+
+        Args:
+            author_id (int): 作者ID
+            author_name (str): 作者名、新しく登録する場合に使う
+
+        Returns:
+            str: 作者ディレクトリ名、{作者名}({作者ID}) の形を想定している
+        """
+        dir_name = self.find(author_id)
+        if dir_name is None:
+            dir_name = f"{author_name}({author_id})"
+            self.register(author_id, dir_name)
+        return dir_name
+
+
+if __name__ == "__main__":
+    import time
+
+    base_path = Path("./MediaDownloader/LinkSearch/")
+    start = time.perf_counter()
+    author_directory_index = AuthorDirectoryIndex.get(base_path)
+    print(f"load: {time.perf_counter() - start:.3f}s")
+    start = time.perf_counter()
+    print(author_directory_index.resolve(12345678, "作者名1"))
+    print(f"resolve: {time.perf_counter() - start:.6f}s")
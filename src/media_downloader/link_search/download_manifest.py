@@ -0,0 +1,173 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    """DL済作品の記録"""
+
+    site: str  # サイト名
+    work_id: int  # 作品ID
+    path: Path  # 保存先パス（ファイル、または漫画形式の場合はディレクトリ）
+    size: int  # 保存したファイルサイズの合計[byte]
+    sha256: str  # 保存したファイルのsha256、ディレクトリの場合は各ファイルのsha256を連結したもののsha256
+    downloaded_at: float  # 記録日時（UNIX時間）
+
+
+class DownloadManifest:
+    """DL済作品の台帳
+
+    (サイト名, 作品ID) をキーに、DLが完了した作品の保存先パス、サイズ、ハッシュ、日時を SQLite に記録する
+    各Fetcherはネットワークに触れる前にこの台帳を確認し、DL済の作品はログインや作品詳細の取得をせずにスキップする
+    記録は一時ファイルを保存先へリネームするのと同じトランザクション内で行うため、
+    台帳に記録があるのに保存先が存在しない（またはその逆）という状態にはならない
+    db_path が設定されていない場合は何も記録せず、常に未DLとして扱う
+    """
+
+    # ハッシュ計算時に1回に読み込むサイズ[byte]
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, db_path: Path | None = None) -> None:
+        self._lock = threading.Lock()
+        self.configure(db_path)
+
+    def configure(self, db_path: Path | None = None) -> None:
+        """台帳の設定を反映する
+
+        Args:
+            db_path (Path | None): 台帳のSQLiteファイルのパス、Noneの場合は記録しない
+        """
+        if db_path is not None and not isinstance(db_path, Path):
+            raise TypeError("db_path must be Path or None.")
+        with self._lock:
+            self.db_path = db_path
+        if self.db_path:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            with closing(sqlite3.connect(self.db_path)) as conn, conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS works ("
+                    "site TEXT NOT NULL, work_id INTEGER NOT NULL, path TEXT NOT NULL, "
+                    "size INTEGER NOT NULL, hash TEXT NOT NULL, downloaded_at REAL NOT NULL, "
+                    "PRIMARY KEY (site, work_id))"
+                )
+
+    @classmethod
+    def digest(cls, path: Path) -> tuple[int, str]:
+        """保存したファイルのサイズとハッシュを計算する
+
+        Args:
+            path (Path): ファイル、またはディレクトリのパス
+
+        Returns:
+            tuple[int, str]: (サイズ[byte], sha256の16進文字列)
+        """
+        if path.is_dir():
+            total_size = 0
+            sha256 = hashlib.sha256()
+            for file_path in sorted(p for p in path.rglob("*") if p.is_file()):
+                size, file_hash = cls.digest(file_path)
+                total_size += size
+                sha256.update(file_hash.encode())
+            return total_size, sha256.hexdigest()
+
+        sha256 = hashlib.sha256()
+        with path.open(mode="rb") as fin:
+            while chunk := fin.read(cls.HASH_CHUNK_SIZE):
+                sha256.update(chunk)
+        return path.stat().st_size, sha256.hexdigest()
+
+    def get(self, site: str, work_id: int) -> ManifestEntry | None:
+        """DL済作品の記録を取得する
+
+        記録があっても保存先が存在しない場合（手動で削除された場合など）は記録を削除してNoneを返す
+
+        Args:
+            site (str): サイト名
+            work_id (int): 作品ID
+
+        Returns:
+            ManifestEntry | None: DL済作品の記録、未DLの場合None
+        """
+        if not self.db_path:
+            return None
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            row = conn.execute(
+                "SELECT path, size, hash, downloaded_at FROM works WHERE site = ? AND work_id = ?", (site, work_id)
+            ).fetchone()
+            if row is None:
+                return None
+            path_str, size, sha256, downloaded_at = row
+            path = Path(path_str)
+            if not path.exists():
+                with conn:
+                    conn.execute("DELETE FROM works WHERE site = ? AND work_id = ?", (site, work_id))
+                return None
+        return ManifestEntry(site, work_id, path, size, sha256, downloaded_at)
+
+    def contains(self, site: str, work_id: int) -> bool:
+        """DL済作品かどうか
+
+        Args:
+            site (str): サイト名
+            work_id (int): 作品ID
+
+        Returns:
+            bool: DL済ならTrue
+        """
+        return self.get(site, work_id) is not None
+
+    def commit(self, site: str, work_id: int, path: Path, source: Path | None = None) -> None:
+        """DLが完了した作品を記録する
+
+        source を指定した場合は source を path にリネームし、その成否と記録を1つのトランザクションで確定させる
+
+        Args:
+            site (str): サイト名
+            work_id (int): 作品ID
+            path (Path): 保存先パス
+            source (Path | None): 保存先にリネームする一時ファイル、Noneの場合は path が既に保存済のものとする
+        """
+        if not self.db_path:
+            if source:
+                os.replace(source, path)
+            return
+
+        size, sha256 = self.digest(source or path)
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO works (site, work_id, path, size, hash, downloaded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (site, work_id, str(path), size, sha256, time.time()),
+            )
+            # リネームに失敗した場合は記録もロールバックされる
+            if source:
+                os.replace(source, path)
+
+    def discard(self, site: str, work_id: int) -> None:
+        """作品の記録を削除する
+
+        Args:
+            site (str): サイト名
+            work_id (int): 作品ID
+        """
+        if not self.db_path:
+            return
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.execute("DELETE FROM works WHERE site = ? AND work_id = ?", (site, work_id))
+
+
+# プロセス全体で共有するDL済作品の台帳
+download_manifest = DownloadManifest()
+
+
+if __name__ == "__main__":
+    download_manifest.configure(Path("./config/download_manifest.db"))
+    start = time.perf_counter()
+    print(download_manifest.get("pixiv", 86704541))
+    print(f"{time.perf_counter() - start:.6f}s")
@@ -0,0 +1,130 @@
+import threading
+from dataclasses import dataclass
+
+
+class DownloadCancelledError(Exception):
+    """DLの取り消しが要求されたことを表す例外
+
+    DL中のファイルは一時ファイルを残して中断し、作品ディレクトリは隠しディレクトリのまま残す
+    次回同じ作品をDLする際に続きから再開する
+    """
+
+    pass
+
+
+@dataclass(frozen=True)
+class WorkProgress:
+    """複数ページの作品1つのDLの進捗"""
+
+    pages_done: int  # DL済のページ数（既に保存済でスキップしたページを含む）
+    pages_total: int  # 全ページ数
+
+
+@dataclass(frozen=True)
+class DownloadProgressSnapshot:
+    """ある時点でのDLの進捗"""
+
+    bytes_total: int  # プロセス起動からの累計受信バイト数
+    works: dict[str, WorkProgress]  # DL中の作品名 -> 進捗
+
+
+class DownloadProgress:
+    """DLの進捗の集計と、DLの取り消し要求の受け渡しを行うクラス
+
+    StreamDownloader は受信したバイト数を、PageDownloader は作品ごとのDL済ページ数を記録する
+    GUIなどの呼び出し元は snapshot で進捗を取得し、cancel でDLの取り消しを要求する
+    DL処理はチャンクやページごとに raise_if_cancelled を呼び出し、取り消されていれば中断する
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._bytes_total = 0
+        # 作品名 -> [DL済ページ数, 全ページ数]
+        self._works: dict[str, list[int]] = {}
+        self._cancelled = threading.Event()
+
+    def add_bytes(self, size: int) -> None:
+        """受信したバイト数を記録する
+
+        Args:
+            size (int): 受信したバイト数
+        """
+        with self._lock:
+            self._bytes_total += size
+
+    def start_work(self, name: str, pages_total: int) -> None:
+        """複数ページの作品のDL開始を記録する
+
+        Args:
+            name (str): 作品名
+            pages_total (int): 全ページ数
+        """
+        with self._lock:
+            self._works[name] = [0, pages_total]
+
+    def page_done(self, name: str) -> None:
+        """作品の1ページのDL完了を記録する
+
+        Args:
+            name (str): 作品名
+        """
+        with self._lock:
+            if name in self._works:
+                self._works[name][0] += 1
+
+    def finish_work(self, name: str) -> None:
+        """複数ページの作品のDL終了を記録する、成否によらず呼び出す
+
+        Args:
+            name (str): 作品名
+        """
+        with self._lock:
+            self._works.pop(name, None)
+
+    def snapshot(self) -> DownloadProgressSnapshot:
+        """現時点のDLの進捗を取得する
+
+        Returns:
+            DownloadProgressSnapshot: DLの進捗
+        """
+        with self._lock:
+            works = {name: WorkProgress(done, total) for name, (done, total) in self._works.items()}
+            return DownloadProgressSnapshot(self._bytes_total, works)
+
+    @property
+    def is_cancelled(self) -> bool:
+        """DLの取り消しが要求されているか"""
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """DLの取り消しを要求する、reset を呼び出すまで以降のDLもすべて中断する"""
+        self._cancelled.set()
+
+    def reset(self) -> None:
+        """DLの取り消し要求を解除する、実行中のDLがすべて中断してから呼び出す"""
+        self._cancelled.clear()
+
+    def raise_if_cancelled(self) -> None:
+        """DLの取り消しが要求されていれば DownloadCancelledError を送出する
+
+        Raises:
+            DownloadCancelledError: DLの取り消しが要求されている
+        """
+        if self._cancelled.is_set():
+            raise DownloadCancelledError("download is cancelled.")
+
+
+# プロセス全体で共有するDLの進捗
+download_progress = DownloadProgress()
+
+
+if __name__ == "__main__":
+    download_progress.start_work("作品名1(12345678)", 3)
+    download_progress.page_done("作品名1(12345678)")
+    download_progress.add_bytes(1024)
+    print(download_progress.snapshot())
+    download_progress.cancel()
+    try:
+        download_progress.raise_if_cancelled()
+    except DownloadCancelledError as e:
+        print(e)
@@ -1,8 +1,10 @@
 import re
 from abc import ABCMeta, abstractmethod
 from dataclasses import dataclass
+from typing import Any, ClassVar
 
 from media_downloader.link_search.url import URL
+from media_downloader.link_search.work_key import WorkKey
 
 
 @dataclass(frozen=True)
@@ -12,6 +14,10 @@ class FetcherBase(metaclass=ABCMeta):
     派生クラスはis_target_urlとfetchをオーバーライドして実装する必要がある
     """
 
+    # 担当urlのホスト名、LinkSearcher はホスト名が一致するurlのみ is_target_url で判定する
+    # 空の場合はすべてのurlについて is_target_url で判定する
+    TARGET_HOSTS: ClassVar[tuple[str, ...]] = ()
+
     def __init__(self):
         pass
 
@@ -29,14 +35,31 @@ class FetcherBase(metaclass=ABCMeta):
         """
         return False
 
+    def work_key(self, url: URL) -> WorkKey | None:
+        """担当urlが指す作品のキーを返す
+
+        LinkSearcher はキーが同じurlの fetch を同時に実行せず、1回にまとめる
+        派生クラスでオーバーライドしない場合はまとめない
+
+        Args:
+            url (URL): 処理対象url、is_target_url で担当と判定したもの
+
+        Returns:
+            WorkKey | None: 作品キー、まとめない場合None
+        """
+        return None
+
     @abstractmethod
-    def fetch(self, url: URL) -> None:
+    def fetch(self, url: URL) -> Any:
         """自分（担当者）が担当する処理
 
         派生クラスでオーバーライドする。
 
         Args:
             url (URL): 処理対象url
+
+        Returns:
+            Any: 処理結果、各DownloaderのDownloadResultを想定
         """
         pass
 
@@ -0,0 +1,139 @@
+import re
+from typing import Any
+
+
+class FetcherIndex:
+    """担当fetcherの候補をurlのホスト名から引くための索引
+
+    各fetcherの TARGET_HOSTS をもとに、ホスト名 -> 候補fetcherのリスト の辞書を作る
+    TARGET_HOSTS が空のfetcherは担当ホストが不明なものとして、すべてのホスト名の候補に含める
+    候補は登録順に並べるため、候補を先頭から is_target_url で判定すれば全fetcherを順に判定した場合と同じ結果になる
+    ホスト名は URL インスタンスを作らずに、url文字列から HOST_PATTERN で取り出す
+    """
+
+    # url文字列からホスト名を取り出すパターン、ユーザー情報とポート番号は除く
+    HOST_PATTERN = re.compile(r"^https?://(?:[^/?#@]*@)?([^/?#:]*)")
+
+    def __init__(self) -> None:
+        # ホスト名 -> 候補fetcherのリスト
+        self._by_host: dict[str, list[Any]] = {}
+        # 担当ホストが不明なfetcherのリスト、索引に無いホスト名の候補
+        self._any_host: list[Any] = []
+
+    @staticmethod
+    def target_hosts(fetcher: Any) -> tuple[str, ...]:
+        """fetcherの担当ホスト名を返す
+
+        Args:
+            fetcher (Any): fetcher
+
+        Returns:
+            tuple[str, ...]: 担当ホスト名、不明な場合は空
+        """
+        hosts = getattr(fetcher, "TARGET_HOSTS", ())
+        return hosts if isinstance(hosts, tuple) else ()
+
+    def add(self, fetcher: Any) -> None:
+        """fetcherを索引に追加する
+
+        Args:
+            fetcher (Any): 追加するfetcher
+        """
+        hosts = self.target_hosts(fetcher)
+        if not hosts:
+            self._any_host.append(fetcher)
+            for candidates in self._by_host.values():
+                candidates.append(fetcher)
+            return
+        for host in hosts:
+            # 初出のホスト名は、それまでに登録された担当ホストが不明なfetcherを候補に含める
+            candidates = self._by_host.setdefault(host.lower(), list(self._any_host))
+            candidates.append(fetcher)
+
+    @classmethod
+    def host(cls, url: str) -> str:
+        """url文字列のホスト名を返す
+
+        Args:
+            url (str): 処理対象url
+
+        Returns:
+            str: 小文字に揃えたホスト名、取り出せなかった場合は空文字列
+        """
+        m = cls.HOST_PATTERN.match(url)
+        return m.group(1).lower() if m else ""
+
+    def candidates(self, url: str) -> list[Any]:
+        """urlを担当しうるfetcherを登録順に返す
+
+        Args:
+            url (str): 処理対象url
+
+        Returns:
+            list[Any]: 担当しうるfetcherのリスト
+        """
+        return self._by_host.get(self.host(url), self._any_host)
+
+
+if __name__ == "__main__":
+    import timeit
+    from pathlib import Path
+
+    from media_downloader.link_search.nico_seiga.nico_seiga_fetcher import NicoSeigaFetcher
+    from media_downloader.link_search.nijie.nijie_fetcher import NijieFetcher
+    from media_downloader.link_search.password import Password
+    from media_downloader.link_search.pixiv.pixiv_fetcher import PixivFetcher
+    from media_downloader.link_search.pixiv_novel.pixiv_novel_fetcher import PixivNovelFetcher
+    from media_downloader.link_search.url import URL
+    from media_downloader.link_search.username import Username
+
+    # 実際の fetcher を登録し、全fetcherを順に判定する場合と、索引で候補を絞り込む場合の処理時間を比べる
+    # fetcher はログインを初回 fetch 時に行うため、ここでは通信しない
+    N = 100000
+    username, password, base_path = Username("dummy"), Password("dummy"), Path("./")
+    fetchers = [
+        PixivFetcher(username, password, base_path),
+        PixivNovelFetcher(username, password, base_path),
+        NijieFetcher(username, password, base_path),
+        NicoSeigaFetcher(username, password, base_path),
+    ]
+    fetcher_index = FetcherIndex()
+    for fetcher in fetchers:
+        fetcher_index.add(fetcher)
+
+    sample_urls = [
+        "https://www.pixiv.net/artworks/86704541",
+        "https://www.pixiv.net/novel/show.php?id=17668373",
+        "https://nijie.info/view.php?id=251267",
+        "https://nijie.info/view_popup.php?id=251267",
+        "https://seiga.nicovideo.jp/seiga/im5360137",
+        "http://nico.ms/im5360137",
+        "https://www.example.com/artworks/86704541",
+        "https://twitter.com/user/status/1234567890",
+    ]
+    urls = [sample_urls[i % len(sample_urls)] for i in range(N)]
+
+    def chain_scan(url: str) -> Any:
+        """索引を使わず、全fetcherを登録順に判定する"""
+        target_url = URL(url)
+        for fetcher in fetchers:
+            if fetcher.is_target_url(target_url):
+                return fetcher
+        return None
+
+    def indexed_scan(url: str) -> Any:
+        """索引で候補を絞り込み、候補が無い場合は URL インスタンスを作らない"""
+        candidates = fetcher_index.candidates(url)
+        if not candidates:
+            return None
+        target_url = URL(url)
+        for fetcher in candidates:
+            if fetcher.is_target_url(target_url):
+                return fetcher
+        return None
+
+    # どちらの方法でも同じ fetcher が見つかる
+    assert [chain_scan(url) for url in sample_urls] == [indexed_scan(url) for url in sample_urls]
+    for name, find in [("chain scan", chain_scan), ("host-indexed", indexed_scan)]:
+        elapsed = min(timeit.repeat(lambda: [find(url) for url in urls], number=1, repeat=3))
+        print(f"{name:12}: {elapsed:5.2f}s, {N / elapsed / 1000:5.1f}k url/s")
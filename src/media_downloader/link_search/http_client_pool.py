@@ -0,0 +1,403 @@
+import asyncio
+import atexit
+import importlib.util
+import logging
+import threading
+import urllib.parse
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from logging import INFO, getLogger
+from typing import AsyncIterator, Iterator
+
+import httpx
+
+from media_downloader.link_search.url import URL
+from media_downloader.util import CustomLogger
+
+logging.setLoggerClass(CustomLogger)
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+class HttpClientPool:
+    """サイト（ホスト群）ごとに長寿命の httpx.Client を共有するプール
+
+    DLのたびに httpx.Client を生成すると、作品ごとにTCP/TLS接続を張り直すことになり、
+    閉じ忘れた Client のソケットも残り続ける
+    ここではサイトごとに1つの Client を生成して使い回し、keep-alive された接続を再利用する
+    httpx.Client はスレッドセーフなため、複数スレッドから同じ Client を借りて使ってよい
+
+    Client の cookies にはレスポンスのクッキーが溜まっていくため、ログイン状態を持つ Client は共有しない
+    認証済セッションは SessionClients でクッキーを設定した Client を専有する
+
+    http2 を有効にすると、同じホストへのリクエストを1本の接続上に多重化する（h2 パッケージが必要）
+    HTTP/2 では接続数の上限が同時リクエスト数の上限にならないため、
+    ホストごとの同時リクエスト数は slot() で別途 max_concurrency_per_host までに制限する
+
+    非同期版の Fetcher 向けに httpx.AsyncClient も同様にサイトごとに共有する（get_async, async_slot）
+    httpx.AsyncClient はイベントループに紐づくため、イベントループを終える前に aclose() で閉じること
+    """
+
+    # 同時接続数の上限
+    DEFAULT_MAX_CONNECTIONS = 16
+    # keep-alive で保持しておく接続数の上限
+    DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 8
+    # keep-alive で保持しておく時間[s]
+    DEFAULT_KEEPALIVE_EXPIRY = 30.0
+    # HTTP/2 を使うか
+    DEFAULT_HTTP2 = False
+    # ホストごとの同時リクエスト数の上限
+    DEFAULT_MAX_CONCURRENCY_PER_HOST = 6
+    # 接続失敗時のリトライ回数
+    RETRIES = 5
+    # タイムアウト[s]
+    TIMEOUT = 60.0
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+        http2: bool = DEFAULT_HTTP2,
+        max_concurrency_per_host: int = DEFAULT_MAX_CONCURRENCY_PER_HOST,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._clients: dict[str, httpx.Client] = {}
+        self._host_slots: dict[str, threading.BoundedSemaphore] = {}
+        self._async_clients: dict[str, httpx.AsyncClient] = {}
+        self._async_host_slots: dict[str, asyncio.Semaphore] = {}
+        # 設定変更で差し替えた AsyncClient、同期的には閉じられないため次の aclose() で閉じる
+        self._stale_async_clients: list[httpx.AsyncClient] = []
+        # create_async で生成した AsyncClient、イベントループに紐づくため aclose() で合わせて閉じる
+        self._created_async_clients: weakref.WeakSet[httpx.AsyncClient] = weakref.WeakSet()
+        self.configure(max_connections, max_keepalive_connections, keepalive_expiry, http2, max_concurrency_per_host)
+
+    def configure(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+        http2: bool = DEFAULT_HTTP2,
+        max_concurrency_per_host: int = DEFAULT_MAX_CONCURRENCY_PER_HOST,
+    ) -> None:
+        """接続数の設定を反映する
+
+        設定が変わった場合、生成済の Client は閉じて次回取得時に作り直す
+        http2 を指定しても h2 パッケージが無い場合は警告を出して HTTP/1.1 を使う
+
+        Args:
+            max_connections (int): サイトごとの同時接続数の上限
+            max_keepalive_connections (int): サイトごとに keep-alive で保持しておく接続数の上限
+            keepalive_expiry (float): keep-alive で保持しておく時間[s]
+            http2 (bool): HTTP/2 を使うか
+            max_concurrency_per_host (int): ホストごとの同時リクエスト数の上限
+        """
+        if not isinstance(max_connections, int) or max_connections < 1:
+            raise ValueError("max_connections must be positive int.")
+        if not isinstance(max_keepalive_connections, int) or max_keepalive_connections < 0:
+            raise ValueError("max_keepalive_connections must be non-negative int.")
+        if not isinstance(keepalive_expiry, int | float) or keepalive_expiry < 0:
+            raise ValueError("keepalive_expiry must be non-negative number.")
+        if not isinstance(http2, bool):
+            raise TypeError("http2 must be bool.")
+        if not isinstance(max_concurrency_per_host, int) or max_concurrency_per_host < 1:
+            raise ValueError("max_concurrency_per_host must be positive int.")
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("http2 is enabled, but h2 package is not installed. Use HTTP/1.1 instead.")
+            http2 = False
+
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=min(max_keepalive_connections, max_connections),
+            keepalive_expiry=keepalive_expiry,
+        )
+        with self._lock:
+            if getattr(self, "max_concurrency_per_host", None) != max_concurrency_per_host:
+                # 取得中のスロットは作り直す前のものに返却される
+                self._host_slots.clear()
+                self._async_host_slots.clear()
+            self.max_concurrency_per_host = max_concurrency_per_host
+            if (getattr(self, "limits", None), getattr(self, "http2", None)) == (limits, http2):
+                return
+            self.limits = limits
+            self.http2 = http2
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._stale_async_clients.extend(self._async_clients.values())
+            self._async_clients.clear()
+        for client in clients:
+            client.close()
+
+    @classmethod
+    def _host(cls, url: str | URL) -> str:
+        """url からホスト名を取り出す"""
+        if isinstance(url, URL):
+            url = url.original_url
+        return (urllib.parse.urlparse(url).hostname or url).lower()
+
+    def create(self) -> httpx.Client:
+        """設定を反映した Client を新しく生成する
+
+        プールには登録しない、認証済セッションのように呼び出し元が専有する Client に使う
+
+        Returns:
+            httpx.Client: 生成した Client
+        """
+        transport = httpx.HTTPTransport(retries=self.RETRIES, limits=self.limits, http2=self.http2)
+        return httpx.Client(follow_redirects=True, timeout=self.TIMEOUT, transport=transport)
+
+    def get(self, site: str) -> httpx.Client:
+        """site 用の Client を返す、まだ無ければ生成する
+
+        Args:
+            site (str): サイト名、同じサイト名に対しては同じ Client を返す
+
+        Returns:
+            httpx.Client: site 用の Client
+        """
+        if not isinstance(site, str) or site == "":
+            raise ValueError("site must be non-empty str.")
+        with self._lock:
+            client = self._clients.get(site)
+            if client is None or client.is_closed:
+                client = self.create()
+                self._clients[site] = client
+            return client
+
+    @contextmanager
+    def slot(self, url: str | URL) -> Iterator[None]:
+        """url のホストへの同時リクエスト数を max_concurrency_per_host までに制限する
+
+        with ブロックの間スロットを1つ占有する、空きが無い場合は空くまでスレッドを待機させる
+
+        Args:
+            url (str | URL): リクエスト先url、またはホスト名
+        """
+        host = self._host(url)
+        with self._lock:
+            host_slot = self._host_slots.get(host)
+            if host_slot is None:
+                host_slot = threading.BoundedSemaphore(self.max_concurrency_per_host)
+                self._host_slots[host] = host_slot
+        with host_slot:
+            yield
+
+    def create_async(self) -> httpx.AsyncClient:
+        """設定を反映した AsyncClient を新しく生成する
+
+        プールには登録しない、認証済セッションのように呼び出し元が専有する AsyncClient に使う
+        イベントループに紐づくため、閉じられていなければ aclose() でプールの AsyncClient と合わせて閉じる
+
+        Returns:
+            httpx.AsyncClient: 生成した AsyncClient
+        """
+        transport = httpx.AsyncHTTPTransport(retries=self.RETRIES, limits=self.limits, http2=self.http2)
+        client = httpx.AsyncClient(follow_redirects=True, timeout=self.TIMEOUT, transport=transport)
+        with self._lock:
+            self._created_async_clients.add(client)
+        return client
+
+    def get_async(self, site: str) -> httpx.AsyncClient:
+        """site 用の AsyncClient を返す、まだ無ければ生成する
+
+        Args:
+            site (str): サイト名、同じサイト名に対しては同じ AsyncClient を返す
+
+        Returns:
+            httpx.AsyncClient: site 用の AsyncClient
+        """
+        if not isinstance(site, str) or site == "":
+            raise ValueError("site must be non-empty str.")
+        with self._lock:
+            client = self._async_clients.get(site)
+            if client is None or client.is_closed:
+                client = self.create_async()
+                self._async_clients[site] = client
+            return client
+
+    @asynccontextmanager
+    async def async_slot(self, url: str | URL) -> AsyncIterator[None]:
+        """slot の非同期版、空きが無い場合は空くまでタスクを待機させる
+
+        Args:
+            url (str | URL): リクエスト先url、またはホスト名
+        """
+        host = self._host(url)
+        with self._lock:
+            host_slot = self._async_host_slots.get(host)
+            if host_slot is None:
+                host_slot = asyncio.Semaphore(self.max_concurrency_per_host)
+                self._async_host_slots[host] = host_slot
+        async with host_slot:
+            yield
+
+    async def aclose(self) -> None:
+        """生成済の AsyncClient をすべて閉じる
+
+        イベントループを終える前に呼び出す、次に get_async した際は新しいイベントループ上で作り直す
+        create_async で生成した AsyncClient も閉じる
+        """
+        with self._lock:
+            clients = list(self._async_clients.values()) + self._stale_async_clients
+            clients += [client for client in self._created_async_clients if not client.is_closed]
+            self._async_clients.clear()
+            self._stale_async_clients = []
+            self._created_async_clients = weakref.WeakSet()
+            # asyncio.Semaphore も最初に使ったイベントループに紐づくため作り直す
+            self._async_host_slots.clear()
+        for client in clients:
+            await client.aclose()
+
+    def close(self) -> None:
+        """生成済の Client をすべて閉じる"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+
+class SessionClients:
+    """認証済セッションが専有する Client と AsyncClient
+
+    共有の Client にリクエストごとに cookies 引数でログイン状態を渡すのは httpx では非推奨であり、
+    レスポンスで受け取ったクッキー（ログイン時の認証情報を含む）も共有の Client に残って以降のリクエストに付与される
+    ここではセッションごとにクッキーを設定した Client を生成して専有し、セッションを破棄する際に閉じる
+    Client, AsyncClient はそれぞれ最初に使う際に生成する、セッションを閉じた後は作り直さない
+    AsyncClient はイベントループに紐づくため HttpClientPool.aclose() でも閉じられる、その場合は次に使う際に作り直す
+    """
+
+    def __init__(self, cookies: httpx.Cookies | None = None, client: httpx.Client | None = None) -> None:
+        """初期化処理
+
+        Args:
+            cookies (httpx.Cookies | None): 生成する Client に設定するクッキー
+            client (httpx.Client | None): ログインに使った Client など生成済の Client、指定した場合はこれを使う
+        """
+        self._lock = threading.Lock()
+        self._cookies = cookies
+        self._client = client
+        self._async_client: httpx.AsyncClient | None = None
+        self._closed = False
+
+    @property
+    def client(self) -> httpx.Client:
+        """セッションが専有する Client"""
+        with self._lock:
+            if self._client is None:
+                self._client = http_client_pool.create()
+                if self._cookies is not None:
+                    self._client.cookies = self._cookies
+            return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """セッションが専有する AsyncClient
+
+        生成時点の Client のクッキー（Client が未生成の場合は cookies）を写して生成する
+        """
+        with self._lock:
+            if self._async_client is None or (self._async_client.is_closed and not self._closed):
+                self._async_client = http_client_pool.create_async()
+                cookies = self._client.cookies if self._client is not None else self._cookies
+                if cookies is not None:
+                    self._async_client.cookies = cookies
+            return self._async_client
+
+    def close(self) -> None:
+        """生成済の Client を閉じる
+
+        AsyncClient は同期的には閉じられないため、aclose() か HttpClientPool.aclose() で閉じる
+        """
+        with self._lock:
+            self._closed = True
+            client = self._client
+        if client is not None:
+            client.close()
+
+    async def aclose(self) -> None:
+        """生成済の Client と AsyncClient を閉じる"""
+        self.close()
+        with self._lock:
+            async_client = self._async_client
+        if async_client is not None:
+            await async_client.aclose()
+
+
+# プロセス全体で共有する Client のプール
+http_client_pool = HttpClientPool()
+atexit.register(http_client_pool.close)
+
+
+if __name__ == "__main__":
+    # HTTP/1.1 と HTTP/2 で、50ページの作品を同じホストからDLする時間を比較するベンチマーク
+    # ローカルのテスト用サーバーとして hypercorn を使う（h2, hypercorn パッケージが必要）
+    # hypercorn は平文のポートで HTTP/1.1 と HTTP/2（prior knowledge）の両方を受け付ける
+    import asyncio
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    PAGES = 50  # 作品のページ数
+    PAGE_SIZE = 256 * 1024  # 1ページの画像サイズ[byte]
+    LATENCY = 0.05  # サーバーの応答遅延[s]
+    WORKERS = 8  # 同時にDLするスレッド数
+    PORT = 18443
+
+    async def app(scope, receive, send) -> None:
+        if scope["type"] != "http":
+            return
+        await asyncio.sleep(LATENCY)
+        body = b"\0" * PAGE_SIZE
+        headers = [(b"content-type", b"image/jpeg"), (b"content-length", str(len(body)).encode())]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    shutdown_event = threading.Event()
+
+    def run_server() -> None:
+        config = Config()
+        config.bind = [f"127.0.0.1:{PORT}"]
+        config.loglevel = "WARNING"
+
+        async def shutdown_trigger() -> None:
+            while not shutdown_event.is_set():
+                await asyncio.sleep(0.1)
+
+        asyncio.run(serve(app, config, shutdown_trigger=shutdown_trigger))
+
+    server_thread = threading.Thread(target=run_server, daemon=True)
+    server_thread.start()
+    time.sleep(1.0)
+
+    def benchmark(http2: bool) -> float:
+        pool = HttpClientPool(http2=http2, max_concurrency_per_host=WORKERS)
+        # 平文のテスト用サーバーに対しては ALPN が使えないため、HTTP/2 は prior knowledge で接続する
+        transport = httpx.HTTPTransport(http1=not http2, http2=http2, limits=pool.limits, retries=pool.RETRIES)
+        client = httpx.Client(timeout=pool.TIMEOUT, transport=transport)
+        urls = [f"http://127.0.0.1:{PORT}/image/{i:03}.jpg" for i in range(PAGES)]
+
+        def fetch(url: str) -> str:
+            with pool.slot(url), client.stream("GET", url) as response:
+                response.raise_for_status()
+                for _ in response.iter_bytes():
+                    pass
+                return response.http_version
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+            versions = set(executor.map(fetch, urls))
+        elapsed = time.perf_counter() - start
+        client.close()
+        print(f"{'/'.join(sorted(versions))}: {PAGES} pages, {elapsed:.3f}s")
+        return elapsed
+
+    try:
+        elapsed_http1 = benchmark(http2=False)
+        elapsed_http2 = benchmark(http2=True)
+        print(f"HTTP/2 / HTTP/1.1 = {elapsed_http2 / elapsed_http1:.2f}")
+    finally:
+        shutdown_event.set()
+        server_thread.join()
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from logging import INFO, getLogger
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from media_downloader.util import CustomLogger
+
+logging.setLoggerClass(CustomLogger)
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+T = TypeVar("T")
+
+
+class InFlightRegistry:
+    """実行中の処理をキーごとに1つにまとめるクラス
+
+    同じキー（WorkKey など）の処理が既に実行中の場合は新たに実行せず、実行中の処理の終了を待って同じ結果を返す
+    実行中の処理が例外を送出した場合は、待っていた呼び出し元にも同じ例外を送出する
+    処理が終了したキーは破棄する、終了後に同じキーで呼び出した場合は改めて実行する
+
+    スレッドからは run で、イベントループ上からは run_async で呼び出す
+    どちらから呼び出した処理も同じキーであれば1つにまとめる
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # キー -> 実行中の処理の結果
+        self._futures: dict[Hashable, Future] = {}
+
+    def _claim(self, key: Hashable) -> tuple[Future, bool]:
+        """key の処理の結果を受け取る Future を返す
+
+        Args:
+            key (Hashable): 処理を識別するキー
+
+        Returns:
+            tuple[Future, bool]: (結果を受け取る Future, 呼び出し元が処理を実行する場合True)
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._futures[key] = future
+            return future, True
+
+    def _finish(self, key: Hashable, future: Future, result=None, exception: BaseException | None = None) -> None:
+        """key の処理の結果を待っている呼び出し元に渡し、key を破棄する
+
+        Args:
+            key (Hashable): 処理を識別するキー
+            future (Future): 結果を受け取る Future
+            result (Any): 処理結果
+            exception (BaseException | None): 処理が送出した例外
+        """
+        with self._lock:
+            self._futures.pop(key, None)
+        if isinstance(exception, asyncio.CancelledError):
+            future.cancel()
+        elif exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def is_running(self, key: Hashable) -> bool:
+        """key の処理が実行中か
+
+        Args:
+            key (Hashable): 処理を識別するキー
+
+        Returns:
+            bool: 実行中ならばTrue
+        """
+        with self._lock:
+            return key in self._futures
+
+    def run(self, key: Hashable | None, func: Callable[[], T]) -> T:
+        """func を実行して結果を返す、同じ key の処理が実行中ならばその結果を待って返す
+
+        Args:
+            key (Hashable | None): 処理を識別するキー、Noneの場合はまとめずにそのまま実行する
+            func (Callable[[], T]): 実行する処理
+
+        Returns:
+            T: 処理結果
+        """
+        if key is None:
+            return func()
+        future, is_owner = self._claim(key)
+        if not is_owner:
+            logger.info(f"{key} -> already in progress, waiting for it.")
+            return future.result()
+        try:
+            result = func()
+        except BaseException as e:
+            self._finish(key, future, exception=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def run_async(self, key: Hashable | None, func: Callable[[], Awaitable[T]]) -> T:
+        """run のイベントループ版、func はコルーチンなど await できるものを返す関数
+
+        Args:
+            key (Hashable | None): 処理を識別するキー、Noneの場合はまとめずにそのまま実行する
+            func (Callable[[], Awaitable[T]]): 実行する処理
+
+        Returns:
+            T: 処理結果
+        """
+        if key is None:
+            return await func()
+        future, is_owner = self._claim(key)
+        if not is_owner:
+            logger.info(f"{key} -> already in progress, waiting for it.")
+            # 待っている側が取り消されても、実行中の処理の結果は他の呼び出し元に渡す
+            return await asyncio.shield(asyncio.wrap_future(future))
+        try:
+            result = await func()
+        except BaseException as e:
+            self._finish(key, future, exception=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+
+# プロセス全体で共有する実行中の処理の置き場
+in_flight_registry = InFlightRegistry()
+
+
+if __name__ == "__main__":
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    def download() -> str:
+        print("download start")
+        time.sleep(0.5)
+        return "done"
+
+    # 同じキーの処理は1回のみ実行され、すべての呼び出し元が同じ結果を受け取る
+    with ThreadPoolExecutor(4) as executor:
+        futures = [executor.submit(in_flight_registry.run, ("nijie", 251267), download) for _ in range(4)]
+        print([f.result() for f in futures])
@@ -1,62 +1,201 @@
 import configparser
+import enum
 import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from logging import INFO, getLogger
 from pathlib import Path
-from typing import Self
+from typing import Iterable, Self
 
 from plyer import notification
 
+from media_downloader.link_search.download_manifest import download_manifest
 from media_downloader.link_search.fetcher_base import FetcherBase
+from media_downloader.link_search.fetcher_index import FetcherIndex
+from media_downloader.link_search.http_client_pool import HttpClientPool, http_client_pool
+from media_downloader.link_search.in_flight_registry import in_flight_registry
 from media_downloader.link_search.nico_seiga.nico_seiga_fetcher import NicoSeigaFetcher
+from media_downloader.link_search.nijie.nijie_cookie import NijieCookie
 from media_downloader.link_search.nijie.nijie_fetcher import NijieFetcher
+from media_downloader.link_search.page_downloader import PageDownloader
 from media_downloader.link_search.password import Password
 from media_downloader.link_search.pixiv.pixiv_fetcher import PixivFetcher
+from media_downloader.link_search.pixiv.pixiv_ugoira_downloader import PixivUgoiraDownloader
+from media_downloader.link_search.pixiv.pixiv_work_cache import PixivWorkCache, pixiv_work_cache
+from media_downloader.link_search.pixiv.ugoira_encoder import UgoiraEncoder, ugoira_encoder
 from media_downloader.link_search.pixiv_novel.pixiv_novel_fetcher import PixivNovelFetcher
+from media_downloader.link_search.rate_limiter import rate_limiter
 from media_downloader.link_search.url import URL
 from media_downloader.link_search.username import Username
+from media_downloader.link_search.work_key import WorkKey
 from media_downloader.log_message import MSG
-from media_downloader.util import CustomLogger
+from media_downloader.util import CustomLogger, Result
 
 logging.setLoggerClass(CustomLogger)
 logger = getLogger(__name__)
 logger.setLevel(INFO)
 
 
+@dataclass(frozen=True)
+class FetchManyResult:
+    """LinkSearcher.fetch_many の処理結果"""
+
+    results: list[tuple[str, Result | enum.Enum]]  # (URL, 処理結果)のリスト、入力順
+    elapsed_time: float  # 全体の処理時間[s]
+
+    @property
+    def failed_urls(self) -> list[str]:
+        """処理に失敗したURLのリストを返す"""
+        return [url for url, result in self.results if result is Result.FAILED]
+
+
 class LinkSearcher:
+    # fetch_many で使用するワーカースレッド数の既定値
+    MAX_WORKERS = 4
+
     def __init__(self):
         self.fetcher_list: list[FetcherBase] = []
+        # ホスト名 -> 担当しうるfetcher の索引
+        self.fetcher_index = FetcherIndex()
 
     def register(self, fetcher) -> None:
         interface_check = hasattr(fetcher, "is_target_url") and hasattr(fetcher, "fetch")
         if not interface_check:
             raise TypeError("Invalid fetcher.")
         self.fetcher_list.append(fetcher)
+        self.fetcher_index.add(fetcher)
         fetcher_class = fetcher.__class__.__name__
         logger.info(MSG.LINKSEARCHER_REGISTERED.value.format(fetcher_class))
 
     def fetch(self, url: str) -> None:
-        # CoR
-        for p in self.fetcher_list:
-            if p.is_target_url(URL(url)):
-                fetcher_class = p.__class__.__name__
-                logger.info(MSG.LINKSEARCHER_FETCHER_FOUND.value.format(url, fetcher_class))
-                p.fetch(url)
-                break
-        else:
+        fetcher = self._find_fetcher(url)
+        if not fetcher:
             raise ValueError("Fetcher not found.")
+        fetcher_class = fetcher.__class__.__name__
+        logger.info(MSG.LINKSEARCHER_FETCHER_FOUND.value.format(url, fetcher_class))
+        # 同じ作品を指すurlを同時に fetch した場合は1回にまとめる
+        in_flight_registry.run(self.work_key(fetcher, url), lambda: fetcher.fetch(url))
 
-    def can_fetch(self, url: str) -> bool:
+    def fetch_many(self, urls: Iterable[str], max_workers: int = MAX_WORKERS) -> FetchManyResult:
+        """複数のURLをスレッドプールで並行に処理する
+
+        担当fetcherの探索は呼び出し元スレッドで行い、
+        実際の取得処理は最大 max_workers 個のワーカースレッドに振り分ける
+        個々のURLの失敗は例外として送出せず、結果に Result.FAILED として記録する
+        同じ作品を指すURLは1回のみ取得し、それぞれに同じ結果を記録する
+
+        Args:
+            urls (Iterable[str]): 処理対象urlのリスト
+            max_workers (int): ワーカースレッド数の上限
+
+        Returns:
+            FetchManyResult: URLごとの処理結果と全体の処理時間
+        """
+        if not isinstance(max_workers, int) or max_workers < 1:
+            raise ValueError("max_workers must be positive int.")
+
+        def fetch_one(fetcher: FetcherBase, url: str) -> Result | enum.Enum:
+            fetcher_class = fetcher.__class__.__name__
+            logger.info(MSG.LINKSEARCHER_FETCHER_FOUND.value.format(url, fetcher_class))
+            try:
+                result = in_flight_registry.run(self.work_key(fetcher, url), lambda: fetcher.fetch(url))
+            except Exception as e:
+                logger.info(MSG.LINKSEARCHER_FETCH_FAILED.value.format(url, e))
+                return Result.FAILED
+            return result if isinstance(result, enum.Enum) else Result.SUCCESS
+
+        start_time = time.perf_counter()
+        entries: list[tuple[str, Result | enum.Enum | Future]] = []
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch_many") as executor:
+            for url in urls:
+                fetcher = self._find_fetcher(url)
+                if not fetcher:
+                    logger.info(MSG.LINKSEARCHER_FETCHER_NOT_FOUND.value.format(url))
+                    entries.append((url, Result.FAILED))
+                    continue
+                entries.append((url, executor.submit(fetch_one, fetcher, url)))
+            results = [(url, r.result() if isinstance(r, Future) else r) for url, r in entries]
+        elapsed_time = time.perf_counter() - start_time
+        fetch_many_result = FetchManyResult(results, elapsed_time)
+        failed_num = len(fetch_many_result.failed_urls)
+        logger.info(MSG.LINKSEARCHER_FETCH_MANY_DONE.value.format(len(results), failed_num, elapsed_time))
+        return fetch_many_result
+
+    def _find_fetcher(self, url: str) -> FetcherBase | None:
+        """urlを担当するfetcherを探す
+
+        ホスト名で担当しうるfetcherを絞り込み、それらのみを登録順に is_target_url で判定する
+        候補が無い場合は URL インスタンスも作らない
+
+        Args:
+            url (str): 処理対象url
+
+        Returns:
+            FetcherBase | None: 担当fetcher, 見つからなかった場合やurlが不正な場合None
+        """
+        if not URL.is_valid(url):
+            return None
+        candidates = self.fetcher_index.candidates(url)
+        if not candidates:
+            return None
+        target_url = URL(url)
         # CoR
-        for p in self.fetcher_list:
-            if p.is_target_url(URL(url)):
-                return True
-        return False
+        for p in candidates:
+            if p.is_target_url(target_url):
+                return p
+        return None
+
+    @staticmethod
+    def work_key(fetcher: FetcherBase, url: str) -> WorkKey | None:
+        """fetcher が担当するurlの作品キーを返す
+
+        Args:
+            fetcher (FetcherBase): 担当fetcher
+            url (str): 処理対象url
+
+        Returns:
+            WorkKey | None: 作品キー、fetcher が作品キーを返さない場合やurlから作品を特定できない場合None
+        """
+        try:
+            work_key = fetcher.work_key(URL(url))
+        except Exception:
+            return None
+        return work_key if isinstance(work_key, WorkKey) else None
+
+    def can_fetch(self, url: str) -> bool:
+        return self._find_fetcher(url) is not None
 
     @classmethod
     def create(cls, config: configparser.ConfigParser) -> Self:
         logger.info(MSG.LINKSEARCHER_CREATE_START.value)
         ls = LinkSearcher()
 
+        # ホストごとのレート制限設定
+        if config.has_section("rate_limit"):
+            rate_limiter.configure(config["rate_limit"])
+
+        # DL済作品の台帳設定
+        if config.has_section("download_manifest"):
+            manifest_db_path = config["download_manifest"].get("db_path", "")
+            download_manifest.configure(Path(manifest_db_path) if manifest_db_path else None)
+
+        # サイトごとに共有する httpx.Client の接続数設定
+        if config.has_section("http_client"):
+            c = config["http_client"]
+            http_client_pool.configure(
+                c.getint("max_connections", HttpClientPool.DEFAULT_MAX_CONNECTIONS),
+                c.getint("max_keepalive_connections", HttpClientPool.DEFAULT_MAX_KEEPALIVE_CONNECTIONS),
+                c.getfloat("keepalive_expiry", HttpClientPool.DEFAULT_KEEPALIVE_EXPIRY),
+                c.getboolean("http2", HttpClientPool.DEFAULT_HTTP2),
+                c.getint("max_concurrency_per_host", HttpClientPool.DEFAULT_MAX_CONCURRENCY_PER_HOST),
+            )
+
+        # 複数ページの作品について、1作品あたりの同時DLページ数設定
+        if config.has_section("page_download"):
+            c = config["page_download"]
+            PageDownloader.configure(c.getint("max_workers", PageDownloader.DEFAULT_MAX_WORKERS))
+
         # 登録失敗時の通知用
         # 登録に失敗しても処理は続ける
         def notify(fetcher_kind: str):
@@ -67,10 +206,27 @@ class LinkSearcher:
                 timeout=10,
             )
 
+        # 各Fetcherは生成時にはログインしない
+        # 担当URLを初めて fetch するときにログインし、認証済セッションは session_registry で共有する
         # pixiv登録
         try:
             c = config["pixiv"]
             if c.getboolean("is_pixiv_trace"):
+                # 作品詳細キャッシュ設定
+                work_cache_db_path = c.get("work_cache_db_path", "")
+                pixiv_work_cache.configure(
+                    c.getint("work_cache_max_size", PixivWorkCache.DEFAULT_MAX_SIZE),
+                    c.getfloat("work_cache_ttl", PixivWorkCache.DEFAULT_TTL),
+                    Path(work_cache_db_path) if work_cache_db_path else None,
+                )
+                # うごイラを生成するワーカープロセス数、0の場合はCPUのコア数
+                ugoira_encoder.configure(
+                    c.getint("ugoira_encode_workers", 0) or None,
+                    c.getboolean("ugoira_encode_streaming", UgoiraEncoder.DEFAULT_STREAMING),
+                    c.get("ugoira_format", UgoiraEncoder.DEFAULT_FORMAT),
+                )
+                # うごイラの各フレームをまとめたzipで取得するか
+                PixivUgoiraDownloader.configure(c.getboolean("ugoira_zip", PixivUgoiraDownloader.DEFAULT_USE_ZIP))
                 fetcher = PixivFetcher(Username(c["username"]), Password(c["password"]), Path(c["save_base_path"]))
                 ls.register(fetcher)
         except Exception:
@@ -91,6 +247,8 @@ class LinkSearcher:
         try:
             c = config["nijie"]
             if c.getboolean("is_nijie_trace"):
+                # クッキーを確認済として扱う期間設定
+                NijieCookie.configure(c.getfloat("cookie_freshness_window", NijieCookie.DEFAULT_FRESHNESS_WINDOW))
                 fetcher = NijieFetcher(Username(c["email"]), Password(c["password"]), Path(c["save_base_path"]))
                 ls.register(fetcher)
         except Exception:
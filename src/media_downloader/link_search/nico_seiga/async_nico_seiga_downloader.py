@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import re
+from dataclasses import dataclass
+from logging import INFO, getLogger
+from pathlib import Path
+
+from media_downloader.link_search.author_directory_index import AuthorDirectoryIndex
+from media_downloader.link_search.download_manifest import download_manifest
+from media_downloader.link_search.nico_seiga.async_nico_seiga_session import AsyncNicoSeigaSession
+from media_downloader.link_search.nico_seiga.nico_seiga_downloader import DownloadResult, NicoSeigaDownloader
+from media_downloader.link_search.nico_seiga.nico_seiga_save_directory_path import NicoSeigaSaveDirectoryPath
+from media_downloader.link_search.nico_seiga.nico_seiga_url import NicoSeigaURL
+from media_downloader.link_search.stream_downloader import StreamDownloader
+from media_downloader.util import CustomLogger
+
+logging.setLoggerClass(CustomLogger)
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+@dataclass(frozen=True)
+class AsyncNicoSeigaDownloader:
+    """ニコニコ静画作品をDLするクラスの非同期版
+
+    保存先、ファイル名、スキップの判定、DL済作品の台帳への記録は NicoSeigaDownloader と同じ
+    """
+
+    nicoseiga_url: NicoSeigaURL  # ニコニコ静画作品ページURL
+    base_path: Path  # 保存ディレクトリベースパス
+    session: AsyncNicoSeigaSession  # 認証済セッション
+
+    def __post_init__(self):
+        self._is_valid()
+
+    def _is_valid(self):
+        if not isinstance(self.nicoseiga_url, NicoSeigaURL):
+            raise TypeError("nicoseiga_url is not NicoSeigaURL.")
+        if not isinstance(self.base_path, Path):
+            raise TypeError("base_path is not Path.")
+        if not isinstance(self.session, AsyncNicoSeigaSession):
+            raise TypeError("session is not AsyncNicoSeigaSession.")
+        return True
+
+    async def download(self) -> DownloadResult:
+        """ニコニコ静画作品ページURLからダウンロードする"""
+        site_name = NicoSeigaDownloader.SITE_NAME
+
+        # イラスト情報取得
+        illust_id = self.nicoseiga_url.illust_id
+        illust_info = await self.session.get_illust_info(illust_id)
+
+        # 画像保存先パスを取得
+        # 作者ディレクトリの索引はファイルを読み書きするため別スレッドで行う
+        save_directory_path = await asyncio.to_thread(NicoSeigaSaveDirectoryPath.create, illust_info, self.base_path)
+        sd_path = save_directory_path.path
+
+        # {作者名}ディレクトリ作成
+        await asyncio.to_thread(AuthorDirectoryIndex.make_author_directory, sd_path.parent)
+
+        # ファイルが既に存在しているか調べる
+        # 拡張子は実際にDLするまで分からないため、illust_idを含むファイル名を持つファイルが存在するかで代用する
+        pattern = r"^.*\(" + str(illust_id.id) + r"\).*$"
+        # DL途中の一時ファイルは除く
+        same_name_list = [
+            f
+            for f in sd_path.parent.glob("**/*")
+            if re.search(pattern, str(f))
+            and not f.name.endswith((StreamDownloader.PART_SUFFIX, StreamDownloader.META_SUFFIX))
+        ]
+
+        # 既に存在しているなら再DLしないでスキップ
+        if same_name_list:
+            name = same_name_list[0].name
+            logger.info("Download nico_seiga illust: " + name + " -> exist")
+            await asyncio.to_thread(download_manifest.commit, site_name, illust_id.id, same_name_list[0])
+            return DownloadResult.PASSED
+
+        # 画像直リンクを取得
+        source_url = await self.session.get_source_url(illust_id)
+
+        # 画像をDLして{作者名}ディレクトリ直下に保存
+        # 保存先へのリネームと同時にDL済作品の台帳に記録する
+        save_path = await self.session.download_illust(
+            source_url,
+            sd_path,
+            commit=lambda source, path: download_manifest.commit(site_name, illust_id.id, path, source),
+        )
+        logger.info("Download seiga illust: " + save_path.name + " -> done")
+
+        return DownloadResult.SUCCESS
+
+
+if __name__ == "__main__":
+    import configparser
+    import logging.config
+
+    from media_downloader.link_search.http_client_pool import http_client_pool
+    from media_downloader.link_search.nico_seiga.async_nico_seiga_fetcher import AsyncNicoSeigaFetcher
+    from media_downloader.link_search.password import Password
+    from media_downloader.link_search.username import Username
+
+    logging.config.fileConfig("./log/logging.ini", disable_existing_loggers=False)
+    CONFIG_FILE_NAME = "./config/config.ini"
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILE_NAME, encoding="utf8")
+
+    base_path = Path("./media_gathering/link_search/")
+    if config["nico_seiga"].getboolean("is_seiga_trace"):
+        fetcher = AsyncNicoSeigaFetcher(
+            Username(config["nico_seiga"]["email"]), Password(config["nico_seiga"]["password"]), base_path
+        )
+        illust_id = 11308865
+        illust_url = f"https://seiga.nicovideo.jp/seiga/im{illust_id}?query=1"
+
+        async def main() -> None:
+            await fetcher.fetch(illust_url)
+            await http_client_pool.aclose()
+
+        asyncio.run(main())
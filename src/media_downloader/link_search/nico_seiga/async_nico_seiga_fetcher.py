@@ -0,0 +1,166 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from logging import INFO, getLogger
+from pathlib import Path
+
+from media_downloader.link_search.async_fetcher_base import AsyncFetcherBase
+from media_downloader.link_search.download_manifest import download_manifest
+from media_downloader.link_search.nico_seiga.async_nico_seiga_downloader import AsyncNicoSeigaDownloader
+from media_downloader.link_search.nico_seiga.async_nico_seiga_session import AsyncNicoSeigaSession
+from media_downloader.link_search.nico_seiga.nico_seiga_downloader import DownloadResult, NicoSeigaDownloader
+from media_downloader.link_search.nico_seiga.nico_seiga_fetcher import NicoSeigaFetcher
+from media_downloader.link_search.nico_seiga.nico_seiga_url import NicoSeigaURL
+from media_downloader.link_search.password import Password
+from media_downloader.link_search.session_registry import SessionRejectedError, session_registry
+from media_downloader.link_search.url import URL
+from media_downloader.link_search.username import Username
+from media_downloader.link_search.work_key import WorkKey
+from media_downloader.util import CustomLogger
+
+logging.setLoggerClass(CustomLogger)
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+@dataclass(frozen=True)
+class AsyncNicoSeigaFetcher(AsyncFetcherBase):
+    """ニコニコ静画を取得するクラスの非同期版
+
+    ログインは NicoSeigaFetcher に任せ、別スレッドで実行する
+    認証済セッションは session_registry を通して同期版の NicoSeigaFetcher と共有する
+    """
+
+    username: Username  # ニコニコログイン用ユーザーID
+    password: Password = field(repr=False)  # ニコニコログイン用パスワード
+    base_path: Path  # 保存ディレクトリベースパス
+    fetcher: NicoSeigaFetcher = field(init=False, repr=False, compare=False)  # ログインに使う同期版の Fetcher
+
+    # 担当urlのホスト名
+    TARGET_HOSTS = NicoSeigaURL.HOSTS
+
+    def __init__(self, username: Username, password: Password, base_path: Path):
+        """初期化処理
+
+        バリデーションのみ
+        ログインは担当URLを初めて fetch するときに行う
+
+        Args:
+            username (Username): ニコニコログイン用ユーザーID
+            password (Password):  ニコニコログイン用パスワード
+            base_path (Path): 保存ディレクトリベースパス
+        """
+        super().__init__()
+        fetcher = NicoSeigaFetcher(username, password, base_path)
+        object.__setattr__(self, "username", username)
+        object.__setattr__(self, "password", password)
+        object.__setattr__(self, "base_path", base_path)
+        object.__setattr__(self, "fetcher", fetcher)
+
+    @classmethod
+    def from_fetcher(cls, fetcher: NicoSeigaFetcher) -> "AsyncNicoSeigaFetcher":
+        """同期版の NicoSeigaFetcher と同じ設定で生成する
+
+        Args:
+            fetcher (NicoSeigaFetcher): 同期版の Fetcher
+
+        Returns:
+            AsyncNicoSeigaFetcher: 非同期版の Fetcher
+        """
+        if not isinstance(fetcher, NicoSeigaFetcher):
+            raise TypeError("fetcher is not NicoSeigaFetcher.")
+        return cls(fetcher.username, fetcher.password, fetcher.base_path)
+
+    async def get_session(self) -> AsyncNicoSeigaSession:
+        """取得に使う認証済セッション
+
+        NicoSeigaFetcher.session を別スレッドで取得する、ログインが必要な場合もイベントループを止めない
+        """
+        session = await asyncio.to_thread(lambda: self.fetcher.session)
+        return AsyncNicoSeigaSession(session)
+
+    async def is_target_url(self, url: URL) -> bool:
+        """担当URLかどうか判定する
+
+        AsyncFetcherBaseオーバーライド
+
+        Args:
+            url (URL): 処理対象url
+
+        Returns:
+            bool: 担当urlだった場合True, そうでない場合False
+        """
+        return self.fetcher.is_target_url(url)
+
+    def work_key(self, url: URL) -> WorkKey:
+        """担当urlが指す作品のキーを返す
+
+        AsyncFetcherBaseオーバーライド
+
+        Args:
+            url (URL): 処理対象url
+
+        Returns:
+            WorkKey: 作品キー
+        """
+        return NicoSeigaURL.create(url).work_key
+
+    async def fetch(self, url: URL) -> DownloadResult:
+        """担当処理：ニコニコ静画作品を取得する
+
+        AsyncFetcherBaseオーバーライド
+
+        Args:
+            url (URL): 処理対象url
+
+        Returns:
+            DownloadResult: DL結果
+        """
+        nicoseiga_url = NicoSeigaURL.create(url)
+
+        # DL済作品の台帳に記録があればネットワークに触れずにスキップ
+        entry = await asyncio.to_thread(
+            download_manifest.get, NicoSeigaDownloader.SITE_NAME, nicoseiga_url.illust_id.id
+        )
+        if entry:
+            logger.info(f"Download seiga illust: {entry.path.name} -> exist")
+            return DownloadResult.PASSED
+
+        # 初回のみここでログインする
+        session = await self.get_session()
+        try:
+            return await AsyncNicoSeigaDownloader(nicoseiga_url, self.base_path, session).download()
+        except SessionRejectedError:
+            # ログイン状態が切れていた場合は一度だけログインし直して再試行する
+            logger.info("niconico session rejected -> re-login")
+            session_registry.discard(self.fetcher.session_key, session.session)
+            # 非同期版の AsyncClient は session_registry からは閉じられないためここで閉じる
+            await session.session.aclose()
+            session = await self.get_session()
+            return await AsyncNicoSeigaDownloader(nicoseiga_url, self.base_path, session).download()
+
+
+if __name__ == "__main__":
+    import configparser
+    import logging.config
+
+    from media_downloader.link_search.http_client_pool import http_client_pool
+
+    logging.config.fileConfig("./log/logging.ini", disable_existing_loggers=False)
+    CONFIG_FILE_NAME = "./config/config.ini"
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILE_NAME, encoding="utf8")
+
+    base_path = Path("./media_gathering/link_search/")
+    if config["nico_seiga"].getboolean("is_seiga_trace"):
+        fetcher = AsyncNicoSeigaFetcher(
+            Username(config["nico_seiga"]["email"]), Password(config["nico_seiga"]["password"]), base_path
+        )
+        illust_id = 11308865
+        illust_url = f"https://seiga.nicovideo.jp/seiga/im{illust_id}?query=1"
+
+        async def main() -> None:
+            await fetcher.fetch(illust_url)
+            await http_client_pool.aclose()
+
+        asyncio.run(main())
@@ -0,0 +1,146 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+import httpx
+import xmltodict
+
+from media_downloader.link_search.async_stream_downloader import AsyncStreamDownloader
+from media_downloader.link_search.http_client_pool import http_client_pool
+from media_downloader.link_search.nico_seiga.authorid import Authorid
+from media_downloader.link_search.nico_seiga.authorname import Authorname
+from media_downloader.link_search.nico_seiga.illust_extension import IllustExtension
+from media_downloader.link_search.nico_seiga.illustid import Illustid
+from media_downloader.link_search.nico_seiga.illustname import Illustname
+from media_downloader.link_search.nico_seiga.nico_seiga_info import NicoSeigaInfo
+from media_downloader.link_search.nico_seiga.nico_seiga_session import NicoSeigaSession
+from media_downloader.link_search.rate_limiter import rate_limiter
+from media_downloader.link_search.session_registry import SessionRejectedError
+from media_downloader.link_search.url import URL
+from media_downloader.util import find_values
+
+
+@dataclass(frozen=True)
+class AsyncNicoSeigaSession:
+    """認証済セッションクラスの非同期版
+
+    ログインと作者名のキャッシュは NicoSeigaSession のものを使う
+    通信はログイン状態のクッキーを引き継いだセッション専用の httpx.AsyncClient で行う
+    """
+
+    session: NicoSeigaSession  # ログイン済の同期版セッション
+
+    def __post_init__(self) -> None:
+        self._is_valid()
+
+    def _is_valid(self) -> bool:
+        if not isinstance(self.session, NicoSeigaSession):
+            raise TypeError("session is not NicoSeigaSession.")
+        return True
+
+    @property
+    def _client(self) -> httpx.AsyncClient:
+        return self.session.async_client
+
+    async def _get(self, url: str) -> httpx.Response:
+        """ログイン状態のクッキーを引き継いだ AsyncClient でGETする"""
+        await rate_limiter.acquire_async(url)
+        response = await self._client.get(url, headers=NicoSeigaSession.HEADERS)
+        response.raise_for_status()
+        return response
+
+    async def get_illust_info(self, illust_id: Illustid) -> NicoSeigaInfo:
+        """イラスト情報をまとめて取得する
+
+        Args:
+            illust_id (Illustid): イラストID
+
+        Returns:
+            NicoSeigaInfo: イラスト情報
+        """
+        response = await self._get(NicoSeigaSession.IMAGE_INFO_API_ENDPOINT_BASE + str(illust_id.id))
+        response_dict = xmltodict.parse(response.text)
+        author_id = Authorid(int(find_values(response_dict, "user_id", True, [], [])))
+        illust_title = Illustname(find_values(response_dict, "title", True, [], []))
+        author_name = await self.get_author_name(author_id)
+        return NicoSeigaInfo(illust_id, illust_title, author_id, author_name)
+
+    async def get_author_name(self, author_id: Authorid) -> Authorname:
+        """作者名を取得する
+
+        一度取得した作者名は同期版のセッションと共有してキャッシュする
+
+        Args:
+            author_id (Authorid): 作者ID
+
+        Returns:
+            Authorname: 作者名
+        """
+        author_name_cache = self.session._author_name_cache
+        if author_id.id in author_name_cache:
+            return author_name_cache[author_id.id]
+
+        response = await self._get(NicoSeigaSession.USERNAME_API_ENDPOINT_BASE + str(author_id.id))
+        author_name = NicoSeigaSession._parse_author_name(response.text)
+        author_name_cache[author_id.id] = author_name
+        return author_name
+
+    async def get_source_url(self, illust_id: Illustid) -> URL:
+        """直リンクを取得する
+
+        Args:
+            illust_id (Illustid): イラストID
+
+        Returns:
+            URL: 画像への直リンク
+        """
+        response = await self._get(NicoSeigaSession.IMAGE_SOUECE_API_ENDPOINT_BASE + str(illust_id.id))
+
+        # ログイン状態が切れているとログインページにリダイレクトされる
+        if response.url.host == NicoSeigaSession.LOGIN_HOST:
+            raise SessionRejectedError("NicoSeigaSession is rejected.")
+        return NicoSeigaSession._parse_source_url(response.text)
+
+    async def download_illust(
+        self, source_url: URL, save_path: Path, commit: Callable[[Path, Path], None] | None = None
+    ) -> Path:
+        """画像の実体をストリーミングでDLして保存する
+
+        Args:
+            source_url (URL): 画像への直リンク
+            save_path (Path): 拡張子を除いた保存先パス
+            commit (Callable[[Path, Path], None] | None):
+                一時ファイルを保存先に確定させる関数、StreamDownloader.download を参照
+
+        Returns:
+            Path: 拡張子を付与した実際の保存先パス
+        """
+        return await AsyncStreamDownloader(self._client).download(
+            source_url,
+            save_path,
+            headers=NicoSeigaSession.HEADERS,
+            suffix_resolver=lambda head: IllustExtension.create(head).extension,
+            commit=commit,
+        )
+
+
+if __name__ == "__main__":
+    import asyncio
+    import configparser
+
+    from media_downloader.link_search.password import Password
+    from media_downloader.link_search.username import Username
+
+    CONFIG_FILE_NAME = "./config/config.ini"
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILE_NAME, encoding="utf8")
+
+    username = Username(config["nico_seiga"]["email"])
+    password = Password(config["nico_seiga"]["password"])
+    session = AsyncNicoSeigaSession(NicoSeigaSession(username, password))
+
+    async def main() -> None:
+        print(await session.get_illust_info(Illustid(11308865)))
+        await http_client_pool.aclose()
+
+    asyncio.run(main())
@@ -5,11 +5,12 @@ from dataclasses import dataclass
 from logging import INFO, getLogger
 from pathlib import Path
 
-from media_downloader.link_search.nico_seiga.illust_extension import IllustExtension
-from media_downloader.link_search.nico_seiga.nico_seiga_info import NicoSeigaInfo
+from media_downloader.link_search.author_directory_index import AuthorDirectoryIndex
+from media_downloader.link_search.download_manifest import download_manifest
 from media_downloader.link_search.nico_seiga.nico_seiga_save_directory_path import NicoSeigaSaveDirectoryPath
 from media_downloader.link_search.nico_seiga.nico_seiga_session import NicoSeigaSession
 from media_downloader.link_search.nico_seiga.nico_seiga_url import NicoSeigaURL
+from media_downloader.link_search.stream_downloader import StreamDownloader
 from media_downloader.util import CustomLogger
 
 logging.setLoggerClass(CustomLogger)
@@ -31,6 +32,9 @@ class NicoSeigaDownloader:
     base_path: Path  # 保存ディレクトリベースパス
     session: NicoSeigaSession  # 認証済セッション
 
+    # DL済作品の台帳に記録する際のサイト名
+    SITE_NAME = NicoSeigaURL.SITE_NAME
+
     def __post_init__(self):
         self._is_valid()
 
@@ -47,48 +51,47 @@ class NicoSeigaDownloader:
         """ニコニコ静画作品ページURLからダウンロードする"""
         # イラスト情報取得
         illust_id = self.nicoseiga_url.illust_id
-        author_id = self.session.get_author_id(illust_id)
-        illust_title = self.session.get_illust_title(illust_id)
-        author_name = self.session.get_author_name(author_id)
-
-        # イラスト情報をまとめる
-        illust_info = NicoSeigaInfo(illust_id, illust_title, author_id, author_name)
+        illust_info = self.session.get_illust_info(illust_id)
 
         # 画像保存先パスを取得
         save_directory_path = NicoSeigaSaveDirectoryPath.create(illust_info, self.base_path)
         sd_path = save_directory_path.path
 
         # {作者名}ディレクトリ作成
-        sd_path.parent.mkdir(parents=True, exist_ok=True)
+        AuthorDirectoryIndex.make_author_directory(sd_path.parent)
 
         # ファイルが既に存在しているか調べる
         # 拡張子は実際にDLするまで分からない
         # そのため、対象フォルダ内にillust_idを含むファイル名を持つファイルが存在するか調べることで代用する
         name = sd_path.name
         pattern = r"^.*\(" + str(illust_id.id) + r"\).*$"
-        same_name_list = [f for f in sd_path.parent.glob("**/*") if re.search(pattern, str(f))]
+        # DL途中の一時ファイルは除く
+        same_name_list = [
+            f
+            for f in sd_path.parent.glob("**/*")
+            if re.search(pattern, str(f))
+            and not f.name.endswith((StreamDownloader.PART_SUFFIX, StreamDownloader.META_SUFFIX))
+        ]
 
         # 既に存在しているなら再DLしないでスキップ
         if same_name_list:
             name = same_name_list[0].name
             logger.info("Download nico_seiga illust: " + name + " -> exist")
+            download_manifest.commit(self.SITE_NAME, illust_id.id, same_name_list[0])
             return DownloadResult.PASSED
 
         # 画像直リンクを取得
         source_url = self.session.get_source_url(illust_id)
 
-        # 画像バイナリDL
-        content = self.session.get_illust_binary(source_url)
-
-        # 拡張子取得
-        ext = IllustExtension.create(content).extension
-
-        # ファイル名設定
-        name = f"{sd_path.name}{ext}"
-
-        # {作者名}ディレクトリ直下に保存
-        with Path(sd_path.parent / name).open(mode="wb") as fout:
-            fout.write(content)
+        # 画像をDLして{作者名}ディレクトリ直下に保存
+        # ファイル名は{sd_path.name}{画像バイナリの先頭から判別した拡張子}
+        # 保存先へのリネームと同時にDL済作品の台帳に記録する
+        save_path = self.session.download_illust(
+            source_url,
+            sd_path,
+            commit=lambda source, path: download_manifest.commit(self.SITE_NAME, illust_id.id, path, source),
+        )
+        name = save_path.name
         logger.info("Download seiga illust: " + name + " -> done")
 
         return DownloadResult.SUCCESS
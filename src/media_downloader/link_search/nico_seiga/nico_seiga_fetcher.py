@@ -1,15 +1,18 @@
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from logging import INFO, getLogger
 from pathlib import Path
 
+from media_downloader.link_search.download_manifest import download_manifest
 from media_downloader.link_search.fetcher_base import FetcherBase
-from media_downloader.link_search.nico_seiga.nico_seiga_downloader import NicoSeigaDownloader
+from media_downloader.link_search.nico_seiga.nico_seiga_downloader import DownloadResult, NicoSeigaDownloader
 from media_downloader.link_search.nico_seiga.nico_seiga_session import NicoSeigaSession
 from media_downloader.link_search.nico_seiga.nico_seiga_url import NicoSeigaURL
 from media_downloader.link_search.password import Password
+from media_downloader.link_search.session_registry import SessionRejectedError, session_registry
 from media_downloader.link_search.url import URL
 from media_downloader.link_search.username import Username
+from media_downloader.link_search.work_key import WorkKey
 from media_downloader.util import CustomLogger
 
 logging.setLoggerClass(CustomLogger)
@@ -21,13 +24,20 @@ logger.setLevel(INFO)
 class NicoSeigaFetcher(FetcherBase):
     """ニコニコ静画を取得するクラス"""
 
-    session: NicoSeigaSession  # 取得に使う認証済セッション
+    username: Username  # ニコニコログイン用ユーザーID
+    password: Password = field(repr=False)  # ニコニコログイン用パスワード
     base_path: Path  # 保存ディレクトリベースパス
 
+    # 認証済セッションを共有するサービス名
+    SESSION_NAME = "nico_seiga"
+    # 担当urlのホスト名
+    TARGET_HOSTS = NicoSeigaURL.HOSTS
+
     def __init__(self, username: Username, password: Password, base_path: Path):
         """初期化処理
 
-        バリデーションとクッキー取得
+        バリデーションのみ
+        ログインは担当URLを初めて fetch するときに行う
 
         Args:
             username (Username): ニコニコログイン用ユーザーID
@@ -43,9 +53,28 @@ class NicoSeigaFetcher(FetcherBase):
         if not isinstance(base_path, Path):
             raise TypeError("base_path is not Path.")
 
-        object.__setattr__(self, "session", NicoSeigaSession(username, password))
+        object.__setattr__(self, "username", username)
+        object.__setattr__(self, "password", password)
         object.__setattr__(self, "base_path", base_path)
 
+    @property
+    def session_key(self) -> tuple[str, str]:
+        """認証済セッションを共有する際のキー"""
+        return (self.SESSION_NAME, self.username.name)
+
+    @property
+    def session(self) -> NicoSeigaSession:
+        """取得に使う認証済セッション
+
+        初回アクセス時にログインし、以降は同じユーザーIDのニコニコ静画Fetcherで共有する
+        ログイン状態の有効期限が切れた場合はログインし直す
+        """
+        return session_registry.get(
+            self.session_key,
+            lambda: NicoSeigaSession(self.username, self.password),
+            expires_at=lambda session: session.expires_at,
+        )
+
     def is_target_url(self, url: URL) -> bool:
         """担当URLかどうか判定する
 
@@ -59,16 +88,47 @@ class NicoSeigaFetcher(FetcherBase):
         """
         return NicoSeigaURL.is_valid(url.original_url)
 
-    def fetch(self, url: URL) -> None:
+    def work_key(self, url: URL) -> WorkKey:
+        """担当urlが指す作品のキーを返す
+
+        FetcherBaseオーバーライド
+
+        Args:
+            url (URL): 処理対象url
+
+        Returns:
+            WorkKey: 作品キー
+        """
+        return NicoSeigaURL.create(url).work_key
+
+    def fetch(self, url: URL) -> DownloadResult:
         """担当処理：ニコニコ静画作品を取得する
 
         FetcherBaseオーバーライド
 
         Args:
             url (URL): 処理対象url
+
+        Returns:
+            DownloadResult: DL結果
         """
         nicoseiga_url = NicoSeigaURL.create(url)
-        NicoSeigaDownloader(nicoseiga_url, self.base_path, self.session).download()
+
+        # DL済作品の台帳に記録があればネットワークに触れずにスキップ
+        entry = download_manifest.get(NicoSeigaDownloader.SITE_NAME, nicoseiga_url.illust_id.id)
+        if entry:
+            logger.info(f"Download seiga illust: {entry.path.name} -> exist")
+            return DownloadResult.PASSED
+
+        # 初回のみここでログインする
+        session = self.session
+        try:
+            return NicoSeigaDownloader(nicoseiga_url, self.base_path, session).download()
+        except SessionRejectedError:
+            # ログイン状態が切れていた場合は一度だけログインし直して再試行する
+            logger.info("niconico session rejected -> re-login")
+            session_registry.discard(self.session_key, session)
+            return NicoSeigaDownloader(nicoseiga_url, self.base_path, self.session).download()
 
 
 if __name__ == "__main__":
@@ -1,7 +1,7 @@
-import re
 from dataclasses import dataclass
 from pathlib import Path
 
+from media_downloader.link_search.author_directory_index import AuthorDirectoryIndex
 from media_downloader.link_search.nico_seiga.nico_seiga_info import NicoSeigaInfo
 
 
@@ -36,27 +36,10 @@ class NicoSeigaSaveDirectoryPath:
         author_id = illust_info.author_id.id
         author_name = illust_info.author_name.name
 
-        # 既に{作者ID}が一致するディレクトリがあるか調べる
-        sd_path = ""
+        # 既に{作者ID}が一致するディレクトリがあれば使い、なければ新しく登録する
         save_path = Path(base_path)
-        filelist = []
-        filelist_tp = [(sp.stat().st_mtime, sp.name) for sp in save_path.glob("*") if sp.is_dir()]
-        for mtime, path in sorted(filelist_tp, reverse=True):
-            filelist.append(path)
-
-        regex = re.compile(r".*\(([0-9]*)\)$")
-        for dir_name in filelist:
-            result = regex.match(dir_name)
-            if result:
-                ai = result.group(1)
-                if ai == str(author_id):
-                    sd_path = f"./{dir_name}/{illust_name}({illust_id})/"
-                    break
-
-        if sd_path == "":
-            sd_path = f"./{author_name}({author_id})/{illust_name}({illust_id})/"
-
-        save_directory_path = save_path / sd_path
+        author_dir_name = AuthorDirectoryIndex.get(save_path).resolve(author_id, author_name)
+        save_directory_path = save_path / author_dir_name / f"{illust_name}({illust_id})"
         return NicoSeigaSaveDirectoryPath(save_directory_path)
 
 
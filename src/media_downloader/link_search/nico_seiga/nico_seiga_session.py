@@ -1,14 +1,22 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
 
 import httpx
 import xmltodict
 from bs4 import BeautifulSoup
 
+from media_downloader.link_search.http_client_pool import SessionClients, http_client_pool
 from media_downloader.link_search.nico_seiga.authorid import Authorid
 from media_downloader.link_search.nico_seiga.authorname import Authorname
+from media_downloader.link_search.nico_seiga.illust_extension import IllustExtension
 from media_downloader.link_search.nico_seiga.illustid import Illustid
 from media_downloader.link_search.nico_seiga.illustname import Illustname
+from media_downloader.link_search.nico_seiga.nico_seiga_info import NicoSeigaInfo
 from media_downloader.link_search.password import Password
+from media_downloader.link_search.rate_limiter import rate_limiter
+from media_downloader.link_search.session_registry import SessionRejectedError
+from media_downloader.link_search.stream_downloader import StreamDownloader
 from media_downloader.link_search.url import URL
 from media_downloader.link_search.username import Username
 from media_downloader.util import find_values
@@ -23,6 +31,10 @@ class NicoSeigaSession:
     """
 
     _session: httpx.Client  # 認証済セッション
+    # 作者名のキャッシュ、同じ作者の作品を続けてDLする場合にユーザー情報の再取得を避ける
+    _author_name_cache: dict[int, Authorname] = field(init=False, repr=False, compare=False)
+    # 認証済セッションの Client と、そのクッキーを引き継ぐ非同期版の AsyncClient
+    _clients: SessionClients = field(init=False, repr=False, compare=False)
 
     # 接続時に使用するヘッダー
     h_mozilla = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
@@ -37,16 +49,34 @@ class NicoSeigaSession:
     USERNAME_API_ENDPOINT_BASE = "https://seiga.nicovideo.jp/api/user/info?id="
     # 静画直リンクエンドポイントベース
     IMAGE_SOUECE_API_ENDPOINT_BASE = "https://seiga.nicovideo.jp/image/source?id="
+    # ログイン状態を保持するクッキー名
+    LOGIN_COOKIE_NAME = "user_session"
+    # 未ログイン時にリダイレクトされるホスト
+    LOGIN_HOST = "account.nicovideo.jp"
 
     def __init__(self, username: Username, password: Password) -> None:
         object.__setattr__(self, "_session", self.login(username, password))
+        object.__setattr__(self, "_author_name_cache", {})
+        object.__setattr__(self, "_clients", SessionClients(client=self._session))
         self._is_valid()
 
     def _is_valid(self) -> bool:
         if not isinstance(self._session, httpx.Client):
             raise TypeError("_session is not httpx.Client.")
+        if not isinstance(self._clients, SessionClients):
+            raise TypeError("_clients is not SessionClients.")
         return True
 
+    @property
+    def expires_at(self) -> float | None:
+        """ログイン状態の有効期限（UNIX時間）、期限が無い場合None"""
+        expires = [
+            cookie.expires
+            for cookie in self._session.cookies.jar
+            if cookie.name == self.LOGIN_COOKIE_NAME and cookie.expires
+        ]
+        return float(min(expires)) if expires else None
+
     def login(self, username: Username, password: Password) -> httpx.Client:
         """セッションを開始し、認証・ログインする
 
@@ -58,8 +88,8 @@ class NicoSeigaSession:
             session (NicoSeigaSession): 認証済セッション
         """
         # セッション開始
-        transport = httpx.HTTPTransport(retries=5)
-        session = httpx.Client(follow_redirects=True, timeout=60.0, transport=transport)
+        # ログイン状態を保持するため共有の Client は使わず、接続設定（HTTP/2 など）のみ揃えた専用の Client を使う
+        session = http_client_pool.create()
 
         # ログイン
         params = {
@@ -70,63 +100,97 @@ class NicoSeigaSession:
         response.raise_for_status()
         return session
 
-    def get_author_id(self, illust_id: Illustid) -> Authorid:
-        """作者IDを取得する
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """ログイン状態のクッキーを引き継いだ専用の AsyncClient"""
+        return self._clients.async_client
+
+    def close(self) -> None:
+        """認証済セッションの Client を閉じる
+
+        session_registry から破棄された際に呼び出される
+        """
+        self._clients.close()
+
+    async def aclose(self) -> None:
+        """認証済セッションの Client と AsyncClient を閉じる
+
+        非同期版の Fetcher がセッションを破棄した際に呼び出す
+        """
+        await self._clients.aclose()
+
+    def _get_illust_info_dict(self, illust_id: Illustid) -> dict:
+        """静画情報を取得して解析する
 
         Args:
             illust_id (Illustid): イラストID
 
         Returns:
-            Authorid: 作者ID
+            dict: 静画情報XMLを解析した辞書
         """
         # 静画情報を取得する
         info_url = self.IMAGE_INFO_API_ENDPOINT_BASE + str(illust_id.id)
+        rate_limiter.acquire(info_url)
         response = self._session.get(info_url, headers=self.HEADERS)
         response.raise_for_status()
 
         # 静画情報解析
-        response_dict = xmltodict.parse(response.text)
-        author_id_str = find_values(response_dict, "user_id", True, [], [])
-        author_id = int(author_id_str)
-        return Authorid(author_id)
+        return xmltodict.parse(response.text)
+
+    def get_illust_info(self, illust_id: Illustid) -> NicoSeigaInfo:
+        """イラスト情報をまとめて取得する
+
+        静画情報の取得は1回のみ行い、作者名はキャッシュがあればそれを使う
+
+        Args:
+            illust_id (Illustid): イラストID
+
+        Returns:
+            NicoSeigaInfo: イラスト情報
+        """
+        response_dict = self._get_illust_info_dict(illust_id)
+        author_id = Authorid(int(find_values(response_dict, "user_id", True, [], [])))
+        illust_title = Illustname(find_values(response_dict, "title", True, [], []))
+        author_name = self.get_author_name(author_id)
+        return NicoSeigaInfo(illust_id, illust_title, author_id, author_name)
 
     def get_author_name(self, author_id: Authorid) -> Authorname:
         """作者名を取得する
 
+        一度取得した作者名はセッション内でキャッシュする
+
         Args:
-            illust_id (Illustid): イラストID
+            author_id (Authorid): 作者ID
 
         Returns:
             Authorname: 作者名
         """
+        if author_id.id in self._author_name_cache:
+            return self._author_name_cache[author_id.id]
+
         # 作者情報を取得する
         username_info_url = self.USERNAME_API_ENDPOINT_BASE + str(author_id.id)
+        rate_limiter.acquire(username_info_url)
         response = self._session.get(username_info_url, headers=self.HEADERS)
         response.raise_for_status()
 
         # 作者情報解析
-        response_dict = xmltodict.parse(response.text)
-        author_name = find_values(response_dict, "nickname", True, [], [])
-        return Authorname(author_name)
+        author_name = self._parse_author_name(response.text)
+        self._author_name_cache[author_id.id] = author_name
+        return author_name
 
-    def get_illust_title(self, illust_id: Illustid) -> Illustname:
-        """イラストタイトルを取得する
+    @classmethod
+    def _parse_author_name(cls, text: str) -> Authorname:
+        """ユーザー情報XMLを解析して作者名を取得する
 
         Args:
-            illust_id (Illustid): イラストID
+            text (str): ユーザー情報XML
 
         Returns:
-            Illustname: イラストタイトル
+            Authorname: 作者名
         """
-        # 静画情報を取得する
-        info_url = self.IMAGE_INFO_API_ENDPOINT_BASE + str(illust_id.id)
-        response = self._session.get(info_url, headers=self.HEADERS)
-        response.raise_for_status()
-
-        # 静画情報解析
-        response_dict = xmltodict.parse(response.text)
-        illust_title = find_values(response_dict, "title", True, [], [])
-        return Illustname(illust_title)
+        response_dict = xmltodict.parse(text)
+        return Authorname(find_values(response_dict, "nickname", True, [], []))
 
     def get_source_url(self, illust_id: Illustid) -> URL:
         """直リンクを取得する
@@ -139,12 +203,29 @@ class NicoSeigaSession:
         """
         # ニコニコ静画ページ取得（画像表示部分のみ）
         source_page_url = self.IMAGE_SOUECE_API_ENDPOINT_BASE + str(illust_id.id)
+        rate_limiter.acquire(source_page_url)
         response = self._session.get(source_page_url, headers=self.HEADERS)
         response.raise_for_status()
 
+        # ログイン状態が切れているとログインページにリダイレクトされる
+        if response.url.host == self.LOGIN_HOST:
+            raise SessionRejectedError("NicoSeigaSession is rejected.")
+
         # ニコニコ静画ページを解析して画像直リンクを取得する
+        return self._parse_source_url(response.text)
+
+    @classmethod
+    def _parse_source_url(cls, text: str) -> URL:
+        """ニコニコ静画ページ（画像表示部分のみ）を解析して画像直リンクを取得する
+
+        Args:
+            text (str): ニコニコ静画ページのhtml
+
+        Returns:
+            URL: 画像への直リンク
+        """
         source_url = ""
-        soup = BeautifulSoup(response.text, "html.parser")
+        soup = BeautifulSoup(text, "html.parser")
         div_contents = soup.find_all("div", id="content")
         for div_content in div_contents:
             div_illust = div_content.find(class_="illust_view_big")
@@ -152,19 +233,29 @@ class NicoSeigaSession:
             break
         return URL(source_url)
 
-    def get_illust_binary(self, source_url: URL) -> bytes:
-        """画像の実体（バイナリ）をDLする
+    def download_illust(
+        self, source_url: URL, save_path: Path, commit: Callable[[Path, Path], None] | None = None
+    ) -> Path:
+        """画像の実体をストリーミングでDLして保存する
+
+        拡張子は実際にDLするまで分からないため、先頭のバイト列から判別して付与する
 
         Args:
             source_url (URL): 画像への直リンク
+            save_path (Path): 拡張子を除いた保存先パス
+            commit (Callable[[Path, Path], None] | None):
+                一時ファイルを保存先に確定させる関数、StreamDownloader.download を参照
 
         Returns:
-            bytes: 画像の実体（バイナリ）
+            Path: 拡張子を付与した実際の保存先パス
         """
-        # 画像DL
-        response = self._session.get(source_url.original_url, headers=self.HEADERS)
-        response.raise_for_status()
-        return response.content
+        return StreamDownloader(self._session).download(
+            source_url,
+            save_path,
+            headers=self.HEADERS,
+            suffix_resolver=lambda head: IllustExtension.create(head).extension,
+            commit=commit,
+        )
 
 
 if __name__ == "__main__":
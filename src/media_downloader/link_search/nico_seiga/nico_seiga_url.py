@@ -4,6 +4,7 @@ from pathlib import Path
 
 from media_downloader.link_search.nico_seiga.illustid import Illustid
 from media_downloader.link_search.url import URL
+from media_downloader.link_search.work_key import WorkKey
 
 
 @dataclass
@@ -22,8 +23,14 @@ class NicoSeigaURL:
 
     url: URL
 
-    NICOSEIGA_URL_PATTERN_1 = r"^https://seiga.nicovideo.jp/seiga/(im)[0-9]+"
-    NICOSEIGA_URL_PATTERN_2 = r"^http://nico.ms/(im)[0-9]+"
+    NICOSEIGA_URL_PATTERN_1 = re.compile(r"^https://seiga.nicovideo.jp/seiga/(im)[0-9]+")
+    NICOSEIGA_URL_PATTERN_2 = re.compile(r"^http://nico.ms/(im)[0-9]+")
+    # 上記いずれかに一致するかを1回で判定するパターン
+    NICOSEIGA_URL_ANY_PATTERN = re.compile(f"{NICOSEIGA_URL_PATTERN_1.pattern}|{NICOSEIGA_URL_PATTERN_2.pattern}")
+    # NICOSEIGA_URL_ANY_PATTERN に一致しうるホスト名
+    HOSTS = ("seiga.nicovideo.jp", "nico.ms")
+    # DL済作品の台帳や作品キーに使うサイト名
+    SITE_NAME = "nico_seiga"
 
     def __post_init__(self) -> None:
         """初期化処理
@@ -45,6 +52,11 @@ class NicoSeigaURL:
         illust_id = int(tail[2:])
         return Illustid(illust_id)
 
+    @property
+    def work_key(self) -> WorkKey:
+        """作品キーを返す、seiga.nicovideo.jp と nico.ms で同じイラストならば同じキーになる"""
+        return WorkKey(self.SITE_NAME, self.illust_id.id)
+
     @property
     def non_query_url(self) -> str:
         """クエリなしURLを返す"""
@@ -70,9 +82,7 @@ class NicoSeigaURL:
             bool: 引数がNicoSeigaURL.NICOSEIGA_URL_PATTERN パターンに則っているならばTrue,
                   そうでないならFalse
         """
-        f1 = re.search(NicoSeigaURL.NICOSEIGA_URL_PATTERN_1, estimated_url) is not None
-        f2 = re.search(NicoSeigaURL.NICOSEIGA_URL_PATTERN_2, estimated_url) is not None
-        return f1 or f2
+        return NicoSeigaURL.NICOSEIGA_URL_ANY_PATTERN.search(estimated_url) is not None
 
     @classmethod
     def create(cls, url: str | URL) -> "NicoSeigaURL":
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from logging import INFO, getLogger
+from pathlib import Path
+
+from media_downloader.link_search.async_stream_downloader import AsyncStreamDownloader
+from media_downloader.link_search.download_progress import download_progress
+from media_downloader.link_search.http_client_pool import http_client_pool
+from media_downloader.link_search.nijie.nijie_cookie import NijieCookie
+from media_downloader.link_search.nijie.nijie_downloader import DownloadResult, NijieDownloader
+from media_downloader.link_search.nijie.nijie_url import NijieURL
+from media_downloader.link_search.page_downloader import PageDownloader
+from media_downloader.link_search.rate_limiter import rate_limiter
+from media_downloader.util import CustomLogger
+
+logging.setLoggerClass(CustomLogger)
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+@dataclass(frozen=True)
+class AsyncNijieDownloader:
+    """nijie作品をDLするクラスの非同期版
+
+    作品詳細ページの解析、保存先、ファイル名、スキップの判定、DL済作品の台帳への記録は NijieDownloader のものを使う
+    漫画形式の各ページは PageDownloader.MAX_WORKERS 件ずつ並行してDLする
+    """
+
+    nijie_url: NijieURL  # nijie作品ページURL
+    base_path: Path  # 保存ディレクトリベースパス
+    cookies: NijieCookie  # nijieのクッキー
+
+    def __post_init__(self):
+        self._is_valid()
+
+    def _is_valid(self):
+        if not isinstance(self.nijie_url, NijieURL):
+            raise TypeError("nijie_url is not NijieURL.")
+        if not isinstance(self.base_path, Path):
+            raise TypeError("base_path is not Path.")
+        if not isinstance(self.cookies, NijieCookie):
+            raise TypeError("cookies is not NijieCookie.")
+        return True
+
+    async def download(self) -> DownloadResult:
+        """nijie作品ページURLから作品をダウンロードしてbase_path以下に保存する"""
+        work_id = self.nijie_url.work_id.id
+
+        # 作品詳細ページをGET
+        work_url = NijieDownloader._work_page_url(work_id)
+        headers = self.cookies._headers
+        # ログイン状態のクッキーを設定した AsyncClient を使う
+        session = self.cookies.async_client
+        await rate_limiter.acquire_async(work_url)
+        res = await session.get(work_url, headers=headers)
+        res.raise_for_status()
+        page_info = NijieDownloader._parse_work_page(res)
+
+        # 保存先を決める、DL済ならばスキップ
+        # 作者ディレクトリの索引とDL済作品の台帳はファイルを読み書きするため別スレッドで行う
+        prepared = await asyncio.to_thread(NijieDownloader._prepare, self.nijie_url, page_info, self.base_path)
+        if prepared is None:
+            return DownloadResult.PASSED
+        sd_path, pages = prepared
+
+        stream_downloader = AsyncStreamDownloader(session)
+        if len(pages) > 1:  # 漫画形式、うごイラ複数
+            # 画像を隠しディレクトリに並行してDLする、前回途中で中断していた場合は残りのみDLする
+            staging_path = await asyncio.to_thread(PageDownloader.prepare_staging, sd_path)
+            page_slot = asyncio.Semaphore(PageDownloader.MAX_WORKERS)
+
+            async def download_page(i: int, url, file_name: str) -> None:
+                if (staging_path / file_name).is_file():
+                    logger.info(f"\t\t: {file_name} -> exist({i + 1}/{len(pages)})")
+                else:
+                    async with page_slot:
+                        download_progress.raise_if_cancelled()
+                        await stream_downloader.download(url, staging_path / file_name, headers=headers)
+                    logger.info(f"\t\t: {file_name} -> done({i + 1}/{len(pages)})")
+                download_progress.page_done(sd_path.name)
+
+            download_progress.start_work(sd_path.name, len(pages))
+            try:
+                async with asyncio.TaskGroup() as task_group:
+                    for i, (url, file_name) in enumerate(pages):
+                        task_group.create_task(download_page(i, url, file_name))
+            finally:
+                download_progress.finish_work(sd_path.name)
+
+            # すべてのページが揃ってから{作者名}/{作品名}ディレクトリにリネームし、同時にDL済として記録する
+            await asyncio.to_thread(
+                PageDownloader.commit_staging, staging_path, sd_path, NijieDownloader._commit(work_id)
+            )
+        else:  # 一枚絵、うごイラ一枚
+            # 画像をDLして{作者名}ディレクトリ直下に保存
+            # 保存先へのリネームと同時にDL済作品の台帳に記録する
+            url, name = pages[0]
+            await stream_downloader.download(
+                url, sd_path.parent / name, headers=headers, commit=NijieDownloader._commit(work_id)
+            )
+            logger.info(f"Download nijie work: {sd_path.parent.name} / {name} -> done")
+
+        return DownloadResult.SUCCESS
+
+
+if __name__ == "__main__":
+    import configparser
+    import logging.config
+
+    from media_downloader.link_search.nijie.async_nijie_fetcher import AsyncNijieFetcher
+    from media_downloader.link_search.password import Password
+    from media_downloader.link_search.username import Username
+
+    logging.config.fileConfig("./log/logging.ini", disable_existing_loggers=False)
+    CONFIG_FILE_NAME = "./config/config.ini"
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILE_NAME, encoding="utf8")
+
+    base_path = Path("./media_downloader/link_search/")
+    if config["nijie"].getboolean("is_nijie_trace"):
+        fetcher = AsyncNijieFetcher(
+            Username(config["nijie"]["email"]), Password(config["nijie"]["password"]), base_path
+        )
+
+        work_id = 251197  # 漫画
+        work_url = f"https://nijie.info/view_popup.php?id={work_id}"
+
+        async def main() -> None:
+            await fetcher.fetch(work_url)
+            await http_client_pool.aclose()
+
+        asyncio.run(main())
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from logging import INFO, getLogger
+from pathlib import Path
+
+from media_downloader.link_search.async_fetcher_base import AsyncFetcherBase
+from media_downloader.link_search.download_manifest import download_manifest
+from media_downloader.link_search.nijie.async_nijie_downloader import AsyncNijieDownloader
+from media_downloader.link_search.nijie.nijie_cookie import NijieCookie
+from media_downloader.link_search.nijie.nijie_downloader import DownloadResult, NijieDownloader
+from media_downloader.link_search.nijie.nijie_fetcher import NijieFetcher
+from media_downloader.link_search.nijie.nijie_url import NijieURL
+from media_downloader.link_search.password import Password
+from media_downloader.link_search.session_registry import SessionRejectedError, session_registry
+from media_downloader.link_search.url import URL
+from media_downloader.link_search.username import Username
+from media_downloader.link_search.work_key import WorkKey
+from media_downloader.util import CustomLogger
+
+logging.setLoggerClass(CustomLogger)
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+@dataclass(frozen=True)
+class AsyncNijieFetcher(AsyncFetcherBase):
+    """nijie作品を取得するクラスの非同期版
+
+    ログインとクッキーの保存は NijieFetcher に任せ、別スレッドで実行する
+    クッキーは session_registry を通して同期版の NijieFetcher と共有する
+    """
+
+    username: Username  # nijieログイン用ユーザーID
+    password: Password = field(repr=False)  # nijieログイン用パスワード
+    base_path: Path  # 保存ディレクトリベースパス
+    fetcher: NijieFetcher = field(init=False, repr=False, compare=False)  # ログインに使う同期版の Fetcher
+
+    # 担当urlのホスト名
+    TARGET_HOSTS = NijieURL.HOSTS
+
+    def __init__(self, username: Username, password: Password, base_path: Path):
+        """初期化処理
+
+        バリデーションのみ
+        クッキー取得（ログイン）は担当URLを初めて fetch するときに行う
+
+        Args:
+            username (Username): nijieログイン用ユーザーID
+            password (Password):  nijieログイン用パスワード
+            base_path (Path): 保存ディレクトリベースパス
+        """
+        super().__init__()
+        fetcher = NijieFetcher(username, password, base_path)
+        object.__setattr__(self, "username", username)
+        object.__setattr__(self, "password", password)
+        object.__setattr__(self, "base_path", base_path)
+        object.__setattr__(self, "fetcher", fetcher)
+
+    @classmethod
+    def from_fetcher(cls, fetcher: NijieFetcher) -> "AsyncNijieFetcher":
+        """同期版の NijieFetcher と同じ設定で生成する
+
+        Args:
+            fetcher (NijieFetcher): 同期版の Fetcher
+
+        Returns:
+            AsyncNijieFetcher: 非同期版の Fetcher
+        """
+        if not isinstance(fetcher, NijieFetcher):
+            raise TypeError("fetcher is not NijieFetcher.")
+        return cls(fetcher.username, fetcher.password, fetcher.base_path)
+
+    async def get_cookies(self) -> NijieCookie:
+        """nijieで使用するクッキー
+
+        NijieFetcher.cookies を別スレッドで取得する、ログインが必要な場合もイベントループを止めない
+        """
+        return await asyncio.to_thread(lambda: self.fetcher.cookies)
+
+    async def is_target_url(self, url: URL) -> bool:
+        """担当URLかどうか判定する
+
+        AsyncFetcherBaseオーバーライド
+
+        Args:
+            url (URL): 処理対象url
+
+        Returns:
+            bool: 担当urlだった場合True, そうでない場合False
+        """
+        return self.fetcher.is_target_url(url)
+
+    def work_key(self, url: URL) -> WorkKey:
+        """担当urlが指す作品のキーを返す
+
+        AsyncFetcherBaseオーバーライド
+
+        Args:
+            url (URL): 処理対象url
+
+        Returns:
+            WorkKey: 作品キー
+        """
+        return NijieURL.create(url).work_key
+
+    async def fetch(self, url: str | URL) -> DownloadResult:
+        """担当処理：nijie作品を取得する
+
+        AsyncFetcherBaseオーバーライド
+
+        Args:
+            url (URL): 処理対象url
+
+        Returns:
+            DownloadResult: DL結果
+        """
+        if not isinstance(url, str | URL):
+            raise TypeError("url is not str | URL.")
+        nijie_url = NijieURL.create(url)
+
+        # DL済作品の台帳に記録があればネットワークに触れずにスキップ
+        entry = await asyncio.to_thread(download_manifest.get, NijieDownloader.SITE_NAME, nijie_url.work_id.id)
+        if entry:
+            logger.info(f"Download nijie work: {entry.path.name} -> exist")
+            return DownloadResult.PASSED
+
+        # 初回のみここでログインする
+        session_key = self.fetcher.session_key
+        cookies = await self.get_cookies()
+        try:
+            result = await AsyncNijieDownloader(nijie_url, self.base_path, cookies).download()
+        except SessionRejectedError:
+            # クッキーが無効になっていた場合は一度だけログインし直して再試行する
+            logger.info("nijie cookies rejected -> re-login")
+            new_cookies = await asyncio.to_thread(self.fetcher.relogin, cookies)
+            await cookies.aclose()
+            return await AsyncNijieDownloader(nijie_url, self.base_path, new_cookies).download()
+
+        if not cookies.is_fresh:
+            # 年齢確認画面にリダイレクトされなかったため、クッキーが有効と確認できた
+            validated_cookies = cookies.validated()
+            session_registry.replace(session_key, cookies, validated_cookies)
+            await asyncio.to_thread(self.fetcher._save_cookies, validated_cookies)
+        return result
+
+
+if __name__ == "__main__":
+    import configparser
+    import logging.config
+
+    from media_downloader.link_search.http_client_pool import http_client_pool
+
+    logging.config.fileConfig("./log/logging.ini", disable_existing_loggers=False)
+    CONFIG_FILE_NAME = "./config/config.ini"
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILE_NAME, encoding="utf8")
+
+    base_path = Path("./media_downloader/link_search/")
+    if config["nijie"].getboolean("is_nijie_trace"):
+        fetcher = AsyncNijieFetcher(
+            Username(config["nijie"]["email"]), Password(config["nijie"]["password"]), base_path
+        )
+        illust_ids = [251267, 251197]  # 一枚絵、漫画
+
+        async def main() -> None:
+            await asyncio.gather(*[fetcher.fetch(f"https://nijie.info/view_popup.php?id={i}") for i in illust_ids])
+            await http_client_pool.aclose()
+
+        asyncio.run(main())
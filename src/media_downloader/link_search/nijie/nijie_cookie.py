@@ -1,32 +1,130 @@
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field, replace
+from typing import ClassVar, Self
 
 import httpx
 
+from media_downloader.link_search.http_client_pool import SessionClients
+
 
 @dataclass(frozen=True)
 class NijieCookie:
-    """nijieのクッキー"""
+    """nijieのクッキー
+
+    クッキーが有効かどうかの確認（トップページのGET）は生成時には行わない
+    最後に有効と確認した日時 validated_at から FRESHNESS_WINDOW 秒以内であれば確認済として扱い、
+    それ以外は最初のリクエストが年齢確認画面にリダイレクトされるかどうかで遅延して確認する
+    リクエストはクッキーを設定した専用の Client / AsyncClient で行い、session_registry から破棄された際に閉じる
+    validated() で更新したクッキーは同じ Client を引き継ぐ
+    """
 
     _cookies: httpx.Cookies  # クッキー
     _headers: dict  # ヘッダー
+    validated_at: float | None = field(default=None, compare=False)  # 最後に有効と確認した日時（UNIX時間）
+    # このクッキーを設定した専用の Client、Noneの場合は _cookies から生成する
+    _clients: SessionClients | None = field(default=None, compare=False, repr=False)
 
     # nijieトップページ
     NIJIE_TOP_URL = "http://nijie.info/index.php"
+    # 有効と確認してから確認済として扱う期間[s]
+    DEFAULT_FRESHNESS_WINDOW = 24 * 60 * 60
+    FRESHNESS_WINDOW: ClassVar[float] = DEFAULT_FRESHNESS_WINDOW
 
     def __post_init__(self) -> None:
         self._is_valid()
+        if self._clients is None:
+            object.__setattr__(self, "_clients", SessionClients(self._cookies))
 
     def _is_valid(self) -> bool:
         if not isinstance(self._cookies, httpx.Cookies):
             raise TypeError("_cookies is not httpx.Cookies.")
         if not isinstance(self._headers, dict):
             raise TypeError("_headers is not dict.")
+        if self.validated_at is not None and not isinstance(self.validated_at, int | float):
+            raise TypeError("validated_at is not float.")
+        if self._clients is not None and not isinstance(self._clients, SessionClients):
+            raise TypeError("_clients is not SessionClients.")
 
         if not (self._headers and self._cookies):
             raise ValueError("NijieCookie _headers or _cookies is invalid.")
+        return True
 
-        # トップページをGETしてクッキーが有効かどうか調べる
-        response = httpx.get(self.NIJIE_TOP_URL, headers=self._headers, cookies=self._cookies, follow_redirects=True)
+    @classmethod
+    def configure(cls, freshness_window: float = DEFAULT_FRESHNESS_WINDOW) -> None:
+        """確認済として扱う期間を設定する
+
+        Args:
+            freshness_window (float): 有効と確認してから確認済として扱う期間[s]
+        """
+        if not isinstance(freshness_window, int | float) or freshness_window < 0:
+            raise ValueError("freshness_window must be non-negative number.")
+        cls.FRESHNESS_WINDOW = freshness_window
+
+    @property
+    def client(self) -> httpx.Client:
+        """このクッキーを設定した専用の Client"""
+        return self._clients.client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """このクッキーを設定した専用の AsyncClient"""
+        return self._clients.async_client
+
+    def close(self) -> None:
+        """専用の Client を閉じる
+
+        session_registry から破棄された際に呼び出される
+        """
+        self._clients.close()
+
+    async def aclose(self) -> None:
+        """専用の Client と AsyncClient を閉じる
+
+        非同期版の Fetcher がクッキーを破棄した際に呼び出す
+        """
+        await self._clients.aclose()
+
+    @property
+    def expires_at(self) -> float | None:
+        """クッキーの有効期限（UNIX時間）
+
+        複数のクッキーに期限がある場合は最も早く切れるものを返す、期限が無い場合None
+        """
+        expires = [cookie.expires for cookie in self._cookies.jar if cookie.expires]
+        return float(min(expires)) if expires else None
+
+    @property
+    def is_fresh(self) -> bool:
+        """確認済として扱えるかどうか
+
+        最後に有効と確認してから FRESHNESS_WINDOW 秒以内で、かつ有効期限が切れていない場合True
+        """
+        if self.validated_at is None:
+            return False
+        now = time.time()
+        if now - self.validated_at >= self.FRESHNESS_WINDOW:
+            return False
+        expires_at = self.expires_at
+        return expires_at is None or now < expires_at
+
+    def validated(self) -> Self:
+        """有効と確認した日時を現在日時に更新したクッキーを返す
+
+        Returns:
+            Self: validated_at を更新したクッキー
+        """
+        return replace(self, validated_at=time.time())
+
+    def validate(self) -> Self:
+        """トップページをGETしてクッキーが有効かどうか確認する
+
+        Raises:
+            ValueError: クッキーが無効な場合
+
+        Returns:
+            Self: validated_at を更新したクッキー
+        """
+        response = self.client.get(self.NIJIE_TOP_URL, headers=self._headers)
         response.raise_for_status()
 
         # 返ってきたレスポンスがトップページのものかチェック
@@ -37,7 +135,7 @@ class NijieCookie:
             "ニジエ - nijie" in response.text,
         ]):
             raise ValueError("NijieCookie is invalid.")
-        return True
+        return self.validated()
 
 
 if __name__ == "__main__":
@@ -55,11 +153,6 @@ if __name__ == "__main__":
     base_path = Path("./media_downloader/link_search/")
     if config["nijie"].getboolean("is_nijie_trace"):
         fetcher = NijieFetcher(Username(config["nijie"]["email"]), Password(config["nijie"]["password"]), base_path)
-
-        illust_id = 251267  # 一枚絵
-        # illust_id = 251197  # 漫画
-        # illust_id = 414793  # うごイラ一枚
-        # illust_id = 409587  # うごイラ複数
-
-        illust_url = f"https://nijie.info/view_popup.php?id={illust_id}"
-        print(fetcher.cookies)
+        cookies = fetcher.cookies
+        print(cookies.is_fresh)
+        print(cookies.validate().validated_at)
@@ -3,15 +3,22 @@ import logging
 from dataclasses import dataclass
 from logging import INFO, getLogger
 from pathlib import Path
-from time import sleep
+from typing import Callable
 
 import httpx
 from bs4 import BeautifulSoup
 
+from media_downloader.link_search.author_directory_index import AuthorDirectoryIndex
+from media_downloader.link_search.download_manifest import download_manifest
 from media_downloader.link_search.nijie.nijie_cookie import NijieCookie
 from media_downloader.link_search.nijie.nijie_page_info import NijiePageInfo
 from media_downloader.link_search.nijie.nijie_save_directory_path import NijieSaveDirectoryPath
 from media_downloader.link_search.nijie.nijie_url import NijieURL
+from media_downloader.link_search.page_downloader import PageDownloader
+from media_downloader.link_search.rate_limiter import rate_limiter
+from media_downloader.link_search.session_registry import SessionRejectedError
+from media_downloader.link_search.stream_downloader import StreamDownloader
+from media_downloader.link_search.url import URL
 from media_downloader.util import CustomLogger
 
 logging.setLoggerClass(CustomLogger)
@@ -33,6 +40,11 @@ class NijieDownloader:
     base_path: Path  # 保存ディレクトリベースパス
     cookies: NijieCookie  # nijieのクッキー
 
+    # DL済作品の台帳に記録する際のサイト名
+    SITE_NAME = NijieURL.SITE_NAME
+    # 未ログイン時にリダイレクトされる年齢確認画面のパス
+    AGE_JUMP_PATH = "age_jump.php"
+
     def __post_init__(self):
         self._is_valid()
 
@@ -45,81 +57,134 @@ class NijieDownloader:
             raise TypeError("cookies is not NijieCookie.")
         return True
 
-    def download(self) -> DownloadResult:
-        """nijie作品ページURLから作品をダウンロードしてbase_path以下に保存する"""
-        work_id = self.nijie_url.work_id.id
+    @classmethod
+    def _work_page_url(cls, work_id: int) -> str:
+        """作品詳細ページのURL
 
-        # 作品詳細ページをGET
-        work_url = f"http://nijie.info/view_popup.php?id={work_id}"
-        headers = self.cookies._headers
-        cookies = self.cookies._cookies
-        transport = httpx.HTTPTransport(retries=5)
-        session = httpx.Client(follow_redirects=True, timeout=60.0, transport=transport)
-        res = session.get(work_url, headers=headers, cookies=cookies)
-        res.raise_for_status()
+        Args:
+            work_id (int): 作品ID
 
-        # BeautifulSoupを用いてhtml解析を行う
-        soup = BeautifulSoup(res.text, "html.parser")
-        page_info = NijiePageInfo.create(soup)
+        Returns:
+            str: 作品詳細ページのURL
+        """
+        return f"http://nijie.info/view_popup.php?id={work_id}"
+
+    @classmethod
+    def _parse_work_page(cls, response: httpx.Response) -> NijiePageInfo:
+        """作品詳細ページを解析する
+
+        Args:
+            response (httpx.Response): 作品詳細ページのレスポンス
+
+        Returns:
+            NijiePageInfo: 作品詳細ページ解析結果
+        """
+        # クッキーが無効になっていると年齢確認画面にリダイレクトされる
+        if cls.AGE_JUMP_PATH in response.url.path:
+            raise SessionRejectedError("NijieCookie is rejected.")
 
-        # 保存先ディレクトリを取得
-        save_directory_path = NijieSaveDirectoryPath.create(self.nijie_url, page_info, self.base_path)
+        # BeautifulSoupを用いてhtml解析を行う
+        soup = BeautifulSoup(response.text, "html.parser")
+        return NijiePageInfo.create(soup)
+
+    @classmethod
+    def _prepare(
+        cls, nijie_url: NijieURL, page_info: NijiePageInfo, base_path: Path
+    ) -> tuple[Path, list[tuple[URL, str]]] | None:
+        """保存先を決め、DL済かどうか確認する
+
+        NijieDownloader と AsyncNijieDownloader で共通の処理
+        ファイルを読み書きするため、AsyncNijieDownloader からは別スレッドで呼び出す
+
+        Args:
+            nijie_url (NijieURL): nijie作品ページURL
+            page_info (NijiePageInfo): 作品詳細ページ解析結果
+            base_path (Path): 保存ディレクトリベースパス
+
+        Returns:
+            tuple[Path, list[tuple[URL, str]]] | None:
+                (作品ディレクトリパス, (ページのurl, ファイル名) のリスト)、
+                DL済の場合はDL済作品の台帳に記録してNone
+        """
+        work_id = nijie_url.work_id.id
+        save_directory_path = NijieSaveDirectoryPath.create(nijie_url, page_info, base_path)
         sd_path = save_directory_path.path
+        author_name_id = sd_path.parent.name
 
         urls = page_info.urls
-        pages = len(urls)
-        if pages > 1:  # 漫画形式、うごイラ複数
-            author_name_id = sd_path.parent.name
-            work_name_id = sd_path.name
-            logger.info(f"Download nijie work: [{author_name_id} / {work_name_id}] -> see below ...")
+        if len(urls) > 1:  # 漫画形式、うごイラ複数
+            logger.info(f"Download nijie work: [{author_name_id} / {sd_path.name}] -> see below ...")
 
-            # 既に存在しているなら再DLしないでスキップ
+            # 作品ディレクトリはすべてのページが揃ってから作られるため、存在すれば再DLしないでスキップ
             if sd_path.is_dir():
                 logger.info("\t\t: exist -> skip")
-                return DownloadResult.PASSED
-
-            # {作者名}/{作品名}ディレクトリ作成
-            sd_path.mkdir(parents=True, exist_ok=True)
+                download_manifest.commit(cls.SITE_NAME, work_id, sd_path)
+                return None
 
-            # 画像をDLする
             # ファイル名は{イラストタイトル}({イラストID})_{3ケタの連番}.{拡張子}
-            for i, url in enumerate(urls):
-                res = session.get(url.original_url, headers=headers, cookies=cookies)
-                res.raise_for_status()
-
-                ext = Path(url.original_url).suffix
-                file_name = f"{sd_path.name}_{i:03}{ext}"
-                with Path(sd_path / file_name).open(mode="wb") as fout:
-                    fout.write(res.content)
-
-                logger.info(f"\t\t: {file_name} -> done({i + 1}/{pages})")
-                sleep(0.5)
-        elif pages == 1:  # 一枚絵、うごイラ一枚
-            # {作者名}ディレクトリ作成
-            sd_path.parent.mkdir(parents=True, exist_ok=True)
-
-            # ファイル名設定
-            url = urls[0]
-            ext = Path(url.original_url).suffix
-            name = f"{sd_path.name}{ext}"
-            author_name_id = sd_path.parent.name
+            file_names = [f"{sd_path.name}_{i:03}{Path(url.original_url).suffix}" for i, url in enumerate(urls)]
+        elif len(urls) == 1:  # 一枚絵、うごイラ一枚
+            # ファイル名は{イラストタイトル}({イラストID}).{拡張子}
+            name = f"{sd_path.name}{Path(urls[0].original_url).suffix}"
 
             # 既に存在しているなら再DLしないでスキップ
             if (sd_path.parent / name).is_file():
                 logger.info(f"Download nijie work: {author_name_id} / {name} -> exist")
-                return DownloadResult.PASSED
-
-            # 画像をDLする
-            res = session.get(url.original_url, headers=headers, cookies=cookies)
-            res.raise_for_status()
-
-            # {作者名}ディレクトリ直下に保存
-            with Path(sd_path.parent / name).open(mode="wb") as fout:
-                fout.write(res.content)
-            logger.info(f"Download nijie work: {author_name_id} / {name} -> done")
+                download_manifest.commit(cls.SITE_NAME, work_id, sd_path.parent / name)
+                return None
+            file_names = [name]
         else:  # エラー
             raise ValueError("download nijie work failed.")
 
+        # {作者名}ディレクトリ作成
+        AuthorDirectoryIndex.make_author_directory(sd_path.parent)
+        return sd_path, list(zip(urls, file_names))
+
+    @classmethod
+    def _commit(cls, work_id: int) -> Callable[[Path, Path], None]:
+        """保存先へのリネームと同時にDL済作品の台帳に記録する関数を返す
+
+        Args:
+            work_id (int): 作品ID
+
+        Returns:
+            Callable[[Path, Path], None]: StreamDownloader.download などの commit に渡す関数
+        """
+        return lambda source, path: download_manifest.commit(cls.SITE_NAME, work_id, path, source)
+
+    def download(self) -> DownloadResult:
+        """nijie作品ページURLから作品をダウンロードしてbase_path以下に保存する"""
+        work_id = self.nijie_url.work_id.id
+
+        # 作品詳細ページをGET
+        work_url = self._work_page_url(work_id)
+        headers = self.cookies._headers
+        # ログイン状態のクッキーを設定した Client を使う、同じクッキーでDLする作品の間で接続を使い回す
+        session = self.cookies.client
+        rate_limiter.acquire(work_url)
+        res = session.get(work_url, headers=headers)
+        res.raise_for_status()
+        page_info = self._parse_work_page(res)
+
+        # 保存先を決める、DL済ならばスキップ
+        prepared = self._prepare(self.nijie_url, page_info, self.base_path)
+        if prepared is None:
+            return DownloadResult.PASSED
+        sd_path, pages = prepared
+
+        stream_downloader = StreamDownloader(session)
+        if len(pages) > 1:  # 漫画形式、うごイラ複数
+            # 画像を隠しディレクトリに並列にDLする、前回途中で中断していた場合は残りのみDLする
+            # すべてのページが揃ってから{作者名}/{作品名}ディレクトリにリネームし、同時にDL済として記録する
+            page_downloader = PageDownloader(stream_downloader)
+            page_downloader.download_directory(sd_path, pages, commit=self._commit(work_id), headers=headers)
+        else:  # 一枚絵、うごイラ一枚
+            # 画像をDLして{作者名}ディレクトリ直下に保存
+            # 保存先へのリネームと同時にDL済作品の台帳に記録する
+            url, name = pages[0]
+            stream_downloader.download(url, sd_path.parent / name, headers=headers, commit=self._commit(work_id))
+            logger.info(f"Download nijie work: {sd_path.parent.name} / {name} -> done")
+
         return DownloadResult.SUCCESS
 
 
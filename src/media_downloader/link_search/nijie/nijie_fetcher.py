@@ -1,6 +1,7 @@
 import logging
+import time
 import urllib.parse
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from http.cookiejar import Cookie
 from logging import INFO, getLogger
 from pathlib import Path
@@ -8,13 +9,17 @@ from pathlib import Path
 import httpx
 import orjson
 
+from media_downloader.link_search.download_manifest import download_manifest
 from media_downloader.link_search.fetcher_base import FetcherBase
+from media_downloader.link_search.http_client_pool import SessionClients, http_client_pool
 from media_downloader.link_search.nijie.nijie_cookie import NijieCookie
-from media_downloader.link_search.nijie.nijie_downloader import NijieDownloader
+from media_downloader.link_search.nijie.nijie_downloader import DownloadResult, NijieDownloader
 from media_downloader.link_search.nijie.nijie_url import NijieURL
 from media_downloader.link_search.password import Password
+from media_downloader.link_search.session_registry import SessionRejectedError, session_registry
 from media_downloader.link_search.url import URL
 from media_downloader.link_search.username import Username
+from media_downloader.link_search.work_key import WorkKey
 from media_downloader.util import CustomLogger
 
 logging.setLoggerClass(CustomLogger)
@@ -26,7 +31,8 @@ logger.setLevel(INFO)
 class NijieFetcher(FetcherBase):
     """nijie作品を取得するクラス"""
 
-    cookies: NijieCookie  # nijieで使用するクッキー
+    username: Username  # nijieログイン用ユーザーID
+    password: Password = field(repr=False)  # nijieログイン用パスワード
     base_path: Path  # 保存ディレクトリベースパス
 
     # 接続時に使用するヘッダー
@@ -36,11 +42,16 @@ class NijieFetcher(FetcherBase):
     HEADERS = {"User-Agent": " ".join([agent_browser, agent_webkit, agent_chrome])}
     # ログイン情報を保持するクッキーファイル置き場
     NIJIE_COOKIE_PATH = "./config/nijie_cookie.json"
+    # 認証済セッションを共有するサービス名
+    SESSION_NAME = "nijie"
+    # 担当urlのホスト名
+    TARGET_HOSTS = NijieURL.HOSTS
 
     def __init__(self, username: Username, password: Password, base_path: Path):
         """初期化処理
 
-        バリデーションとクッキー取得
+        バリデーションのみ
+        クッキー取得（ログイン）は担当URLを初めて fetch するときに行う
 
         Args:
             username (Username): nijieログイン用ユーザーID
@@ -56,15 +67,91 @@ class NijieFetcher(FetcherBase):
         if not isinstance(base_path, Path):
             raise TypeError("base_path is not Path.")
 
-        object.__setattr__(self, "cookies", self.login(username, password))
+        object.__setattr__(self, "username", username)
+        object.__setattr__(self, "password", password)
         object.__setattr__(self, "base_path", base_path)
 
-    def login(self, username: Username, password: Password) -> NijieCookie:
+    @property
+    def session_key(self) -> tuple[str, str]:
+        """認証済セッションを共有する際のキー"""
+        return (self.SESSION_NAME, self.username.name)
+
+    @property
+    def cookies(self) -> NijieCookie:
+        """nijieで使用するクッキー
+
+        初回アクセス時にログインし、以降は同じユーザーIDの nijie Fetcherで共有する
+        クッキーの有効期限が切れた場合はログインし直す
+        """
+        return session_registry.get(
+            self.session_key,
+            lambda: self.login(self.username, self.password),
+            expires_at=lambda cookies: cookies.expires_at,
+        )
+
+    def relogin(self, rejected_cookies: NijieCookie) -> NijieCookie:
+        """拒否されたクッキーを破棄し、保存済のクッキーを使わずにログインし直す
+
+        保存済のクッキーは拒否されたものと同じであるため読み込まない
+        他スレッドが既にログインし直していた場合は、そのクッキーを返す
+
+        Args:
+            rejected_cookies (NijieCookie): 拒否されたクッキー
+
+        Returns:
+            NijieCookie: ログインし直して取得したクッキー
+        """
+        session_registry.discard(self.session_key, rejected_cookies)
+        return session_registry.get(
+            self.session_key,
+            lambda: self.login(self.username, self.password, use_saved_cookies=False),
+            expires_at=lambda cookies: cookies.expires_at,
+        )
+
+    @classmethod
+    def _make_cookie(cls, name: str, value: str, domain: str, path: str, expires: int | None) -> Cookie:
+        """有効期限付きのクッキーを作成する
+
+        httpx.Cookies.set は有効期限を設定できないため、同等の Cookie を直接作成する
+
+        Args:
+            name (str): クッキー名
+            value (str): 値
+            domain (str): ドメイン
+            path (str): パス
+            expires (int | None): 有効期限（UNIX時間）、Noneの場合はセッションクッキー
+
+        Returns:
+            Cookie: クッキー
+        """
+        return Cookie(
+            version=0,
+            name=name,
+            value=value,
+            port=None,
+            port_specified=False,
+            domain=domain,
+            domain_specified=bool(domain),
+            domain_initial_dot=domain.startswith("."),
+            path=path,
+            path_specified=bool(path),
+            secure=False,
+            expires=expires,
+            discard=expires is None,
+            comment=None,
+            comment_url=None,
+            rest={"HttpOnly": None},
+            rfc2109=False,
+        )
+
+    def login(self, username: Username, password: Password, use_saved_cookies: bool = True) -> NijieCookie:
         """nijieページにログインし、ログイン情報を保持したクッキーを返す
 
         Args:
             username (Username): nijieユーザーID(登録したemailアドレス)
             password (Password): nijieユーザーIDのパスワード
+            use_saved_cookies (bool): 保存済のクッキーがあればそれを返す場合True、
+                                      Falseの場合は保存済のクッキーを無視して必ずログインする
 
         Returns:
             cookies (NijieCookie): ログイン情報を保持したクッキー
@@ -75,51 +162,84 @@ class NijieFetcher(FetcherBase):
             raise TypeError("password is not Password.")
 
         ncp = Path(self.NIJIE_COOKIE_PATH)
-        if ncp.is_file():
+        if use_saved_cookies and ncp.is_file():
             # クッキーが既に存在している場合
             try:
                 # クッキーを読み込む
-                cookies_dict: list[dict] = orjson.loads(ncp.read_bytes())
+                data: dict | list[dict] = orjson.loads(ncp.read_bytes())
+                if isinstance(data, list):
+                    # 旧形式（クッキーのリストのみ）の場合は未確認として扱う
+                    cookies_dict, validated_at = data, None
+                else:
+                    cookies_dict, validated_at = data["cookies"], data.get("validated_at")
                 cookies = httpx.Cookies()
+                now = time.time()
                 for c in cookies_dict:
-                    # TODO::expires を反映させたい場合は cookies.jar.set_cookie を参照
-                    cookies.set(c["name"], c["value"], domain=c["domain"], path=c["path"])
-
-                # クッキーが有効かチェック
-                res = NijieCookie(cookies, self.HEADERS)
+                    expires = c.get("expires")
+                    if expires is not None and expires <= now:
+                        # 期限切れのクッキーが含まれている場合はログインし直す
+                        raise ValueError("nijie cookie is expired.")
+                    cookies.jar.set_cookie(self._make_cookie(c["name"], c["value"], c["domain"], c["path"], expires))
+
+                # 有効かどうかの確認はここでは行わない
+                # 確認済の期間外であれば、最初のリクエストが年齢確認画面にリダイレクトされるかで確認する
+                res = NijieCookie(cookies, self.HEADERS, validated_at)
                 return res
             except Exception:
                 pass
 
         # クッキーが存在していない場合、または有効なクッキーではなかった場合
-        # 年齢確認で「はい」を選択したあとのURLにアクセス
-        auth_url = "https://nijie.info/age_jump.php?url="
-        response = httpx.get(auth_url, headers=self.HEADERS, follow_redirects=True)
-        response.raise_for_status()
-
-        # 認証用URLクエリを取得する
-        response_url = str(response.url)
-        qs = urllib.parse.urlparse(response_url).query
-        qd = urllib.parse.parse_qs(qs)
-        url_param = qd["url"][0]
-
-        # ログイン時に必要な情報
-        payload = {"email": username.name, "password": password.password, "save": "on", "ticket": "", "url": url_param}
-
-        # ログインする
-        login_url = "https://nijie.info/login_int.php"
-        response = httpx.post(login_url, data=payload, follow_redirects=True)
-        response.raise_for_status()
+        # ログイン状態のクッキーが共有の Client に残らないよう、ログイン用に専用の Client を生成する
+        # 以降のDLでもこの Client を使い回す
+        session = http_client_pool.create()
+        try:
+            # 年齢確認で「はい」を選択したあとのURLにアクセス
+            auth_url = "https://nijie.info/age_jump.php?url="
+            response = session.get(auth_url, headers=self.HEADERS)
+            response.raise_for_status()
+
+            # 認証用URLクエリを取得する
+            response_url = str(response.url)
+            qs = urllib.parse.urlparse(response_url).query
+            qd = urllib.parse.parse_qs(qs)
+            url_param = qd["url"][0]
+
+            # ログイン時に必要な情報
+            payload = {
+                "email": username.name,
+                "password": password.password,
+                "save": "on",
+                "ticket": "",
+                "url": url_param,
+            }
+
+            # ログインする
+            login_url = "https://nijie.info/login_int.php"
+            response = session.post(login_url, data=payload)
+            response.raise_for_status()
+        except Exception:
+            session.close()
+            raise
 
         # 以降はクッキーに認証情報が含まれているため、これを用いて各ページをGETする
         cookies: httpx.Cookies = response.cookies
 
-        # クッキーが有効かチェック
-        res = NijieCookie(cookies, self.HEADERS)
+        # ログイン直後のクッキーは有効と確認済として扱う
+        res = NijieCookie(cookies, self.HEADERS, time.time(), SessionClients(client=session))
 
+        # クッキー情報をファイルに保存する
+        self._save_cookies(res)
+        return res
+
+    def _save_cookies(self, cookies: NijieCookie) -> None:
+        """クッキー情報を有効と確認した日時とともにファイルに保存する
+
+        Args:
+            cookies (NijieCookie): 保存するクッキー
+        """
         # クッキー解析
         cookies_dict: list[dict] = []
-        cookies_jar: dict[str, dict[str, dict[str, Cookie]]] = cookies.jar._cookies
+        cookies_jar: dict[str, dict[str, dict[str, Cookie]]] = cookies._cookies.jar._cookies
         for domain, domain_dict in cookies_jar.items():
             for path, path_dict in domain_dict.items():
                 for name, cookie in path_dict.items():
@@ -131,9 +251,8 @@ class NijieFetcher(FetcherBase):
                         "domain": domain,
                     })
 
-        # クッキー情報をファイルに保存する
-        ncp.write_bytes(orjson.dumps(cookies_dict, option=orjson.OPT_INDENT_2))
-        return res
+        data = {"validated_at": cookies.validated_at, "cookies": cookies_dict}
+        Path(self.NIJIE_COOKIE_PATH).write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
 
     def is_target_url(self, url: URL) -> bool:
         """担当URLかどうか判定する
@@ -150,18 +269,55 @@ class NijieFetcher(FetcherBase):
             raise TypeError("url is not URL.")
         return NijieURL.is_valid(url.original_url)
 
-    def fetch(self, url: str | URL) -> None:
+    def work_key(self, url: URL) -> WorkKey:
+        """担当urlが指す作品のキーを返す
+
+        FetcherBaseオーバーライド
+
+        Args:
+            url (URL): 処理対象url
+
+        Returns:
+            WorkKey: 作品キー
+        """
+        return NijieURL.create(url).work_key
+
+    def fetch(self, url: str | URL) -> DownloadResult:
         """担当処理：nijie作品を取得する
 
         FetcherBaseオーバーライド
 
         Args:
             url (URL): 処理対象url
+
+        Returns:
+            DownloadResult: DL結果
         """
         if not isinstance(url, str | URL):
             raise TypeError("url is not str | URL.")
         novel_url = NijieURL.create(url)
-        NijieDownloader(novel_url, self.base_path, self.cookies).download()
+
+        # DL済作品の台帳に記録があればネットワークに触れずにスキップ
+        entry = download_manifest.get(NijieDownloader.SITE_NAME, novel_url.work_id.id)
+        if entry:
+            logger.info(f"Download nijie work: {entry.path.name} -> exist")
+            return DownloadResult.PASSED
+
+        # 初回のみここでログインする
+        cookies = self.cookies
+        try:
+            result = NijieDownloader(novel_url, self.base_path, cookies).download()
+        except SessionRejectedError:
+            # クッキーが無効になっていた場合は一度だけログインし直して再試行する
+            logger.info("nijie cookies rejected -> re-login")
+            return NijieDownloader(novel_url, self.base_path, self.relogin(cookies)).download()
+
+        if not cookies.is_fresh:
+            # 年齢確認画面にリダイレクトされなかったため、クッキーが有効と確認できた
+            validated_cookies = cookies.validated()
+            session_registry.replace(self.session_key, cookies, validated_cookies)
+            self._save_cookies(validated_cookies)
+        return result
 
 
 if __name__ == "__main__":
@@ -1,7 +1,7 @@
-import re
 from dataclasses import dataclass
 from pathlib import Path
 
+from media_downloader.link_search.author_directory_index import AuthorDirectoryIndex
 from media_downloader.link_search.nijie.nijie_page_info import NijiePageInfo
 from media_downloader.link_search.nijie.nijie_url import NijieURL
 
@@ -45,27 +45,10 @@ class NijieSaveDirectoryPath:
         work_title = page_info.work_title.title
         work_id = nijie_url.work_id.id
 
-        # 既に{作者nijieID}が一致するディレクトリがあるか調べる
-        sd_path = ""
+        # 既に{作者nijieID}が一致するディレクトリがあれば使い、なければ新しく登録する
         save_path = Path(base_path)
-        filelist = []
-        filelist_tp = [(sp.stat().st_mtime, sp.name) for sp in save_path.glob("*") if sp.is_dir()]
-        for mtime, path in sorted(filelist_tp, reverse=True):
-            filelist.append(path)
-
-        regex = re.compile(r".*\(([0-9]*)\)$")
-        for dir_name in filelist:
-            result = regex.match(dir_name)
-            if result:
-                ai = result.group(1)
-                if ai == str(author_id):
-                    sd_path = f"./{dir_name}/{work_title}({work_id})/"
-                    break
-
-        if sd_path == "":
-            sd_path = f"./{author_name}({author_id})/{work_title}({work_id})/"
-
-        save_directory_path = save_path / sd_path
+        author_dir_name = AuthorDirectoryIndex.get(save_path).resolve(author_id, author_name)
+        save_directory_path = save_path / author_dir_name / f"{work_title}({work_id})"
         return NijieSaveDirectoryPath(save_directory_path)
 
 
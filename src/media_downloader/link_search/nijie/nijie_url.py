@@ -4,6 +4,7 @@ from dataclasses import dataclass
 
 from media_downloader.link_search.nijie.workid import Workid
 from media_downloader.link_search.url import URL
+from media_downloader.link_search.work_key import WorkKey
 
 
 @dataclass
@@ -22,8 +23,14 @@ class NijieURL:
 
     url: URL
 
-    NIJIE_URL_PATTERN = r"^https?://nijie.info/view.php\?id=[0-9]+"
-    NIJIE_URL_DETAIL_PATTERN = r"^https?://nijie.info/view_popup.php\?id=[0-9]+"
+    NIJIE_URL_PATTERN = re.compile(r"^https?://nijie.info/view.php\?id=[0-9]+")
+    NIJIE_URL_DETAIL_PATTERN = re.compile(r"^https?://nijie.info/view_popup.php\?id=[0-9]+")
+    # 上記いずれかに一致するかを1回で判定するパターン
+    NIJIE_URL_ANY_PATTERN = re.compile(f"{NIJIE_URL_PATTERN.pattern}|{NIJIE_URL_DETAIL_PATTERN.pattern}")
+    # NIJIE_URL_ANY_PATTERN に一致しうるホスト名
+    HOSTS = ("nijie.info",)
+    # DL済作品の台帳や作品キーに使うサイト名
+    SITE_NAME = "nijie"
 
     def __post_init__(self) -> None:
         """初期化処理
@@ -43,6 +50,11 @@ class NijieURL:
         work_id_num = int(qd.get("id", [-1])[0])
         return Workid(work_id_num)
 
+    @property
+    def work_key(self) -> WorkKey:
+        """作品キーを返す、view.php と view_popup.php で同じ作品ならば同じキーになる"""
+        return WorkKey(self.SITE_NAME, self.work_id.id)
+
     @property
     def non_query_url(self) -> str:
         """クエリなしURLを返す"""
@@ -68,9 +80,7 @@ class NijieURL:
             bool: 引数が NijieURL.NIJIE_URL_PATTERN パターンに則っているならばTrue,
                   そうでないならFalse
         """
-        f1 = re.search(NijieURL.NIJIE_URL_PATTERN, estimated_url) is not None
-        f2 = re.search(NijieURL.NIJIE_URL_DETAIL_PATTERN, estimated_url) is not None
-        return f1 or f2
+        return NijieURL.NIJIE_URL_ANY_PATTERN.search(estimated_url) is not None
 
     @classmethod
     def create(cls, url: str | URL) -> "NijieURL":
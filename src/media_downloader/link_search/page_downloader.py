@@ -0,0 +1,226 @@
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from logging import INFO, getLogger
+from pathlib import Path
+from typing import Any, Callable, ClassVar
+
+from media_downloader.link_search.download_progress import download_progress
+from media_downloader.link_search.stream_downloader import StreamDownloader
+from media_downloader.link_search.url import URL
+from media_downloader.util import CustomLogger
+
+logging.setLoggerClass(CustomLogger)
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+@dataclass(frozen=True)
+class PageDownloader:
+    """漫画形式など複数ページの作品について、各ページを並列にDLするクラス
+
+    各ページは StreamDownloader で一時ファイルに書き込み、完了したものから保存先にリネームする
+    ページの完了順は前後するが、保存先に書きかけのファイルが残ることはない
+    いずれかのページが失敗した場合は未着手のページを取り消し、実行中のページの完了を待ってから例外を送出する
+    完了したページは残るため、次回は残りのページのみDLする
+    作品をDL済として記録するのは、すべてのページが完了してから呼び出し元で行う
+
+    作品ディレクトリ単位でDLする場合（download_directory）は、保存先の隣の隠しディレクトリに書き込み、
+    すべてのページが揃ってから保存先にリネームする
+    途中で中断しても保存先ディレクトリは作られないため、保存先ディレクトリが存在すれば完了済とみなせる
+    """
+
+    stream_downloader: StreamDownloader  # 各ページのDLに使う StreamDownloader
+
+    # 1作品あたりの同時DLページ数
+    DEFAULT_MAX_WORKERS = 4
+    MAX_WORKERS: ClassVar[int] = DEFAULT_MAX_WORKERS
+    # 作品ディレクトリを書き込む間の隠しディレクトリ名の接尾辞
+    STAGING_SUFFIX = ".staging"
+    # 中断した隠しディレクトリから再開せずに、削除して最初からDLし直すまでの期間[s]
+    STAGING_EXPIRE = 7 * 24 * 60 * 60
+
+    def __post_init__(self) -> None:
+        self._is_valid()
+
+    def _is_valid(self) -> bool:
+        if not isinstance(self.stream_downloader, StreamDownloader):
+            raise TypeError("stream_downloader is not StreamDownloader.")
+        return True
+
+    @classmethod
+    def configure(cls, max_workers: int = DEFAULT_MAX_WORKERS) -> None:
+        """1作品あたりの同時DLページ数を設定する
+
+        Args:
+            max_workers (int): 1作品あたりの同時DLページ数、1の場合は1ページずつ順にDLする
+        """
+        if not isinstance(max_workers, int) or max_workers < 1:
+            raise ValueError("max_workers must be positive int.")
+        cls.MAX_WORKERS = max_workers
+
+    def download(self, pages: list[tuple[str | URL, Path]], work_name: str = "", **kwargs: Any) -> None:
+        """各ページをDLして保存する、既に保存済のページはスキップする
+
+        DLの取り消しが要求された場合は、未着手のページはDLせずに DownloadCancelledError を送出する
+
+        Args:
+            pages (list[tuple[str | URL, Path]]): (ページのurl, 保存先パス) のリスト
+            work_name (str): 進捗の記録に使う作品名、空文字列の場合は記録しない
+            kwargs (Any): StreamDownloader.download に渡す引数（headers, cookies など）
+        """
+        total = len(pages)
+
+        def download_page(i: int, url: str | URL, save_path: Path) -> None:
+            if save_path.is_file():
+                logger.info(f"\t\t: {save_path.name} -> exist({i + 1}/{total})")
+            else:
+                download_progress.raise_if_cancelled()
+                self.stream_downloader.download(url, save_path, **kwargs)
+                logger.info(f"\t\t: {save_path.name} -> done({i + 1}/{total})")
+            if work_name:
+                download_progress.page_done(work_name)
+
+        if work_name:
+            download_progress.start_work(work_name, total)
+        try:
+            self._download_pages(pages, download_page)
+        finally:
+            if work_name:
+                download_progress.finish_work(work_name)
+
+    def _download_pages(
+        self, pages: list[tuple[str | URL, Path]], download_page: Callable[[int, str | URL, Path], None]
+    ) -> None:
+        """各ページに download_page を MAX_WORKERS 件ずつ並行して実行する"""
+        max_workers = min(self.MAX_WORKERS, len(pages))
+        if max_workers <= 1:
+            for i, (url, save_path) in enumerate(pages):
+                download_page(i, url, save_path)
+            return
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="page_download") as executor:
+            futures = [executor.submit(download_page, i, url, save_path) for i, (url, save_path) in enumerate(pages)]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except Exception:
+                # 未着手のページは取り消す、実行中のページは with を抜ける際に完了を待つ
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def download_directory(
+        self,
+        save_directory: Path,
+        pages: list[tuple[str | URL, str]],
+        commit: Callable[[Path, Path], None] | None = None,
+        **kwargs: Any,
+    ) -> Path:
+        """各ページを隠しディレクトリにDLし、すべて揃ってから保存先ディレクトリにリネームする
+
+        前回中断した隠しディレクトリが残っていれば、残りのページのみDLする（prepare_staging を参照）
+
+        Args:
+            save_directory (Path): 保存先ディレクトリパス
+            pages (list[tuple[str | URL, str]]): (ページのurl, ファイル名) のリスト
+            commit (Callable[[Path, Path], None] | None):
+                隠しディレクトリを保存先に確定させる関数、commit_staging を参照
+            kwargs (Any): StreamDownloader.download に渡す引数（headers, cookies など）
+
+        Returns:
+            Path: 保存先ディレクトリパス
+        """
+        staging_path = self.prepare_staging(save_directory)
+        self.download([(url, staging_path / name) for url, name in pages], save_directory.name, **kwargs)
+        return self.commit_staging(staging_path, save_directory, commit)
+
+    @classmethod
+    def staging_path(cls, save_directory: Path) -> Path:
+        """保存先ディレクトリに対応する隠しディレクトリのパス
+
+        保存先と同じディレクトリに置き、リネームが同一ファイルシステム内で完結するようにする
+
+        Args:
+            save_directory (Path): 保存先ディレクトリパス
+
+        Returns:
+            Path: {親ディレクトリ}/.{保存先ディレクトリ名}.staging
+        """
+        return save_directory.parent / f".{save_directory.name}{cls.STAGING_SUFFIX}"
+
+    @classmethod
+    def commit_staging(
+        cls, staging_path: Path, save_directory: Path, commit: Callable[[Path, Path], None] | None = None
+    ) -> Path:
+        """書き込みが完了した隠しディレクトリを保存先ディレクトリにリネームする
+
+        並行して動いている別の処理が先に保存先を確定させていた場合は、隠しディレクトリを破棄してそちらを使う
+
+        Args:
+            staging_path (Path): 書き込みが完了した隠しディレクトリ
+            save_directory (Path): 保存先ディレクトリパス
+            commit (Callable[[Path, Path], None] | None):
+                隠しディレクトリを保存先にリネームする関数、Noneの場合は os.replace でリネームする
+                DL済作品の台帳への記録と同時にリネームする場合に指定する
+
+        Returns:
+            Path: 保存先ディレクトリパス
+        """
+        try:
+            (commit or os.replace)(staging_path, save_directory)
+        except OSError:
+            if not save_directory.is_dir():
+                raise
+            shutil.rmtree(staging_path, ignore_errors=True)
+        return save_directory
+
+    @classmethod
+    def prepare_staging(cls, save_directory: Path, expire: float = STAGING_EXPIRE) -> Path:
+        """保存先ディレクトリに対応する隠しディレクトリを用意する
+
+        前回以前の実行で中断した隠しディレクトリが残っていれば、続きから再開するためそのまま使う
+        ただし expire 以上更新されていないものは、中身が古い可能性があるため削除して最初からDLし直す
+        作品をDLするときにその作品の隠しディレクトリのみを確認し、保存ディレクトリ全体は走査しない
+
+        Args:
+            save_directory (Path): 保存先ディレクトリパス
+            expire (float): 再開せずに削除するまでの期間[s]
+
+        Returns:
+            Path: 隠しディレクトリのパス
+        """
+        staging_path = cls.staging_path(save_directory)
+        try:
+            is_expired = time.time() - staging_path.stat().st_mtime >= expire
+        except FileNotFoundError:
+            is_expired = False
+        if is_expired:
+            shutil.rmtree(staging_path, ignore_errors=True)
+            logger.info(f"Staging directory: {staging_path} -> expired, removed")
+        staging_path.mkdir(parents=True, exist_ok=True)
+        return staging_path
+
+
+if __name__ == "__main__":
+    import logging.config
+    import time
+
+    import httpx
+
+    logging.config.fileConfig("./log/logging.ini", disable_existing_loggers=False)
+    url = "https://www.python.org/static/img/python-logo.png"
+    save_directory = Path("./page_downloader_sample")
+    save_directory.mkdir(exist_ok=True)
+    pages = [(url, save_directory / f"python-logo_{i:03}.png") for i in range(8)]
+
+    start = time.perf_counter()
+    with httpx.Client(follow_redirects=True, timeout=60.0) as session:
+        PageDownloader(StreamDownloader(session)).download(pages)
+    print(f"{time.perf_counter() - start:.3f}s")
+    for _, save_path in pages:
+        save_path.unlink()
+    save_directory.rmdir()
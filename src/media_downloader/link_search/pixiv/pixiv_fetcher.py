@@ -1,18 +1,22 @@
 import logging
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
 from logging import INFO, getLogger
 from pathlib import Path
 
 from pixivpy3 import AppPixivAPI
 
+from media_downloader.link_search.download_manifest import download_manifest
 from media_downloader.link_search.fetcher_base import FetcherBase
 from media_downloader.link_search.password import Password
 from media_downloader.link_search.pixiv.pixiv_save_directory_path import PixivSaveDirectoryPath
 from media_downloader.link_search.pixiv.pixiv_source_list import PixivSourceList
-from media_downloader.link_search.pixiv.pixiv_work_downloader import PixivWorkDownloader
+from media_downloader.link_search.pixiv.pixiv_work_downloader import DownloadResult, PixivWorkDownloader
 from media_downloader.link_search.pixiv.pixiv_work_url import PixivWorkURL
+from media_downloader.link_search.session_registry import SessionRejectedError, session_registry
 from media_downloader.link_search.url import URL
 from media_downloader.link_search.username import Username
+from media_downloader.link_search.work_key import WorkKey
 from media_downloader.util import CustomLogger
 
 logging.setLoggerClass(CustomLogger)
@@ -24,16 +28,24 @@ logger.setLevel(INFO)
 class PixivFetcher(FetcherBase):
     """pixiv作品を取得するクラス"""
 
-    aapi: AppPixivAPI  # 非公式pixivAPI操作インスタンス
+    username: Username  # pixivログイン用ユーザーID
+    password: Password = field(repr=False)  # pixivログイン用パスワード
     base_path: Path  # 保存ディレクトリベースパス
 
     # refresh_tokenファイルパス
     REFRESH_TOKEN_PATH = "./config/refresh_token.ini"
+    # アクセストークンの有効期間[s]
+    ACCESS_TOKEN_TTL = 3600
+    # 認証済セッションを共有するサービス名、pixiv小説と同じ AppPixivAPI を使う
+    SESSION_NAME = "pixiv"
+    # 担当urlのホスト名
+    TARGET_HOSTS = PixivWorkURL.HOSTS
 
     def __init__(self, username: Username, password: Password, base_path: Path) -> None:
         """初期化処理
 
-        バリデーションと非公式pixivAPIインスタンス取得
+        バリデーションのみ
+        ログインは担当URLを初めて fetch するときに行う
 
         Args:
             username (Username): pixivログイン用ユーザーID
@@ -49,9 +61,28 @@ class PixivFetcher(FetcherBase):
         if not isinstance(base_path, Path):
             raise TypeError("base_path is not Path.")
 
-        object.__setattr__(self, "aapi", self.login(username, password))
+        object.__setattr__(self, "username", username)
+        object.__setattr__(self, "password", password)
         object.__setattr__(self, "base_path", base_path)
 
+    @property
+    def session_key(self) -> tuple[str, str]:
+        """認証済セッションを共有する際のキー"""
+        return (self.SESSION_NAME, self.username.name)
+
+    @property
+    def aapi(self) -> AppPixivAPI:
+        """非公式pixivAPI操作インスタンス
+
+        初回アクセス時にログインし、以降は同じユーザーIDの pixiv 系Fetcherで共有する
+        アクセストークンの有効期限が切れた場合はログインし直す
+        """
+        return session_registry.get(
+            self.session_key,
+            lambda: self.login(self.username, self.password),
+            expires_at=lambda aapi: time.time() + self.ACCESS_TOKEN_TTL,
+        )
+
     def login(self, username: Username, password: Password) -> AppPixivAPI:
         """pixivログインして非公式pixivAPIインスタンスを取得する
 
@@ -106,18 +137,52 @@ class PixivFetcher(FetcherBase):
         """
         return PixivWorkURL.is_valid(url.non_query_url)
 
-    def fetch(self, url: URL) -> None:
+    def work_key(self, url: URL) -> WorkKey:
+        """担当urlが指す作品のキーを返す
+
+        FetcherBaseオーバーライド
+
+        Args:
+            url (URL): 処理対象url
+
+        Returns:
+            WorkKey: 作品キー
+        """
+        return PixivWorkURL.create(url).work_key
+
+    def fetch(self, url: URL) -> DownloadResult:
         """担当処理：pixiv作品を取得する
 
         FetcherBaseオーバーライド
 
         Args:
             url (URL): 処理対象url
+
+        Returns:
+            DownloadResult: DL結果
         """
         pixiv_url = PixivWorkURL.create(url)
-        source_list = PixivSourceList.create(self.aapi, pixiv_url)
-        save_directory_path = PixivSaveDirectoryPath.create(self.aapi, pixiv_url, self.base_path)
-        PixivWorkDownloader(self.aapi, source_list, save_directory_path).download()
+
+        # DL済作品の台帳に記録があればネットワークに触れずにスキップ
+        entry = download_manifest.get(PixivWorkDownloader.SITE_NAME, pixiv_url.work_id.id)
+        if entry:
+            logger.info(f"Download pixiv work: {entry.path.name} -> exist")
+            return DownloadResult.PASSED
+
+        def download(aapi: AppPixivAPI) -> DownloadResult:
+            source_list = PixivSourceList.create(aapi, pixiv_url)
+            save_directory_path = PixivSaveDirectoryPath.create(aapi, pixiv_url, self.base_path)
+            return PixivWorkDownloader(aapi, source_list, save_directory_path).download()
+
+        # 初回のみここでログインする
+        aapi = self.aapi
+        try:
+            return download(aapi)
+        except SessionRejectedError:
+            # アクセストークンが無効になっていた場合は一度だけログインし直して再試行する
+            logger.info("pixiv access token rejected -> re-login")
+            session_registry.discard(self.session_key, aapi)
+            return download(self.aapi)
 
 
 if __name__ == "__main__":
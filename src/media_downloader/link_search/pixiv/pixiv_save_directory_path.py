@@ -1,11 +1,12 @@
-import re
 from dataclasses import dataclass
 from pathlib import Path
 
 from pixivpy3 import AppPixivAPI
 
+from media_downloader.link_search.author_directory_index import AuthorDirectoryIndex
 from media_downloader.link_search.pixiv.authorid import Authorid
 from media_downloader.link_search.pixiv.authorname import Authorname
+from media_downloader.link_search.pixiv.pixiv_work_cache import pixiv_work_cache
 from media_downloader.link_search.pixiv.pixiv_work_url import PixivWorkURL
 from media_downloader.link_search.pixiv.worktitle import Worktitle
 
@@ -44,7 +45,7 @@ class PixivSaveDirectoryPath:
         work_id = pixiv_url.work_id.id
 
         # 作品詳細取得
-        works = aapi.illust_detail(work_id)
+        works = pixiv_work_cache.illust_detail(aapi, work_id)
         if works.error or (works.illust is None):
             raise ValueError("PixivSaveDirectoryPath create failed.")
         work = works.illust
@@ -54,27 +55,10 @@ class PixivSaveDirectoryPath:
         author_id = Authorid(int(work.user.id)).id
         work_title = Worktitle(work.title).title
 
-        # 既に{作者pixivID}が一致するディレクトリがあるか調べる
-        sd_path = ""
+        # 既に{作者pixivID}が一致するディレクトリがあれば使い、なければ新しく登録する
         save_path = base_path
-        filelist = []
-        filelist_tp = [(sp.stat().st_mtime, sp.name) for sp in save_path.glob("*") if sp.is_dir()]
-        for mtime, path in sorted(filelist_tp, reverse=True):
-            filelist.append(path)
-
-        regex = re.compile(r".*\(([0-9]*)\)$")
-        for dir_name in filelist:
-            result = regex.match(dir_name)
-            if result:
-                ai = result.group(1)
-                if ai == str(author_id):
-                    sd_path = f"./{dir_name}/{work_title}({work_id})/"
-                    break
-
-        if sd_path == "":
-            sd_path = f"./{author_name}({author_id})/{work_title}({work_id})/"
-
-        save_directory_path = save_path / sd_path
+        author_dir_name = AuthorDirectoryIndex.get(save_path).resolve(author_id, author_name)
+        save_directory_path = save_path / author_dir_name / f"{work_title}({work_id})"
         return PixivSaveDirectoryPath(save_directory_path)
 
 
@@ -3,6 +3,7 @@ from typing import Iterable
 
 from pixivpy3 import AppPixivAPI
 
+from media_downloader.link_search.pixiv.pixiv_work_cache import pixiv_work_cache
 from media_downloader.link_search.pixiv.pixiv_work_url import PixivWorkURL
 from media_downloader.link_search.url import URL
 
@@ -55,7 +56,7 @@ class PixivSourceList(Iterable):
         work_id = pixiv_url.work_id.id
 
         # イラスト情報取得
-        works = aapi.illust_detail(work_id)
+        works = pixiv_work_cache.illust_detail(aapi, work_id)
         if works.error or (works.illust is None):
             raise ValueError("PixivSourceList create failed.")
         work = works.illust
@@ -3,13 +3,19 @@ import logging
 from dataclasses import dataclass
 from logging import INFO, getLogger
 from pathlib import Path
-from time import sleep
+from typing import Callable, ClassVar
 
-from PIL import Image
 from pixivpy3 import AppPixivAPI
 
+from media_downloader.link_search.download_progress import download_progress
+from media_downloader.link_search.http_client_pool import http_client_pool
+from media_downloader.link_search.page_downloader import PageDownloader
+from media_downloader.link_search.pixiv.pixiv_work_cache import pixiv_work_cache
+from media_downloader.link_search.pixiv.ugoira_encoder import ugoira_encoder
 from media_downloader.link_search.pixiv.workid import Workid
 from media_downloader.link_search.pixiv.worktitle import Worktitle
+from media_downloader.link_search.rate_limiter import PIXIV_APP_API_HOST, rate_limiter
+from media_downloader.link_search.stream_downloader import StreamDownloader
 from media_downloader.util import CustomLogger
 
 logging.setLoggerClass(CustomLogger)
@@ -31,6 +37,14 @@ class PixivUgoiraDownloader:
     work_id: Workid  # 作品ID
     base_path: Path  # 保存ディレクトリベースパス
 
+    # 各フレームをまとめたzipを1回のリクエストで取得するか、Falseの場合は各フレーム画像を1枚ずつ取得する
+    DEFAULT_USE_ZIP = True
+    USE_ZIP: ClassVar[bool] = DEFAULT_USE_ZIP
+    # zipのDLに付与するヘッダ
+    HEADERS = {"Referer": "https://app-api.pixiv.net/"}
+    # 共有する httpx.Client のプール上のサイト名
+    HTTP_CLIENT_NAME = "pixiv"
+
     def __post_init__(self):
         self._is_valid()
 
@@ -43,26 +57,41 @@ class PixivUgoiraDownloader:
             raise TypeError("base_path is not Path.")
         return True
 
-    def download(self) -> DownloadResult:
+    @classmethod
+    def configure(cls, use_zip: bool = DEFAULT_USE_ZIP) -> None:
+        """各フレームの取得方法を設定する
+
+        Args:
+            use_zip (bool): 各フレームをまとめたzipを1回のリクエストで取得するか
+                Falseの場合は各フレーム画像を1枚ずつ取得する
+        """
+        if not isinstance(use_zip, bool):
+            raise TypeError("use_zip must be bool.")
+        cls.USE_ZIP = use_zip
+
+    def download(self, on_done: Callable[[], None] | None = None) -> DownloadResult:
         """うごイラをダウンロードする
 
         Notes:
-            {base_path}/{作品タイトル}({作品ID})/以下に各フレーム画像を保存
-            {base_path}/{作品タイトル}({作品ID}).gifとしてアニメーションgifを保存
+            {base_path}/{作品タイトル}({作品ID})/以下に各フレームをまとめたzip、または各フレーム画像を保存
+            {base_path}/{作品タイトル}({作品ID}).{拡張子}としてうごイラを保存、出力形式は ugoira_encoder の設定による
+            うごイラは別プロセスで生成するため、download から戻った時点では未完了の場合がある
 
         Args:
-            illust_id (int): 作品ID
-            base_path (str): 保存先ベースフルパス
+            on_done (Callable[[], None] | None): 保存がすべて完了した後に呼び出す関数
+                うごイラでない場合や取得済の場合はすぐに、それ以外はうごイラの保存後に呼び出す
 
         Returns:
             int: DL成功時0、スキップされた場合1、エラー時-1
         """
-        works = self.aapi.illust_detail(self.work_id.id)
+        works = pixiv_work_cache.illust_detail(self.aapi, self.work_id.id)
         if works.error or (works.illust is None):
             raise ValueError("ugoira download failed.")
         work = works.illust
 
         if work.type != "ugoira":
+            if on_done:
+                on_done()
             return DownloadResult.PASSED  # うごイラではなかった
 
         logger.info("\t\t: ugoira download -> see below ...")
@@ -70,55 +99,92 @@ class PixivUgoiraDownloader:
         # ValueObject生成
         work_title = Worktitle(work.title).title
 
-        # うごイラの各フレームを保存するディレクトリを生成
+        # うごイラの各フレームを保存するディレクトリ
+        # うごイラの保存まで完了してから作られるため、存在すれば取得済
         sd_path = self.base_path / f"./{work_title}({self.work_id.id})/"
         if sd_path.is_dir():
             logger.info(f"\t\t: {str(sd_path)} exist -> skip")
+            if on_done:
+                on_done()
             return DownloadResult.PASSED  # すでに取得済
 
-        sd_path.mkdir(parents=True, exist_ok=True)
+        # 各フレームは隠しディレクトリに保存する、前回途中で中断していた場合は続きから保存する
+        staging_path = PageDownloader.prepare_staging(sd_path)
 
         # うごイラの情報をaapiから取得する
+        rate_limiter.acquire(PIXIV_APP_API_HOST)
+        ugoira = self.aapi.ugoira_metadata(self.work_id.id)
+        metadata = ugoira.ugoira_metadata
+        delays = [f["delay"] for f in metadata.frames]
+        if self.USE_ZIP:
+            frames, archive = self._download_zip(metadata, staging_path)
+        else:
+            frames, archive = self._download_frames(work, len(delays), staging_path), None
+
+        # うごイラを設定された出力形式で保存、拡張子は ugoira_encoder が付与する
+        # エンコードはCPUを使うため別プロセスに任せ、完了を待たずに次の作品のDLに進む
+        # うごイラの保存が完了してから各フレームのディレクトリにリネームし、on_done を呼び出す
+        name = f"{work_title}({self.work_id.id})"
+
+        def commit() -> None:
+            PageDownloader.commit_staging(staging_path, sd_path)
+            if on_done:
+                on_done()
+
+        ugoira_encoder.submit(frames, delays, self.base_path / name, commit, archive)
+        return DownloadResult.SUCCESS
+
+    def _download_zip(self, metadata, staging_path: Path) -> tuple[list[str], Path]:
+        """各フレームをまとめたzipを1回のリクエストでDLする
+
+        Args:
+            metadata: aapi.ugoira_metadata で取得したうごイラの情報
+            staging_path (Path): zipの保存先ディレクトリ
+
+        Returns:
+            tuple[list[str], Path]: 表示順に並べたzip内の各フレームのファイル名, zipのパス
+        """
+        # zip_urls.medium は600x600に縮小したフレームのzipのため、原寸のフレームのzipに置き換える
+        # https://{...}/{作品ID}_ugoira600x600.zip -> https://{...}/{作品ID}_ugoira1920x1080.zip
+        zip_url = metadata.zip_urls.medium.replace("_ugoira600x600.", "_ugoira1920x1080.")
+        zip_path = staging_path / zip_url.rsplit("/", 1)[1]
+        frames = [f["file"] for f in metadata.frames]
+        if zip_path.is_file():
+            logger.info(f"\t\t: {zip_path.name} -> exist({len(frames)} frames)")
+            return frames, zip_path
+
+        session = http_client_pool.get(self.HTTP_CLIENT_NAME)
+        StreamDownloader(session).download(zip_url, zip_path, headers=self.HEADERS)
+        logger.info(f"\t\t: {zip_path.name} -> done({len(frames)} frames)")
+        return frames, zip_path
+
+    def _download_frames(self, work, frames_len: int, staging_path: Path) -> list[Path]:
+        """各フレーム画像を1枚ずつDLする
+
+        Args:
+            work: aapi.illust_detail で取得した作品詳細
+            frames_len (int): フレーム数
+            staging_path (Path): 各フレーム画像の保存先ディレクトリ
+
+        Returns:
+            list[Path]: 表示順に並べた各フレーム画像のパス
+        """
         # アドレスは以下の形になっている
         # https://{...}/{作品ID}_ugoira{画像の番号}.jpg
-        ugoira = self.aapi.ugoira_metadata(self.work_id.id)
         ugoira_url = work.meta_single_page.original_image_url.rsplit("0", 1)
-        frames_len = len(ugoira.ugoira_metadata.frames)
-        delays = [f["delay"] for f in ugoira.ugoira_metadata.frames]
-
-        # 各フレーム画像DL
+        frames = []
         for i in range(frames_len):
             frame_url = ugoira_url[0] + str(i) + ugoira_url[1]
-            self.aapi.download(frame_url, path=str(sd_path))
-            logger.info("\t\t: " + frame_url.rsplit("/", 1)[1] + " -> done({}/{})".format(i + 1, frames_len))
-            sleep(0.5)
-
-        # DLした各フレーム画像のパスを収集
-        frames = []
-        fr = [(sp.stat().st_mtime, str(sp)) for sp in sd_path.glob("*") if sp.is_file()]
-        for mtime, path in sorted(fr, reverse=False):
-            frames.append(path)
-
-        # うごイラをanimated gifとして保存
-        first = Image.open(frames[0])
-        first = first.copy()
-        image_list = []
-        for f in frames[1:]:
-            buf = Image.open(f)
-            buf = buf.copy()
-            # buf = buf.quantize(method=0)  # ディザリング抑制
-            image_list.append(buf)
-        name = f"{work_title}({self.work_id.id}).gif"
-        first.save(
-            fp=str(self.base_path / name),
-            save_all=True,
-            append_images=image_list,
-            optimize=False,
-            duration=delays,
-            loop=0,
-        )
-        logger.info("\t\t: animated gif saved: " + name + " -> done")
-        return DownloadResult.SUCCESS
+            frame_path = staging_path / frame_url.rsplit("/", 1)[1]
+            frames.append(frame_path)
+            if frame_path.is_file():
+                logger.info(f"\t\t: {frame_path.name} -> exist({i + 1}/{frames_len})")
+                continue
+            download_progress.raise_if_cancelled()
+            rate_limiter.acquire(frame_url)
+            self.aapi.download(frame_url, path=str(staging_path))
+            logger.info(f"\t\t: {frame_path.name} -> done({i + 1}/{frames_len})")
+        return frames
 
 
 if __name__ == "__main__":
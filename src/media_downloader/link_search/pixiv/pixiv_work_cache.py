@@ -0,0 +1,188 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+
+import orjson
+from pixivpy3 import AppPixivAPI
+from pixivpy3.utils import ParsedJson
+
+from media_downloader.link_search.rate_limiter import PIXIV_APP_API_HOST, rate_limiter
+from media_downloader.link_search.session_registry import SessionRejectedError
+
+# アクセストークンが失効・無効な場合のエラーメッセージに含まれる文字列
+PIXIV_OAUTH_ERROR_MESSAGE = "OAuth"
+
+
+def is_auth_rejected(works: ParsedJson) -> bool:
+    """非公式pixivAPIの結果がアクセストークンの失効・無効によるエラーかどうか
+
+    Args:
+        works (ParsedJson): 非公式pixivAPIの結果
+
+    Returns:
+        bool: アクセストークンが拒否されていた場合True
+    """
+    if not works.error:
+        return False
+    message = works.error.message if isinstance(works.error, dict) else str(works.error)
+    return PIXIV_OAUTH_ERROR_MESSAGE in str(message)
+
+
+class PixivWorkCache:
+    """pixiv作品詳細（aapi.illust_detail の結果）のキャッシュ
+
+    1つの作品に対して PixivSourceList, PixivSaveDirectoryPath, PixivUgoiraDownloader が
+    それぞれ作品詳細を必要とするため、ここで取得結果を共有して API 呼び出しを1回にまとめる
+    メモリ上では最大 max_size 件の LRU として保持し、取得から ttl 秒経過したものは再取得する
+    db_path が設定されている場合は SQLite にも保存し、次回以降の実行でも再利用する
+    取得に失敗した結果はキャッシュしない
+    """
+
+    # メモリ上に保持する最大件数
+    DEFAULT_MAX_SIZE = 1024
+    # キャッシュの有効期間[s]
+    DEFAULT_TTL = 24 * 60 * 60
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl: float = DEFAULT_TTL, db_path: Path | None = None):
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[int, tuple[float, ParsedJson]] = OrderedDict()
+        self.configure(max_size, ttl, db_path)
+
+    def configure(
+        self, max_size: int = DEFAULT_MAX_SIZE, ttl: float = DEFAULT_TTL, db_path: Path | None = None
+    ) -> None:
+        """キャッシュの設定を反映する
+
+        Args:
+            max_size (int): メモリ上に保持する最大件数
+            ttl (float): キャッシュの有効期間[s]
+            db_path (Path | None): 永続化に使うSQLiteファイルのパス、Noneの場合は永続化しない
+        """
+        if not isinstance(max_size, int) or max_size < 1:
+            raise ValueError("max_size must be positive int.")
+        if not isinstance(ttl, int | float) or ttl <= 0:
+            raise ValueError("ttl must be positive number.")
+        if db_path is not None and not isinstance(db_path, Path):
+            raise TypeError("db_path must be Path or None.")
+
+        with self._lock:
+            self.max_size = max_size
+            self.ttl = ttl
+            self.db_path = db_path
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        if self.db_path:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            with closing(sqlite3.connect(self.db_path)) as conn, conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS illust_detail ("
+                    "work_id INTEGER PRIMARY KEY, json BLOB NOT NULL, fetched_at REAL NOT NULL)"
+                )
+
+    def clear(self) -> None:
+        """メモリ上のキャッシュを破棄する"""
+        with self._lock:
+            self._cache.clear()
+
+    def _get_memory(self, work_id: int, now: float) -> ParsedJson | None:
+        with self._lock:
+            entry = self._cache.get(work_id)
+            if entry is None:
+                return None
+            fetched_at, works = entry
+            if now - fetched_at > self.ttl:
+                del self._cache[work_id]
+                return None
+            self._cache.move_to_end(work_id)
+            return works
+
+    def _put_memory(self, work_id: int, fetched_at: float, works: ParsedJson) -> None:
+        with self._lock:
+            self._cache[work_id] = (fetched_at, works)
+            self._cache.move_to_end(work_id)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def _get_db(self, work_id: int, now: float) -> tuple[float, ParsedJson] | None:
+        if not self.db_path:
+            return None
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            row = conn.execute("SELECT json, fetched_at FROM illust_detail WHERE work_id = ?", (work_id,)).fetchone()
+        if row is None:
+            return None
+        json_bytes, fetched_at = row
+        if now - fetched_at > self.ttl:
+            return None
+        return fetched_at, AppPixivAPI.parse_json(json_bytes)
+
+    def _put_db(self, work_id: int, fetched_at: float, works: ParsedJson) -> None:
+        if not self.db_path:
+            return
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO illust_detail (work_id, json, fetched_at) VALUES (?, ?, ?)",
+                (work_id, orjson.dumps(works), fetched_at),
+            )
+
+    def illust_detail(self, aapi: AppPixivAPI, work_id: int) -> ParsedJson:
+        """作品詳細を取得する
+
+        キャッシュにあればそれを返し、なければ aapi.illust_detail を呼び出して結果をキャッシュする
+        アクセストークンが拒否された場合は SessionRejectedError を送出する
+
+        Args:
+            aapi (AppPixivAPI): 非公式pixivAPI操作インスタンス
+            work_id (int): 作品ID
+
+        Returns:
+            ParsedJson: aapi.illust_detail(work_id) の結果
+        """
+        now = time.time()
+        works = self._get_memory(work_id, now)
+        if works is not None:
+            return works
+
+        entry = self._get_db(work_id, now)
+        if entry is not None:
+            fetched_at, works = entry
+            self._put_memory(work_id, fetched_at, works)
+            return works
+
+        rate_limiter.acquire(PIXIV_APP_API_HOST)
+        works = aapi.illust_detail(work_id)
+        if is_auth_rejected(works):
+            raise SessionRejectedError("pixiv access token is rejected.")
+        if works.error or (works.illust is None):
+            # 失敗した結果はキャッシュしない
+            return works
+        self._put_memory(work_id, now, works)
+        self._put_db(work_id, now, works)
+        return works
+
+
+# プロセス全体で共有する作品詳細キャッシュ
+pixiv_work_cache = PixivWorkCache()
+
+
+if __name__ == "__main__":
+    import configparser
+
+    from media_downloader.link_search.password import Password
+    from media_downloader.link_search.pixiv.pixiv_fetcher import PixivFetcher
+    from media_downloader.link_search.username import Username
+
+    CONFIG_FILE_NAME = "./config/config.ini"
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILE_NAME, encoding="utf8")
+
+    base_path = Path("./MediaDownloader/LinkSearch/")
+    if config["pixiv"].getboolean("is_pixiv_trace"):
+        fetcher = PixivFetcher(Username(config["pixiv"]["username"]), Password(config["pixiv"]["password"]), base_path)
+        work_id = 86704541
+        for _ in range(3):
+            start = time.perf_counter()
+            works = pixiv_work_cache.illust_detail(fetcher.aapi, work_id)
+            print(f"{works.illust.title}: {time.perf_counter() - start:.3f}s")
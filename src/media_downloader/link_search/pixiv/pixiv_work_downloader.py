@@ -4,14 +4,19 @@ import re
 from dataclasses import dataclass
 from logging import INFO, getLogger
 from pathlib import Path
-from time import sleep
 
 from pixivpy3 import AppPixivAPI
 
+from media_downloader.link_search.author_directory_index import AuthorDirectoryIndex
+from media_downloader.link_search.download_manifest import download_manifest
+from media_downloader.link_search.http_client_pool import http_client_pool
+from media_downloader.link_search.page_downloader import PageDownloader
 from media_downloader.link_search.pixiv.pixiv_save_directory_path import PixivSaveDirectoryPath
 from media_downloader.link_search.pixiv.pixiv_source_list import PixivSourceList
 from media_downloader.link_search.pixiv.pixiv_ugoira_downloader import PixivUgoiraDownloader
+from media_downloader.link_search.pixiv.pixiv_work_url import PixivWorkURL
 from media_downloader.link_search.pixiv.workid import Workid
+from media_downloader.link_search.stream_downloader import StreamDownloader
 from media_downloader.util import CustomLogger
 
 logging.setLoggerClass(CustomLogger)
@@ -33,6 +38,13 @@ class PixivWorkDownloader:
     source_list: PixivSourceList  # 直リンクURLリスト
     save_directory_path: PixivSaveDirectoryPath  # 保存先ディレクトリパス
 
+    # DL済作品の台帳に記録する際のサイト名
+    SITE_NAME = PixivWorkURL.SITE_NAME
+    # 画像の直リンクはリファラがないと取得できない
+    HEADERS = {"Referer": "https://app-api.pixiv.net/"}
+    # 共有する httpx.Client のプール上のサイト名
+    HTTP_CLIENT_NAME = "pixiv"
+
     def __post_init__(self) -> None:
         self._is_valid()
 
@@ -48,7 +60,8 @@ class PixivWorkDownloader:
     def download(self) -> DownloadResult:
         """pixiv作品ページURLからダウンロードする
 
-        リファラの関係で直接requestできないためAPIを通して保存する
+        リファラの関係で直接requestできないため、APIと同じリファラを付与して保存する
+        中断したDLは次回続きから再開する
         save_directory_pathは
         {base_path}/{作者名}({作者pixivID})/{作品タイトル}({作品ID})/の形を想定している
         漫画形式の場合：
@@ -60,30 +73,45 @@ class PixivWorkDownloader:
         うごイラの場合：
             save_directory_pathから作品タイトルと作品IDを取得し
             /{作者名}({作者pixivID})/{作品タイトル}({作品ID}).{拡張子}の形式で扉絵（1枚目）を保存
-            /{作者名}({作者pixivID})/{作品タイトル}({作品ID})/{作品ID}_ugoira{*}.{拡張子}の形式で各フレームを保存
-            /{作者名}({作者pixivID})/{作品タイトル}({作品ID}).gifとしてアニメーションgifを保存
+            /{作者名}({作者pixivID})/{作品タイトル}({作品ID})/{作品ID}_ugoira1920x1080.zipとして各フレームを保存
+                （PixivUgoiraDownloader.USE_ZIP が False の場合は{作品ID}_ugoira{*}.{拡張子}の形式で各フレームを保存）
+            /{作者名}({作者pixivID})/{作品タイトル}({作品ID}).{拡張子}としてうごイラを保存（既定はアニメーションgif）
+            うごイラの生成は別プロセスで行い、完了を待たずに戻る
         """
         pages = len(self.source_list)
         sd_path = self.save_directory_path.path
+        work_id = Workid(int(re.findall(r".*\(([0-9]*)\)$", sd_path.name)[0]))
+        # 作品ごとに接続を張り直さないよう、プロセス全体で共有している Client を借りる
+        session = http_client_pool.get(self.HTTP_CLIENT_NAME)
+        stream_downloader = StreamDownloader(session)
         if pages > 1:  # 漫画形式
             author_name_id = sd_path.parent.name
             work_name_id = sd_path.name
             logger.info(f"Download pixiv works: [{author_name_id} / {work_name_id}] -> see below ...")
 
-            # 既に存在しているなら再DLしないでスキップ
+            names = [
+                "{}_{:03}{}".format(sd_path.name, i + 1, Path(url.non_query_url).suffix)
+                for i, url in enumerate(self.source_list)
+            ]
+
+            # 作品ディレクトリはすべてのページが揃ってから作られるため、存在すれば再DLしないでスキップ
             if sd_path.is_dir():
                 logger.info("\t\t: exist -> skip")
+                download_manifest.commit(self.SITE_NAME, work_id.id, sd_path)
                 return DownloadResult.PASSED
 
-            sd_path.mkdir(parents=True, exist_ok=True)
-            for i, url in enumerate(self.source_list):
-                ext = Path(url.non_query_url).suffix
-                name = "{}_{:03}{}".format(sd_path.name, i + 1, ext)
-                self.aapi.download(url.non_query_url, path=str(sd_path), name=name)
-                logger.info(f"\t\t: {name} -> done({i + 1}/{pages})")
-                sleep(0.5)
+            # 各ページを隠しディレクトリに並列にDLする、前回途中で中断していた場合は残りのみDLする
+            # すべてのページが揃ってから作品ディレクトリにリネームし、同時にDL済として記録する
+            AuthorDirectoryIndex.make_author_directory(sd_path.parent)
+            page_downloader = PageDownloader(stream_downloader)
+            page_downloader.download_directory(
+                sd_path,
+                [(url.non_query_url, name) for url, name in zip(self.source_list, names)],
+                commit=lambda source, path: download_manifest.commit(self.SITE_NAME, work_id.id, path, source),
+                headers=self.HEADERS,
+            )
         elif pages == 1:  # 一枚絵
-            sd_path.parent.mkdir(parents=True, exist_ok=True)
+            AuthorDirectoryIndex.make_author_directory(sd_path.parent)
 
             url = self.source_list[0].non_query_url
             ext = Path(url).suffix
@@ -93,17 +121,17 @@ class PixivWorkDownloader:
             # 既に存在しているなら再DLしないでスキップ
             if (sd_path.parent / name).is_file():
                 logger.info(f"Download pixiv work: {author_name_id} / {name} -> exist")
+                download_manifest.commit(self.SITE_NAME, work_id.id, sd_path.parent / name)
                 return DownloadResult.PASSED
 
-            self.aapi.download(url, path=str(sd_path.parent), name=name)
+            stream_downloader.download(url, sd_path.parent / name, headers=self.HEADERS)
             logger.info(f"Download pixiv work: {author_name_id} / {name} -> done")
 
             # うごイラの場合は追加で保存する
-            regex = re.compile(r".*\(([0-9]*)\)$")
-            result = regex.match(sd_path.name)
-            if result:
-                work_id = Workid(int(result.group(1)))
-                PixivUgoiraDownloader(self.aapi, work_id, sd_path.parent).download()
+            # うごイラは別プロセスで生成するため、うごイラの保存まで完了した時点で記録する
+            PixivUgoiraDownloader(self.aapi, work_id, sd_path.parent).download(
+                on_done=lambda: download_manifest.commit(self.SITE_NAME, work_id.id, sd_path.parent / name)
+            )
         else:  # エラー
             raise ValueError("download pixiv work failed.")
         return DownloadResult.SUCCESS
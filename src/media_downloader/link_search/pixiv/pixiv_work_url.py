@@ -4,6 +4,7 @@ from pathlib import Path
 
 from media_downloader.link_search.pixiv.workid import Workid
 from media_downloader.link_search.url import URL
+from media_downloader.link_search.work_key import WorkKey
 
 
 @dataclass
@@ -22,7 +23,11 @@ class PixivWorkURL:
 
     url: URL
 
-    PIXIV_URL_PATTERN = r"^https://www.pixiv.net/artworks/[0-9]+"
+    PIXIV_URL_PATTERN = re.compile(r"^https://www.pixiv.net/artworks/[0-9]+")
+    # PIXIV_URL_PATTERN に一致しうるホスト名
+    HOSTS = ("www.pixiv.net",)
+    # DL済作品の台帳や作品キーに使うサイト名
+    SITE_NAME = "pixiv"
 
     def __post_init__(self) -> None:
         """初期化処理
@@ -40,6 +45,11 @@ class PixivWorkURL:
         work_id_num = int(tail)
         return Workid(work_id_num)
 
+    @property
+    def work_key(self) -> WorkKey:
+        """作品キーを返す"""
+        return WorkKey(self.SITE_NAME, self.work_id.id)
+
     @property
     def non_query_url(self) -> str:
         """クエリなしURLを返す"""
@@ -65,7 +75,7 @@ class PixivWorkURL:
             bool: 引数がPixivWorkURL.PIXIV_URL_PATTERN パターンに則っているならばTrue,
                   そうでないならFalse
         """
-        return re.search(PixivWorkURL.PIXIV_URL_PATTERN, estimated_url) is not None
+        return PixivWorkURL.PIXIV_URL_PATTERN.search(estimated_url) is not None
 
     @classmethod
     def create(cls, url: str | URL) -> "PixivWorkURL":
@@ -0,0 +1,535 @@
+import atexit
+import io
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from logging import INFO, getLogger
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+from PIL import GifImagePlugin, Image, ImageChops
+
+from media_downloader.util import CustomLogger
+
+logging.setLoggerClass(CustomLogger)
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+def iter_frames(frame_paths: list[str], archive: str | None = None) -> Iterator[Image.Image]:
+    """各フレーム画像を表示順に1枚ずつ読み込む
+
+    archive を指定した場合、frame_paths は zip 内のファイル名とみなし、
+    各フレームを展開せずにメモリ上で1枚ずつ読み出す
+
+    Args:
+        frame_paths (list[str]): 各フレーム画像のパス、または zip 内のファイル名、表示順
+        archive (str | None): 各フレームをまとめた zip のパス
+
+    Yields:
+        Image.Image: 読み込んだフレーム画像、次のフレームを読み込む時点で閉じる
+    """
+    if archive is None:
+        for frame_path in frame_paths:
+            with Image.open(frame_path) as image:
+                image.load()
+                yield image
+        return
+
+    with zipfile.ZipFile(archive) as zf:
+        for name in frame_paths:
+            with Image.open(io.BytesIO(zf.read(name))) as image:
+                image.load()
+                yield image
+
+
+def write_gif_streaming(frames: Iterable[str | Path | Image.Image], delays: Iterable[int], fp: BinaryIO) -> int:
+    """各フレームを1枚ずつ読み込んでアニメーションgifとして書き出す
+
+    Image.save(save_all=True) はすべてのフレームを変換してメモリ上に保持してから書き出すため、
+    フレーム数と解像度に比例してメモリを使う
+    ここでは1枚読み込むごとに変換して書き出し、メモリ上に保持するフレームを直前のものと合わせて2枚に抑える
+    Image.save と同じく、2枚目以降は直前のフレームから変化した範囲のみを、その範囲の適応パレットで書き出す
+
+    Args:
+        frames (Iterable[str | Path | Image.Image]): 各フレーム画像のパス、または画像、表示順
+        delays (Iterable[int]): 各フレームの表示時間[ms]
+        fp (BinaryIO): 書き出し先
+
+    Returns:
+        int: 書き出したフレーム数
+    """
+    count = 0
+    previous = None
+    for frame, delay in zip(frames, delays, strict=True):
+        if isinstance(frame, Image.Image):
+            current = frame.convert("RGB")
+        else:
+            with Image.open(frame) as image:
+                current = image.convert("RGB")
+        if previous is None:
+            # 1枚目のパレットを全体のパレットとし、無限ループを指定する
+            frame_p = current.convert("P", palette=Image.Palette.ADAPTIVE)
+            header, _ = GifImagePlugin.getheader(frame_p, info={"loop": 0, "duration": delay})
+            fp.write(b"".join(header))
+            data = GifImagePlugin.getdata(frame_p, duration=delay)
+        else:
+            # 変化がない場合も表示時間を保つため、左上の1画素のみ書き出す
+            bbox = ImageChops.difference(previous, current).getbbox() or (0, 0, 1, 1)
+            frame_p = current.crop(bbox).convert("P", palette=Image.Palette.ADAPTIVE)
+            data = GifImagePlugin.getdata(frame_p, offset=bbox[:2], duration=delay, include_color_table=True)
+        fp.write(b"".join(data))
+        previous = current
+        count += 1
+    if count == 0:
+        raise ValueError("frames is empty.")
+    fp.write(b";")  # trailer
+    return count
+
+
+def write_gif(
+    frame_paths: list[str], delays: list[int], save_path: str, streaming: bool = True, archive: str | None = None
+) -> None:
+    """アニメーションgifとして書き出す
+
+    Args:
+        frame_paths (list[str]): 各フレーム画像のパス、または zip 内のファイル名、表示順
+        delays (list[int]): 各フレームの表示時間[ms]
+        save_path (str): 書き出し先パス
+        streaming (bool): True の場合はフレームを1枚ずつ書き出す（write_gif_streaming）
+            False の場合はすべてのフレームを読み込んでから Image.save で書き出す
+        archive (str | None): 各フレームをまとめた zip のパス、指定した場合は zip から直接読み出す
+    """
+    if streaming:
+        with open(save_path, "wb") as fout:
+            write_gif_streaming(iter_frames(frame_paths, archive), delays, fout)
+        return
+    _save_all(frame_paths, delays, save_path, archive, format="GIF", optimize=False)
+
+
+def write_webp(
+    frame_paths: list[str], delays: list[int], save_path: str, streaming: bool = True, archive: str | None = None
+) -> None:
+    """アニメーションWebPとして書き出す
+
+    各フレームはフルカラーのまま非可逆圧縮するため、256色に減色するgifより画質が良く、ファイルも小さい
+    Pillow はすべてのフレームを受け取ってから書き出すため、streaming の指定によらずすべてのフレームを読み込む
+
+    Args:
+        frame_paths, delays, save_path, streaming, archive: write_gif を参照
+    """
+    _save_all(frame_paths, delays, save_path, archive, format="WEBP", quality=90, method=4)
+
+
+def write_apng(
+    frame_paths: list[str], delays: list[int], save_path: str, streaming: bool = True, archive: str | None = None
+) -> None:
+    """APNGとして書き出す
+
+    各フレームはフルカラーのまま可逆圧縮する、2枚目以降は直前のフレームから変化した範囲のみを保持する
+    Pillow はすべてのフレームを受け取ってから書き出すため、streaming の指定によらずすべてのフレームを読み込む
+
+    Args:
+        frame_paths, delays, save_path, streaming, archive: write_gif を参照
+    """
+    _save_all(frame_paths, delays, save_path, archive, format="PNG")
+
+
+def write_mp4(
+    frame_paths: list[str], delays: list[int], save_path: str, streaming: bool = True, archive: str | None = None
+) -> None:
+    """H.264 の mp4 動画として ffmpeg で書き出す
+
+    Args:
+        frame_paths, delays, save_path, streaming, archive: write_gif を参照
+    """
+    _write_video(frame_paths, delays, save_path, archive, ["-f", "mp4", "-c:v", "libx264", "-crf", "20"])
+
+
+def write_webm(
+    frame_paths: list[str], delays: list[int], save_path: str, streaming: bool = True, archive: str | None = None
+) -> None:
+    """VP9 の webm 動画として ffmpeg で書き出す
+
+    Args:
+        frame_paths, delays, save_path, streaming, archive: write_gif を参照
+    """
+    _write_video(
+        frame_paths, delays, save_path, archive, ["-f", "webm", "-c:v", "libvpx-vp9", "-crf", "32", "-b:v", "0"]
+    )
+
+
+def _save_all(frame_paths: list[str], delays: list[int], save_path: str, archive: str | None, **params) -> None:
+    """すべてのフレームを読み込んでから Image.save(save_all=True) で書き出す"""
+    images = [image.copy() for image in iter_frames(frame_paths, archive)]
+    if not images:
+        raise ValueError("frames is empty.")
+    if len(images) != len(delays):
+        raise ValueError("frames and delays must be same length.")
+    images[0].save(fp=save_path, save_all=True, append_images=images[1:], duration=delays, loop=0, **params)
+
+
+def _write_video(
+    frame_paths: list[str], delays: list[int], save_path: str, archive: str | None, args: list[str]
+) -> None:
+    """ffmpeg で動画として書き出す
+
+    各フレームの表示時間は concat demuxer の duration で指定し、可変フレームレートの動画とする
+    zip から読み出す場合は、各フレームを一時ディレクトリに展開してから ffmpeg に渡す
+
+    Args:
+        frame_paths, delays, save_path, archive: write_gif を参照
+        args (list[str]): 出力形式とコーデックを指定する ffmpeg の引数
+    """
+    ffmpeg = shutil.which(FFMPEG)
+    if ffmpeg is None:
+        raise FileNotFoundError("ffmpeg is not found.")
+    if not frame_paths:
+        raise ValueError("frames is empty.")
+    if len(frame_paths) != len(delays):
+        raise ValueError("frames and delays must be same length.")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = [Path(p).resolve() for p in frame_paths]
+        if archive is not None:
+            with zipfile.ZipFile(archive) as zf:
+                paths = []
+                for i, name in enumerate(frame_paths):
+                    path = Path(temp_dir) / f"{i:06}{Path(name).suffix}"
+                    path.write_bytes(zf.read(name))
+                    paths.append(path)
+
+        def entry(path: Path) -> str:
+            escaped = str(path).replace("'", "'\\''")
+            return f"file '{escaped}'"
+
+        lines = ["ffconcat version 1.0"]
+        for path, delay in zip(paths, delays):
+            lines += [entry(path), f"duration {delay / 1000}"]
+        # 最後のフレームの duration は無視されるため、最後のフレームをもう一度並べて表示時間を反映させる
+        lines.append(entry(paths[-1]))
+        list_path = Path(temp_dir) / "frames.ffconcat"
+        list_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+        command = [ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", str(list_path)]
+        # yuv420p は縦横が偶数である必要があるため、奇数の場合は1画素埋める
+        command += ["-vsync", "vfr", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-pix_fmt", "yuv420p"]
+        result = subprocess.run([*command, *args, save_path], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {result.stderr.strip()}")
+
+
+@dataclass(frozen=True)
+class UgoiraFormat:
+    """うごイラの出力形式"""
+
+    extension: str  # 保存するファイルの拡張子
+    writer: Callable[[list[str], list[int], str, bool, str | None], None]  # 書き出す関数、ワーカープロセス上で呼び出す
+    uses_ffmpeg: bool = False  # ffmpeg を使うか
+
+
+# ffmpeg の実行ファイル名、PATH から探す
+FFMPEG = "ffmpeg"
+
+# 出力形式名と出力形式の対応、設定ファイルの ugoira_format で指定する
+UGOIRA_FORMATS: dict[str, UgoiraFormat] = {
+    "gif": UgoiraFormat(".gif", write_gif),
+    "webp": UgoiraFormat(".webp", write_webp),
+    "apng": UgoiraFormat(".png", write_apng),
+    "mp4": UgoiraFormat(".mp4", write_mp4, uses_ffmpeg=True),
+    "webm": UgoiraFormat(".webm", write_webm, uses_ffmpeg=True),
+}
+
+
+def encode_ugoira(
+    frame_paths: list[str],
+    delays: list[int],
+    save_path: str,
+    output_format: str = "gif",
+    streaming: bool = True,
+    archive: str | None = None,
+) -> float:
+    """各フレーム画像からうごイラを生成して保存する
+
+    ワーカープロセス上で実行するため、モジュールのトップレベルに定義し、引数と戻り値は pickle できる型のみとする
+    書きかけのファイルが残らないよう、一時ファイルに書き込んでから保存先にリネームする
+    書き出しに失敗した場合は一時ファイルを削除してから例外を送出する
+
+    Args:
+        frame_paths (list[str]): 各フレーム画像のパス、または zip 内のファイル名、表示順
+        delays (list[int]): 各フレームの表示時間[ms]
+        save_path (str): 保存先パス
+        output_format (str): 出力形式名、UGOIRA_FORMATS を参照
+        streaming (bool): フレームを1枚ずつ書き出すか、write_gif を参照
+        archive (str | None): 各フレームをまとめた zip のパス、指定した場合は zip から直接読み出す
+
+    Returns:
+        float: エンコードにかかった時間[s]
+    """
+    start = time.perf_counter()
+    part_path = save_path + ".part"
+    try:
+        UGOIRA_FORMATS[output_format].writer(frame_paths, delays, part_path, streaming, archive)
+        os.replace(part_path, save_path)
+    except Exception:
+        Path(part_path).unlink(missing_ok=True)
+        raise
+    return time.perf_counter() - start
+
+
+@dataclass(frozen=True)
+class UgoiraEncodeStats:
+    """うごイラのエンコード状況"""
+
+    queued: int  # エンコード待ち、エンコード中の作品数
+    completed: int  # エンコードが完了した作品数
+    failed: int  # エンコードに失敗した作品数
+    encode_time: float  # 完了した作品のエンコード時間の合計[s]
+
+
+class UgoiraEncoder:
+    """うごイラを別プロセスで生成するクラス
+
+    各フレームの読み込みとエンコードはCPUを使うため、DLを行うスレッドとは別のプロセスで行う
+    エンコードを待つ間も呼び出し元は次の作品のDLを進められる
+    ワーカープロセスは最初にエンコードを依頼した際に起動し、プロセス数の既定値はCPUのコア数とする
+    DL用のスレッドが動いている最中に fork するとロックの状態ごと複製されるため、ワーカープロセスは spawn で起動する
+    出力形式は UGOIRA_FORMATS から選ぶ、既定はアニメーションgif
+    既定ではフレームを1枚ずつ書き出し、1作品あたりのメモリ使用量をフレーム数によらず抑える
+    同じ保存先へのエンコードが依頼済の場合は重複して依頼せず、依頼済のものの完了を待てるようにする
+    """
+
+    # フレームを1枚ずつ書き出すか
+    DEFAULT_STREAMING = True
+    # 出力形式名
+    DEFAULT_FORMAT = "gif"
+
+    def __init__(
+        self, max_workers: int | None = None, streaming: bool = DEFAULT_STREAMING, output_format: str = DEFAULT_FORMAT
+    ):
+        self._lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+        self._all_done = threading.Condition(self._lock)
+        self._executor: ProcessPoolExecutor | None = None
+        self._pending: dict[Path, Future] = {}  # 保存先パスとエンコード待ち、エンコード中の Future
+        self._completed = 0
+        self._failed = 0
+        self._encode_time = 0.0
+        self.configure(max_workers, streaming, output_format)
+
+    def configure(
+        self, max_workers: int | None = None, streaming: bool = DEFAULT_STREAMING, output_format: str = DEFAULT_FORMAT
+    ) -> None:
+        """ワーカープロセス数とエンコード方法を設定する
+
+        起動済のワーカープロセスは、依頼済のエンコードが完了してから終了する
+        ffmpeg を使う出力形式で ffmpeg が見つからない場合は、既定の出力形式を使う
+
+        Args:
+            max_workers (int | None): ワーカープロセス数、Noneの場合はCPUのコア数
+            streaming (bool): フレームを1枚ずつ書き出すか、write_gif を参照
+            output_format (str): 出力形式名、UGOIRA_FORMATS を参照
+        """
+        if max_workers is not None and (not isinstance(max_workers, int) or max_workers < 1):
+            raise ValueError("max_workers must be positive int or None.")
+        if not isinstance(streaming, bool):
+            raise TypeError("streaming must be bool.")
+        if output_format not in UGOIRA_FORMATS:
+            raise ValueError(f"output_format must be one of {list(UGOIRA_FORMATS)}.")
+        if UGOIRA_FORMATS[output_format].uses_ffmpeg and shutil.which(FFMPEG) is None:
+            logger.warning(f"ffmpeg is not found, ugoira output format {output_format} -> {self.DEFAULT_FORMAT}")
+            output_format = self.DEFAULT_FORMAT
+        self.shutdown()
+        with self._lock:
+            self.max_workers = max_workers or os.cpu_count() or 1
+            self.streaming = streaming
+            self.output_format = output_format
+
+    @property
+    def extension(self) -> str:
+        """出力形式の拡張子"""
+        return UGOIRA_FORMATS[self.output_format].extension
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def submit(
+        self,
+        frame_paths: list[Path] | list[str],
+        delays: list[int],
+        save_path: Path,
+        on_done: Callable[[], None] | None = None,
+        archive: Path | None = None,
+    ) -> Future:
+        """うごイラの生成を依頼する
+
+        同じ保存先へのエンコードが依頼済の場合は依頼せず、依頼済の Future を返す
+        この場合 on_done は呼び出さない、保存の完了後の処理は先に依頼した側の on_done で行う
+
+        Args:
+            frame_paths (list[Path] | list[str]): 各フレーム画像のパス、または zip 内のファイル名、表示順
+            delays (list[int]): 各フレームの表示時間[ms]
+            save_path (Path): 拡張子を除いた保存先パス、出力形式の拡張子を付与して保存する
+            on_done (Callable[[], None] | None): 保存が完了した後に呼び出す関数、失敗した場合は呼び出さない
+            archive (Path | None): 各フレームをまとめた zip のパス、指定した場合は zip から直接読み出す
+
+        Returns:
+            Future: エンコード時間[s]を結果として持つ Future
+        """
+        if not frame_paths:
+            raise ValueError("frame_paths is empty.")
+        if len(frame_paths) != len(delays):
+            raise ValueError("frame_paths and delays must be same length.")
+
+        save_path = save_path.parent / (save_path.name + self.extension)
+        # 確認から登録までの間に同じ保存先の依頼が割り込まないよう、依頼はひとつずつ行う
+        with self._submit_lock:
+            with self._lock:
+                pending_future = self._pending.get(save_path)
+            if pending_future is not None:
+                logger.info(f"\t\t: ugoira encode: {save_path.name} -> already queued, skip")
+                return pending_future
+
+            executor = self._get_executor()
+            future = executor.submit(
+                encode_ugoira,
+                [str(p) for p in frame_paths],
+                list(delays),
+                str(save_path),
+                self.output_format,
+                self.streaming,
+                str(archive) if archive else None,
+            )
+            with self._lock:
+                self._pending[save_path] = future
+                queued = len(self._pending)
+        logger.info(f"\t\t: ugoira encode: {save_path.name} -> queued (queue depth {queued})")
+
+        def done(future: Future) -> None:
+            try:
+                encode_time = future.result()
+            except Exception as e:
+                with self._lock:
+                    self._pending.pop(save_path, None)
+                    self._failed += 1
+                    if isinstance(e, BrokenProcessPool) and self._executor is executor:
+                        # ワーカープロセスが異常終了した場合は次の依頼時に起動し直す
+                        self._executor = None
+                    self._all_done.notify_all()
+                logger.error(f"\t\t: ugoira encode: {save_path.name} -> failed: {e}")
+                return
+
+            try:
+                if on_done:
+                    on_done()
+            except Exception as e:
+                logger.error(f"\t\t: ugoira saved: {save_path.name} -> commit failed: {e}")
+            finally:
+                with self._lock:
+                    self._pending.pop(save_path, None)
+                    self._completed += 1
+                    self._encode_time += encode_time
+                    queued = len(self._pending)
+                    self._all_done.notify_all()
+            logger.info(
+                f"\t\t: ugoira saved: {save_path.name} -> done (encode {encode_time:.2f}s, queue depth {queued})"
+            )
+
+        future.add_done_callback(done)
+        return future
+
+    def stats(self) -> UgoiraEncodeStats:
+        """エンコード状況を取得する
+
+        Returns:
+            UgoiraEncodeStats: エンコード状況
+        """
+        with self._lock:
+            return UgoiraEncodeStats(len(self._pending), self._completed, self._failed, self._encode_time)
+
+    def wait(self) -> None:
+        """依頼済のエンコードがすべて完了し、on_done の呼び出しも終わるまで待つ"""
+        with self._all_done:
+            self._all_done.wait_for(lambda: not self._pending)
+
+    def shutdown(self) -> None:
+        """依頼済のエンコードの完了を待ってからワーカープロセスを終了する"""
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor:
+            executor.shutdown(wait=True)
+
+
+# プロセス全体で共有するうごイラのエンコーダ
+ugoira_encoder = UgoiraEncoder()
+atexit.register(ugoira_encoder.shutdown)
+
+
+def _encode_peak_memory(
+    frame_paths: list[str], delays: list[int], save_path: str, output_format: str, streaming: bool
+) -> int:
+    """ベンチマーク用、新しいプロセス上で encode_ugoira を実行し、そのプロセスの最大常駐メモリ[KiB]を返す
+
+    Pillow の画像データは tracemalloc で追跡されないため、プロセスの最大常駐メモリで比較する
+    ffmpeg を使う出力形式では、子プロセスの ffmpeg の最大常駐メモリと比べて大きい方を返す
+    """
+    import resource
+
+    encode_ugoira(frame_paths, delays, save_path, output_format, streaming)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max(peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+if __name__ == "__main__":
+    from PIL import ImageDraw
+
+    # 合成したフレームから、出力形式ごとの処理時間、ファイルサイズ、メモリ使用量を計測する（Linux のみ）
+    # ffmpeg を使う出力形式は、PATH に ffmpeg がある場合のみ計測する
+    FRAMES = 300
+    SIZE = (960, 540)
+    sample_path = Path("./ugoira_encoder_sample")
+    sample_path.mkdir(exist_ok=True)
+    frame_paths = []
+    for i in range(FRAMES):
+        frame_path = sample_path / f"12345678_ugoira{i}.jpg"
+        image = Image.linear_gradient("L").resize(SIZE).convert("RGB")
+        ImageDraw.Draw(image).ellipse((i * 3, 100, i * 3 + 200, 300), fill=(255, i % 256, 0))
+        image.save(frame_path, quality=90)
+        frame_paths.append(str(frame_path))
+    delays = [50 if i % 2 else 100 for i in range(FRAMES)]
+
+    cases = [("gif", False), ("gif", True)]
+    cases += [(name, True) for name in UGOIRA_FORMATS if name != "gif"]
+    context = multiprocessing.get_context("spawn")
+    for output_format, streaming in cases:
+        if UGOIRA_FORMATS[output_format].uses_ffmpeg and shutil.which(FFMPEG) is None:
+            print(f"{output_format:5} : ffmpeg is not found -> skip")
+            continue
+        save_path = str(sample_path / f"sample_{streaming}{UGOIRA_FORMATS[output_format].extension}")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            start = time.perf_counter()
+            peak = executor.submit(_encode_peak_memory, frame_paths, delays, save_path, output_format, streaming)
+            peak = peak.result()
+            elapsed = time.perf_counter() - start
+        size = Path(save_path).stat().st_size
+        print(
+            f"{output_format:5}(streaming={streaming!s:5}): {elapsed:6.2f}s, "
+            f"{size / 1024 / 1024:6.2f} MiB, peak RSS {peak / 1024:7.1f} MiB"
+        )
+
+    shutil.rmtree(sample_path)
@@ -6,8 +6,11 @@ from logging import INFO, getLogger
 from bs4 import BeautifulSoup
 from pixivpy3 import AppPixivAPI
 
+from media_downloader.link_search.author_directory_index import AuthorDirectoryIndex
+from media_downloader.link_search.download_manifest import download_manifest
 from media_downloader.link_search.pixiv_novel.pixiv_novel_save_directory_path import PixivNovelSaveDirectoryPath
 from media_downloader.link_search.pixiv_novel.pixiv_novel_url import PixivNovelURL
+from media_downloader.link_search.rate_limiter import PIXIV_APP_API_HOST, rate_limiter
 from media_downloader.util import CustomLogger
 
 logging.setLoggerClass(CustomLogger)
@@ -29,6 +32,9 @@ class PixivNovelDownloader:
     novel_url: PixivNovelURL  # ノベルURL
     save_directory_path: PixivNovelSaveDirectoryPath  # 保存ディレクトリベースパス
 
+    # DL済作品の台帳に記録する際のサイト名
+    SITE_NAME = PixivNovelURL.SITE_NAME
+
     def __post_init__(self) -> None:
         self._is_valid()
 
@@ -62,19 +68,21 @@ class PixivNovelDownloader:
         novel_id = self.novel_url.novel_id.id
 
         # ノベル詳細取得
+        rate_limiter.acquire(PIXIV_APP_API_HOST)
         works = self.aapi.novel_detail(novel_id)
         if works.error or (works.novel is None):
             raise ValueError("Download pixiv novel: " + url + " -> failed")
         work = works.novel
 
         # ノベルテキスト取得
+        rate_limiter.acquire(PIXIV_APP_API_HOST)
         work_text = self.aapi.novel_text(novel_id)
         if work_text.error or (work_text.novel_text is None):
             raise ValueError("Download pixiv novel: " + url + " -> failed")
 
         # 保存場所親ディレクトリ作成
         sd_path = self.save_directory_path.path
-        sd_path.parent.mkdir(parents=True, exist_ok=True)
+        AuthorDirectoryIndex.make_author_directory(sd_path.parent)
 
         # ファイル名取得
         ext = ".txt"
@@ -83,6 +91,7 @@ class PixivNovelDownloader:
         # 既に存在しているなら再DLしないでスキップ
         if (sd_path.parent / name).is_file():
             logger.info("Download pixiv novel: " + name + " -> exist")
+            download_manifest.commit(self.SITE_NAME, novel_id, sd_path.parent / name)
             return DownloadResult.PASSED
 
         # ノベル詳細から作者・キャプション等付与情報を取得する
@@ -101,10 +110,13 @@ class PixivNovelDownloader:
         # ノベルテキストの全文を保存する
         # 改ページは"[newpage]"の内部タグで表現される
         # self.aapi.download(url, path=str(sd_path.parent), name=name)
-        with (sd_path.parent / name).open("w", encoding="utf-8") as fout:
+        # 一時ファイルに書き込んでから、DL済作品の台帳への記録と同時に保存先へリネームする
+        part_path = sd_path.parent / f"{name}.part"
+        with part_path.open("w", encoding="utf-8") as fout:
             fout.write(info_tag + "\n")
             fout.write(caption + "\n")
             fout.write("[text]\n" + work_text.novel_text + "\n")
+        download_manifest.commit(self.SITE_NAME, novel_id, sd_path.parent / name, part_path)
 
         logger.info("Download pixiv novel: " + name + " -> done")
         return DownloadResult.SUCCESS
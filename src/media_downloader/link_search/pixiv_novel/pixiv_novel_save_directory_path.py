@@ -1,13 +1,16 @@
-import re
 from dataclasses import dataclass
 from pathlib import Path
 
 from pixivpy3 import AppPixivAPI
 
+from media_downloader.link_search.author_directory_index import AuthorDirectoryIndex
+from media_downloader.link_search.pixiv.pixiv_work_cache import is_auth_rejected
 from media_downloader.link_search.pixiv_novel.authorid import Authorid
 from media_downloader.link_search.pixiv_novel.authorname import Authorname
 from media_downloader.link_search.pixiv_novel.noveltitle import Noveltitle
 from media_downloader.link_search.pixiv_novel.pixiv_novel_url import PixivNovelURL
+from media_downloader.link_search.rate_limiter import PIXIV_APP_API_HOST, rate_limiter
+from media_downloader.link_search.session_registry import SessionRejectedError
 
 
 @dataclass(frozen=True)
@@ -35,6 +38,7 @@ class PixivNovelSaveDirectoryPath:
 
         Raises:
             ValueError: 非公式pixivAPI操作時エラー
+            SessionRejectedError: アクセストークンが拒否された場合
 
         Returns:
             PixivNovelSaveDirectoryPath: 保存先ディレクトリパス
@@ -44,7 +48,10 @@ class PixivNovelSaveDirectoryPath:
         novel_id = novel_url.novel_id.id
 
         # ノベル詳細取得
+        rate_limiter.acquire(PIXIV_APP_API_HOST)
         works = aapi.novel_detail(novel_id)
+        if is_auth_rejected(works):
+            raise SessionRejectedError("pixiv access token is rejected.")
         if works.error or (works.novel is None):
             raise ValueError("PixivNovelSaveDirectoryPath create failed.")
         work = works.novel
@@ -54,27 +61,10 @@ class PixivNovelSaveDirectoryPath:
         author_id = Authorid(int(work.user.id)).id
         novel_title = Noveltitle(work.title).title
 
-        # 既に{作者pixivID}が一致するディレクトリがあるか調べる
-        sd_path = ""
+        # 既に{作者pixivID}が一致するディレクトリがあれば使い、なければ新しく登録する
         save_path = Path(base_path)
-        filelist = []
-        filelist_tp = [(sp.stat().st_mtime, sp.name) for sp in save_path.glob("*") if sp.is_dir()]
-        for mtime, path in sorted(filelist_tp, reverse=True):
-            filelist.append(path)
-
-        regex = re.compile(r".*\(([0-9]*)\)$")
-        for dir_name in filelist:
-            result = regex.match(dir_name)
-            if result:
-                ai = result.group(1)
-                if ai == str(author_id):
-                    sd_path = f"./{dir_name}/{novel_title}({novel_id})/"
-                    break
-
-        if sd_path == "":
-            sd_path = f"./{author_name}({author_id})/{novel_title}({novel_id})/"
-
-        save_directory_path = save_path / sd_path
+        author_dir_name = AuthorDirectoryIndex.get(save_path).resolve(author_id, author_name)
+        save_directory_path = save_path / author_dir_name / f"{novel_title}({novel_id})"
         return PixivNovelSaveDirectoryPath(save_directory_path)
 
 
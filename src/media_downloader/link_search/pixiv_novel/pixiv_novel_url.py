@@ -4,6 +4,7 @@ from dataclasses import dataclass
 
 from media_downloader.link_search.pixiv_novel.novelid import Novelid
 from media_downloader.link_search.url import URL
+from media_downloader.link_search.work_key import WorkKey
 
 
 @dataclass
@@ -22,7 +23,11 @@ class PixivNovelURL:
 
     url: URL
 
-    PIXIV_NOVEL_URL_PATTERN = r"^https://www.pixiv.net/novel/show.php\?id=[0-9]+"
+    PIXIV_NOVEL_URL_PATTERN = re.compile(r"^https://www.pixiv.net/novel/show.php\?id=[0-9]+")
+    # PIXIV_NOVEL_URL_PATTERN に一致しうるホスト名
+    HOSTS = ("www.pixiv.net",)
+    # DL済作品の台帳や作品キーに使うサイト名
+    SITE_NAME = "pixiv_novel"
 
     def __post_init__(self) -> None:
         """初期化処理
@@ -42,6 +47,11 @@ class PixivNovelURL:
         novel_id_num = int(qs.get("id", [-1])[0])
         return Novelid(novel_id_num)
 
+    @property
+    def work_key(self) -> WorkKey:
+        """作品キーを返す"""
+        return WorkKey(self.SITE_NAME, self.novel_id.id)
+
     @property
     def non_query_url(self) -> str:
         """クエリなしURLを返す"""
@@ -67,7 +77,7 @@ class PixivNovelURL:
             bool: 引数がPixivNovelURL.PIXIV_NOVEL_URL_PATTERN パターンに則っているならばTrue,
                   そうでないならFalse
         """
-        return re.search(PixivNovelURL.PIXIV_NOVEL_URL_PATTERN, estimated_url) is not None
+        return PixivNovelURL.PIXIV_NOVEL_URL_PATTERN.search(estimated_url) is not None
 
     @classmethod
     def create(cls, url: str | URL) -> "PixivNovelURL":
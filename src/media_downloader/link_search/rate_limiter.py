@@ -0,0 +1,198 @@
+import asyncio
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass, field
+from typing import Mapping
+
+from media_downloader.link_search.url import URL
+
+# 非公式pixivAPIのホスト、AppPixivAPI経由のリクエスト前にこのホストのトークンを取得する
+PIXIV_APP_API_HOST = "app-api.pixiv.net"
+
+
+@dataclass
+class TokenBucket:
+    """トークンバケット
+
+    1リクエストにつき1トークンを消費する
+    トークンは rate [個/s] で補充され、最大 capacity 個まで貯まる
+    トークンが足りない場合は補充されるまで待機する
+
+    待機時間は取得時にロック内で予約するため、
+    複数スレッド、複数の非同期タスクから同時に使用しても rate を超えない
+    """
+
+    rate: float  # 1秒あたりのトークン補充数
+    capacity: float  # バケット容量（連続で許容するリクエスト数）
+    _tokens: float = field(init=False, repr=False)  # 現在のトークン数（負の場合は予約済の待ち）
+    _last_time: float = field(init=False, repr=False)  # 最後にトークンを補充した時刻
+    _lock: threading.Lock = field(init=False, repr=False, default_factory=threading.Lock)
+
+    def __post_init__(self) -> None:
+        if not isinstance(self.rate, int | float) or self.rate <= 0:
+            raise ValueError("rate must be positive number.")
+        if not isinstance(self.capacity, int | float) or self.capacity < 1:
+            raise ValueError("capacity must be greater than or equal to 1.")
+        self._tokens = float(self.capacity)
+        self._last_time = time.monotonic()
+
+    def _reserve(self) -> float:
+        """トークンを1つ予約し、使用可能になるまでの待機時間を返す
+
+        Returns:
+            float: 待機時間[s]、すぐに使用できる場合は0
+        """
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._last_time
+            self._tokens = min(float(self.capacity), self._tokens + elapsed * self.rate)
+            self._last_time = now
+            self._tokens -= 1.0
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self) -> float:
+        """トークンを1つ取得する、足りない場合は補充されるまでスレッドを待機させる
+
+        Returns:
+            float: 実際に待機した時間[s]
+        """
+        wait_time = self._reserve()
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+
+    async def acquire_async(self) -> float:
+        """トークンを1つ取得する、足りない場合は補充されるまでタスクを待機させる
+
+        Returns:
+            float: 実際に待機した時間[s]
+        """
+        wait_time = self._reserve()
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+        return wait_time
+
+
+class HostRateLimiter:
+    """ホストごとのレート制限
+
+    ホストごとにトークンバケットを持ち、同じホストへのリクエストは
+    どの作品、どのスレッドからのものでも同じバケットを共有する
+    設定のないホストは親ドメインの設定を探し、それもなければ default の設定を使う
+    """
+
+    # 設定のないホストに使用する (rate, capacity)
+    DEFAULT_SETTING = (2.0, 2.0)
+    # 既定のホストごとの (rate, capacity)
+    DEFAULT_HOST_SETTINGS = {
+        "i.pximg.net": (2.0, 4.0),
+        "app-api.pixiv.net": (1.0, 2.0),
+        "nijie.info": (1.0, 2.0),
+        "pic.nijie.net": (2.0, 4.0),
+        "seiga.nicovideo.jp": (1.0, 2.0),
+        "lohas.nicoseiga.jp": (2.0, 4.0),
+    }
+
+    def __init__(self) -> None:
+        self._default_setting: tuple[float, float] = self.DEFAULT_SETTING
+        self._host_settings: dict[str, tuple[float, float]] = dict(self.DEFAULT_HOST_SETTINGS)
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse_setting(cls, value: str) -> tuple[float, float]:
+        """設定値文字列を解析する
+
+        Args:
+            value (str): "{1秒あたりのリクエスト数}, {連続で許容するリクエスト数}" 形式の文字列
+
+        Returns:
+            tuple[float, float]: (rate, capacity)
+        """
+        rate_str, capacity_str = value.split(",")
+        rate, capacity = float(rate_str), float(capacity_str)
+        if rate <= 0 or capacity < 1:
+            raise ValueError(f"invalid rate limit setting: {value}.")
+        return (rate, capacity)
+
+    def configure(self, settings: Mapping[str, str]) -> None:
+        """レート制限の設定を反映する
+
+        config.ini の [rate_limit] セクションを想定している
+        設定を変更したホストのバケットは作り直す
+
+        Args:
+            settings (Mapping[str, str]): {ホスト名 or "default": "{rate}, {capacity}"}
+        """
+        with self._lock:
+            for host, value in settings.items():
+                setting = self.parse_setting(value)
+                if host == "default":
+                    self._default_setting = setting
+                else:
+                    self._host_settings[host.lower()] = setting
+            self._buckets.clear()
+
+    def _resolve_key(self, host: str) -> tuple[str, tuple[float, float]]:
+        """ホスト名から使用するバケットのキーと設定を決定する"""
+        labels = host.split(".")
+        for i in range(len(labels) - 1):
+            candidate = ".".join(labels[i:])
+            if candidate in self._host_settings:
+                return candidate, self._host_settings[candidate]
+        return host, self._default_setting
+
+    def get_bucket(self, url: str | URL) -> TokenBucket:
+        """url のホストに対応するバケットを返す
+
+        Args:
+            url (str | URL): リクエスト先url、またはホスト名
+
+        Returns:
+            TokenBucket: url のホストに対応するバケット
+        """
+        if isinstance(url, URL):
+            url = url.original_url
+        host = (urllib.parse.urlparse(url).hostname or url).lower()
+        with self._lock:
+            key, (rate, capacity) = self._resolve_key(host)
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(rate, capacity)
+            return self._buckets[key]
+
+    def acquire(self, url: str | URL) -> float:
+        """url のホストへのリクエストが許可されるまで待機する
+
+        Args:
+            url (str | URL): リクエスト先url、またはホスト名
+
+        Returns:
+            float: 実際に待機した時間[s]
+        """
+        return self.get_bucket(url).acquire()
+
+    async def acquire_async(self, url: str | URL) -> float:
+        """url のホストへのリクエストが許可されるまで非同期に待機する
+
+        Args:
+            url (str | URL): リクエスト先url、またはホスト名
+
+        Returns:
+            float: 実際に待機した時間[s]
+        """
+        return await self.get_bucket(url).acquire_async()
+
+
+# プロセス全体で共有するレート制限
+rate_limiter = HostRateLimiter()
+
+
+if __name__ == "__main__":
+    bucket = TokenBucket(rate=2.0, capacity=2)
+    start = time.monotonic()
+    for i in range(6):
+        bucket.acquire()
+        print(f"{i}: {time.monotonic() - start:.2f}s")
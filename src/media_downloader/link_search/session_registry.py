@@ -0,0 +1,176 @@
+import threading
+import time
+from typing import Any, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SessionRejectedError(Exception):
+    """認証済セッションがサーバーに拒否された（トークン失効、クッキー無効化など）ことを表す例外
+
+    各Fetcherはこの例外を受け取った場合、セッションを破棄してログインし直し、1回だけ再試行する
+    """
+
+    pass
+
+
+class SessionRegistry:
+    """サービスごとの認証済セッションの置き場
+
+    各Fetcherは生成時にはログインせず、担当URLを初めて fetch するときにここからセッションを取得する
+    同じキー（サービス名, ユーザーID）に対するログインはプロセス全体で1回のみ行い、
+    以降は同じセッションを共有する（pixiv と pixiv小説で同じ AppPixivAPI を使うなど）
+    GUIで実行ボタンを押すたびに LinkSearcher.create し直しても、セッションはここに残るため再ログインしない
+
+    ログイン時に有効期限が分かる場合は合わせて保持し、期限が近づいたものは次回取得時にログインし直す
+    ログインに失敗した場合は何も保持せず、次回取得時に再度ログインを試みる
+    破棄したセッションが close() を持つ場合は呼び出し、専有している接続を閉じる
+    """
+
+    # 有効期限のこの秒数前から期限切れとして扱う
+    EXPIRY_MARGIN = 60.0
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # キー -> (認証済セッション, 有効期限（UNIX時間）、期限が無い場合None)
+        self._sessions: dict[Hashable, tuple[Any, float | None]] = {}
+        # キーごとのロック、別サービスのログインを待たせないようにする
+        self._key_locks: dict[Hashable, threading.Lock] = {}
+
+    def _key_lock(self, key: Hashable) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    @staticmethod
+    def _close(session: Any) -> None:
+        """破棄したセッションが close() を持つ場合は呼び出す"""
+        close = getattr(session, "close", None)
+        if callable(close):
+            close()
+
+    def _get_alive(self, key: Hashable) -> tuple[Any, float | None] | None:
+        """有効期限内の認証済セッションを返す、期限切れのものは破棄する"""
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                return None
+            session, expires_at = entry
+            if expires_at is None or time.time() < expires_at - self.EXPIRY_MARGIN:
+                return entry
+            del self._sessions[key]
+        self._close(session)
+        return None
+
+    def get(self, key: Hashable, login: Callable[[], T], expires_at: Callable[[T], float | None] | None = None) -> T:
+        """key に対応する認証済セッションを返す、無いか期限切れならば login を呼び出してログインする
+
+        複数スレッドから同時に呼び出された場合も login は1回のみ呼び出される
+
+        Args:
+            key (Hashable): セッションを識別するキー、(サービス名, ユーザーID) を想定
+            login (Callable[[], T]): ログインして認証済セッションを返す関数
+            expires_at (Callable[[T], float | None] | None):
+                ログイン直後に呼び出し、セッションの有効期限（UNIX時間）を返す関数
+                Noneの場合、または関数がNoneを返した場合は期限なしとして扱う
+
+        Returns:
+            T: 認証済セッション
+        """
+        entry = self._get_alive(key)
+        if entry is not None:
+            return entry[0]
+        with self._key_lock(key):
+            entry = self._get_alive(key)
+            if entry is not None:
+                return entry[0]
+            session = login()
+            session_expires_at = expires_at(session) if expires_at else None
+            with self._lock:
+                self._sessions[key] = (session, session_expires_at)
+            return session
+
+    def expires_at(self, key: Hashable) -> float | None:
+        """key に対応する認証済セッションの有効期限を返す
+
+        Args:
+            key (Hashable): セッションを識別するキー
+
+        Returns:
+            float | None: 有効期限（UNIX時間）、期限が無い場合や保持していない場合None
+        """
+        entry = self._get_alive(key)
+        return entry[1] if entry else None
+
+    def is_logged_in(self, key: Hashable) -> bool:
+        """key に対応する有効期限内の認証済セッションを保持しているか
+
+        Args:
+            key (Hashable): セッションを識別するキー
+
+        Returns:
+            bool: 保持している場合True
+        """
+        return self._get_alive(key) is not None
+
+    def discard(self, key: Hashable, session: Any = None) -> None:
+        """key に対応する認証済セッションを破棄する、次回取得時に再度ログインする
+
+        session を指定した場合は、保持しているものが session と同一の場合のみ破棄する
+        複数スレッドで同時に拒否された場合に、他スレッドがログインし直したセッションまで破棄しないようにする
+
+        Args:
+            key (Hashable): セッションを識別するキー
+            session (Any): 拒否されたセッション、Noneの場合は無条件に破棄する
+        """
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                return
+            if session is not None and entry[0] is not session:
+                return
+            del self._sessions[key]
+        self._close(entry[0])
+
+    def replace(self, key: Hashable, session: Any, new_session: Any) -> None:
+        """key に対応する認証済セッションを差し替える、有効期限は引き継ぐ
+
+        保持しているものが session と同一の場合のみ差し替える
+
+        Args:
+            key (Hashable): セッションを識別するキー
+            session (Any): 差し替え前のセッション
+            new_session (Any): 差し替え後のセッション
+        """
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None or entry[0] is not session:
+                return
+            self._sessions[key] = (new_session, entry[1])
+
+    def clear(self) -> None:
+        """保持しているすべての認証済セッションを破棄する"""
+        with self._lock:
+            sessions = [session for session, _ in self._sessions.values()]
+            self._sessions.clear()
+        for session in sessions:
+            self._close(session)
+
+
+# プロセス全体で共有する認証済セッションの置き場
+session_registry = SessionRegistry()
+
+
+if __name__ == "__main__":
+
+    def login() -> str:
+        print("login called")
+        time.sleep(1)
+        return "session"
+
+    threads = [
+        threading.Thread(target=lambda: print(session_registry.get(("dummy", "user"), login))) for _ in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
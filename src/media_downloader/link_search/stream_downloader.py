@@ -0,0 +1,314 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+import httpx
+import orjson
+
+from media_downloader.link_search.download_progress import DownloadCancelledError, download_progress
+from media_downloader.link_search.http_client_pool import http_client_pool
+from media_downloader.link_search.rate_limiter import rate_limiter
+from media_downloader.link_search.url import URL
+
+
+@dataclass(frozen=True)
+class StreamDownloader:
+    """ストリーミングでファイルをDLするクラス
+
+    レスポンス全体をメモリに載せず、チャンクごとに一時ファイル（{保存先}.part）に書き込む
+    DLが完了したら一時ファイルを保存先パスにリネームするため、
+    途中で失敗しても保存先パスに壊れたファイルが残ることはない
+
+    通信が途中で切れた場合は一時ファイルと進捗情報（{保存先}.part.json）を残しておき、
+    次回同じ保存先にDLする際に Range リクエストで続きから再開する
+    サーバーが Range に対応していない、またはファイルが更新されていた場合は最初からDLし直す
+    受信したバイト数は download_progress に記録し、DLの取り消しが要求された場合も続きから再開できるように中断する
+    """
+
+    session: httpx.Client  # DLに使うセッション
+
+    # 1回に読み込むチャンクサイズ[byte]
+    CHUNK_SIZE = 64 * 1024
+    # 拡張子判別に使う先頭のバイト数
+    HEAD_SIZE = 8
+    # 一時ファイルの拡張子
+    PART_SUFFIX = ".part"
+    # 進捗情報ファイルの拡張子
+    META_SUFFIX = ".part.json"
+
+    def __post_init__(self) -> None:
+        self._is_valid()
+
+    def _is_valid(self) -> bool:
+        if not isinstance(self.session, httpx.Client):
+            raise TypeError("session is not httpx.Client.")
+        return True
+
+    @classmethod
+    def part_path(cls, save_path: Path) -> Path:
+        """save_path に対応する一時ファイルのパスを返す
+
+        Args:
+            save_path (Path): 保存先パス
+
+        Returns:
+            Path: 一時ファイルのパス、save_path と同じディレクトリに作成する
+        """
+        return save_path.with_name(save_path.name + cls.PART_SUFFIX)
+
+    @classmethod
+    def meta_path(cls, save_path: Path) -> Path:
+        """save_path に対応する進捗情報ファイルのパスを返す
+
+        Args:
+            save_path (Path): 保存先パス
+
+        Returns:
+            Path: 進捗情報ファイルのパス、save_path と同じディレクトリに作成する
+        """
+        return save_path.with_name(save_path.name + cls.META_SUFFIX)
+
+    @classmethod
+    def _load_meta(cls, save_path: Path, url: str) -> dict | None:
+        """再開可能な進捗情報を読み込む
+
+        Args:
+            save_path (Path): 保存先パス
+            url (str): DL対象のurl
+
+        Returns:
+            dict | None: 進捗情報、再開できない場合None
+        """
+        part_path, meta_path = cls.part_path(save_path), cls.meta_path(save_path)
+        if not (part_path.is_file() and meta_path.is_file()):
+            return None
+        try:
+            meta = orjson.loads(meta_path.read_bytes())
+        except orjson.JSONDecodeError:
+            return None
+        if not isinstance(meta, dict) or meta.get("url") != url:
+            return None
+        return meta
+
+    @classmethod
+    def _discard(cls, save_path: Path) -> None:
+        """一時ファイルと進捗情報を削除する"""
+        cls.part_path(save_path).unlink(missing_ok=True)
+        cls.meta_path(save_path).unlink(missing_ok=True)
+
+    @classmethod
+    def _total_length(cls, response: httpx.Response) -> int | None:
+        """レスポンスからファイル全体のサイズを取得する
+
+        Args:
+            response (httpx.Response): レスポンス
+
+        Returns:
+            int | None: ファイル全体のサイズ[byte]、不明な場合None
+        """
+        if response.headers.get("Content-Encoding", "identity") != "identity":
+            # 圧縮転送の場合は Content-Length と展開後のサイズが一致しない
+            return None
+        if response.status_code == httpx.codes.PARTIAL_CONTENT:
+            # Content-Range: bytes {開始}-{終了}/{全体サイズ}
+            total = response.headers.get("Content-Range", "").rsplit("/", 1)[-1]
+            return int(total) if total.isdecimal() else None
+        length = response.headers.get("Content-Length", "")
+        return int(length) if length.isdecimal() else None
+
+    @classmethod
+    def _range_start(cls, response: httpx.Response) -> int | None:
+        """206レスポンスの Content-Range から開始位置を取得する"""
+        content_range = response.headers.get("Content-Range", "")
+        if not content_range.startswith("bytes "):
+            return None
+        start = content_range.removeprefix("bytes ").split("-", 1)[0]
+        return int(start) if start.isdecimal() else None
+
+    def download(
+        self,
+        url: str | URL,
+        save_path: Path,
+        headers: dict | None = None,
+        cookies: dict | None = None,
+        suffix_resolver: Callable[[bytes], str] | None = None,
+        resume: bool = True,
+        commit: Callable[[Path, Path], None] | None = None,
+    ) -> Path:
+        """url の内容をDLして save_path に保存する
+
+        Args:
+            url (str | URL): DL対象のurl
+            save_path (Path): 保存先パス
+            headers (dict | None): リクエストに使うヘッダー
+            cookies (dict | None): リクエストに使うクッキー
+            suffix_resolver (Callable[[bytes], str] | None):
+                先頭 HEAD_SIZE バイトから拡張子を決める関数
+                指定した場合、保存先パスは save_path の末尾に拡張子を付与したものになる
+            resume (bool): 前回中断したDLがあれば続きから再開するか
+            commit (Callable[[Path, Path], None] | None):
+                一時ファイルを保存先に確定させる関数、(一時ファイル, 保存先) を受け取る
+                Noneの場合は os.replace でリネームする
+
+        Returns:
+            Path: 実際に保存したパス
+        """
+        if isinstance(url, URL):
+            url = url.original_url
+        if not isinstance(save_path, Path):
+            raise TypeError("save_path is not Path.")
+
+        part_path = self.part_path(save_path)
+        offset, request_headers = self._prepare(url, save_path, headers, resume)
+
+        total = None
+        try:
+            rate_limiter.acquire(url)
+            # HTTP/2 で多重化している場合も、同じホストへの同時DL数は上限までに抑える
+            with (
+                http_client_pool.slot(url),
+                self.session.stream("GET", url, headers=request_headers, cookies=cookies) as response,
+            ):
+                if offset > 0 and response.status_code == httpx.codes.REQUESTED_RANGE_NOT_SATISFIABLE:
+                    # 一時ファイルがサーバー上のファイルと一致しない
+                    restart = True
+                else:
+                    restart = False
+                    mode, total = self._start(url, save_path, offset, response)
+                    with part_path.open(mode=mode) as fout:
+                        for chunk in response.iter_bytes(self.CHUNK_SIZE):
+                            fout.write(chunk)
+                            download_progress.add_bytes(len(chunk))
+                            download_progress.raise_if_cancelled()
+        except (httpx.TransportError, DownloadCancelledError):
+            # 通信が途中で切れた場合、DLが取り消された場合は続きから再開できるように残しておく
+            if not resume:
+                self._discard(save_path)
+            raise
+        except Exception:
+            self._discard(save_path)
+            raise
+
+        if restart:
+            self._discard(save_path)
+            return self.download(url, save_path, headers, cookies, suffix_resolver, resume=False, commit=commit)
+
+        return self._finish(url, save_path, total, suffix_resolver, resume, commit)
+
+    @classmethod
+    def _prepare(cls, url: str, save_path: Path, headers: dict | None, resume: bool) -> tuple[int, dict]:
+        """前回中断したDLの進捗情報を確認し、リクエストに使うヘッダーを作成する
+
+        再開できない場合は一時ファイルと進捗情報を削除する
+
+        Args:
+            url (str): DL対象のurl
+            save_path (Path): 保存先パス
+            headers (dict | None): リクエストに使うヘッダー
+            resume (bool): 前回中断したDLがあれば続きから再開するか
+
+        Returns:
+            tuple[int, dict]: (再開位置[byte], リクエストに使うヘッダー)
+        """
+        meta = cls._load_meta(save_path, url) if resume else None
+        if meta is None:
+            cls._discard(save_path)
+        offset = cls.part_path(save_path).stat().st_size if meta else 0
+
+        request_headers = dict(headers or {})
+        if offset > 0:
+            request_headers["Range"] = f"bytes={offset}-"
+            # 前回から更新されていた場合はサーバーが全体を返す
+            validator = meta.get("etag") or meta.get("last_modified")
+            if validator:
+                request_headers["If-Range"] = validator
+        return offset, request_headers
+
+    @classmethod
+    def _start(cls, url: str, save_path: Path, offset: int, response: httpx.Response) -> tuple[str, int | None]:
+        """レスポンスを確認し、一時ファイルへの書き込みを始める前に進捗情報を保存する
+
+        Args:
+            url (str): DL対象のurl
+            save_path (Path): 保存先パス
+            offset (int): 再開位置[byte]
+            response (httpx.Response): レスポンス
+
+        Returns:
+            tuple[str, int | None]: (一時ファイルを開くモード, ファイル全体のサイズ[byte]、不明な場合None)
+        """
+        response.raise_for_status()
+        if response.status_code == httpx.codes.PARTIAL_CONTENT and offset > 0:
+            if cls._range_start(response) != offset:
+                raise ValueError(f"unexpected Content-Range: {response.headers.get('Content-Range')}.")
+            mode = "ab"
+        else:
+            # Range 非対応、またはファイルが更新されていたため最初から
+            mode = "wb"
+        total = cls._total_length(response)
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_length": total,
+        }
+        cls.meta_path(save_path).write_bytes(orjson.dumps(meta))
+        return mode, total
+
+    @classmethod
+    def _finish(
+        cls,
+        url: str,
+        save_path: Path,
+        total: int | None,
+        suffix_resolver: Callable[[bytes], str] | None,
+        resume: bool,
+        commit: Callable[[Path, Path], None] | None,
+    ) -> Path:
+        """一時ファイルが全体サイズと一致するか確認し、保存先に確定させる
+
+        Args:
+            url (str): DL対象のurl
+            save_path (Path): 保存先パス
+            total (int | None): ファイル全体のサイズ[byte]、不明な場合None
+            suffix_resolver (Callable[[bytes], str] | None): 先頭 HEAD_SIZE バイトから拡張子を決める関数
+            resume (bool): 前回中断したDLがあれば続きから再開するか
+            commit (Callable[[Path, Path], None] | None): 一時ファイルを保存先に確定させる関数
+
+        Returns:
+            Path: 実際に保存したパス
+        """
+        part_path = cls.part_path(save_path)
+
+        # 全体サイズと一致するか確認する
+        size = part_path.stat().st_size
+        if total is not None and size != total:
+            if size > total or not resume:
+                cls._discard(save_path)
+            raise ValueError(f"download incomplete: {size}/{total} bytes, {url}.")
+
+        try:
+            final_path = save_path
+            if suffix_resolver:
+                with part_path.open(mode="rb") as fin:
+                    head = fin.read(cls.HEAD_SIZE)
+                final_path = save_path.with_name(save_path.name + suffix_resolver(head))
+            (commit or os.replace)(part_path, final_path)
+        except Exception:
+            cls._discard(save_path)
+            raise
+        cls.meta_path(save_path).unlink(missing_ok=True)
+        return final_path
+
+
+if __name__ == "__main__":
+    from media_downloader.link_search.nico_seiga.illust_extension import IllustExtension
+
+    url = "https://www.python.org/static/img/python-logo.png"
+    session = httpx.Client(follow_redirects=True, timeout=60.0)
+    save_path = StreamDownloader(session).download(
+        url, Path("./python-logo"), suffix_resolver=lambda head: IllustExtension.create(head).extension
+    )
+    print(save_path)
+    save_path.unlink()
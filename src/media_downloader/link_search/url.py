@@ -22,7 +22,7 @@ class URL:
     non_query_url: str  # クエリなしURL
     original_url: ClassVar[str]  # もとのURL
 
-    URL_PATTERN = r"^https?://[a-zA-Z0-9_/:%#$&\?\(\)~\.=\+\-]+"
+    URL_PATTERN = re.compile(r"^https?://[a-zA-Z0-9_/:%#$&\?\(\)~\.=\+\-]+")
 
     def __init__(self, url: "str | URL") -> None:
         """初期化処理
@@ -57,7 +57,7 @@ class URL:
             bool: 引数がURL.URL_PATTERN パターンに則っているならばTrue,
                   そうでないならFalse
         """
-        return re.search(URL.URL_PATTERN, estimated_url) is not None
+        return URL.URL_PATTERN.search(estimated_url) is not None
 
 
 if __name__ == "__main__":
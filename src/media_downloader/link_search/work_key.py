@@ -0,0 +1,34 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class WorkKey:
+    """作品を一意に識別するキー
+
+    同じ作品を指す別の形式のURL（nijie の view.php と view_popup.php、
+    ニコニコ静画の seiga.nicovideo.jp と nico.ms など）から同じキーを作る
+    各サイトのURLクラスの work_key から取得する
+    """
+
+    site: str  # サイト名、DL済作品の台帳に記録するサイト名と同じ
+    work_id: int  # 作品ID
+
+    def __post_init__(self) -> None:
+        """初期化処理
+
+        バリデーションのみ
+        """
+        self._is_valid()
+
+    def _is_valid(self) -> bool:
+        if not isinstance(self.site, str):
+            raise TypeError("site must be str.")
+        if not isinstance(self.work_id, int):
+            raise TypeError("work_id must be int.")
+        if self.site == "":
+            raise ValueError("site must not be empty.")
+        return True
+
+
+if __name__ == "__main__":
+    print(WorkKey("nijie", 251267) == WorkKey("nijie", 251267))
@@ -0,0 +1,156 @@
+import re
+from dataclasses import dataclass
+from typing import ClassVar, Iterable, Iterator, TextIO
+
+from media_downloader.link_search.nico_seiga.nico_seiga_url import NicoSeigaURL
+from media_downloader.link_search.nijie.nijie_url import NijieURL
+from media_downloader.link_search.pixiv.pixiv_work_url import PixivWorkURL
+from media_downloader.link_search.pixiv_novel.pixiv_novel_url import PixivNovelURL
+from media_downloader.link_search.work_key import WorkKey
+
+
+@dataclass(frozen=True)
+class ExtractedWorkURL:
+    """テキストから抽出した作品ページURL"""
+
+    site: str  # サイト名、WorkURLExtractor.SITES のキー
+    work_id: int  # 作品ID
+    url: str  # 正規化した作品ページURL
+
+    @property
+    def work_key(self) -> WorkKey:
+        """作品キーを返す、url を各サイトのURLクラスで解釈した場合と同じ"""
+        return WorkKey(self.site, self.work_id)
+
+    def __post_init__(self) -> None:
+        """初期化処理
+
+        バリデーションのみ
+        """
+        self._is_valid()
+
+    def _is_valid(self) -> bool:
+        if self.site not in WorkURLExtractor.SITES:
+            raise ValueError(f"site must be one of {list(WorkURLExtractor.SITES)}.")
+        if not isinstance(self.work_id, int):
+            raise TypeError("work_id must be int.")
+        if not isinstance(self.url, str):
+            raise TypeError("url must be str.")
+        return True
+
+
+class WorkURLExtractor:
+    """任意のテキストから対応サイトの作品ページURLを抽出するクラス
+
+    HTML、ブラウザのブックマークのエクスポート、チャットログなど形式を問わず、
+    PixivWorkURL, PixivNovelURL, NijieURL, NicoSeigaURL が受け入れる作品ページURLを探す
+    見つけたURLは作品キー（WorkKey）ごとに1つにまとめ、各サイトの正規の作品ページURLにして初出順に返す
+    （nijie の view.php と view_popup.php、ニコニコ静画の seiga.nicovideo.jp と nico.ms は同じ作品として扱う）
+
+    入力は chunk_size 文字ずつ読み込んで走査するため、改行の無い巨大なファイルでもメモリに全体を読み込まない
+    チャンクの境界をまたぐURLを取りこぼさないよう、各チャンクの末尾 OVERLAP 文字は次のチャンクと合わせて走査する
+    """
+
+    # 1回に読み込む文字数
+    DEFAULT_CHUNK_SIZE = 1024 * 1024
+    # 次のチャンクと合わせて走査する末尾の文字数、抽出対象のURLの最大長より十分長くする
+    OVERLAP = 256
+
+    # サイト名 -> (正規の作品ページURLの書式, 受け入れるURLクラス)
+    SITES: ClassVar[dict[str, tuple[str, type]]] = {
+        PixivWorkURL.SITE_NAME: ("https://www.pixiv.net/artworks/{}", PixivWorkURL),
+        PixivNovelURL.SITE_NAME: ("https://www.pixiv.net/novel/show.php?id={}", PixivNovelURL),
+        NijieURL.SITE_NAME: ("https://nijie.info/view.php?id={}", NijieURL),
+        NicoSeigaURL.SITE_NAME: ("https://seiga.nicovideo.jp/seiga/im{}", NicoSeigaURL),
+    }
+    # 作品ページURLのパターン、グループ名はサイト名、グループの値は作品ID
+    # 各URLクラスのパターンが受け入れるURLの先頭部分と一致する
+    # 一致した箇所は各URLクラスの is_valid でも確認し、URLクラスが受け入れないものは抽出しない
+    WORK_URL_PATTERN = re.compile(
+        r"https://www\.pixiv\.net/artworks/(?P<pixiv>[0-9]+)"
+        r"|https://www\.pixiv\.net/novel/show\.php\?id=(?P<pixiv_novel>[0-9]+)"
+        r"|https?://nijie\.info/view(?:_popup)?\.php\?id=(?P<nijie>[0-9]+)"
+        r"|(?:https://seiga\.nicovideo\.jp/seiga/|http://nico\.ms/)im(?P<nico_seiga>[0-9]+)"
+    )
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """初期化処理
+
+        Args:
+            chunk_size (int): 1回に読み込む文字数
+        """
+        if not isinstance(chunk_size, int) or chunk_size < 1:
+            raise ValueError("chunk_size must be positive int.")
+        self.chunk_size = chunk_size
+
+    def extract(self, chunks: Iterable[str]) -> Iterator[ExtractedWorkURL]:
+        """テキストから作品ページURLを抽出する
+
+        Args:
+            chunks (Iterable[str]): 抽出対象のテキストを順に分割したもの、分割位置は問わない
+
+        Yields:
+            ExtractedWorkURL: 抽出した作品ページURL、作品キーごとに初出の1つのみ
+        """
+        seen: set[WorkKey] = set()
+        carry = ""
+        for chunk in chunks:
+            buffer = carry + chunk
+            # 末尾 OVERLAP 文字にかかるURLは続きがある可能性があるため、次のチャンクと合わせて走査する
+            safe_end = len(buffer) - self.OVERLAP
+            carry_start = max(safe_end, 0)
+            for m in self.WORK_URL_PATTERN.finditer(buffer):
+                if m.end() > safe_end:
+                    carry_start = min(m.start(), carry_start)
+                    break
+                carry_start = max(m.end(), carry_start)
+                yield from self._dedup(m, seen)
+            carry = buffer[carry_start:]
+        for m in self.WORK_URL_PATTERN.finditer(carry):
+            yield from self._dedup(m, seen)
+
+    def extract_file(self, fin: TextIO) -> Iterator[ExtractedWorkURL]:
+        """ファイルから chunk_size 文字ずつ読み込んで作品ページURLを抽出する
+
+        Args:
+            fin (TextIO): 抽出対象のテキストファイル
+
+        Yields:
+            ExtractedWorkURL: 抽出した作品ページURL、作品キーごとに初出の1つのみ
+        """
+        return self.extract(iter(lambda: fin.read(self.chunk_size), ""))
+
+    def _dedup(self, m: re.Match, seen: set[WorkKey]) -> Iterator[ExtractedWorkURL]:
+        """パターンに一致した箇所から作品ページURLを作る
+
+        URLクラスが受け入れないURLと、既出の作品の場合は何も返さない
+
+        Args:
+            m (re.Match): WORK_URL_PATTERN に一致した箇所
+            seen (set[WorkKey]): 既出の作品キー、返した作品を追加する
+
+        Yields:
+            ExtractedWorkURL: 抽出した作品ページURL
+        """
+        site = m.lastgroup
+        url_format, url_class = self.SITES[site]
+        if not url_class.is_valid(m.group(0)):
+            return
+        work_key = WorkKey(site, int(m.group(site)))
+        if work_key in seen:
+            return
+        seen.add(work_key)
+        yield ExtractedWorkURL(site, work_key.work_id, url_format.format(work_key.work_id))
+
+
+if __name__ == "__main__":
+    import io
+
+    text = """
+    <DT><A HREF="https://www.pixiv.net/artworks/86704541?p=1" ADD_DATE="1">作品1</A>
+    [12:00] user: これ見て http://nijie.info/view_popup.php?id=251267 と https://nijie.info/view.php?id=251267
+    {"uri": "https://seiga.nicovideo.jp/seiga/im5360137", "title": "作品3"} (http://nico.ms/im5360137)
+    https://www.pixiv.net/novel/show.php?id=17668373&amp;mode=cover
+    """
+    for extracted in WorkURLExtractor(chunk_size=16).extract_file(io.StringIO(text)):
+        print(extracted)
@@ -9,3 +9,6 @@ class MSG(enum.Enum):
     LINKSEARCHER_CREATE_DONE = "LinkSearcher each fetcher registering -> done"
     LINKSEARCHER_REGISTERED = "LinkSearcher {} -> registered."
     LINKSEARCHER_FETCHER_FOUND = "{} -> Fetcher found: {}."
+    LINKSEARCHER_FETCHER_NOT_FOUND = "{} -> Fetcher not found."
+    LINKSEARCHER_FETCH_FAILED = "{} -> Fetch failed: {}."
+    LINKSEARCHER_FETCH_MANY_DONE = "LinkSearcher fetch_many -> done ({} urls, {} failed, {:.2f}s)."
@@ -2,9 +2,9 @@ from enum import Enum, auto
 from logging import Logger
 from typing import Any
 
-from TkEasyGUI import Multiline, Window
+from TkEasyGUI import Window
 
-window_cache: Window = None
+from media_downloader.gui_log_sink import gui_log_sink
 
 
 class CustomLogger(Logger):
@@ -16,24 +16,12 @@ class CustomLogger(Logger):
         super().info(msg, *args, **kwargs)
 
         # GUI画面表示
-        global window_cache
-        if window:
-            # windowが指定されていたらキャッシュとして保存
-            if not window_cache:
-                window_cache = window
-        else:
-            # windowが指定されていない場合
-            if window_cache:
-                # キャッシュがあるならそれを採用
-                window = window_cache
-            else:
-                # そうでない場合、画面更新は何もせず終了
-                return
-        multiline: Multiline = window["-OUTPUT-"]
-        old_text = multiline.get_text()
-        multiline.set_text(old_text + msg + "\n")
-        multiline.update()
-        window.refresh()
+        if window and not gui_log_sink.is_attached:
+            # windowが指定されていたらログ表示欄として設定
+            gui_log_sink.attach(window)
+        # ログ表示欄が設定されていない場合は何もしない
+        # 画面への追記は gui_log_sink が一定間隔でまとめて行うため、どのスレッドから呼び出してもよい
+        gui_log_sink.write(msg)
 
 
 class Result(Enum):
@@ -0,0 +1,97 @@
+"""AsyncNicoSeigaFetcher のテスト"""
+
+import sys
+import unittest
+from pathlib import Path
+
+from mock import AsyncMock, MagicMock, patch
+
+from media_downloader.link_search.nico_seiga.async_nico_seiga_fetcher import AsyncNicoSeigaFetcher
+from media_downloader.link_search.nico_seiga.nico_seiga_downloader import DownloadResult
+from media_downloader.link_search.nico_seiga.nico_seiga_fetcher import NicoSeigaFetcher
+from media_downloader.link_search.nico_seiga.nico_seiga_url import NicoSeigaURL
+from media_downloader.link_search.password import Password
+from media_downloader.link_search.session_registry import SessionRejectedError
+from media_downloader.link_search.url import URL
+from media_downloader.link_search.username import Username
+
+
+class TestAsyncNicoSeigaFetcher(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.username = Username("ユーザー1_ID")
+        self.password = Password("ユーザー1_PW")
+        self.base_path = Path("./tests/link_search/nico_seiga")
+
+    def test_AsyncNicoSeigaFetcher(self):
+        actual = AsyncNicoSeigaFetcher(self.username, self.password, self.base_path)
+        self.assertEqual(self.username, actual.username)
+        self.assertEqual(self.password, actual.password)
+        self.assertEqual(self.base_path, actual.base_path)
+        self.assertNotIn(self.password.password, repr(actual))
+        self.assertIsInstance(actual.fetcher, NicoSeigaFetcher)
+
+        # 同期版の Fetcher から生成
+        actual = AsyncNicoSeigaFetcher.from_fetcher(NicoSeigaFetcher(self.username, self.password, self.base_path))
+        self.assertEqual(self.username, actual.username)
+        self.assertEqual(self.base_path, actual.base_path)
+
+        with self.assertRaises(TypeError):
+            actual = AsyncNicoSeigaFetcher.from_fetcher("invalid argument")
+
+    async def test_is_target_url(self):
+        fetcher = AsyncNicoSeigaFetcher(self.username, self.password, self.base_path)
+        actual = await fetcher.is_target_url(URL("https://seiga.nicovideo.jp/seiga/im5360137?query=1"))
+        self.assertTrue(actual)
+        actual = await fetcher.is_target_url(URL("https://invalid.url/seiga/im5360137"))
+        self.assertFalse(actual)
+
+    async def test_fetch(self):
+        mock_manifest = self.enterContext(
+            patch("media_downloader.link_search.nico_seiga.async_nico_seiga_fetcher.download_manifest")
+        )
+        mock_registry = self.enterContext(
+            patch("media_downloader.link_search.nico_seiga.async_nico_seiga_fetcher.session_registry")
+        )
+        mock_downloader = self.enterContext(
+            patch("media_downloader.link_search.nico_seiga.async_nico_seiga_fetcher.AsyncNicoSeigaDownloader")
+        )
+        mock_get_session = self.enterContext(patch.object(AsyncNicoSeigaFetcher, "get_session", AsyncMock()))
+        fetcher = AsyncNicoSeigaFetcher(self.username, self.password, self.base_path)
+        url = "https://seiga.nicovideo.jp/seiga/im5360137?query=1"
+        nicoseiga_url = NicoSeigaURL.create(url)
+
+        # DL済作品の台帳に記録がある
+        mock_manifest.get.return_value = MagicMock()
+        actual = await fetcher.fetch(url)
+        self.assertEqual(DownloadResult.PASSED, actual)
+        mock_get_session.assert_not_awaited()
+        mock_manifest.get.return_value = None
+
+        # 正常系
+        session = MagicMock()
+        mock_get_session.return_value = session
+        mock_downloader.return_value.download = AsyncMock(return_value=DownloadResult.SUCCESS)
+        actual = await fetcher.fetch(url)
+        self.assertEqual(DownloadResult.SUCCESS, actual)
+        mock_downloader.assert_called_once_with(nicoseiga_url, self.base_path, session)
+        mock_registry.discard.assert_not_called()
+
+        # ログイン状態が切れていたら一度だけログインし直して再試行する
+        rejected_session = MagicMock()
+        rejected_session.session.aclose = AsyncMock()
+        new_session = MagicMock()
+        mock_get_session.side_effect = [rejected_session, new_session]
+        mock_downloader.return_value.download = AsyncMock(
+            side_effect=[SessionRejectedError("rejected"), DownloadResult.SUCCESS]
+        )
+        actual = await fetcher.fetch(url)
+        self.assertEqual(DownloadResult.SUCCESS, actual)
+        mock_registry.discard.assert_called_once_with(fetcher.fetcher.session_key, rejected_session.session)
+        rejected_session.session.aclose.assert_awaited_once_with()
+        self.assertEqual(new_session, mock_downloader.call_args.args[2])
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
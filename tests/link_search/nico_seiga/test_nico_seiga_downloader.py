@@ -9,8 +9,9 @@ import unittest
 from contextlib import ExitStack
 from pathlib import Path
 
-from mock import MagicMock, patch
+from mock import ANY, MagicMock, patch
 
+from media_downloader.link_search.author_directory_index import AuthorDirectoryIndex
 from media_downloader.link_search.nico_seiga.authorid import Authorid
 from media_downloader.link_search.nico_seiga.authorname import Authorname
 from media_downloader.link_search.nico_seiga.illustname import Illustname
@@ -26,7 +27,8 @@ class TestNicoSeigaDownloader(unittest.TestCase):
         self.TBP = Path("./tests")
 
     def tearDown(self):
-        pass
+        (self.TBP / AuthorDirectoryIndex.INDEX_FILE_NAME).unlink(missing_ok=True)
+        AuthorDirectoryIndex.reset()
 
     def test_DownloadResult(self):
         expect = ["SUCCESS", "PASSED"]
@@ -94,11 +96,17 @@ class TestNicoSeigaDownloader(unittest.TestCase):
         save_directory_path = NicoSeigaSaveDirectoryPath.create(illust_info, base_path)
 
         session = MagicMock()
-        session.get_author_id.side_effect = lambda id: author_id
-        session.get_illust_title.side_effect = lambda id: illust_name
-        session.get_author_name.side_effect = lambda id: author_name
+        session.get_illust_info.side_effect = lambda id: illust_info
         session.get_source_url.side_effect = lambda id: None
-        session.get_illust_binary.side_effect = lambda url: b"\x89\x50\x4e\x47\x0d\x0a\x1a\x0a"
+
+        def download_illust(source_url, save_path, commit):
+            part_path = save_path.with_name(save_path.name + ".part")
+            part_path.write_bytes(b"\x89\x50\x4e\x47\x0d\x0a\x1a\x0a")
+            save_path = save_path.with_name(save_path.name + ".png")
+            commit(part_path, save_path)
+            return save_path
+
+        session.download_illust.side_effect = download_illust
         with ExitStack() as stack:
             m_is_valid = stack.enter_context(
                 patch("media_downloader.link_search.nico_seiga.nico_seiga_downloader.NicoSeigaDownloader._is_valid")
@@ -112,6 +120,8 @@ class TestNicoSeigaDownloader(unittest.TestCase):
             expect = DownloadResult.SUCCESS
             actual = downloader.download()
             self.assertEqual(expect, actual)
+            session.download_illust.assert_called_once_with(None, save_directory_path.path, commit=ANY)
+            self.assertTrue(save_directory_path.path.with_name(save_directory_path.path.name + ".png").is_file())
 
             # 2回目DL想定
             expect = DownloadResult.PASSED
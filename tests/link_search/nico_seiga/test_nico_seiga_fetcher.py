@@ -9,17 +9,18 @@ import unittest
 from contextlib import ExitStack
 from pathlib import Path
 
-from mock import MagicMock, PropertyMock, mock_open, patch
+from mock import MagicMock, PropertyMock, call, mock_open, patch
 
 from media_downloader.link_search.fetcher_base import FetcherBase
 from media_downloader.link_search.nico_seiga.authorid import Authorid
 from media_downloader.link_search.nico_seiga.authorname import Authorname
 from media_downloader.link_search.nico_seiga.illustname import Illustname
-from media_downloader.link_search.nico_seiga.nico_seiga_downloader import NicoSeigaDownloader
+from media_downloader.link_search.nico_seiga.nico_seiga_downloader import DownloadResult, NicoSeigaDownloader
 from media_downloader.link_search.nico_seiga.nico_seiga_fetcher import NicoSeigaFetcher
 from media_downloader.link_search.nico_seiga.nico_seiga_session import NicoSeigaSession
 from media_downloader.link_search.nico_seiga.nico_seiga_url import NicoSeigaURL
 from media_downloader.link_search.password import Password
+from media_downloader.link_search.session_registry import SessionRegistry, SessionRejectedError
 from media_downloader.link_search.url import URL
 from media_downloader.link_search.username import Username
 
@@ -27,6 +28,9 @@ from media_downloader.link_search.username import Username
 class TestNicoSeigaFetcher(unittest.TestCase):
     def setUp(self):
         self.TBP = Path("./tests")
+        self.session_registry = self.enterContext(
+            patch("media_downloader.link_search.nico_seiga.nico_seiga_fetcher.session_registry", SessionRegistry())
+        )
 
     def tearDown(self):
         pass
@@ -36,6 +40,7 @@ class TestNicoSeigaFetcher(unittest.TestCase):
             m_session = stack.enter_context(
                 patch("media_downloader.link_search.nico_seiga.nico_seiga_fetcher.NicoSeigaSession")
             )
+            m_session.return_value.expires_at = None
 
             username = Username("ユーザー1_ID")
             password = Password("ユーザー1_PW")
@@ -43,10 +48,21 @@ class TestNicoSeigaFetcher(unittest.TestCase):
 
             # 正常系
             actual = NicoSeigaFetcher(username, password, base_path)
-            self.assertEqual(True, hasattr(actual, "session"))
-            m_session.assert_called_once_with(username, password)
+            # 生成時にはログインしない
+            m_session.assert_not_called()
+            self.assertEqual(username, actual.username)
+            self.assertEqual(password, actual.password)
+            self.assertNotIn(password.password, repr(actual))
             self.assertEqual(True, hasattr(actual, "base_path"))
             self.assertEqual(base_path, actual.base_path)
+            self.assertEqual("nico_seiga", actual.SESSION_NAME)
+
+            # 初回アクセス時にログインし、以降は同じユーザーIDの別インスタンスとも共有する
+            self.assertEqual(m_session.return_value, actual.session)
+            m_session.assert_called_once_with(username, password)
+            other = NicoSeigaFetcher(username, password, base_path)
+            self.assertIs(actual.session, other.session)
+            m_session.assert_called_once_with(username, password)
 
             # 異常系
             with self.assertRaises(TypeError):
@@ -61,6 +77,7 @@ class TestNicoSeigaFetcher(unittest.TestCase):
             m_session = stack.enter_context(
                 patch("media_downloader.link_search.nico_seiga.nico_seiga_fetcher.NicoSeigaSession")
             )
+            m_session.return_value.expires_at = None
 
             username = Username("ユーザー1_ID")
             password = Password("ユーザー1_PW")
@@ -84,9 +101,14 @@ class TestNicoSeigaFetcher(unittest.TestCase):
             m_session = stack.enter_context(
                 patch("media_downloader.link_search.nico_seiga.nico_seiga_fetcher.NicoSeigaSession")
             )
+            m_session.return_value.expires_at = None
             m_downloader = stack.enter_context(
                 patch("media_downloader.link_search.nico_seiga.nico_seiga_fetcher.NicoSeigaDownloader")
             )
+            m_manifest = stack.enter_context(
+                patch("media_downloader.link_search.nico_seiga.nico_seiga_fetcher.download_manifest")
+            )
+            m_manifest.get.return_value = None
 
             username = Username("ユーザー1_ID")
             password = Password("ユーザー1_PW")
@@ -95,11 +117,43 @@ class TestNicoSeigaFetcher(unittest.TestCase):
 
             illust_url = f"https://seiga.nicovideo.jp/seiga/im11111111?query=1"
             nicoseiga_url = NicoSeigaURL.create(illust_url)
+
+            # DL済作品の台帳に記録があればログインせずにスキップ
+            m_manifest.get.return_value = MagicMock()
+            actual = fetcher.fetch(illust_url)
+            self.assertEqual(DownloadResult.PASSED, actual)
+            m_session.assert_not_called()
+
+            m_manifest.get.return_value = None
             actual = fetcher.fetch(illust_url)
-            self.assertEqual(None, actual)
+            m_session.assert_called_once_with(username, password)
+            self.assertEqual(m_downloader.return_value.download.return_value, actual)
             m_downloader.assert_called_once_with(nicoseiga_url, base_path, fetcher.session)
             m_downloader().download.assert_called_once_with()
 
+            # DL済作品の台帳に記録があればネットワークに触れずにスキップ
+            m_downloader.reset_mock()
+            m_manifest.get.return_value = MagicMock()
+            actual = fetcher.fetch(illust_url)
+            self.assertEqual(DownloadResult.PASSED, actual)
+            m_manifest.get.assert_called_with(m_downloader.SITE_NAME, 11111111)
+            m_downloader.assert_not_called()
+
+            # ログイン状態が切れていた場合は一度だけログインし直して再試行する
+            m_manifest.get.return_value = None
+            stale_session = fetcher.session
+            new_session = MagicMock(expires_at=None)
+            m_session.reset_mock()
+            m_session.return_value = new_session
+            m_downloader.return_value.download.side_effect = [SessionRejectedError, DownloadResult.SUCCESS]
+            actual = fetcher.fetch(illust_url)
+            self.assertEqual(DownloadResult.SUCCESS, actual)
+            m_session.assert_called_once_with(username, password)
+            self.assertEqual(
+                [call(nicoseiga_url, base_path, stale_session), call(nicoseiga_url, base_path, new_session)],
+                m_downloader.call_args_list,
+            )
+
 
 if __name__ == "__main__":
     if sys.argv:
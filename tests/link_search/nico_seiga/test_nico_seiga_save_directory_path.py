@@ -9,6 +9,7 @@ import sys
 import unittest
 from pathlib import Path
 
+from media_downloader.link_search.author_directory_index import AuthorDirectoryIndex
 from media_downloader.link_search.nico_seiga.authorid import Authorid
 from media_downloader.link_search.nico_seiga.authorname import Authorname
 from media_downloader.link_search.nico_seiga.illustid import Illustid
@@ -18,6 +19,10 @@ from media_downloader.link_search.nico_seiga.nico_seiga_save_directory_path impo
 
 
 class TestNicoSeigaSaveDirectoryPath(unittest.TestCase):
+    def tearDown(self):
+        (Path("./tests/link_search/nico_seiga") / AuthorDirectoryIndex.INDEX_FILE_NAME).unlink(missing_ok=True)
+        AuthorDirectoryIndex.reset()
+
     def test_NicoSeigaSaveDirectoryPath(self):
         illust_id = Illustid(12345678)
         illust_name = Illustname("作品名1")
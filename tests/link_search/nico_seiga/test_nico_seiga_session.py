@@ -3,28 +3,37 @@
 NicoSeigaSessionを表すクラスをテストする
 """
 
+import asyncio
 import sys
 import unittest
 from contextlib import ExitStack
-from unittest.mock import MagicMock, call, patch
+from unittest.mock import AsyncMock, MagicMock, call, patch
 
 import httpx
 
+from media_downloader.link_search.http_client_pool import SessionClients
 from media_downloader.link_search.nico_seiga.authorid import Authorid
 from media_downloader.link_search.nico_seiga.authorname import Authorname
 from media_downloader.link_search.nico_seiga.illustid import Illustid
 from media_downloader.link_search.nico_seiga.illustname import Illustname
+from media_downloader.link_search.nico_seiga.nico_seiga_info import NicoSeigaInfo
 from media_downloader.link_search.nico_seiga.nico_seiga_session import NicoSeigaSession
 from media_downloader.link_search.password import Password
+from media_downloader.link_search.session_registry import SessionRejectedError
 from media_downloader.link_search.url import URL
 from media_downloader.link_search.username import Username
 
 
 class TestNicoSeigaSession(unittest.TestCase):
+    def setUp(self):
+        self.mock_rate_limiter = self.enterContext(
+            patch("media_downloader.link_search.nico_seiga.nico_seiga_session.rate_limiter")
+        )
+
     def _get_session(self):
         with ExitStack() as stack:
-            mock_session = stack.enter_context(
-                patch("media_downloader.link_search.nico_seiga.nico_seiga_session.httpx.Client")
+            mock_http_client_pool = stack.enter_context(
+                patch("media_downloader.link_search.nico_seiga.nico_seiga_session.http_client_pool")
             )
             mock_is_valid = stack.enter_context(
                 patch("media_downloader.link_search.nico_seiga.nico_seiga_session.NicoSeigaSession._is_valid")
@@ -50,7 +59,7 @@ class TestNicoSeigaSession(unittest.TestCase):
             return_get = MagicMock()
             return_get.get = return_get_html
 
-            mock_session.side_effect = lambda follow_redirects, timeout, transport: return_get
+            mock_http_client_pool.create.side_effect = lambda: return_get
             username = Username("dummy_name")
             password = Password("dummy_pass")
             return NicoSeigaSession(username, password)
@@ -67,6 +76,8 @@ class TestNicoSeigaSession(unittest.TestCase):
         USERNAME_API_ENDPOINT_BASE = "https://seiga.nicovideo.jp/api/user/info?id="
         IMAGE_SOUECE_API_ENDPOINT_BASE = "https://seiga.nicovideo.jp/image/source?id="
         self.assertIsNotNone(session._session)
+        self.assertIsInstance(session._clients, SessionClients)
+        self.assertIs(session._session, session._clients.client)
         self.assertEqual(HEADERS, session.HEADERS)
         self.assertEqual(LOGIN_ENDPOINT, session.LOGIN_ENDPOINT)
         self.assertEqual(IMAGE_INFO_API_ENDPOINT_BASE, session.IMAGE_INFO_API_ENDPOINT_BASE)
@@ -98,13 +109,31 @@ class TestNicoSeigaSession(unittest.TestCase):
         self.assertEqual(call.post(session.LOGIN_ENDPOINT, data=params, headers=session.HEADERS), mock_calls[0])
         self.assertEqual(call.post().raise_for_status(), mock_calls[1])
 
-    def test_get_author_id(self):
+    def test_get_illust_info(self):
         session = self._get_session()
+        session_mock: MagicMock = session._session
+        session_mock.get = MagicMock(side_effect=session_mock.get)
         illust_id = Illustid(12345678)
 
-        expect = Authorid(1234567)
-        actual = session.get_author_id(illust_id)
+        expect = NicoSeigaInfo(illust_id, Illustname("title_1"), Authorid(1234567), Authorname("author_name_1"))
+        actual = session.get_illust_info(illust_id)
         self.assertEqual(expect, actual)
+        self.assertEqual(
+            [
+                call(session.IMAGE_INFO_API_ENDPOINT_BASE + "12345678", headers=session.HEADERS),
+                call(session.USERNAME_API_ENDPOINT_BASE + "1234567", headers=session.HEADERS),
+            ],
+            session_mock.get.mock_calls,
+        )
+
+        # 同じ作者の作品なら作者情報は再取得しない
+        session_mock.get.reset_mock()
+        actual = session.get_illust_info(Illustid(12345679))
+        self.assertEqual(Authorname("author_name_1"), actual.author_name)
+        self.assertEqual(
+            [call(session.IMAGE_INFO_API_ENDPOINT_BASE + "12345679", headers=session.HEADERS)],
+            session_mock.get.mock_calls,
+        )
 
     def test_get_author_name(self):
         session = self._get_session()
@@ -113,14 +142,12 @@ class TestNicoSeigaSession(unittest.TestCase):
         expect = Authorname("author_name_1")
         actual = session.get_author_name(author_id)
         self.assertEqual(expect, actual)
+        self.assertEqual({author_id.id: expect}, session._author_name_cache)
 
-    def test_get_illust_title(self):
-        session = self._get_session()
-        illust_id = Illustid(12345678)
-
-        expect = Illustname("title_1")
-        actual = session.get_illust_title(illust_id)
-        self.assertEqual(expect, actual)
+        # キャッシュ済の作者名はリクエストせずに返す
+        session._author_name_cache[author_id.id] = Authorname("cached_author_name")
+        actual = session.get_author_name(author_id)
+        self.assertEqual(Authorname("cached_author_name"), actual)
 
     def test_get_source_url(self):
         session = self._get_session()
@@ -130,13 +157,51 @@ class TestNicoSeigaSession(unittest.TestCase):
         actual = session.get_source_url(illust_id)
         self.assertEqual(expect, actual)
 
-    def test_get_illust_binary(self):
+    def test_get_source_url_rejected(self):
         session = self._get_session()
-        source_url = URL("http://source_url")
+        illust_id = Illustid(12345678)
 
-        expect = "sample image bytes".encode()
-        actual = session.get_illust_binary(source_url)
-        self.assertEqual(expect, actual)
+        # ログイン状態が切れているとログインページにリダイレクトされる
+        response = MagicMock()
+        response.url = httpx.URL("https://account.nicovideo.jp/login?site=seiga")
+        object.__setattr__(session, "_session", MagicMock())
+        session._session.get.return_value = response
+        with self.assertRaises(SessionRejectedError):
+            actual = session.get_source_url(illust_id)
+
+    def test_close(self):
+        session = self._get_session()
+        object.__setattr__(session, "_session", MagicMock())
+        object.__setattr__(session, "_clients", MagicMock())
+        session.close()
+        session._clients.close.assert_called_once_with()
+
+    def test_aclose(self):
+        session = self._get_session()
+        object.__setattr__(session, "_clients", MagicMock(aclose=AsyncMock()))
+        asyncio.run(session.aclose())
+        session._clients.aclose.assert_awaited_once_with()
+
+    def test_async_client(self):
+        session = self._get_session()
+        object.__setattr__(session, "_clients", MagicMock())
+        self.assertEqual(session._clients.async_client, session.async_client)
+
+    def test_expires_at(self):
+        session = self._get_session()
+        cookies = httpx.Cookies()
+        object.__setattr__(session, "_session", MagicMock(cookies=cookies))
+
+        # ログイン状態を保持するクッキーが無い場合はNone
+        cookies.set("other_cookie", "dummy_value", domain=".nicovideo.jp")
+        self.assertIsNone(session.expires_at)
+
+        # ログイン状態を保持するクッキーの期限を返す
+        cookies.set(session.LOGIN_COOKIE_NAME, "dummy_value", domain=".nicovideo.jp")
+        self.assertIsNone(session.expires_at)
+        for cookie in cookies.jar:
+            cookie.expires = 2000000000 if cookie.name == session.LOGIN_COOKIE_NAME else 1000000000
+        self.assertEqual(2000000000.0, session.expires_at)
 
 
 if __name__ == "__main__":
@@ -8,6 +8,7 @@ import unittest
 import urllib.parse
 
 from media_downloader.link_search.nico_seiga.nico_seiga_url import NicoSeigaURL
+from media_downloader.link_search.work_key import WorkKey
 
 
 class TestNicoSeigaURL(unittest.TestCase):
@@ -56,6 +57,16 @@ class TestNicoSeigaURL(unittest.TestCase):
         url_str = "https://www.google.co.jp/"
         self.assertEqual(False, NicoSeigaURL.is_valid(url_str))
 
+    def test_work_key(self):
+        # seiga.nicovideo.jp と nico.ms は同じイラストとして扱う
+        urls = [
+            "https://seiga.nicovideo.jp/seiga/im5360137",
+            "https://seiga.nicovideo.jp/seiga/im5360137?query=1",
+            "http://nico.ms/im5360137",
+        ]
+        for url in urls:
+            self.assertEqual(WorkKey("nico_seiga", 5360137), NicoSeigaURL.create(url).work_key)
+
 
 if __name__ == "__main__":
     if sys.argv:
@@ -0,0 +1,136 @@
+"""AsyncNijieDownloader のテスト"""
+
+import shutil
+import sys
+import unittest
+from pathlib import Path
+
+import httpx
+from mock import ANY, AsyncMock, MagicMock, call, patch
+
+from media_downloader.link_search.author_directory_index import AuthorDirectoryIndex
+from media_downloader.link_search.nijie.async_nijie_downloader import AsyncNijieDownloader
+from media_downloader.link_search.nijie.nijie_cookie import NijieCookie
+from media_downloader.link_search.nijie.nijie_downloader import DownloadResult
+from media_downloader.link_search.nijie.nijie_url import NijieURL
+from media_downloader.link_search.session_registry import SessionRejectedError
+from media_downloader.link_search.url import URL
+
+
+class TestAsyncNijieDownloader(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.TBP = Path("./tests/link_search/nijie")
+        self.enterContext(patch("media_downloader.link_search.nijie.async_nijie_downloader.logger.info"))
+        self.enterContext(patch("media_downloader.link_search.nijie.nijie_downloader.logger.info"))
+        mock_rate_limiter = self.enterContext(
+            patch("media_downloader.link_search.nijie.async_nijie_downloader.rate_limiter")
+        )
+        mock_rate_limiter.acquire_async = AsyncMock()
+        self.mock_manifest = self.enterContext(
+            patch("media_downloader.link_search.nijie.nijie_downloader.download_manifest")
+        )
+        # DL済作品の台帳への記録と同時に保存先へリネームする
+        self.mock_manifest.commit.side_effect = lambda site, work_id, path, source=None: (
+            source.replace(path) if source else None
+        )
+
+        self.mock_res = MagicMock()
+        self.mock_res.url = httpx.URL("http://nijie.info/view_popup.php?id=10000000")
+        self.mock_session = MagicMock()
+        self.mock_session.get = AsyncMock(return_value=self.mock_res)
+
+        async def stream_download(url, save_path, headers, commit=None):
+            save_path.write_bytes(b"dummy_content")
+            if commit:
+                commit(save_path, save_path)
+            return save_path
+
+        mock_stream_downloader = self.enterContext(
+            patch("media_downloader.link_search.nijie.async_nijie_downloader.AsyncStreamDownloader")
+        )
+        self.mock_download = AsyncMock(side_effect=stream_download)
+        mock_stream_downloader.return_value.download = self.mock_download
+
+        self.cookies = MagicMock(spec=NijieCookie)
+        self.cookies._headers = {"dummy_headers": "dummy_headers"}
+        self.cookies.async_client = self.mock_session
+
+    def tearDown(self):
+        rmdir = [p for p in self.TBP.glob("*") if p.is_dir() and p.name != "__pycache__"]
+        for p in rmdir:
+            shutil.rmtree(p)
+        (self.TBP / AuthorDirectoryIndex.INDEX_FILE_NAME).unlink(missing_ok=True)
+        AuthorDirectoryIndex.reset()
+
+    def _set_page(self, title: str, author_id: int, pages: int) -> list[str]:
+        srcs = [f"//pic.nijie.net/04/nijie/23m02/24/{author_id}/illust/sample_{i + 1:02}.jpg" for i in range(pages)]
+        imgs = "".join(
+            f"""<div id="img_filter" data-index='0'><a href="javascript:void(0);">
+            <img src="{src}" border="0" /></a></div>"""
+            for src in srcs
+        )
+        self.mock_res.text = f"<title>{title} | 作者名 | ニジエ</title>{imgs}"
+        return [f"http:{src}" for src in srcs]
+
+    async def test_download(self):
+        base_path = Path(self.TBP)
+
+        # 一枚絵初回DL想定
+        nijie_url = NijieURL.create("http://nijie.info/view_popup.php?id=10000000")
+        urls = self._set_page("作品名1", 11111111, 1)
+        actual = await AsyncNijieDownloader(nijie_url, base_path, self.cookies).download()
+        self.assertIs(DownloadResult.SUCCESS, actual)
+        self.mock_session.get.assert_awaited_once_with(
+            "http://nijie.info/view_popup.php?id=10000000",
+            headers=self.cookies._headers,
+        )
+        save_path = base_path / "作者名(11111111)" / "作品名1(10000000).jpg"
+        self.mock_download.assert_awaited_once_with(URL(urls[0]), save_path, headers=self.cookies._headers, commit=ANY)
+        self.mock_manifest.commit.assert_called_once_with("nijie", 10000000, save_path, save_path)
+        self.assertTrue(save_path.is_file())
+
+        # 一枚絵2回目DL想定
+        self.mock_download.reset_mock()
+        actual = await AsyncNijieDownloader(nijie_url, base_path, self.cookies).download()
+        self.assertIs(DownloadResult.PASSED, actual)
+        self.mock_download.assert_not_called()
+
+        # 漫画形式初回DL想定、前回1ページ目まで隠しディレクトリにDLして中断していた
+        nijie_url = NijieURL.create("http://nijie.info/view_popup.php?id=20000000")
+        urls = self._set_page("作品名2", 22222222, 4)
+        sd_path = base_path / "作者名(22222222)" / "作品名2(20000000)"
+        staging_path = base_path / "作者名(22222222)" / ".作品名2(20000000).staging"
+        staging_path.mkdir(parents=True)
+        (staging_path / "作品名2(20000000)_000.jpg").write_bytes(b"dummy_content")
+        actual = await AsyncNijieDownloader(nijie_url, base_path, self.cookies).download()
+        self.assertIs(DownloadResult.SUCCESS, actual)
+        expect = [
+            call(
+                URL(urls[i]),
+                staging_path / f"作品名2(20000000)_{i:03}.jpg",
+                headers=self.cookies._headers,
+            )
+            for i in range(1, 4)
+        ]
+        self.assertCountEqual(expect, self.mock_download.await_args_list)
+        # すべてのページが揃ってから作品ディレクトリにリネームされる
+        self.assertFalse(staging_path.exists())
+        self.assertEqual(4, len(list(sd_path.glob("*.jpg"))))
+        self.mock_manifest.commit.assert_called_with("nijie", 20000000, sd_path, staging_path)
+
+        # 漫画形式2回目DL想定
+        actual = await AsyncNijieDownloader(nijie_url, base_path, self.cookies).download()
+        self.assertIs(DownloadResult.PASSED, actual)
+
+        # クッキーが無効になっていて年齢確認画面にリダイレクトされた場合
+        self.mock_download.reset_mock()
+        self.mock_res.url = httpx.URL("https://nijie.info/age_jump.php?url=")
+        with self.assertRaises(SessionRejectedError):
+            actual = await AsyncNijieDownloader(nijie_url, base_path, self.cookies).download()
+        self.mock_download.assert_not_called()
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,113 @@
+"""AsyncNijieFetcher のテスト"""
+
+import sys
+import unittest
+from pathlib import Path
+
+from mock import AsyncMock, MagicMock, patch
+
+from media_downloader.link_search.nijie.async_nijie_fetcher import AsyncNijieFetcher
+from media_downloader.link_search.nijie.nijie_downloader import DownloadResult
+from media_downloader.link_search.nijie.nijie_fetcher import NijieFetcher
+from media_downloader.link_search.nijie.nijie_url import NijieURL
+from media_downloader.link_search.password import Password
+from media_downloader.link_search.session_registry import SessionRejectedError
+from media_downloader.link_search.url import URL
+from media_downloader.link_search.username import Username
+
+
+class TestAsyncNijieFetcher(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.mock_login = self.enterContext(
+            patch("media_downloader.link_search.nijie.nijie_fetcher.NijieFetcher.login")
+        )
+        self.username = Username("ユーザー1_ID")
+        self.password = Password("ユーザー1_PW")
+        self.base_path = Path("./tests/link_search/nijie")
+
+    def test_AsyncNijieFetcher(self):
+        actual = AsyncNijieFetcher(self.username, self.password, self.base_path)
+        # 生成時にはログインしない
+        self.mock_login.assert_not_called()
+        self.assertEqual(self.username, actual.username)
+        self.assertEqual(self.password, actual.password)
+        self.assertEqual(self.base_path, actual.base_path)
+        self.assertNotIn(self.password.password, repr(actual))
+        self.assertIsInstance(actual.fetcher, NijieFetcher)
+
+        # 同期版の Fetcher から生成
+        actual = AsyncNijieFetcher.from_fetcher(NijieFetcher(self.username, self.password, self.base_path))
+        self.assertEqual(self.username, actual.username)
+        self.assertEqual(self.base_path, actual.base_path)
+
+        with self.assertRaises(TypeError):
+            actual = AsyncNijieFetcher.from_fetcher("invalid argument")
+
+    async def test_is_target_url(self):
+        fetcher = AsyncNijieFetcher(self.username, self.password, self.base_path)
+        actual = await fetcher.is_target_url(URL("http://nijie.info/view_popup.php?id=251267"))
+        self.assertTrue(actual)
+        actual = await fetcher.is_target_url(URL("https://invalid.url/view_popup.php?id=251267"))
+        self.assertFalse(actual)
+
+    async def test_fetch(self):
+        mock_manifest = self.enterContext(
+            patch("media_downloader.link_search.nijie.async_nijie_fetcher.download_manifest")
+        )
+        mock_registry = self.enterContext(
+            patch("media_downloader.link_search.nijie.async_nijie_fetcher.session_registry")
+        )
+        mock_downloader = self.enterContext(
+            patch("media_downloader.link_search.nijie.async_nijie_fetcher.AsyncNijieDownloader")
+        )
+        fetcher = AsyncNijieFetcher(self.username, self.password, self.base_path)
+        mock_save_cookies = self.enterContext(patch.object(NijieFetcher, "_save_cookies"))
+        mock_get_cookies = self.enterContext(patch.object(AsyncNijieFetcher, "get_cookies", AsyncMock()))
+        url = "http://nijie.info/view_popup.php?id=251267"
+        nijie_url = NijieURL.create(url)
+        session_key = fetcher.fetcher.session_key
+
+        # DL済作品の台帳に記録がある
+        mock_manifest.get.return_value = MagicMock()
+        actual = await fetcher.fetch(url)
+        self.assertEqual(DownloadResult.PASSED, actual)
+        mock_get_cookies.assert_not_awaited()
+        mock_manifest.get.return_value = None
+
+        # 正常系、クッキーの有効性を確認できたので保存し直す
+        cookies = MagicMock(is_fresh=False)
+        mock_get_cookies.return_value = cookies
+        mock_downloader.return_value.download = AsyncMock(return_value=DownloadResult.SUCCESS)
+        actual = await fetcher.fetch(url)
+        self.assertEqual(DownloadResult.SUCCESS, actual)
+        mock_downloader.assert_called_once_with(nijie_url, self.base_path, cookies)
+        mock_registry.replace.assert_called_once_with(session_key, cookies, cookies.validated.return_value)
+        mock_save_cookies.assert_called_once_with(cookies.validated.return_value)
+
+        # クッキーが無効になっていたら一度だけログインし直して再試行する
+        mock_downloader.reset_mock()
+        mock_registry.reset_mock()
+        rejected_cookies = MagicMock(is_fresh=True)
+        rejected_cookies.aclose = AsyncMock()
+        new_cookies = MagicMock(is_fresh=True)
+        mock_get_cookies.side_effect = [rejected_cookies]
+        mock_relogin = self.enterContext(patch.object(NijieFetcher, "relogin", return_value=new_cookies))
+        mock_downloader.return_value.download = AsyncMock(
+            side_effect=[SessionRejectedError("rejected"), DownloadResult.SUCCESS]
+        )
+        actual = await fetcher.fetch(url)
+        self.assertEqual(DownloadResult.SUCCESS, actual)
+        # 保存済のクッキーを使わずにログインし直したクッキーで再試行する
+        mock_relogin.assert_called_once_with(rejected_cookies)
+        rejected_cookies.aclose.assert_awaited_once_with()
+        self.assertEqual(rejected_cookies, mock_downloader.call_args_list[0].args[2])
+        self.assertEqual(new_cookies, mock_downloader.call_args_list[1].args[2])
+
+        with self.assertRaises(TypeError):
+            actual = await fetcher.fetch(-1)
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -1,12 +1,14 @@
 """NijieCookie のテスト"""
 
+import asyncio
 import sys
 import unittest
 from contextlib import ExitStack
 
 import httpx
-from mock import MagicMock, call, patch
+from mock import AsyncMock, MagicMock, call, patch
 
+from media_downloader.link_search.http_client_pool import SessionClients
 from media_downloader.link_search.nijie.nijie_cookie import NijieCookie
 
 
@@ -24,39 +26,182 @@ class TestNijieCookie(unittest.TestCase):
             self.assertEqual({"headers": "dummy_headers"}, nijie_cookie._headers)
             mock_is_valid.assert_called_once_with()
 
+    def test_expires_at(self):
+        with ExitStack() as stack:
+            mock_is_valid = stack.enter_context(
+                patch("media_downloader.link_search.nijie.nijie_cookie.NijieCookie._is_valid")
+            )
+            # 期限の無いクッキーのみの場合はNone
+            cookies = httpx.Cookies()
+            cookies.set(name="session_name", value="dummy_value", domain=".nijie.info")
+            nijie_cookie = NijieCookie(cookies, {"headers": "dummy_headers"})
+            self.assertIsNone(nijie_cookie.expires_at)
+
+            # 最も早く切れるクッキーの期限を返す
+            for name, expires in [("name_1", 2000000000), ("name_2", 1900000000)]:
+                cookie = next(iter(httpx.Cookies({name: "dummy_value"}).jar))
+                cookie.expires = expires
+                cookies.jar.set_cookie(cookie)
+            nijie_cookie = NijieCookie(cookies, {"headers": "dummy_headers"})
+            self.assertEqual(1900000000.0, nijie_cookie.expires_at)
+
     def test_is_valid(self):
         with ExitStack() as stack:
-            mock_get = stack.enter_context(patch("media_downloader.link_search.nijie.nijie_cookie.httpx.get"))
+            mock_http_client_pool = stack.enter_context(
+                patch("media_downloader.link_search.http_client_pool.http_client_pool")
+            )
+            mock_get = mock_http_client_pool.create.return_value.get
+            headers = {"headers": "dummy_headers"}
+            cookies = httpx.Cookies()
+            cookies.set(name="dummy_name", value="dummy_value")
+
+            # 生成時にはネットワークに触れない
+            nijie_cookie = NijieCookie(cookies, headers)
+            self.assertIsNone(nijie_cookie.validated_at)
+            nijie_cookie = NijieCookie(cookies, headers, 1000000000.0)
+            self.assertEqual(1000000000.0, nijie_cookie.validated_at)
+            mock_get.assert_not_called()
+
+            with self.assertRaises(ValueError):
+                nijie_cookie = NijieCookie(httpx.Cookies(), headers)
+
+            with self.assertRaises(TypeError):
+                nijie_cookie = NijieCookie(cookies, "invalid_headers_type")
+
+            with self.assertRaises(TypeError):
+                nijie_cookie = NijieCookie("invalid_cookies_type", headers)
+
+            with self.assertRaises(TypeError):
+                nijie_cookie = NijieCookie(cookies, headers, "invalid_validated_at_type")
+
+            with self.assertRaises(TypeError):
+                nijie_cookie = NijieCookie(cookies, headers, None, "invalid_clients_type")
+
+    def test_validate(self):
+        with ExitStack() as stack:
+            mock_http_client_pool = stack.enter_context(
+                patch("media_downloader.link_search.http_client_pool.http_client_pool")
+            )
+            mock_get = mock_http_client_pool.create.return_value.get
             NIJIE_TOP_URL = "http://nijie.info/index.php"
             mock_res = MagicMock()
             mock_res.status_code = 200
             mock_res.url = NIJIE_TOP_URL
             mock_res.text = "ニジエ - nijie"
-            mock_get.side_effect = lambda url, headers, cookies, follow_redirects: mock_res
+            mock_get.side_effect = lambda url, headers: mock_res
 
             headers = {"headers": "dummy_headers"}
             cookies = httpx.Cookies()
             cookies.set(name="dummy_name", value="dummy_value")
             nijie_cookie = NijieCookie(cookies, headers)
 
-            mock_get.assert_called_once_with(NIJIE_TOP_URL, headers=headers, cookies=cookies, follow_redirects=True)
+            actual = nijie_cookie.validate()
+            mock_http_client_pool.create.assert_called_once_with()
+            mock_get.assert_called_once_with(NIJIE_TOP_URL, headers=headers)
             r_calls = mock_res.mock_calls
             self.assertEqual(1, len(r_calls))
             self.assertEqual(call.raise_for_status(), r_calls[0])
+            self.assertEqual(nijie_cookie, actual)
+            self.assertTrue(actual.is_fresh)
 
+            # 不正なクッキーだと年齢確認画面に飛ばされる
             with self.assertRaises(ValueError):
                 mock_res.status_code = 404
-                nijie_cookie = NijieCookie(cookies, headers)
+                actual = nijie_cookie.validate()
 
-            with self.assertRaises(ValueError):
-                cookies = httpx.Cookies()
-                nijie_cookie = NijieCookie(cookies, headers)
+    def test_client(self):
+        mock_http_client_pool = self.enterContext(
+            patch("media_downloader.link_search.http_client_pool.http_client_pool")
+        )
+        mock_client = mock_http_client_pool.create.return_value
+        headers = {"headers": "dummy_headers"}
+        cookies = httpx.Cookies()
+        cookies.set(name="dummy_name", value="dummy_value")
 
-            with self.assertRaises(TypeError):
-                nijie_cookie = NijieCookie(cookies, "invalid_headers_type")
+        # クッキーを設定した専用の Client を初回アクセス時に生成する
+        nijie_cookie = NijieCookie(cookies, headers)
+        mock_http_client_pool.create.assert_not_called()
+        self.assertIs(mock_client, nijie_cookie.client)
+        self.assertIs(cookies, mock_client.cookies)
+        self.assertIs(mock_client, nijie_cookie.client)
+        mock_http_client_pool.create.assert_called_once_with()
 
-            with self.assertRaises(TypeError):
-                nijie_cookie = NijieCookie("invalid_cookies_type", headers)
+        # 確認日時を更新したクッキーは同じ Client を引き継ぐ
+        self.assertIs(mock_client, nijie_cookie.validated().client)
+        mock_http_client_pool.create.assert_called_once_with()
+
+        # ログインに使った Client を指定した場合はそれを使う
+        login_client = MagicMock()
+        nijie_cookie = NijieCookie(cookies, headers, None, SessionClients(client=login_client))
+        self.assertIs(login_client, nijie_cookie.client)
+        nijie_cookie.close()
+        login_client.close.assert_called_once_with()
+
+    def test_async_client(self):
+        mock_http_client_pool = self.enterContext(
+            patch("media_downloader.link_search.http_client_pool.http_client_pool")
+        )
+        mock_async_client = mock_http_client_pool.create_async.return_value
+        mock_async_client.aclose = AsyncMock()
+        headers = {"headers": "dummy_headers"}
+        cookies = httpx.Cookies()
+        cookies.set(name="dummy_name", value="dummy_value")
+
+        # クッキーを設定した専用の AsyncClient を初回アクセス時に生成する
+        nijie_cookie = NijieCookie(cookies, headers)
+        mock_http_client_pool.create_async.assert_not_called()
+        self.assertIs(mock_async_client, nijie_cookie.async_client)
+        self.assertIs(cookies, mock_async_client.cookies)
+        self.assertIs(mock_async_client, nijie_cookie.validated().async_client)
+        mock_http_client_pool.create_async.assert_called_once_with()
+
+        # 破棄する際は AsyncClient も閉じる
+        asyncio.run(nijie_cookie.aclose())
+        mock_async_client.aclose.assert_awaited_once_with()
+
+    def test_is_fresh(self):
+        cookies = httpx.Cookies()
+        cookies.set(name="dummy_name", value="dummy_value")
+        headers = {"headers": "dummy_headers"}
+        with patch("media_downloader.link_search.nijie.nijie_cookie.time") as mock_time:
+            mock_time.time.return_value = 1000000000.0
+
+            # 未確認
+            self.assertFalse(NijieCookie(cookies, headers).is_fresh)
+
+            # 確認してから FRESHNESS_WINDOW 秒以内なら確認済
+            validated_at = 1000000000.0 - NijieCookie.FRESHNESS_WINDOW + 1
+            self.assertTrue(NijieCookie(cookies, headers, validated_at).is_fresh)
+            validated_at = 1000000000.0 - NijieCookie.FRESHNESS_WINDOW
+            self.assertFalse(NijieCookie(cookies, headers, validated_at).is_fresh)
+
+            # validated で現在日時に更新する
+            actual = NijieCookie(cookies, headers, validated_at).validated()
+            self.assertEqual(1000000000.0, actual.validated_at)
+            self.assertTrue(actual.is_fresh)
+
+            # 有効期限が切れている場合は確認済として扱わない
+            for cookie in cookies.jar:
+                cookie.expires = 1000000000
+            self.assertFalse(actual.is_fresh)
+
+    def test_configure(self):
+        cookies = httpx.Cookies()
+        cookies.set(name="dummy_name", value="dummy_value")
+        nijie_cookie = NijieCookie(cookies, {"headers": "dummy_headers"})
+        nijie_cookie = nijie_cookie.validated()
+        self.assertEqual(NijieCookie.DEFAULT_FRESHNESS_WINDOW, NijieCookie.FRESHNESS_WINDOW)
+        self.assertTrue(nijie_cookie.is_fresh)
+        try:
+            NijieCookie.configure(0)
+            self.assertEqual(0, NijieCookie.FRESHNESS_WINDOW)
+            self.assertFalse(nijie_cookie.is_fresh)
+
+            with self.assertRaises(ValueError):
+                NijieCookie.configure(-1)
+        finally:
+            NijieCookie.configure()
+        self.assertEqual(NijieCookie.DEFAULT_FRESHNESS_WINDOW, NijieCookie.FRESHNESS_WINDOW)
 
 
 if __name__ == "__main__":
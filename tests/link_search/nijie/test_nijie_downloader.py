@@ -6,11 +6,16 @@ import unittest
 from contextlib import ExitStack
 from pathlib import Path
 
-from mock import MagicMock, patch
+import httpx
+from mock import ANY, MagicMock, call, patch
 
+from media_downloader.link_search.author_directory_index import AuthorDirectoryIndex
 from media_downloader.link_search.nijie.nijie_cookie import NijieCookie
 from media_downloader.link_search.nijie.nijie_downloader import DownloadResult, NijieDownloader
 from media_downloader.link_search.nijie.nijie_url import NijieURL
+from media_downloader.link_search.session_registry import SessionRejectedError
+from media_downloader.link_search.stream_downloader import StreamDownloader
+from media_downloader.link_search.url import URL
 
 
 class TestNijieDownloader(unittest.TestCase):
@@ -21,6 +26,8 @@ class TestNijieDownloader(unittest.TestCase):
         rmdir = [p for p in self.TBP.glob("*") if p.is_dir() and p.name != "__pycache__"]
         for p in rmdir:
             shutil.rmtree(p)
+        (self.TBP / AuthorDirectoryIndex.INDEX_FILE_NAME).unlink(missing_ok=True)
+        AuthorDirectoryIndex.reset()
 
     def test_DownloadResult(self):
         expect = ["SUCCESS", "PASSED"]
@@ -56,13 +63,27 @@ class TestNijieDownloader(unittest.TestCase):
 
     def test_download(self):
         with ExitStack() as stack:
-            mock_session = stack.enter_context(
-                patch("media_downloader.link_search.nijie.nijie_downloader.httpx.Client")
-            )
             mock_logger_info = stack.enter_context(
                 patch("media_downloader.link_search.nijie.nijie_downloader.logger.info")
             )
-            mock_sleep = stack.enter_context(patch("media_downloader.link_search.nijie.nijie_downloader.sleep"))
+            mock_rate_limiter = stack.enter_context(
+                patch("media_downloader.link_search.nijie.nijie_downloader.rate_limiter")
+            )
+            mock_stream_downloader = stack.enter_context(
+                patch("media_downloader.link_search.nijie.nijie_downloader.StreamDownloader")
+            )
+            mock_stream_downloader.return_value = MagicMock(spec=StreamDownloader)
+
+            def stream_download(url, save_path, headers, commit=None):
+                if commit:
+                    part_path = save_path.with_name(save_path.name + ".part")
+                    part_path.write_bytes(b"dummy_content")
+                    commit(part_path, save_path)
+                else:
+                    save_path.write_bytes(b"dummy_content")
+                return save_path
+
+            mock_stream_downloader.return_value.download.side_effect = stream_download
 
             work_id = 10000000
 
@@ -77,19 +98,31 @@ class TestNijieDownloader(unittest.TestCase):
             """
             mock_res.content = b"dummy_content"
             mock_get = MagicMock()
-            mock_get.get.side_effect = lambda url, headers, cookies: mock_res
-            mock_session.side_effect = lambda follow_redirects, timeout, transport: mock_get
+            mock_get.get.side_effect = lambda url, headers: mock_res
 
             nijie_url = NijieURL.create(f"http://nijie.info/view_popup.php?id={work_id}")
             base_path = Path(self.TBP)
             cookies = MagicMock(spec=NijieCookie)
             cookies._headers = {"dummy_headers": "dummy_headers"}
             cookies._cookies = {"dummy_cookies": "dummy_cookies"}
+            cookies.client = mock_get
 
             # 一枚絵初回DL想定
             actual = NijieDownloader(nijie_url, base_path, cookies).download()
             expect = DownloadResult.SUCCESS
             self.assertIs(expect, actual)
+            # クッキーを設定した専用の Client を使う
+            mock_get.get.assert_called_once_with(
+                "http://nijie.info/view_popup.php?id=10000000", headers=cookies._headers
+            )
+            mock_stream_downloader.assert_called_once_with(mock_get)
+            mock_stream_downloader.return_value.download.assert_called_once_with(
+                URL("http://pic.nijie.net/04/nijie/23m02/24/11111111/illust/sample_01.jpg"),
+                base_path / "作者名1(11111111)" / "作品名1(10000000).jpg",
+                headers=cookies._headers,
+                commit=ANY,
+            )
+            mock_stream_downloader.reset_mock()
 
             # 一枚絵2回目DL想定
             actual = NijieDownloader(nijie_url, base_path, cookies).download()
@@ -118,15 +151,40 @@ class TestNijieDownloader(unittest.TestCase):
                 <img src="//pic.nijie.net/04/nijie/23m02/24/22222222/illust/sample_04.jpg" border="0" />
                 </a></div>
             """
+            # 前回1ページ目まで隠しディレクトリにDLして中断していた
+            sd_path = base_path / "作者名2(22222222)" / "作品名2(20000000)"
+            staging_path = base_path / "作者名2(22222222)" / ".作品名2(20000000).staging"
+            staging_path.mkdir(parents=True)
+            (staging_path / "作品名2(20000000)_000.jpg").write_bytes(b"dummy_content")
             actual = NijieDownloader(nijie_url, base_path, cookies).download()
             expect = DownloadResult.SUCCESS
             self.assertIs(expect, actual)
+            self.assertEqual(3, mock_stream_downloader.return_value.download.call_count)
+            expect = [
+                call(
+                    URL(f"http://pic.nijie.net/04/nijie/23m02/24/22222222/illust/sample_{i + 1:02}.jpg"),
+                    staging_path / f"作品名2(20000000)_{i:03}.jpg",
+                    headers=cookies._headers,
+                )
+                for i in range(1, 4)
+            ]
+            self.assertCountEqual(expect, mock_stream_downloader.return_value.download.call_args_list)
+            # すべてのページが揃ってから作品ディレクトリにリネームされる
+            self.assertFalse(staging_path.exists())
+            self.assertEqual(4, len(list(sd_path.glob("*.jpg"))))
 
             # 漫画形式2回目DL想定
             actual = NijieDownloader(nijie_url, base_path, cookies).download()
             expect = DownloadResult.PASSED
             self.assertIs(expect, actual)
 
+            # クッキーが無効になっていて年齢確認画面にリダイレクトされた場合
+            mock_stream_downloader.reset_mock()
+            mock_res.url = httpx.URL("https://nijie.info/age_jump.php?url=")
+            with self.assertRaises(SessionRejectedError):
+                actual = NijieDownloader(nijie_url, base_path, cookies).download()
+            mock_stream_downloader.return_value.download.assert_not_called()
+
             # 後始末
 
 
@@ -2,23 +2,32 @@
 
 import shutil
 import sys
+import time
 import unittest
 from contextlib import ExitStack
 from pathlib import Path
 
 import httpx
-from mock import MagicMock, call, mock_open, patch
+import orjson
+from mock import ANY, MagicMock, call, mock_open, patch
 
+from media_downloader.link_search.nijie.nijie_cookie import NijieCookie
+from media_downloader.link_search.nijie.nijie_downloader import DownloadResult
 from media_downloader.link_search.nijie.nijie_fetcher import NijieFetcher
 from media_downloader.link_search.nijie.nijie_url import NijieURL
 from media_downloader.link_search.password import Password
+from media_downloader.link_search.session_registry import SessionRegistry, SessionRejectedError
 from media_downloader.link_search.url import URL
 from media_downloader.link_search.username import Username
+from media_downloader.link_search.work_key import WorkKey
 
 
 class TestNijieFetcher(unittest.TestCase):
     def setUp(self):
         self.TBP = Path("./tests/link_search/nijie")
+        self.session_registry = self.enterContext(
+            patch("media_downloader.link_search.nijie.nijie_fetcher.session_registry", SessionRegistry())
+        )
 
     def tearDown(self):
         rmdir = [p for p in self.TBP.glob("*") if p.is_dir() and p.name != "__pycache__"]
@@ -26,23 +35,26 @@ class TestNijieFetcher(unittest.TestCase):
             shutil.rmtree(p)
 
     def _get_instance(self):
-        with ExitStack() as stack:
-            self.mock_login = stack.enter_context(
-                patch("media_downloader.link_search.nijie.nijie_fetcher.NijieFetcher.login")
-            )
+        self.mock_login = self.enterContext(
+            patch("media_downloader.link_search.nijie.nijie_fetcher.NijieFetcher.login")
+        )
+        self.mock_login.return_value.expires_at = None
 
-            self.username = Username("ユーザー1_ID")
-            self.password = Password("ユーザー1_PW")
-            self.base_path = Path(self.TBP)
+        self.username = Username("ユーザー1_ID")
+        self.password = Password("ユーザー1_PW")
+        self.base_path = Path(self.TBP)
 
-            self.fetcher = NijieFetcher(self.username, self.password, self.base_path)
-            return self.fetcher
+        self.fetcher = NijieFetcher(self.username, self.password, self.base_path)
+        return self.fetcher
 
     def test_NijieFetcher(self):
         # 正常系
         actual = self._get_instance()
-        self.assertTrue(hasattr(actual, "cookies"))
-        self.mock_login.assert_called_once_with(self.username, self.password)
+        # 生成時にはログインしない
+        self.mock_login.assert_not_called()
+        self.assertEqual(self.username, actual.username)
+        self.assertEqual(self.password, actual.password)
+        self.assertNotIn(self.password.password, repr(actual))
         self.assertTrue(hasattr(actual, "base_path"))
         self.assertEqual(self.base_path, actual.base_path)
 
@@ -53,6 +65,7 @@ class TestNijieFetcher(unittest.TestCase):
         self.assertEqual(expect, actual.HEADERS)
         expect = "./config/nijie_cookie.json"
         self.assertEqual(expect, actual.NIJIE_COOKIE_PATH)
+        self.assertEqual("nijie", actual.SESSION_NAME)
 
         # 異常系
         with self.assertRaises(TypeError):
@@ -62,8 +75,40 @@ class TestNijieFetcher(unittest.TestCase):
         with self.assertRaises(TypeError):
             actual = NijieFetcher(self.username, self.password, "invalid args")
 
-    def test_login(self):
+    def test_cookies(self):
         fetcher = self._get_instance()
+        self.mock_login.assert_not_called()
+
+        # 初回アクセス時にログインする
+        actual = fetcher.cookies
+        self.assertEqual(self.mock_login.return_value, actual)
+        self.mock_login.assert_called_once_with(self.username, self.password)
+
+        # 2回目以降は同じクッキーを使う
+        self.mock_login.reset_mock()
+        actual = fetcher.cookies
+        self.assertEqual(self.mock_login.return_value, actual)
+        self.mock_login.assert_not_called()
+
+        # 同じユーザーIDの別インスタンスとも共有する
+        other = NijieFetcher(self.username, self.password, self.base_path)
+        self.assertIs(fetcher.cookies, other.cookies)
+        self.mock_login.assert_not_called()
+
+        # ログインに失敗した場合は保持せず、次回アクセス時に再度ログインする
+        self.session_registry.clear()
+        self.mock_login.side_effect = ValueError
+        with self.assertRaises(ValueError):
+            actual = fetcher.cookies
+        self.mock_login.side_effect = None
+        actual = fetcher.cookies
+        self.assertEqual(self.mock_login.return_value, actual)
+        self.assertEqual(2, self.mock_login.call_count)
+
+    def test_login(self):
+        self.username = Username("ユーザー1_ID")
+        self.password = Password("ユーザー1_PW")
+        fetcher = NijieFetcher(self.username, self.password, Path(self.TBP))
         ncp = self.TBP / fetcher.NIJIE_COOKIE_PATH
         object.__setattr__(fetcher, "NIJIE_COOKIE_PATH", str(ncp))
 
@@ -71,8 +116,12 @@ class TestNijieFetcher(unittest.TestCase):
             mock_path_open = stack.enter_context(
                 patch("media_downloader.link_search.nijie.nijie_fetcher.Path.open", mock_open())
             )
-            mock_get = stack.enter_context(patch("media_downloader.link_search.nijie.nijie_fetcher.httpx.get"))
-            mock_post = stack.enter_context(patch("media_downloader.link_search.nijie.nijie_fetcher.httpx.post"))
+            mock_http_client_pool = stack.enter_context(
+                patch("media_downloader.link_search.nijie.nijie_fetcher.http_client_pool")
+            )
+            mock_session = mock_http_client_pool.create.return_value
+            mock_get = mock_session.get
+            mock_post = mock_session.post
             mock_nijie_cookie = stack.enter_context(
                 patch("media_downloader.link_search.nijie.nijie_fetcher.NijieCookie")
             )
@@ -84,7 +133,7 @@ class TestNijieFetcher(unittest.TestCase):
 
             mock_get_res = MagicMock()
             mock_get_res.url = "https://nijie.info/for_login_url?url=for_login_url"
-            mock_get.side_effect = lambda url, headers, follow_redirects: mock_get_res
+            mock_get.side_effect = lambda url, headers: mock_get_res
 
             jar = httpx.Cookies()
             jar.set(
@@ -95,14 +144,17 @@ class TestNijieFetcher(unittest.TestCase):
             )
             mock_post_res = MagicMock()
             mock_post_res.cookies = jar
-            mock_post.side_effect = lambda url, data, follow_redirects: mock_post_res
+            mock_post.side_effect = lambda url, data: mock_post_res
 
-            mock_nijie_cookie.side_effect = lambda cookies, headers: "dummy_nijie_cookies"
+            mock_nijie_cookie.side_effect = lambda cookies, headers, validated_at, clients: NijieCookie(
+                cookies, headers, validated_at, clients
+            )
+            now = time.time()
             actual = fetcher.login(self.username, self.password)
 
-            mock_get.assert_called_once_with(
-                "https://nijie.info/age_jump.php?url=", headers=fetcher.HEADERS, follow_redirects=True
-            )
+            # ログインには専用の Client を生成し、以降のDLでも使い回す
+            mock_http_client_pool.create.assert_called_once_with()
+            mock_get.assert_called_once_with("https://nijie.info/age_jump.php?url=", headers=fetcher.HEADERS)
             mock_get_res.raise_for_status.assert_called_once_with()
 
             payload = {
@@ -112,9 +164,20 @@ class TestNijieFetcher(unittest.TestCase):
                 "ticket": "",
                 "url": "for_login_url",
             }
-            mock_post.assert_called_once_with("https://nijie.info/login_int.php", data=payload, follow_redirects=True)
+            mock_post.assert_called_once_with("https://nijie.info/login_int.php", data=payload)
             mock_post_res.raise_for_status.assert_called_once_with()
-            mock_nijie_cookie.assert_called_once_with(jar, fetcher.HEADERS)
+            mock_nijie_cookie.assert_called_once_with(jar, fetcher.HEADERS, ANY, ANY)
+            self.assertIs(mock_session, actual.client)
+
+            # ログイン直後のクッキーは確認済として扱い、確認日時とともに保存する
+            self.assertTrue(actual.is_fresh)
+            self.assertGreaterEqual(actual.validated_at, now)
+            saved = orjson.loads(mock_path_open().write.call_args.args[0])
+            self.assertEqual(actual.validated_at, saved["validated_at"])
+            expect = [
+                {"name": "dummy_name", "value": "dummy_value", "expires": None, "path": "/", "domain": ".dummy.domain"}
+            ]
+            self.assertEqual(expect, saved["cookies"])
 
         with ExitStack() as stack:
             mock_read_bytes = stack.enter_context(
@@ -139,6 +202,7 @@ class TestNijieFetcher(unittest.TestCase):
 
             actual = fetcher.login(self.username, self.password)
 
+            # 旧形式（クッキーのリストのみ）の場合は未確認として読み込む
             jar = httpx.Cookies()
             jar.set(
                 name="dummy_name",
@@ -146,7 +210,41 @@ class TestNijieFetcher(unittest.TestCase):
                 path="/",
                 domain=".dummy.domain",
             )
-            mock_nijie_cookie.assert_called_once_with(jar, fetcher.HEADERS)
+            mock_nijie_cookie.assert_called_once_with(jar, fetcher.HEADERS, None)
+            actual_jar = mock_nijie_cookie.call_args.args[0].jar
+            self.assertEqual([None], [c.expires for c in actual_jar])
+
+            # 確認日時が記録されている場合はそれを引き継ぐ
+            mock_nijie_cookie.reset_mock()
+            mock_read_bytes.return_value = f'{{"validated_at": 1000000000.0, "cookies": {read_data}}}'
+            actual = fetcher.login(self.username, self.password)
+            mock_nijie_cookie.assert_called_once_with(jar, fetcher.HEADERS, 1000000000.0)
+
+            # 有効期限付きのクッキーは期限を反映して読み込む
+            mock_nijie_cookie.reset_mock()
+            expires = int(time.time()) + 3600
+            mock_read_bytes.return_value = read_data.replace('"expires": null', f'"expires": {expires}')
+            actual = fetcher.login(self.username, self.password)
+            mock_nijie_cookie.assert_called_once_with(jar, fetcher.HEADERS, None)
+            actual_jar = mock_nijie_cookie.call_args.args[0].jar
+            self.assertEqual([expires], [c.expires for c in actual_jar])
+            self.assertEqual([".dummy.domain"], [c.domain for c in actual_jar])
+
+            # 期限切れのクッキーが含まれている場合は読み込まずにログインし直す
+            mock_nijie_cookie.reset_mock()
+            expires = int(time.time()) - 1
+            mock_read_bytes.return_value = read_data.replace('"expires": null', f'"expires": {expires}')
+            mock_http_client_pool = stack.enter_context(
+                patch("media_downloader.link_search.nijie.nijie_fetcher.http_client_pool")
+            )
+            mock_get = mock_http_client_pool.create.return_value.get
+            mock_get.side_effect = ValueError
+            with self.assertRaises(ValueError):
+                actual = fetcher.login(self.username, self.password)
+            mock_nijie_cookie.assert_not_called()
+            mock_get.assert_called_once()
+            # ログインに失敗した場合は生成した Client を閉じる
+            mock_http_client_pool.create.return_value.close.assert_called_once_with()
 
             if ncp.exists():
                 shutil.rmtree(ncp.parent)
@@ -157,6 +255,43 @@ class TestNijieFetcher(unittest.TestCase):
             with self.assertRaises(TypeError):
                 actual = fetcher.login(self.username, "invalid argument")
 
+    def test_fetch_validate_lazily(self):
+        with ExitStack() as stack:
+            mock_nijie_downloader = stack.enter_context(
+                patch("media_downloader.link_search.nijie.nijie_fetcher.NijieDownloader")
+            )
+            m_manifest = stack.enter_context(
+                patch("media_downloader.link_search.nijie.nijie_fetcher.download_manifest")
+            )
+            m_manifest.get.return_value = None
+            mock_save_cookies = stack.enter_context(
+                patch("media_downloader.link_search.nijie.nijie_fetcher.NijieFetcher._save_cookies")
+            )
+
+            fetcher = self._get_instance()
+            jar = httpx.Cookies()
+            jar.set(name="dummy_name", value="dummy_value", domain=".dummy.domain")
+            # 確認済の期間外のクッキー
+            stale_cookies = NijieCookie(jar, fetcher.HEADERS, time.time() - NijieCookie.FRESHNESS_WINDOW - 1)
+            self.assertFalse(stale_cookies.is_fresh)
+            self.mock_login.return_value = stale_cookies
+            url = URL("https://nijie.info/view_popup.php?id=11111111")
+
+            # 最初のリクエストが年齢確認画面にリダイレクトされなければ有効と確認できたとして記録する
+            actual = fetcher.fetch(url)
+            self.assertEqual(mock_nijie_downloader.return_value.download.return_value, actual)
+            mock_nijie_downloader.assert_called_once_with(NijieURL.create(url), fetcher.base_path, stale_cookies)
+            validated_cookies = fetcher.cookies
+            self.assertIsNot(stale_cookies, validated_cookies)
+            self.assertTrue(validated_cookies.is_fresh)
+            mock_save_cookies.assert_called_once_with(validated_cookies)
+            self.mock_login.assert_called_once_with(self.username, self.password)
+
+            # 確認済のクッキーは再度記録しない
+            mock_save_cookies.reset_mock()
+            actual = fetcher.fetch(url)
+            mock_save_cookies.assert_not_called()
+
     def test_is_target_url(self):
         fetcher = self._get_instance()
 
@@ -180,22 +315,117 @@ class TestNijieFetcher(unittest.TestCase):
         with self.assertRaises(TypeError):
             actual = fetcher.is_target_url("invalid argument")
 
+    def test_work_key(self):
+        fetcher = self._get_instance()
+
+        # view.php と view_popup.php は同じ作品キーになる
+        expect = WorkKey("nijie", 11111111)
+        self.assertEqual(expect, fetcher.work_key(URL("https://nijie.info/view.php?id=11111111")))
+        self.assertEqual(expect, fetcher.work_key(URL("https://nijie.info/view_popup.php?id=11111111")))
+
+        with self.assertRaises(ValueError):
+            actual = fetcher.work_key(URL("https://invalid.url/view_popup.php?id=11111111"))
+
+    def test_fetch_relogin(self):
+        fetcher = NijieFetcher(Username("ユーザー1_ID"), Password("ユーザー1_PW"), Path(self.TBP))
+        ncp = self.TBP / "relogin" / "nijie_cookie.json"
+        object.__setattr__(fetcher, "NIJIE_COOKIE_PATH", str(ncp))
+
+        # 保存済のクッキー、サーバーには拒否される
+        ncp.parent.mkdir(parents=True, exist_ok=True)
+        stale = [{"name": "session", "value": "stale", "expires": None, "path": "/", "domain": ".nijie.info"}]
+        ncp.write_bytes(orjson.dumps({"validated_at": time.time(), "cookies": stale}))
+
+        mock_http_client_pool = self.enterContext(
+            patch("media_downloader.link_search.nijie.nijie_fetcher.http_client_pool")
+        )
+        mock_session = mock_http_client_pool.create.return_value
+        mock_session.get.return_value.url = "https://nijie.info/age_jump.php?url=for_login_url"
+        new_jar = httpx.Cookies()
+        new_jar.set(name="session", value="new", path="/", domain=".nijie.info")
+        mock_session.post.return_value.cookies = new_jar
+        m_manifest = self.enterContext(patch("media_downloader.link_search.nijie.nijie_fetcher.download_manifest"))
+        m_manifest.get.return_value = None
+        mock_nijie_downloader = self.enterContext(
+            patch("media_downloader.link_search.nijie.nijie_fetcher.NijieDownloader")
+        )
+        mock_nijie_downloader.return_value.download.side_effect = [SessionRejectedError, DownloadResult.SUCCESS]
+
+        actual = fetcher.fetch("https://nijie.info/view_popup.php?id=11111111")
+        self.assertEqual(DownloadResult.SUCCESS, actual)
+
+        # 1回目は保存済のクッキー、再試行はログインし直して取得したクッキーを使う
+        used_cookies = [c.args[2] for c in mock_nijie_downloader.call_args_list]
+        self.assertEqual(["stale"], [c.value for c in used_cookies[0]._cookies.jar])
+        self.assertEqual(["new"], [c.value for c in used_cookies[1]._cookies.jar])
+        mock_http_client_pool.create.assert_called_once_with()
+        mock_session.post.assert_called_once()
+
+        # ログインし直したクッキーを保存する
+        saved = orjson.loads(ncp.read_bytes())
+        self.assertEqual(["new"], [c["value"] for c in saved["cookies"]])
+        self.assertIs(used_cookies[1], fetcher.cookies)
+
     def test_fetch(self):
         with ExitStack() as stack:
             mock_nijie_downloader = stack.enter_context(
                 patch("media_downloader.link_search.nijie.nijie_fetcher.NijieDownloader")
             )
+            m_manifest = stack.enter_context(
+                patch("media_downloader.link_search.nijie.nijie_fetcher.download_manifest")
+            )
+            m_manifest.get.return_value = None
 
             fetcher = self._get_instance()
             nijie_url = f"https://nijie.info/view_popup.php?id=11111111"
             url = URL(nijie_url)
 
+            # DL済作品の台帳に記録があればログインせずにスキップ
+            m_manifest.get.return_value = MagicMock()
             actual = fetcher.fetch(url)
+            self.assertEqual(DownloadResult.PASSED, actual)
+            self.mock_login.assert_not_called()
+
+            m_manifest.get.return_value = None
+            actual = fetcher.fetch(url)
+            self.mock_login.assert_called_once_with(self.username, self.password)
 
             f_calls = mock_nijie_downloader.mock_calls
             self.assertEqual(2, len(f_calls))
             self.assertEqual(call(NijieURL.create(url), fetcher.base_path, fetcher.cookies), f_calls[0])
             self.assertEqual(call().download(), f_calls[1])
+            self.assertEqual(mock_nijie_downloader.return_value.download.return_value, actual)
+
+            # DL済作品の台帳に記録があればネットワークに触れずにスキップ
+            mock_nijie_downloader.reset_mock()
+            m_manifest.get.return_value = MagicMock()
+            actual = fetcher.fetch(url)
+            self.assertEqual(DownloadResult.PASSED, actual)
+            m_manifest.get.assert_called_with(mock_nijie_downloader.SITE_NAME, 11111111)
+            mock_nijie_downloader.assert_not_called()
+
+            # クッキーが拒否された場合は一度だけログインし直して再試行する
+            m_manifest.get.return_value = None
+            self.mock_login.reset_mock()
+            stale_cookies = fetcher.cookies
+            new_cookies = MagicMock(expires_at=None)
+            self.mock_login.return_value = new_cookies
+            mock_nijie_downloader.return_value.download.side_effect = [SessionRejectedError, DownloadResult.SUCCESS]
+            actual = fetcher.fetch(url)
+            self.assertEqual(DownloadResult.SUCCESS, actual)
+            # 保存済のクッキーは拒否されたものと同じであるため使わずにログインする
+            self.mock_login.assert_called_once_with(self.username, self.password, use_saved_cookies=False)
+            self.assertEqual(
+                call(NijieURL.create(url), fetcher.base_path, stale_cookies), mock_nijie_downloader.call_args_list[0]
+            )
+            self.assertEqual(
+                call(NijieURL.create(url), fetcher.base_path, new_cookies), mock_nijie_downloader.call_args_list[1]
+            )
+
+            # 再試行しても拒否された場合はそのまま送出する
+            mock_nijie_downloader.return_value.download.side_effect = SessionRejectedError
+            with self.assertRaises(SessionRejectedError):
+                actual = fetcher.fetch(url)
 
             with self.assertRaises(TypeError):
                 actual = fetcher.fetch(-1)
@@ -6,6 +6,7 @@ import sys
 import unittest
 from pathlib import Path
 
+from media_downloader.link_search.author_directory_index import AuthorDirectoryIndex
 from media_downloader.link_search.nijie.authorid import Authorid
 from media_downloader.link_search.nijie.authorname import Authorname
 from media_downloader.link_search.nijie.nijie_page_info import NijiePageInfo
@@ -17,6 +18,10 @@ from media_downloader.link_search.nijie.worktitle import Worktitle
 
 
 class TestNijieSaveDirectoryPath(unittest.TestCase):
+    def tearDown(self):
+        (Path("./tests/link_search/nijie") / AuthorDirectoryIndex.INDEX_FILE_NAME).unlink(missing_ok=True)
+        AuthorDirectoryIndex.reset()
+
     def test_is_valid(self):
         author_name = Authorname("作者名1")
         author_id = Authorid(1234567)
@@ -10,6 +10,7 @@ import urllib.parse
 from media_downloader.link_search.nijie.nijie_url import NijieURL
 from media_downloader.link_search.nijie.workid import Workid
 from media_downloader.link_search.url import URL
+from media_downloader.link_search.work_key import WorkKey
 
 
 class TestNijieURL(unittest.TestCase):
@@ -55,6 +56,17 @@ class TestNijieURL(unittest.TestCase):
         actual2 = NijieURL.create(url)
         self.assertEqual(actual1, actual2)
 
+    def test_work_key(self):
+        # view.php と view_popup.php、http と https は同じ作品として扱う
+        urls = [
+            "https://nijie.info/view.php?id=251267",
+            "http://nijie.info/view.php?id=251267",
+            "https://nijie.info/view_popup.php?id=251267",
+        ]
+        for url in urls:
+            self.assertEqual(WorkKey("nijie", 251267), NijieURL.create(url).work_key)
+        self.assertNotEqual(WorkKey("nijie", 251268), NijieURL.create(urls[0]).work_key)
+
 
 if __name__ == "__main__":
     if sys.argv:
@@ -1,16 +1,20 @@
 import sys
+import time
 import unittest
 from contextlib import ExitStack
 from logging import WARNING, getLogger
 from pathlib import Path
 
-from mock import patch
+from mock import MagicMock, call, patch
 
 from media_downloader.link_search.password import Password
 from media_downloader.link_search.pixiv.pixiv_fetcher import PixivFetcher
+from media_downloader.link_search.pixiv.pixiv_work_downloader import DownloadResult
 from media_downloader.link_search.pixiv.pixiv_work_url import PixivWorkURL
+from media_downloader.link_search.session_registry import SessionRegistry, SessionRejectedError
 from media_downloader.link_search.url import URL
 from media_downloader.link_search.username import Username
+from media_downloader.link_search.work_key import WorkKey
 
 logger = getLogger("media_downloader.link_search.pixiv.pixiv_fetcher")
 logger.setLevel(WARNING)
@@ -19,6 +23,9 @@ logger.setLevel(WARNING)
 class TestPixivFetcher(unittest.TestCase):
     def setUp(self):
         self.TBP = Path("./tests/link_search/pixiv")
+        self.session_registry = self.enterContext(
+            patch("media_downloader.link_search.pixiv.pixiv_fetcher.session_registry", SessionRegistry())
+        )
 
     def get_instance(self):
         with ExitStack() as stack:
@@ -42,11 +49,15 @@ class TestPixivFetcher(unittest.TestCase):
 
             # 正常系
             actual = PixivFetcher(username, password, base_path)
-            self.assertEqual(True, hasattr(actual, "aapi"))
-            m_login.assert_called_once_with(username, password)
+            # 生成時にはログインしない
+            m_login.assert_not_called()
+            self.assertEqual(username, actual.username)
+            self.assertEqual(password, actual.password)
+            self.assertNotIn(password.password, repr(actual))
             self.assertEqual(True, hasattr(actual, "base_path"))
             self.assertEqual(base_path, actual.base_path)
             self.assertEqual(REFRESH_TOKEN_PATH, actual.REFRESH_TOKEN_PATH)
+            self.assertEqual("pixiv", actual.SESSION_NAME)
 
             # 異常系
             with self.assertRaises(TypeError):
@@ -56,6 +67,50 @@ class TestPixivFetcher(unittest.TestCase):
             with self.assertRaises(TypeError):
                 actual = PixivFetcher(username, password, "invalid args")
 
+    def test_aapi(self):
+        with ExitStack() as stack:
+            m_login = stack.enter_context(patch("media_downloader.link_search.pixiv.pixiv_fetcher.PixivFetcher.login"))
+            username = Username("ユーザー1_ID")
+            password = Password("ユーザー1_PW")
+            fetcher = self.get_instance()
+            m_login.assert_not_called()
+
+            # 初回アクセス時にログインする
+            actual = fetcher.aapi
+            self.assertEqual(m_login.return_value, actual)
+            m_login.assert_called_once_with(username, password)
+
+            # 2回目以降、同じユーザーIDの別インスタンスでも同じ aapi を使う
+            m_login.reset_mock()
+            other = PixivFetcher(username, password, Path(self.TBP))
+            self.assertIs(fetcher.aapi, other.aapi)
+            m_login.assert_not_called()
+
+            # 別ユーザーIDならば別にログインする
+            another = PixivFetcher(Username("ユーザー2_ID"), password, Path(self.TBP))
+            self.assertEqual(m_login.return_value, another.aapi)
+            m_login.assert_called_once_with(Username("ユーザー2_ID"), password)
+
+            # アクセストークンの有効期限が切れたらログインし直す
+            m_login.reset_mock()
+            expires_at = self.session_registry.expires_at(fetcher.session_key)
+            self.assertAlmostEqual(time.time() + fetcher.ACCESS_TOKEN_TTL, expires_at, delta=10)
+            with patch("media_downloader.link_search.session_registry.time") as mock_time:
+                mock_time.time.return_value = expires_at
+                actual = fetcher.aapi
+            m_login.assert_called_once_with(username, password)
+
+            # ログインに失敗した場合は保持せず、次回アクセス時に再度ログインする
+            self.session_registry.clear()
+            m_login.reset_mock()
+            m_login.side_effect = ValueError
+            with self.assertRaises(ValueError):
+                actual = fetcher.aapi
+            m_login.side_effect = None
+            actual = fetcher.aapi
+            self.assertEqual(m_login.return_value, actual)
+            self.assertEqual(2, m_login.call_count)
+
     def test_login(self):
         with ExitStack() as stack:
             mock_aapi = stack.enter_context(patch("media_downloader.link_search.pixiv.pixiv_fetcher.AppPixivAPI"))
@@ -104,6 +159,15 @@ class TestPixivFetcher(unittest.TestCase):
         actual = fetcher.is_target_url(url)
         self.assertEqual(False, actual)
 
+    def test_work_key(self):
+        fetcher = self.get_instance()
+
+        actual = fetcher.work_key(URL("https://www.pixiv.net/artworks/86704541?query=1"))
+        self.assertEqual(WorkKey("pixiv", 86704541), actual)
+
+        with self.assertRaises(ValueError):
+            actual = fetcher.work_key(URL("https://invalid.url/"))
+
     def test_fetch(self):
         with ExitStack() as stack:
             m_pixiv_source_list = stack.enter_context(
@@ -115,13 +179,26 @@ class TestPixivFetcher(unittest.TestCase):
             m_downloader = stack.enter_context(
                 patch("media_downloader.link_search.pixiv.pixiv_fetcher.PixivWorkDownloader")
             )
+            m_manifest = stack.enter_context(
+                patch("media_downloader.link_search.pixiv.pixiv_fetcher.download_manifest")
+            )
+            m_login = stack.enter_context(patch("media_downloader.link_search.pixiv.pixiv_fetcher.PixivFetcher.login"))
 
             fetcher = self.get_instance()
 
             work_url = f"https://www.pixiv.net/artworks/86704541?query=1"
             pixiv_work_url = PixivWorkURL.create(work_url)
+
+            # DL済作品の台帳に記録があればログインせずにスキップ
+            m_manifest.get.return_value = MagicMock()
+            actual = fetcher.fetch(work_url)
+            self.assertEqual(DownloadResult.PASSED, actual)
+            m_login.assert_not_called()
+
+            m_manifest.get.return_value = None
             actual = fetcher.fetch(work_url)
-            self.assertEqual(None, actual)
+            m_login.assert_called_once()
+            self.assertEqual(m_downloader.return_value.download.return_value, actual)
             m_pixiv_source_list.create.assert_called_once_with(fetcher.aapi, pixiv_work_url)
             m_pixiv_save_directory_path.create.assert_called_once_with(fetcher.aapi, pixiv_work_url, fetcher.base_path)
             m_downloader.assert_called_once_with(
@@ -129,6 +206,36 @@ class TestPixivFetcher(unittest.TestCase):
             )
             m_downloader().download.assert_called_once_with()
 
+            # DL済作品の台帳に記録があればネットワークに触れずにスキップ
+            m_pixiv_source_list.reset_mock()
+            m_pixiv_save_directory_path.reset_mock()
+            m_downloader.reset_mock()
+            m_manifest.get.return_value = MagicMock()
+            actual = fetcher.fetch(work_url)
+            self.assertEqual(DownloadResult.PASSED, actual)
+            m_manifest.get.assert_called_with(m_downloader.SITE_NAME, 86704541)
+            m_pixiv_source_list.create.assert_not_called()
+            m_pixiv_save_directory_path.create.assert_not_called()
+            m_downloader.assert_not_called()
+
+            # アクセストークンが拒否された場合は一度だけログインし直して再試行する
+            m_manifest.get.return_value = None
+            stale_aapi = fetcher.aapi
+            new_aapi = MagicMock()
+            m_login.reset_mock()
+            m_login.return_value = new_aapi
+            m_pixiv_source_list.create.side_effect = [SessionRejectedError, m_pixiv_source_list.create.return_value]
+            actual = fetcher.fetch(work_url)
+            self.assertEqual(m_downloader.return_value.download.return_value, actual)
+            m_login.assert_called_once()
+            self.assertEqual(
+                [call(stale_aapi, pixiv_work_url), call(new_aapi, pixiv_work_url)],
+                m_pixiv_source_list.create.call_args_list,
+            )
+            m_downloader.assert_called_once_with(
+                new_aapi, m_pixiv_source_list.create.return_value, m_pixiv_save_directory_path.create.return_value
+            )
+
 
 if __name__ == "__main__":
     if sys.argv:
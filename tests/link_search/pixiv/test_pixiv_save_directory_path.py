@@ -6,15 +6,27 @@ from pathlib import Path
 
 from mock import MagicMock, mock_open, patch
 
+from media_downloader.link_search.author_directory_index import AuthorDirectoryIndex
 from media_downloader.link_search.pixiv.authorid import Authorid
 from media_downloader.link_search.pixiv.authorname import Authorname
 from media_downloader.link_search.pixiv.pixiv_save_directory_path import PixivSaveDirectoryPath
+from media_downloader.link_search.pixiv.pixiv_work_cache import pixiv_work_cache
 from media_downloader.link_search.pixiv.pixiv_work_url import PixivWorkURL
 from media_downloader.link_search.pixiv.workid import Workid
 from media_downloader.link_search.pixiv.worktitle import Worktitle
 
 
 class TestPixivSaveDirectoryPath(unittest.TestCase):
+    def setUp(self):
+        self.mock_rate_limiter = self.enterContext(
+            patch("media_downloader.link_search.pixiv.pixiv_work_cache.rate_limiter")
+        )
+        pixiv_work_cache.clear()
+
+    def tearDown(self):
+        (Path("./tests/link_search/pixiv") / AuthorDirectoryIndex.INDEX_FILE_NAME).unlink(missing_ok=True)
+        AuthorDirectoryIndex.reset()
+
     def mock_aapi(self, work_id, work_title, author_id, author_name, error_occur) -> MagicMock:
         aapi = MagicMock()
         illust = MagicMock()
@@ -81,6 +93,7 @@ class TestPixivSaveDirectoryPath(unittest.TestCase):
         actual = PixivSaveDirectoryPath.create(m_aapi, work_url, base_path).path
         self.assertEqual(expect, actual)
 
+        pixiv_work_cache.clear()
         m_aapi = self.mock_aapi(work_id, work_title, author_id, author_name, True)
         with self.assertRaises(ValueError):
             actual = PixivSaveDirectoryPath.create(m_aapi, work_url, base_path).path
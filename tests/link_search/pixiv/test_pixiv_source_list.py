@@ -3,15 +3,22 @@ import unittest
 from copy import deepcopy
 from typing import Iterable
 
-from mock import MagicMock
+from mock import MagicMock, patch
 from pixivpy3 import AppPixivAPI
 
 from media_downloader.link_search.pixiv.pixiv_source_list import PixivSourceList
+from media_downloader.link_search.pixiv.pixiv_work_cache import pixiv_work_cache
 from media_downloader.link_search.pixiv.pixiv_work_url import PixivWorkURL
 from media_downloader.link_search.url import URL
 
 
 class TestPixivSourceList(unittest.TestCase):
+    def setUp(self):
+        self.mock_rate_limiter = self.enterContext(
+            patch("media_downloader.link_search.pixiv.pixiv_work_cache.rate_limiter")
+        )
+        pixiv_work_cache.clear()
+
     def test_PixivSourceList(self):
         work_url = "https://www.pixiv.net/artworks/1111111{}"
         work_urls = [URL(work_url.format(i)) for i in range(10)]
@@ -39,6 +46,7 @@ class TestPixivSourceList(unittest.TestCase):
 
         # 漫画形式
         work_url = "https://www.pixiv.net/artworks/1111111{}"
+        pixiv_work_cache.clear()
         work_urls = [URL(work_url.format(i)) for i in range(10)]
         pixiv_url = PixivWorkURL.create(work_url.format(0))
         mock_works = MagicMock()
@@ -59,6 +67,7 @@ class TestPixivSourceList(unittest.TestCase):
         self.assertEqual(expect, actual)
 
         with self.assertRaises(ValueError):
+            pixiv_work_cache.clear()
             mock_works.error = True
             mock_aapi.illust_detail.side_effect = lambda work_id: mock_works
             actual = PixivSourceList.create(mock_aapi, pixiv_url)
@@ -2,6 +2,7 @@ import re
 import shutil
 import sys
 import unittest
+import zipfile
 from contextlib import ExitStack
 from logging import WARNING, getLogger
 from pathlib import Path
@@ -12,6 +13,7 @@ from pixivpy3 import AppPixivAPI
 from media_downloader.link_search.pixiv.authorid import Authorid
 from media_downloader.link_search.pixiv.authorname import Authorname
 from media_downloader.link_search.pixiv.pixiv_ugoira_downloader import DownloadResult, PixivUgoiraDownloader
+from media_downloader.link_search.pixiv.pixiv_work_cache import pixiv_work_cache
 from media_downloader.link_search.pixiv.workid import Workid
 from media_downloader.link_search.pixiv.worktitle import Worktitle
 
@@ -36,7 +38,8 @@ class TestPixivUgoiraDownloader(unittest.TestCase):
         works.illust = illust
 
         metadata = MagicMock()
-        metadata.ugoira_metadata.frames = [{"delay": 10} for i in range(10)]
+        metadata.ugoira_metadata.frames = [{"file": f"{i:06}.jpg", "delay": 10} for i in range(10)]
+        metadata.ugoira_metadata.zip_urls.medium = original_image_url.replace("_ugoira0.jpg", "_ugoira600x600.zip")
 
         def download(url: str, path: str):
             name = url.rsplit("/", 1)[1]
@@ -81,12 +84,44 @@ class TestPixivUgoiraDownloader(unittest.TestCase):
         with self.assertRaises(TypeError):
             actual = PixivUgoiraDownloader(aapi, work_id, "invalid argument")
 
-    def test_download(self):
+    def test_configure(self):
+        self.addCleanup(PixivUgoiraDownloader.configure)
+        self.assertTrue(PixivUgoiraDownloader.USE_ZIP)
+        PixivUgoiraDownloader.configure(False)
+        self.assertFalse(PixivUgoiraDownloader.USE_ZIP)
+        PixivUgoiraDownloader.configure()
+        self.assertTrue(PixivUgoiraDownloader.USE_ZIP)
+        with self.assertRaises(TypeError):
+            PixivUgoiraDownloader.configure("invalid argument")
+
+    def test_download_zip(self):
         with ExitStack() as stack:
-            mock_sleep = stack.enter_context(patch("media_downloader.link_search.pixiv.pixiv_ugoira_downloader.sleep"))
-            mock_image = stack.enter_context(patch("media_downloader.link_search.pixiv.pixiv_ugoira_downloader.Image"))
+            mock_rate_limiter = stack.enter_context(
+                patch("media_downloader.link_search.pixiv.pixiv_ugoira_downloader.rate_limiter")
+            )
+            mock_cache_rate_limiter = stack.enter_context(
+                patch("media_downloader.link_search.pixiv.pixiv_work_cache.rate_limiter")
+            )
+            mock_encoder = stack.enter_context(
+                patch("media_downloader.link_search.pixiv.pixiv_ugoira_downloader.ugoira_encoder")
+            )
+            mock_http_client_pool = stack.enter_context(
+                patch("media_downloader.link_search.pixiv.pixiv_ugoira_downloader.http_client_pool")
+            )
+            mock_stream_downloader = stack.enter_context(
+                patch("media_downloader.link_search.pixiv.pixiv_ugoira_downloader.StreamDownloader")
+            )
+            pixiv_work_cache.clear()
             mock_logger_info = stack.enter_context(patch.object(logger, "info"))
 
+            def download(url: str, save_path: Path, **kwargs) -> Path:
+                with zipfile.ZipFile(save_path, "w") as zf:
+                    for i in reversed(range(10)):
+                        zf.writestr(f"{i:06}.jpg", url)
+                return save_path
+
+            mock_stream_downloader.return_value.download.side_effect = download
+
             work_id = Workid(123456789)
             work_title = Worktitle("作品名1")
             author_id = Authorid(1234567)
@@ -99,42 +134,125 @@ class TestPixivUgoiraDownloader(unittest.TestCase):
             if sd_path.is_dir():
                 shutil.rmtree(sd_path)
 
+            mock_on_done = MagicMock()
+            actual = PixivUgoiraDownloader(mock_aapi, work_id, base_path).download(mock_on_done)
+            expect = DownloadResult.SUCCESS
+            self.assertIs(expect, actual)
+
+            # 各フレームは原寸のzipとして1回のリクエストで取得し、フレームごとのDLは行わない
+            zip_url = "https://www.pixiv.net/artworks/12346578_ugoira1920x1080.zip"
+            staging_path = base_path / f".{work_title.title}({work_id.id}).staging"
+            zip_path = staging_path / "12346578_ugoira1920x1080.zip"
+            a_calls = mock_aapi.mock_calls
+            self.assertEqual(2, len(a_calls))
+            self.assertEqual(call.illust_detail(work_id.id), a_calls[0])
+            self.assertEqual(call.ugoira_metadata(work_id.id), a_calls[1])
+            mock_http_client_pool.get.assert_called_once_with(PixivUgoiraDownloader.HTTP_CLIENT_NAME)
+            mock_stream_downloader.assert_called_once_with(mock_http_client_pool.get.return_value)
+            mock_stream_downloader.return_value.download.assert_called_once_with(
+                zip_url, zip_path, headers=PixivUgoiraDownloader.HEADERS
+            )
+
+            # zip内の各フレームはメタデータの順に、展開せずにエンコーダに渡す
+            mock_encoder.submit.assert_called_once()
+            frames, delays, save_path, commit, archive = mock_encoder.submit.call_args.args
+            self.assertEqual([f"{i:06}.jpg" for i in range(10)], frames)
+            self.assertEqual([10 for _ in range(10)], delays)
+            self.assertEqual(base_path / f"{work_title.title}({work_id.id})", save_path)
+            self.assertEqual(zip_path, archive)
+            self.assertEqual(1, len(list(staging_path.glob("*"))))
+
+            # gifの保存が完了したらzipごと各フレームのディレクトリにリネームして on_done を呼び出す
+            self.assertFalse(sd_path.exists())
+            commit()
+            self.assertFalse(staging_path.exists())
+            self.assertEqual([sd_path / zip_path.name], list(sd_path.glob("*")))
+            mock_on_done.assert_called_once_with()
+
+            # 中断していた場合、DL済のzipは再DLしない
+            shutil.rmtree(sd_path)
+            staging_path.mkdir(parents=True)
+            download(zip_url, zip_path)
+            mock_encoder.reset_mock()
+            mock_stream_downloader.reset_mock()
             actual = PixivUgoiraDownloader(mock_aapi, work_id, base_path).download()
+            self.assertIs(DownloadResult.SUCCESS, actual)
+            mock_stream_downloader.return_value.download.assert_not_called()
+            self.assertEqual(zip_path, mock_encoder.submit.call_args.args[4])
+
+            if staging_path.is_dir():
+                shutil.rmtree(staging_path)
+
+    def test_download(self):
+        self.addCleanup(PixivUgoiraDownloader.configure)
+        PixivUgoiraDownloader.configure(False)
+        with ExitStack() as stack:
+            mock_rate_limiter = stack.enter_context(
+                patch("media_downloader.link_search.pixiv.pixiv_ugoira_downloader.rate_limiter")
+            )
+            mock_cache_rate_limiter = stack.enter_context(
+                patch("media_downloader.link_search.pixiv.pixiv_work_cache.rate_limiter")
+            )
+            mock_encoder = stack.enter_context(
+                patch("media_downloader.link_search.pixiv.pixiv_ugoira_downloader.ugoira_encoder")
+            )
+            pixiv_work_cache.clear()
+            mock_logger_info = stack.enter_context(patch.object(logger, "info"))
+
+            work_id = Workid(123456789)
+            work_title = Worktitle("作品名1")
+            author_id = Authorid(1234567)
+            author_name = Authorname("作者名1")
+            original_image_url = "https://www.pixiv.net/artworks/12346578_ugoira0.jpg"
+            mock_aapi = self.mock_aapi(original_image_url, work_title.title, author_id.id, author_name.name)
+
+            base_path = Path("./tests/link_search/pixiv")
+            sd_path = base_path / f"./{work_title.title}({work_id.id})/"
+            if sd_path.is_dir():
+                shutil.rmtree(sd_path)
+
+            mock_on_done = MagicMock()
+            actual = PixivUgoiraDownloader(mock_aapi, work_id, base_path).download(mock_on_done)
             expect = DownloadResult.SUCCESS
             self.assertIs(expect, actual)
 
             ugoira_url = original_image_url.rsplit("0", 1)
             frame_urls = [ugoira_url[0] + str(i) + ugoira_url[1] for i in range(10)]
+            staging_path = base_path / f".{work_title.title}({work_id.id}).staging"
             a_calls = mock_aapi.mock_calls
             self.assertEqual(12, len(a_calls))
             self.assertEqual(call.illust_detail(work_id.id), a_calls[0])
             self.assertEqual(call.ugoira_metadata(work_id.id), a_calls[1])
             for i in range(10):
-                self.assertEqual(call.download(frame_urls[i], path=str(sd_path)), a_calls[2 + i])
-
-            frames = []
-            fr = [(sp.stat().st_mtime, str(sp)) for sp in sd_path.glob("*") if sp.is_file()]
-            for mtime, path in sorted(fr, reverse=False):
-                frames.append(path)
-            name = f"{work_title.title}({work_id.id}).gif"
-            image_list = []
-            delays = [10 for _ in range(10)]
-            i_calls = mock_image.mock_calls
-            self.assertEqual(21, len(i_calls))
-            self.assertEqual(call.open(frames[0]), i_calls[0])
-            self.assertEqual(call.open().copy(), i_calls[1])
-            index = 2
-            for f in frames[1:]:
-                self.assertEqual(call.open(f), i_calls[index])
-                self.assertEqual(call.open().copy(), i_calls[index + 1])
-                index = index + 2
-            # first.save の呼び出し確認は省略
+                self.assertEqual(call.download(frame_urls[i], path=str(staging_path)), a_calls[2 + i])
+
+            # アニメーションgifの生成は別プロセスに依頼する
+            mock_encoder.submit.assert_called_once()
+            frames, delays, save_path, commit, archive = mock_encoder.submit.call_args.args
+            self.assertEqual([staging_path / url.rsplit("/", 1)[1] for url in frame_urls], frames)
+            self.assertTrue(all(frame.is_file() for frame in frames))
+            self.assertIsNone(archive)
+            self.assertEqual([10 for _ in range(10)], delays)
+            self.assertEqual(base_path / f"{work_title.title}({work_id.id})", save_path)
+
+            # gifの保存が完了するまでは各フレームのディレクトリを作らない
+            self.assertFalse(sd_path.exists())
+            mock_on_done.assert_not_called()
+
+            # gifの保存が完了したら各フレームのディレクトリにリネームして on_done を呼び出す
+            commit()
+            self.assertFalse(staging_path.exists())
+            self.assertEqual(10, len(list(sd_path.glob("*"))))
+            mock_on_done.assert_called_once_with()
+            mock_on_done.reset_mock()
 
             # 2回目の呼び出し想定
-            actual = PixivUgoiraDownloader(mock_aapi, work_id, base_path).download()
+            actual = PixivUgoiraDownloader(mock_aapi, work_id, base_path).download(mock_on_done)
             expect = DownloadResult.PASSED
             self.assertIs(expect, actual)
+            mock_on_done.assert_called_once_with()
 
+            pixiv_work_cache.clear()
             mock_aapi = self.mock_aapi(
                 original_image_url, work_title.title, author_id.id, author_name.name, "not ugoira"
             )
@@ -142,6 +260,7 @@ class TestPixivUgoiraDownloader(unittest.TestCase):
             expect = DownloadResult.PASSED
             self.assertIs(expect, actual)
 
+            pixiv_work_cache.clear()
             mock_aapi = self.mock_aapi(
                 original_image_url, work_title.title, author_id.id, author_name.name, "ugoira", True
             )
@@ -0,0 +1,155 @@
+"""PixivWorkCache のテスト"""
+
+import sys
+import unittest
+from pathlib import Path
+
+from mock import MagicMock, patch
+from pixivpy3 import AppPixivAPI
+from pixivpy3.utils import JsonDict
+
+from media_downloader.link_search.pixiv.pixiv_work_cache import PixivWorkCache, is_auth_rejected, pixiv_work_cache
+from media_downloader.link_search.session_registry import SessionRejectedError
+
+
+class TestPixivWorkCache(unittest.TestCase):
+    def setUp(self):
+        self.TBP = Path("./tests/link_search/pixiv")
+        self.db_path = self.TBP / "pixiv_work_cache.db"
+        self.db_path.unlink(missing_ok=True)
+        self.mock_rate_limiter = self.enterContext(
+            patch("media_downloader.link_search.pixiv.pixiv_work_cache.rate_limiter")
+        )
+        self.mock_time = self.enterContext(patch("media_downloader.link_search.pixiv.pixiv_work_cache.time"))
+        self.now = 1000.0
+        self.mock_time.time.side_effect = lambda: self.now
+
+    def tearDown(self):
+        self.db_path.unlink(missing_ok=True)
+
+    def mock_aapi(self, error: bool = False, message: str = "error") -> MagicMock:
+        aapi = MagicMock(spec=AppPixivAPI)
+
+        def illust_detail(work_id):
+            if error:
+                return JsonDict({"error": JsonDict({"message": message}), "illust": None})
+            return JsonDict({
+                "error": None,
+                "illust": JsonDict({"id": work_id, "title": f"作品名{work_id}", "page_count": 1}),
+            })
+
+        aapi.illust_detail.side_effect = illust_detail
+        return aapi
+
+    def test_PixivWorkCache(self):
+        self.assertIsInstance(pixiv_work_cache, PixivWorkCache)
+
+        cache = PixivWorkCache()
+        self.assertEqual(PixivWorkCache.DEFAULT_MAX_SIZE, cache.max_size)
+        self.assertEqual(PixivWorkCache.DEFAULT_TTL, cache.ttl)
+        self.assertIsNone(cache.db_path)
+
+        with self.assertRaises(ValueError):
+            cache = PixivWorkCache(max_size=0)
+        with self.assertRaises(ValueError):
+            cache = PixivWorkCache(ttl=0)
+        with self.assertRaises(TypeError):
+            cache = PixivWorkCache(db_path="invalid argument")
+
+    def test_illust_detail(self):
+        cache = PixivWorkCache()
+        aapi = self.mock_aapi()
+
+        # 同じ作品の2回目以降はAPIを呼ばない
+        actual = [cache.illust_detail(aapi, 12345678) for _ in range(3)]
+        aapi.illust_detail.assert_called_once_with(12345678)
+        self.mock_rate_limiter.acquire.assert_called_once()
+        self.assertEqual("作品名12345678", actual[0].illust.title)
+        self.assertIs(actual[0], actual[1])
+        self.assertIs(actual[0], actual[2])
+
+        # 有効期間を過ぎると再取得する
+        self.now += PixivWorkCache.DEFAULT_TTL + 1
+        actual = cache.illust_detail(aapi, 12345678)
+        self.assertEqual(2, aapi.illust_detail.call_count)
+
+        # 失敗した結果はキャッシュしない
+        error_aapi = self.mock_aapi(error=True)
+        actual = cache.illust_detail(error_aapi, 99999999)
+        self.assertIsNotNone(actual.error)
+        actual = cache.illust_detail(error_aapi, 99999999)
+        self.assertEqual(2, error_aapi.illust_detail.call_count)
+
+        # clear で破棄する
+        cache.clear()
+        actual = cache.illust_detail(aapi, 12345678)
+        self.assertEqual(3, aapi.illust_detail.call_count)
+
+    def test_illust_detail_rejected(self):
+        cache = PixivWorkCache()
+
+        # アクセストークンが拒否された場合は SessionRejectedError を送出し、キャッシュしない
+        message = "Error occurred at the OAuth process. Please check your Access Token to fix this."
+        rejected_aapi = self.mock_aapi(error=True, message=message)
+        with self.assertRaises(SessionRejectedError):
+            actual = cache.illust_detail(rejected_aapi, 12345678)
+        aapi = self.mock_aapi()
+        actual = cache.illust_detail(aapi, 12345678)
+        self.assertEqual("作品名12345678", actual.illust.title)
+        aapi.illust_detail.assert_called_once_with(12345678)
+
+    def test_is_auth_rejected(self):
+        message = "Error occurred at the OAuth process. Please check your Access Token to fix this."
+        self.assertTrue(is_auth_rejected(JsonDict({"error": JsonDict({"message": message})})))
+        self.assertFalse(is_auth_rejected(JsonDict({"error": JsonDict({"message": "error"})})))
+        self.assertFalse(is_auth_rejected(JsonDict({"error": None, "illust": JsonDict({})})))
+
+    def test_lru(self):
+        cache = PixivWorkCache(max_size=2)
+        aapi = self.mock_aapi()
+
+        cache.illust_detail(aapi, 1)
+        cache.illust_detail(aapi, 2)
+        cache.illust_detail(aapi, 1)  # 1 を最近使ったものにする
+        cache.illust_detail(aapi, 3)  # 2 が追い出される
+        self.assertEqual(3, aapi.illust_detail.call_count)
+
+        cache.illust_detail(aapi, 1)
+        cache.illust_detail(aapi, 3)
+        self.assertEqual(3, aapi.illust_detail.call_count)
+        cache.illust_detail(aapi, 2)
+        self.assertEqual(4, aapi.illust_detail.call_count)
+
+        # 最大件数を縮めると古いものから破棄する
+        cache.configure(max_size=1)
+        cache.illust_detail(aapi, 2)
+        self.assertEqual(4, aapi.illust_detail.call_count)
+        cache.illust_detail(aapi, 3)
+        self.assertEqual(5, aapi.illust_detail.call_count)
+
+    def test_persist(self):
+        aapi = self.mock_aapi()
+        cache = PixivWorkCache(db_path=self.db_path)
+        expect = cache.illust_detail(aapi, 12345678)
+        self.assertTrue(self.db_path.is_file())
+
+        # 別のキャッシュ（次回の実行を想定）からもAPIを呼ばずに取得できる
+        other_aapi = self.mock_aapi()
+        other_cache = PixivWorkCache(db_path=self.db_path)
+        actual = other_cache.illust_detail(other_aapi, 12345678)
+        other_aapi.illust_detail.assert_not_called()
+        self.assertEqual(expect, actual)
+        self.assertIsInstance(actual, JsonDict)
+        self.assertEqual("作品名12345678", actual.illust.title)
+
+        # 有効期間を過ぎたものは再取得する
+        self.now += PixivWorkCache.DEFAULT_TTL + 1
+        other_cache = PixivWorkCache(db_path=self.db_path)
+        actual = other_cache.illust_detail(other_aapi, 12345678)
+        other_aapi.illust_detail.assert_called_once_with(12345678)
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
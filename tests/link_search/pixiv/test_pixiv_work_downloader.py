@@ -6,13 +6,16 @@ from contextlib import ExitStack
 from logging import WARNING, getLogger
 from pathlib import Path
 
-from mock import MagicMock, call, patch
+import httpx
+from mock import ANY, MagicMock, call, patch
 from pixivpy3 import AppPixivAPI
 
+from media_downloader.link_search.author_directory_index import AuthorDirectoryIndex
 from media_downloader.link_search.pixiv.pixiv_save_directory_path import PixivSaveDirectoryPath
 from media_downloader.link_search.pixiv.pixiv_source_list import PixivSourceList
 from media_downloader.link_search.pixiv.pixiv_work_downloader import DownloadResult, PixivWorkDownloader
 from media_downloader.link_search.pixiv.workid import Workid
+from media_downloader.link_search.stream_downloader import StreamDownloader
 from media_downloader.link_search.url import URL
 
 logger = getLogger("media_downloader.link_search.pixiv.pixiv_work_downloader")
@@ -20,6 +23,10 @@ logger.setLevel(WARNING)
 
 
 class TestPixivWorkDownloader(unittest.TestCase):
+    def tearDown(self):
+        (Path("./tests/link_search/pixiv") / AuthorDirectoryIndex.INDEX_FILE_NAME).unlink(missing_ok=True)
+        AuthorDirectoryIndex.reset()
+
     def mock_aapi(self) -> MagicMock:
         aapi = MagicMock(spec=AppPixivAPI)
 
@@ -65,7 +72,18 @@ class TestPixivWorkDownloader(unittest.TestCase):
 
     def test_download(self):
         with ExitStack() as stack:
-            mock_sleep = stack.enter_context(patch("media_downloader.link_search.pixiv.pixiv_work_downloader.sleep"))
+            mock_stream_downloader = stack.enter_context(
+                patch("media_downloader.link_search.pixiv.pixiv_work_downloader.StreamDownloader")
+            )
+            mock_stream_downloader.return_value = MagicMock(spec=StreamDownloader)
+
+            def stream_download(url: str, save_path: Path, headers: dict):
+                save_path.write_text(url)
+                return save_path
+
+            mock_download = mock_stream_downloader.return_value.download
+            mock_download.side_effect = stream_download
+            HEADERS = {"Referer": "https://app-api.pixiv.net/"}
             mock_ugoira = stack.enter_context(
                 patch("media_downloader.link_search.pixiv.pixiv_work_downloader.PixivUgoiraDownloader")
             )
@@ -93,18 +111,18 @@ class TestPixivWorkDownloader(unittest.TestCase):
             ext = Path(url).suffix
             name = f"{sd_path.name}{ext}"
             work_id = Workid(int(re.findall(r".*\(([0-9]*)\)$", sd_path.name)[0]))
-            self.assertEqual(1, len(aapi.mock_calls))
-            self.assertEqual(call.download(url, path=str(sd_path.parent), name=name), aapi.mock_calls[0])
+            aapi.assert_not_called()
+            mock_download.assert_called_once_with(url, sd_path.parent / name, headers=HEADERS)
             self.assertEqual(2, len(mock_ugoira.mock_calls))
             self.assertEqual(call(aapi, work_id, sd_path.parent), mock_ugoira.mock_calls[0])
-            self.assertEqual(call().download(), mock_ugoira.mock_calls[1])
-            aapi.reset_mock()
+            self.assertEqual(call().download(on_done=ANY), mock_ugoira.mock_calls[1])
+            mock_download.reset_mock()
             mock_ugoira.reset_mock()
 
             actual = PixivWorkDownloader(aapi, source_list, save_directory_path).download()
             expect = DownloadResult.PASSED
             self.assertIs(expect, actual)
-            aapi.assert_not_called()
+            mock_download.assert_not_called()
             mock_ugoira.assert_not_called()
 
             if sd_path.parent.is_dir():
@@ -116,23 +134,53 @@ class TestPixivWorkDownloader(unittest.TestCase):
             )
             source_urls = [URL(source_url_base.format(i)) for i in range(10)]
             source_list = PixivSourceList(source_urls)
-
+            mock_download.reset_mock()
+
+            names = [
+                "{}_{:03}{}".format(sd_path.name, i + 1, Path(url.non_query_url).suffix)
+                for i, url in enumerate(source_list)
+            ]
+            staging_path = sd_path.parent / f".{sd_path.name}.staging"
+
+            # 漫画形式、途中のページで失敗した場合は作品ディレクトリを作らない
+            def stream_download_failed(url: str, save_path: Path, headers: dict):
+                if save_path.name in (names[3], names[7]):
+                    raise httpx.ReadError("connection lost")
+                return stream_download(url, save_path, headers)
+
+            mock_download.side_effect = stream_download_failed
+            with self.assertRaises(httpx.ReadError):
+                actual = PixivWorkDownloader(aapi, source_list, save_directory_path).download()
+            self.assertFalse(sd_path.exists())
+            self.assertTrue(staging_path.is_dir())
+            mock_download.side_effect = stream_download
+            mock_download.reset_mock()
+
+            # 前回途中で中断していた場合は隠しディレクトリに残っているページ以外をDLする
+            downloaded = {p.name for p in staging_path.glob("*")}
+            self.assertNotIn(names[3], downloaded)
+            self.assertNotIn(names[7], downloaded)
             actual = PixivWorkDownloader(aapi, source_list, save_directory_path).download()
             expect = DownloadResult.SUCCESS
             self.assertIs(expect, actual)
-
-            self.assertEqual(len(source_list), len(aapi.mock_calls))
-            for i, url in enumerate(source_list):
-                ext = Path(url.non_query_url).suffix
-                name = "{}_{:03}{}".format(sd_path.name, i + 1, ext)
-                self.assertEqual(call.download(url.non_query_url, path=str(sd_path), name=name), aapi.mock_calls[i])
+            expect = [
+                call(url.non_query_url, staging_path / name, headers=HEADERS)
+                for url, name in zip(source_list, names)
+                if name not in downloaded
+            ]
+            # 各ページは並列にDLするため順不同
+            self.assertCountEqual(expect, mock_download.call_args_list)
+            # すべてのページが揃ってから作品ディレクトリにリネームされる
+            self.assertFalse(staging_path.exists())
+            self.assertEqual(names, sorted(p.name for p in sd_path.glob("*")))
             mock_ugoira.assert_not_called()
-            aapi.reset_mock()
+            mock_download.reset_mock()
 
+            # 作品ディレクトリが存在すれば完了済としてスキップする
             actual = PixivWorkDownloader(aapi, source_list, save_directory_path).download()
             expect = DownloadResult.PASSED
             self.assertIs(expect, actual)
-            aapi.assert_not_called()
+            mock_download.assert_not_called()
             mock_ugoira.assert_not_called()
 
             # 異常系
@@ -8,6 +8,7 @@ import unittest
 import urllib.parse
 
 from media_downloader.link_search.pixiv.pixiv_work_url import PixivWorkURL
+from media_downloader.link_search.work_key import WorkKey
 
 
 class TestPixivWorkURL(unittest.TestCase):
@@ -41,6 +42,11 @@ class TestPixivWorkURL(unittest.TestCase):
         url_str = "https://www.google.co.jp/"
         self.assertEqual(False, PixivWorkURL.is_valid(url_str))
 
+    def test_work_key(self):
+        url = PixivWorkURL.create("https://www.pixiv.net/artworks/86704541?query=1")
+        self.assertEqual(WorkKey("pixiv", 86704541), url.work_key)
+        self.assertEqual(url.work_key, PixivWorkURL.create("https://www.pixiv.net/artworks/86704541").work_key)
+
 
 if __name__ == "__main__":
     if sys.argv:
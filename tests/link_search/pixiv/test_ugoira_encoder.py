@@ -0,0 +1,356 @@
+"""UgoiraEncoder のテスト"""
+
+import os
+import shutil
+import sys
+import threading
+import unittest
+import zipfile
+from concurrent.futures import Future
+from pathlib import Path
+
+from mock import MagicMock, patch
+from PIL import Image
+
+from media_downloader.link_search.pixiv.ugoira_encoder import FFMPEG, UGOIRA_FORMATS, UgoiraEncoder, UgoiraEncodeStats
+from media_downloader.link_search.pixiv.ugoira_encoder import UgoiraFormat, encode_ugoira, iter_frames, write_gif
+from media_downloader.link_search.pixiv.ugoira_encoder import write_gif_streaming, write_mp4, write_webm
+
+
+class TestUgoiraEncoder(unittest.TestCase):
+    def setUp(self):
+        self.TBP = Path("./tests/link_search/pixiv/ugoira_encoder_test")
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+        self.TBP.mkdir(parents=True)
+        self.enterContext(patch("media_downloader.link_search.pixiv.ugoira_encoder.logger"))
+
+        self.frame_paths = []
+        for i in range(3):
+            frame_path = self.TBP / f"12345678_ugoira{i}.jpg"
+            Image.new("RGB", (8, 8), (i * 80, 0, 0)).save(frame_path, quality=100)
+            self.frame_paths.append(frame_path)
+        self.delays = [10, 20, 30]
+
+    def tearDown(self):
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+
+    def _get_instance(self) -> tuple[UgoiraEncoder, MagicMock]:
+        """ワーカープロセスを起動せず、呼び出し元のスレッドとは別のスレッドで encode_gif を実行する"""
+        encoder = UgoiraEncoder(1)
+        self.addCleanup(encoder.shutdown)
+        mock_executor = MagicMock()
+
+        def submit(fn, *args) -> Future:
+            future = Future()
+
+            def run() -> None:
+                try:
+                    future.set_result(fn(*args))
+                except Exception as e:
+                    future.set_exception(e)
+
+            threading.Thread(target=run).start()
+            return future
+
+        mock_executor.submit.side_effect = submit
+        self.enterContext(patch.object(encoder, "_get_executor", return_value=mock_executor))
+        return encoder, mock_executor
+
+    def _assert_gif(self, save_path: Path, frames: list[Image.Image]) -> None:
+        with Image.open(save_path) as image:
+            self.assertEqual("GIF", image.format)
+            self.assertEqual(0, image.info["loop"])
+            self.assertEqual(len(frames), image.n_frames)
+            for i, (frame, delay) in enumerate(zip(frames, self.delays)):
+                image.seek(i)
+                self.assertEqual(delay, image.info["duration"])
+                self.assertEqual(frame.convert("RGB").tobytes(), image.convert("RGB").tobytes())
+
+    def _make_archive(self) -> tuple[Path, list[str]]:
+        """各フレームをまとめた zip を作る、zip 内の格納順は表示順と逆にする"""
+        archive = self.TBP / "12345678_ugoira1920x1080.zip"
+        names = [f"{i:06}.jpg" for i in range(len(self.frame_paths))]
+        with zipfile.ZipFile(archive, "w") as zf:
+            for frame_path, name in reversed(list(zip(self.frame_paths, names))):
+                zf.write(frame_path, name)
+        return archive, names
+
+    def test_iter_frames(self):
+        expect = [Image.open(p).convert("RGB").tobytes() for p in self.frame_paths]
+        actual = [image.convert("RGB").tobytes() for image in iter_frames([str(p) for p in self.frame_paths])]
+        self.assertEqual(expect, actual)
+
+        # zip から読み出す場合は格納順ではなく指定した順に読み出す
+        archive, names = self._make_archive()
+        actual = [image.convert("RGB").tobytes() for image in iter_frames(names, str(archive))]
+        self.assertEqual(expect, actual)
+
+        with self.assertRaises(KeyError):
+            actual = list(iter_frames(["invalid.jpg"], str(archive)))
+
+    def test_write_gif_streaming(self):
+        frames = [Image.open(p).convert("RGB") for p in self.frame_paths]
+        # 直前と変化のないフレームを含む
+        frames[2] = frames[1].copy()
+        read_frames = []
+
+        def frame_generator():
+            for frame in frames:
+                read_frames.append(frame)
+                yield frame
+
+        save_path = self.TBP / "作品名1(12345678).gif"
+        with save_path.open("wb") as fout:
+            actual = write_gif_streaming(frame_generator(), self.delays, fout)
+        self.assertEqual(3, actual)
+        self.assertEqual(frames, read_frames)
+        self._assert_gif(save_path, frames)
+
+        # フレームと表示時間の数が一致しない
+        with self.assertRaises(ValueError):
+            with save_path.open("wb") as fout:
+                actual = write_gif_streaming(self.frame_paths, [10], fout)
+        # フレームがない
+        with self.assertRaises(ValueError):
+            with save_path.open("wb") as fout:
+                actual = write_gif_streaming([], [], fout)
+
+    def test_write_gif(self):
+        frames = [Image.open(p) for p in self.frame_paths]
+        archive, names = self._make_archive()
+        for streaming in [True, False]:
+            save_path = self.TBP / f"作品名1(12345678)_{streaming}.gif"
+            write_gif([str(p) for p in self.frame_paths], self.delays, str(save_path), streaming)
+            self._assert_gif(save_path, frames)
+
+            save_path = self.TBP / f"作品名1(12345678)_zip_{streaming}.gif"
+            write_gif(names, self.delays, str(save_path), streaming, str(archive))
+            self._assert_gif(save_path, frames)
+
+    def test_write_webp_apng(self):
+        frames = [Image.open(p).convert("RGB") for p in self.frame_paths]
+        archive, names = self._make_archive()
+        for output_format in ["webp", "apng"]:
+            save_path = self.TBP / f"作品名1(12345678){UGOIRA_FORMATS[output_format].extension}"
+            UGOIRA_FORMATS[output_format].writer(names, self.delays, str(save_path), True, str(archive))
+            with Image.open(save_path) as image:
+                self.assertEqual({"webp": "WEBP", "apng": "PNG"}[output_format], image.format)
+                self.assertEqual(0, image.info["loop"])
+                self.assertEqual(len(frames), image.n_frames)
+                for i, (frame, delay) in enumerate(zip(frames, self.delays)):
+                    image.seek(i)
+                    image.load()
+                    self.assertEqual(delay, image.info["duration"])
+                    if output_format == "apng":
+                        # 可逆圧縮のため元のフレームと一致する
+                        self.assertEqual(frame.tobytes(), image.convert("RGB").tobytes())
+
+            with self.assertRaises(ValueError):
+                UGOIRA_FORMATS[output_format].writer(names, [10], str(save_path), True, str(archive))
+            with self.assertRaises(ValueError):
+                UGOIRA_FORMATS[output_format].writer([], [], str(save_path))
+
+    def test_write_video(self):
+        mock_which = self.enterContext(patch("media_downloader.link_search.pixiv.ugoira_encoder.shutil.which"))
+        mock_run = self.enterContext(patch("media_downloader.link_search.pixiv.ugoira_encoder.subprocess.run"))
+        mock_which.return_value = "/usr/bin/ffmpeg"
+        archive, names = self._make_archive()
+
+        def run(command: list[str], **kwargs) -> MagicMock:
+            # 一時ディレクトリは ffmpeg の実行後に削除されるため、実行時点の内容を確認する
+            list_path = Path(command[command.index("-i") + 1])
+            lines = list_path.read_text(encoding="utf-8").splitlines()
+            self.assertEqual("ffconcat version 1.0", lines[0])
+            entries = lines[1:]
+            self.assertEqual(len(self.delays) * 2 + 1, len(entries))
+            for i, delay in enumerate(self.delays):
+                path = Path(entries[i * 2].removeprefix("file '").removesuffix("'"))
+                with Image.open(path) as image, Image.open(self.frame_paths[i]) as expect:
+                    self.assertEqual(expect.tobytes(), image.tobytes())
+                self.assertEqual(f"duration {delay / 1000}", entries[i * 2 + 1])
+            # 最後のフレームの表示時間を反映させるため、最後のフレームをもう一度並べる
+            self.assertEqual(entries[-3], entries[-1])
+            return MagicMock(returncode=0)
+
+        mock_run.side_effect = run
+        save_path = str(self.TBP / "作品名1(12345678).mp4")
+        write_mp4(names, self.delays, save_path, True, str(archive))
+        command = mock_run.call_args.args[0]
+        self.assertEqual("/usr/bin/ffmpeg", command[0])
+        self.assertIn("libx264", command)
+        self.assertEqual(save_path, command[-1])
+        mock_which.assert_called_with(FFMPEG)
+
+        save_path = str(self.TBP / "作品名1(12345678).webm")
+        write_webm([str(p) for p in self.frame_paths], self.delays, save_path)
+        command = mock_run.call_args.args[0]
+        self.assertIn("libvpx-vp9", command)
+        self.assertEqual(save_path, command[-1])
+
+        # ffmpeg が失敗した
+        mock_run.side_effect = None
+        mock_run.return_value = MagicMock(returncode=1, stderr="error message\n")
+        with self.assertRaises(RuntimeError):
+            write_mp4(names, self.delays, save_path, True, str(archive))
+
+        # 引数が不正
+        with self.assertRaises(ValueError):
+            write_mp4(names, [10], save_path, True, str(archive))
+        with self.assertRaises(ValueError):
+            write_mp4([], [], save_path)
+
+        # ffmpeg が見つからない
+        mock_which.return_value = None
+        with self.assertRaises(FileNotFoundError):
+            write_mp4(names, self.delays, save_path, True, str(archive))
+
+    def test_encode_ugoira(self):
+        frames = [Image.open(p) for p in self.frame_paths]
+        for streaming in [True, False]:
+            save_path = self.TBP / f"作品名1(12345678)_{streaming}.gif"
+            actual = encode_ugoira([str(p) for p in self.frame_paths], self.delays, str(save_path), "gif", streaming)
+            self.assertGreaterEqual(actual, 0.0)
+            self.assertFalse(Path(str(save_path) + ".part").exists())
+            self._assert_gif(save_path, frames)
+
+        # 出力形式の書き出し関数に一時ファイルのパスを渡し、書き出し後に保存先にリネームする
+        mock_writer = MagicMock(side_effect=lambda *args: Path(args[2]).write_bytes(b"ugoira"))
+        self.enterContext(patch.dict(UGOIRA_FORMATS, {"mock": UgoiraFormat(".mock", mock_writer)}))
+        archive, names = self._make_archive()
+        save_path = self.TBP / "作品名1(12345678).mock"
+        actual = encode_ugoira(names, self.delays, str(save_path), "mock", False, str(archive))
+        self.assertGreaterEqual(actual, 0.0)
+        mock_writer.assert_called_once_with(names, self.delays, str(save_path) + ".part", False, str(archive))
+        self.assertEqual(b"ugoira", save_path.read_bytes())
+        self.assertFalse(Path(str(save_path) + ".part").exists())
+
+        # 書き出しに失敗した場合は一時ファイルを残さない
+        def broken_writer(*args):
+            Path(args[2]).write_bytes(b"broken")
+            raise RuntimeError("error")
+
+        mock_writer.side_effect = broken_writer
+        save_path = self.TBP / "作品名2(23456789).mock"
+        with self.assertRaises(RuntimeError):
+            actual = encode_ugoira(names, self.delays, str(save_path), "mock", False, str(archive))
+        self.assertFalse(save_path.exists())
+        self.assertFalse(Path(str(save_path) + ".part").exists())
+
+    def test_configure(self):
+        encoder = UgoiraEncoder()
+        self.assertEqual(os.cpu_count() or 1, encoder.max_workers)
+        self.assertTrue(encoder.streaming)
+        self.assertEqual("gif", encoder.output_format)
+        self.assertEqual(".gif", encoder.extension)
+        encoder.configure(2, False, "webp")
+        self.assertEqual(2, encoder.max_workers)
+        self.assertFalse(encoder.streaming)
+        self.assertEqual("webp", encoder.output_format)
+        self.assertEqual(".webp", encoder.extension)
+        self.assertEqual(UgoiraEncodeStats(0, 0, 0, 0.0), encoder.stats())
+
+        # ffmpeg を使う出力形式は ffmpeg が見つかる場合のみ使う
+        mock_which = self.enterContext(patch("media_downloader.link_search.pixiv.ugoira_encoder.shutil.which"))
+        mock_which.return_value = "/usr/bin/ffmpeg"
+        encoder.configure(output_format="mp4")
+        self.assertEqual(".mp4", encoder.extension)
+        mock_which.return_value = None
+        encoder.configure(output_format="webm")
+        self.assertEqual("gif", encoder.output_format)
+
+        with self.assertRaises(ValueError):
+            encoder.configure(0)
+        with self.assertRaises(ValueError):
+            encoder.configure("invalid argument")
+        with self.assertRaises(TypeError):
+            encoder.configure(1, "invalid argument")
+        with self.assertRaises(ValueError):
+            encoder.configure(1, True, "invalid argument")
+
+    def test_submit(self):
+        encoder, mock_executor = self._get_instance()
+        save_path = self.TBP / "作品名1(12345678).gif"
+        mock_on_done = MagicMock()
+
+        # 保存先には出力形式の拡張子を付与する
+        future = encoder.submit(self.frame_paths, self.delays, self.TBP / "作品名1(12345678)", mock_on_done)
+        encoder.wait()
+        self.assertGreaterEqual(future.result(), 0.0)
+        mock_executor.submit.assert_called_once_with(
+            encode_ugoira, [str(p) for p in self.frame_paths], self.delays, str(save_path), "gif", True, None
+        )
+        self.assertTrue(save_path.is_file())
+        mock_on_done.assert_called_once_with()
+        stats = encoder.stats()
+        self.assertEqual(0, stats.queued)
+        self.assertEqual(1, stats.completed)
+        self.assertEqual(0, stats.failed)
+        self.assertEqual(future.result(), stats.encode_time)
+
+        # エンコードに失敗した場合は on_done を呼び出さない
+        mock_on_done.reset_mock()
+        broken_path = self.TBP / "broken.jpg"
+        broken_path.write_bytes(b"broken")
+        future = encoder.submit([broken_path], [10], self.TBP / "作品名2(23456789)", mock_on_done)
+        encoder.wait()
+        mock_on_done.assert_not_called()
+        self.assertEqual(UgoiraEncodeStats(0, 1, 1, stats.encode_time), encoder.stats())
+
+        # 同じ保存先のエンコードが依頼済の場合は依頼せず、依頼済の Future を返す
+        mock_executor.reset_mock()
+        mock_on_done.reset_mock()
+        pending_future = Future()
+        mock_executor.submit.side_effect = lambda fn, *args: pending_future
+        future = encoder.submit(self.frame_paths, self.delays, self.TBP / "作品名3(34567890)", mock_on_done)
+        other_on_done = MagicMock()
+        other_future = encoder.submit(self.frame_paths, self.delays, self.TBP / "作品名3(34567890)", other_on_done)
+        self.assertIs(future, other_future)
+        mock_executor.submit.assert_called_once()
+        self.assertEqual(1, encoder.stats().queued)
+        pending_future.set_result(0.5)
+        encoder.wait()
+        mock_on_done.assert_called_once_with()
+        other_on_done.assert_not_called()
+        self.assertEqual(0, encoder.stats().queued)
+
+        # 完了した後は改めて依頼する
+        encoder.submit(self.frame_paths, self.delays, self.TBP / "作品名3(34567890)")
+        self.assertEqual(2, mock_executor.submit.call_count)
+
+        # 引数が不正
+        with self.assertRaises(ValueError):
+            future = encoder.submit([], [], save_path)
+        with self.assertRaises(ValueError):
+            future = encoder.submit(self.frame_paths, [10], save_path)
+
+    def test_submit_archive(self):
+        encoder, mock_executor = self._get_instance()
+        save_path = self.TBP / "作品名1(12345678).gif"
+        archive, names = self._make_archive()
+
+        future = encoder.submit(names, self.delays, self.TBP / "作品名1(12345678)", archive=archive)
+        encoder.wait()
+        self.assertGreaterEqual(future.result(), 0.0)
+        mock_executor.submit.assert_called_once_with(
+            encode_ugoira, names, self.delays, str(save_path), "gif", True, str(archive)
+        )
+        self._assert_gif(save_path, [Image.open(p) for p in self.frame_paths])
+
+    def test_submit_process_pool(self):
+        # 実際にワーカープロセスでエンコードする
+        encoder = UgoiraEncoder(1)
+        self.addCleanup(encoder.shutdown)
+        save_path = self.TBP / "作品名1(12345678).gif"
+        future = encoder.submit(self.frame_paths, self.delays, self.TBP / "作品名1(12345678)")
+        encoder.wait()
+        self.assertGreaterEqual(future.result(), 0.0)
+        self.assertTrue(save_path.is_file())
+        self.assertEqual(1, encoder.stats().completed)
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
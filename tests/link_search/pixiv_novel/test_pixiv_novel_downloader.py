@@ -24,6 +24,11 @@ logger.setLevel(WARNING)
 
 
 class TestPixivNovelDownloader(unittest.TestCase):
+    def setUp(self):
+        self.mock_rate_limiter = self.enterContext(
+            patch("media_downloader.link_search.pixiv_novel.pixiv_novel_downloader.rate_limiter")
+        )
+
     def mock_aapi(self) -> MagicMock:
         aapi = MagicMock(spec=AppPixivAPI)
 
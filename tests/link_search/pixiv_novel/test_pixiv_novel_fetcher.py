@@ -4,11 +4,13 @@ from contextlib import ExitStack
 from logging import WARNING, getLogger
 from pathlib import Path
 
-from mock import patch
+from mock import MagicMock, call, patch
 
 from media_downloader.link_search.password import Password
+from media_downloader.link_search.pixiv_novel.pixiv_novel_downloader import DownloadResult
 from media_downloader.link_search.pixiv_novel.pixiv_novel_fetcher import PixivNovelFetcher
 from media_downloader.link_search.pixiv_novel.pixiv_novel_url import PixivNovelURL
+from media_downloader.link_search.session_registry import SessionRegistry, SessionRejectedError
 from media_downloader.link_search.url import URL
 from media_downloader.link_search.username import Username
 
@@ -19,6 +21,9 @@ logger.setLevel(WARNING)
 class TestPixivNovelFetcher(unittest.TestCase):
     def setUp(self):
         self.TBP = Path("./tests/link_search/pixiv_novel")
+        self.session_registry = self.enterContext(
+            patch("media_downloader.link_search.pixiv_novel.pixiv_novel_fetcher.session_registry", SessionRegistry())
+        )
 
     def get_instance(self) -> PixivNovelFetcher:
         with ExitStack() as stack:
@@ -45,11 +50,21 @@ class TestPixivNovelFetcher(unittest.TestCase):
             base_path = Path(self.TBP)
 
             fetcher = PixivNovelFetcher(username, password, base_path)
-            self.assertTrue(hasattr(fetcher, "aapi"))
-            mock_login.assert_called_once_with(username, password)
+            # 生成時にはログインしない
+            mock_login.assert_not_called()
+            self.assertEqual(username, fetcher.username)
+            self.assertEqual(password, fetcher.password)
+            self.assertNotIn(password.password, repr(fetcher))
             self.assertTrue(hasattr(fetcher, "base_path"))
             self.assertEqual(base_path, fetcher.base_path)
             self.assertEqual(REFRESH_TOKEN_PATH, fetcher.REFRESH_TOKEN_PATH)
+            self.assertEqual("pixiv", fetcher.SESSION_NAME)
+
+            # 初回アクセス時にログインし、以降は同じ aapi を使う
+            self.assertEqual(mock_login.return_value, fetcher.aapi)
+            mock_login.assert_called_once_with(username, password)
+            self.assertEqual(mock_login.return_value, fetcher.aapi)
+            mock_login.assert_called_once_with(username, password)
 
             with self.assertRaises(TypeError):
                 fetcher = PixivNovelFetcher("invalid args", password, base_path)
@@ -116,19 +131,60 @@ class TestPixivNovelFetcher(unittest.TestCase):
             mock_downloader = stack.enter_context(
                 patch("media_downloader.link_search.pixiv_novel.pixiv_novel_fetcher.PixivNovelDownloader")
             )
+            m_manifest = stack.enter_context(
+                patch("media_downloader.link_search.pixiv_novel.pixiv_novel_fetcher.download_manifest")
+            )
+            mock_login = stack.enter_context(
+                patch("media_downloader.link_search.pixiv_novel.pixiv_novel_fetcher.PixivNovelFetcher.login")
+            )
 
             mock_save_directory_path.side_effect = lambda aapi, novel_url, base_path: str(self.TBP)
             fetcher = self.get_instance()
 
             work_url = "https://www.pixiv.net/novel/show.php?id=3195243"
+
+            # DL済作品の台帳に記録があればログインせずにスキップ
+            m_manifest.get.return_value = MagicMock()
+            actual = fetcher.fetch(URL(work_url))
+            self.assertEqual(DownloadResult.PASSED, actual)
+            mock_login.assert_not_called()
+
+            m_manifest.get.return_value = None
             actual = fetcher.fetch(URL(work_url))
-            self.assertIsNone(actual)
+            mock_login.assert_called_once()
+            self.assertEqual(mock_downloader.return_value.download.return_value, actual)
 
             novel_url = PixivNovelURL.create(work_url)
             mock_save_directory_path.assert_called_once_with(fetcher.aapi, novel_url, fetcher.base_path)
             mock_downloader.assert_called_once_with(fetcher.aapi, novel_url, str(self.TBP))
             mock_downloader().download.assert_called_once_with()
 
+            # DL済作品の台帳に記録があればネットワークに触れずにスキップ
+            mock_save_directory_path.reset_mock()
+            mock_downloader.reset_mock()
+            m_manifest.get.return_value = MagicMock()
+            actual = fetcher.fetch(URL(work_url))
+            self.assertEqual(DownloadResult.PASSED, actual)
+            m_manifest.get.assert_called_with(mock_downloader.SITE_NAME, 3195243)
+            mock_save_directory_path.assert_not_called()
+            mock_downloader.assert_not_called()
+
+            # アクセストークンが拒否された場合は一度だけログインし直して再試行する
+            m_manifest.get.return_value = None
+            stale_aapi = fetcher.aapi
+            new_aapi = MagicMock()
+            mock_login.reset_mock()
+            mock_login.return_value = new_aapi
+            mock_save_directory_path.side_effect = [SessionRejectedError, str(self.TBP)]
+            actual = fetcher.fetch(URL(work_url))
+            self.assertEqual(mock_downloader.return_value.download.return_value, actual)
+            mock_login.assert_called_once()
+            self.assertEqual(
+                [call(stale_aapi, novel_url, fetcher.base_path), call(new_aapi, novel_url, fetcher.base_path)],
+                mock_save_directory_path.call_args_list,
+            )
+            mock_downloader.assert_called_once_with(new_aapi, novel_url, str(self.TBP))
+
 
 if __name__ == "__main__":
     if sys.argv:
@@ -6,6 +6,7 @@ from pathlib import Path
 
 from mock import MagicMock, mock_open, patch
 
+from media_downloader.link_search.author_directory_index import AuthorDirectoryIndex
 from media_downloader.link_search.pixiv_novel.authorid import Authorid
 from media_downloader.link_search.pixiv_novel.authorname import Authorname
 from media_downloader.link_search.pixiv_novel.novelid import Novelid
@@ -15,6 +16,15 @@ from media_downloader.link_search.pixiv_novel.pixiv_novel_url import PixivNovelU
 
 
 class TestPixivNovelSaveDirectoryPath(unittest.TestCase):
+    def setUp(self):
+        self.mock_rate_limiter = self.enterContext(
+            patch("media_downloader.link_search.pixiv_novel.pixiv_novel_save_directory_path.rate_limiter")
+        )
+
+    def tearDown(self):
+        (Path("./tests/link_search/pixiv_novel") / AuthorDirectoryIndex.INDEX_FILE_NAME).unlink(missing_ok=True)
+        AuthorDirectoryIndex.reset()
+
     def mock_aapi(self, novel_id, novel_title, author_id, author_name, error_occur) -> MagicMock:
         aapi = MagicMock()
         novel = MagicMock()
@@ -9,6 +9,7 @@ import urllib.parse
 
 from media_downloader.link_search.pixiv_novel.novelid import Novelid
 from media_downloader.link_search.pixiv_novel.pixiv_novel_url import PixivNovelURL
+from media_downloader.link_search.work_key import WorkKey
 
 
 class TestPixivNovelURL(unittest.TestCase):
@@ -41,6 +42,12 @@ class TestPixivNovelURL(unittest.TestCase):
         url_str = "https://www.google.co.jp/"
         self.assertEqual(False, PixivNovelURL.is_valid(url_str))
 
+    def test_work_key(self):
+        url = PixivNovelURL.create("https://www.pixiv.net/novel/show.php?id=17668373&mode=cover")
+        self.assertEqual(WorkKey("pixiv_novel", 17668373), url.work_key)
+        # 同じIDでも pixiv の作品とは別の作品として扱う
+        self.assertNotEqual(WorkKey("pixiv", 17668373), url.work_key)
+
 
 if __name__ == "__main__":
     if sys.argv:
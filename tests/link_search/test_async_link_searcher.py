@@ -0,0 +1,205 @@
+"""AsyncLinkSearcher のテスト
+
+外部リンク探索クラスの非同期版をテストする
+"""
+
+import asyncio
+import enum
+import sys
+import threading
+import unittest
+from logging import WARNING, getLogger
+from pathlib import Path
+
+from mock import AsyncMock, MagicMock, patch
+
+from media_downloader.link_search.async_fetcher_base import AsyncFetcherBase
+from media_downloader.link_search.async_link_searcher import AsyncLinkSearcher
+from media_downloader.link_search.in_flight_registry import InFlightRegistry
+from media_downloader.link_search.link_searcher import LinkSearcher
+from media_downloader.link_search.nico_seiga.async_nico_seiga_fetcher import AsyncNicoSeigaFetcher
+from media_downloader.link_search.nico_seiga.nico_seiga_fetcher import NicoSeigaFetcher
+from media_downloader.link_search.nijie.async_nijie_fetcher import AsyncNijieFetcher
+from media_downloader.link_search.nijie.nijie_fetcher import NijieFetcher
+from media_downloader.link_search.password import Password
+from media_downloader.link_search.url import URL
+from media_downloader.link_search.username import Username
+from media_downloader.link_search.work_key import WorkKey
+from media_downloader.util import Result
+
+logger = getLogger("media_downloader.link_search.async_link_searcher")
+logger.setLevel(WARNING)
+
+
+class DummyResult(enum.Enum):
+    SUCCESS = enum.auto()
+    PASSED = enum.auto()
+
+
+class ConcreteAsyncFetcher(AsyncFetcherBase):
+    """同時に処理しているURL数を記録する非同期版の担当者"""
+
+    def __init__(self, host: str):
+        super().__init__()
+        object.__setattr__(self, "host", host)
+        object.__setattr__(self, "in_flight", 0)
+        object.__setattr__(self, "max_in_flight", 0)
+
+    async def is_target_url(self, url: URL) -> bool:
+        return self.host in url.original_url
+
+    async def fetch(self, url: str) -> DummyResult:
+        object.__setattr__(self, "in_flight", self.in_flight + 1)
+        object.__setattr__(self, "max_in_flight", max(self.max_in_flight, self.in_flight))
+        await asyncio.sleep(0.01)
+        object.__setattr__(self, "in_flight", self.in_flight - 1)
+        if "fail" in url:
+            raise ValueError("fetch failed")
+        if "passed" in url:
+            return DummyResult.PASSED
+        return DummyResult.SUCCESS
+
+
+class TestAsyncLinkSearcher(unittest.TestCase):
+    def setUp(self):
+        self.mock_pool = self.enterContext(patch("media_downloader.link_search.async_link_searcher.http_client_pool"))
+        self.mock_pool.aclose = AsyncMock()
+
+    def test_AsyncLinkSearcher(self):
+        als = AsyncLinkSearcher()
+        self.assertEqual([], als.fetcher_list)
+        self.assertEqual(LinkSearcher.MAX_WORKERS, als.executor_workers)
+        self.assertEqual(64, AsyncLinkSearcher.MAX_IN_FLIGHT)
+
+        als = AsyncLinkSearcher(2)
+        self.assertEqual(2, als.executor_workers)
+
+        with self.assertRaises(ValueError):
+            als = AsyncLinkSearcher(0)
+
+    def test_register(self):
+        als = AsyncLinkSearcher()
+
+        # 正常系
+        fetcher = ConcreteAsyncFetcher("async.example.com")
+        als.register(fetcher)
+        self.assertEqual([fetcher], als.fetcher_list)
+
+        # 異常系
+        fake_fetcher = MagicMock()
+        del fake_fetcher.is_target_url
+        del fake_fetcher.fetch
+        with self.assertRaises(TypeError):
+            als.register(fake_fetcher)
+
+    def test_fetch_many(self):
+        als = AsyncLinkSearcher(executor_workers=1)
+
+        # 非同期版の担当者
+        async_fetcher = ConcreteAsyncFetcher("async.example.com")
+        als.register(async_fetcher)
+
+        # 同期版の担当者はイベントループとは別のスレッドで実行する
+        sync_fetcher = MagicMock()
+        sync_fetcher.is_target_url = lambda url: "sync.example.com" in url.original_url
+        fetch_threads = []
+
+        def sync_fetch(url: str) -> None:
+            fetch_threads.append(threading.current_thread())
+
+        sync_fetcher.fetch = MagicMock(side_effect=sync_fetch)
+        als.register(sync_fetcher)
+
+        urls = [f"https://async.example.com/{i}" for i in range(10)] + [
+            "https://async.example.com/passed",
+            "https://async.example.com/fail",
+            "https://sync.example.com/0",
+            "https://unknown.example.com/0",
+            "invalid url",
+        ]
+        actual = als.run(urls, max_in_flight=4)
+        self.assertEqual(urls, [url for url, _ in actual.results])
+        expect = [DummyResult.SUCCESS] * 10 + [DummyResult.PASSED, Result.FAILED, Result.SUCCESS] + [Result.FAILED] * 2
+        self.assertEqual(expect, [result for _, result in actual.results])
+        self.assertEqual(urls[11:12] + urls[13:], actual.failed_urls)
+        self.assertGreaterEqual(actual.elapsed_time, 0.0)
+
+        # 同時に処理するURL数は max_in_flight までに抑えられる
+        self.assertEqual(4, async_fetcher.max_in_flight)
+        sync_fetcher.fetch.assert_called_once_with("https://sync.example.com/0")
+        self.assertNotEqual(threading.main_thread(), fetch_threads[0])
+
+        # 終了時に非同期版のクライアントを閉じる
+        self.mock_pool.aclose.assert_awaited_once_with()
+
+        with self.assertRaises(ValueError):
+            actual = als.run(urls, max_in_flight=0)
+
+    def test_fetch_many_same_work(self):
+        self.enterContext(
+            patch("media_downloader.link_search.async_link_searcher.in_flight_registry", InFlightRegistry())
+        )
+        als = AsyncLinkSearcher()
+
+        class WorkKeyAsyncFetcher(ConcreteAsyncFetcher):
+            def work_key(self, url: URL) -> WorkKey:
+                return WorkKey("async", int(url.original_url.split("id=")[-1]))
+
+        fetcher = WorkKeyAsyncFetcher("async.example.com")
+        object.__setattr__(fetcher, "fetched_urls", [])
+        original_fetch = fetcher.fetch
+
+        async def fetch(url: str) -> DummyResult:
+            fetcher.fetched_urls.append(url)
+            return await original_fetch(url)
+
+        object.__setattr__(fetcher, "fetch", fetch)
+        als.register(fetcher)
+
+        # 同じ作品を指すURLは1回のみ取得し、それぞれに同じ結果を記録する
+        urls = [
+            "https://async.example.com/view.php?id=1",
+            "https://async.example.com/view_popup.php?id=1",
+            "https://async.example.com/view.php?id=2",
+        ]
+        actual = als.run(urls, max_in_flight=4)
+        self.assertEqual([(url, DummyResult.SUCCESS) for url in urls], actual.results)
+        self.assertEqual([urls[0], urls[2]], fetcher.fetched_urls)
+
+    def test_from_link_searcher(self):
+        self.enterContext(patch("media_downloader.link_search.nijie.nijie_fetcher.NijieFetcher.login"))
+        base_path = Path("./tests/link_search")
+        username = Username("ユーザー1_ID")
+        password = Password("ユーザー1_PW")
+        nijie_fetcher = NijieFetcher(username, password, base_path)
+        nico_seiga_fetcher = NicoSeigaFetcher(username, password, base_path)
+        other_fetcher = MagicMock()
+
+        link_searcher = LinkSearcher()
+        link_searcher.register(nijie_fetcher)
+        link_searcher.register(nico_seiga_fetcher)
+        link_searcher.register(other_fetcher)
+
+        # 非同期版のある担当者は非同期版に置き換える
+        actual = AsyncLinkSearcher.from_link_searcher(link_searcher, 2)
+        self.assertEqual(2, actual.executor_workers)
+        self.assertEqual(3, len(actual.fetcher_list))
+        self.assertIsInstance(actual.fetcher_list[0], AsyncNijieFetcher)
+        self.assertEqual(username, actual.fetcher_list[0].username)
+        self.assertIsInstance(actual.fetcher_list[1], AsyncNicoSeigaFetcher)
+        self.assertEqual(base_path, actual.fetcher_list[1].base_path)
+        self.assertIs(other_fetcher, actual.fetcher_list[2])
+
+    def test_create(self):
+        mock_create = self.enterContext(patch("media_downloader.link_search.async_link_searcher.LinkSearcher.create"))
+        mock_create.return_value = LinkSearcher()
+        mock_config = MagicMock()
+        actual = AsyncLinkSearcher.create(mock_config)
+        self.assertIsInstance(actual, AsyncLinkSearcher)
+        mock_create.assert_called_once_with(mock_config)
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,159 @@
+"""AsyncStreamDownloader のテスト"""
+
+import shutil
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+import httpx
+from mock import AsyncMock, patch
+
+from media_downloader.link_search.async_stream_downloader import AsyncStreamDownloader
+from media_downloader.link_search.http_client_pool import http_client_pool
+from media_downloader.link_search.nico_seiga.illust_extension import IllustExtension
+from media_downloader.link_search.stream_downloader import StreamDownloader
+from media_downloader.link_search.url import URL
+
+
+class TestAsyncStreamDownloader(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.TBP = Path("./tests/link_search/async_stream_downloader")
+        self.TBP.mkdir(parents=True, exist_ok=True)
+        self.mock_rate_limiter = self.enterContext(
+            patch("media_downloader.link_search.async_stream_downloader.rate_limiter")
+        )
+        self.mock_rate_limiter.acquire_async = AsyncMock()
+
+    async def asyncTearDown(self):
+        # ホストごとの同時DL数の制限はイベントループに紐づくため、テストごとに作り直す
+        await http_client_pool.aclose()
+
+    def tearDown(self):
+        shutil.rmtree(self.TBP, ignore_errors=True)
+
+    def _get_session(self, content: bytes, status_code: int = 200) -> httpx.AsyncClient:
+        self.requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            return httpx.Response(status_code, content=content)
+
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    def test_AsyncStreamDownloader(self):
+        session = self._get_session(b"")
+        stream_downloader = AsyncStreamDownloader(session)
+        self.assertEqual(session, stream_downloader.session)
+
+        with self.assertRaises(TypeError):
+            stream_downloader = AsyncStreamDownloader(httpx.Client())
+
+    async def test_download(self):
+        content = b"\x89\x50\x4e\x47\x0d\x0a\x1a\x0a" + b"\x00" * (StreamDownloader.CHUNK_SIZE * 3 + 5)
+        session = self._get_session(content)
+        stream_downloader = AsyncStreamDownloader(session)
+        url = URL("https://www.example.com/sample.png")
+        headers = {"User-Agent": "dummy"}
+
+        # 保存先パス指定
+        save_path = self.TBP / "作品名1(12345678).png"
+        actual = await stream_downloader.download(url, save_path, headers=headers)
+        self.assertEqual(save_path, actual)
+        self.assertEqual(content, save_path.read_bytes())
+        self.assertFalse(StreamDownloader.part_path(save_path).exists())
+        self.mock_rate_limiter.acquire_async.assert_awaited_once_with(url.original_url)
+        self.assertEqual("dummy", self.requests[-1].headers["User-Agent"])
+
+        # 拡張子を先頭のバイト列から判別、保存先への確定処理を指定
+        committed = []
+        commit_threads = []
+
+        def commit(source: Path, path: Path) -> None:
+            committed.append(path)
+            commit_threads.append(threading.current_thread())
+            source.replace(path)
+
+        save_path = self.TBP / "作品名2(23456789)"
+        actual = await stream_downloader.download(
+            url.original_url,
+            save_path,
+            suffix_resolver=lambda head: IllustExtension.create(head).extension,
+            commit=commit,
+        )
+        self.assertEqual(self.TBP / "作品名2(23456789).png", actual)
+        self.assertEqual(content, actual.read_bytes())
+        self.assertEqual([actual], committed)
+        # 保存先への確定はイベントループを止めないよう別スレッドで行う
+        self.assertIsNot(threading.current_thread(), commit_threads[0])
+        self.assertFalse(StreamDownloader.part_path(save_path).exists())
+
+        # レスポンスがエラー
+        stream_downloader = AsyncStreamDownloader(self._get_session(b"not found", status_code=404))
+        save_path = self.TBP / "作品名3(34567890).png"
+        with self.assertRaises(httpx.HTTPStatusError):
+            actual = await stream_downloader.download(url, save_path)
+        self.assertFalse(save_path.exists())
+        self.assertFalse(StreamDownloader.part_path(save_path).exists())
+
+        # 保存先パス指定が不正
+        with self.assertRaises(TypeError):
+            actual = await stream_downloader.download(url, "invalid argument")
+
+    async def test_download_resume(self):
+        content = bytes(range(256)) * 1000
+        etag = '"dummy_etag"'
+        cut_size = StreamDownloader.CHUNK_SIZE
+
+        class CutStream(httpx.AsyncByteStream):
+            """途中で通信が切れるストリーム"""
+
+            async def __aiter__(self):
+                yield content[:cut_size]
+                raise httpx.ReadError("connection lost")
+
+        state = {"cut": True}
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            headers = {"ETag": etag}
+            if state["cut"]:
+                headers["Content-Length"] = str(len(content))
+                return httpx.Response(200, headers=headers, stream=CutStream())
+            range_header = request.headers.get("Range")
+            if range_header and request.headers.get("If-Range") == etag:
+                start = int(range_header.removeprefix("bytes=").rstrip("-"))
+                headers["Content-Range"] = f"bytes {start}-{len(content) - 1}/{len(content)}"
+                return httpx.Response(206, headers=headers, content=content[start:])
+            return httpx.Response(200, headers=headers, content=content)
+
+        stream_downloader = AsyncStreamDownloader(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        url = "https://www.example.com/sample.mp4"
+        save_path = self.TBP / "作品名1(12345678).mp4"
+        part_path = StreamDownloader.part_path(save_path)
+
+        # 中断したDLを同期版と同じ一時ファイルから Range リクエストで再開する
+        with self.assertRaises(httpx.ReadError):
+            await stream_downloader.download(url, save_path)
+        self.assertEqual(cut_size, part_path.stat().st_size)
+        state["cut"] = False
+        requests.clear()
+        actual = await stream_downloader.download(url, save_path)
+        self.assertEqual(content, actual.read_bytes())
+        self.assertFalse(part_path.exists())
+        self.assertFalse(StreamDownloader.meta_path(save_path).exists())
+        self.assertEqual(f"bytes={cut_size}-", requests[0].headers["Range"])
+        save_path.unlink()
+
+        # resume=False の場合は中断時に一時ファイルを残さない
+        state["cut"] = True
+        with self.assertRaises(httpx.ReadError):
+            await stream_downloader.download(url, save_path, resume=False)
+        self.assertFalse(part_path.exists())
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
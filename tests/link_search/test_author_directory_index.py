@@ -0,0 +1,165 @@
+"""AuthorDirectoryIndex のテスト"""
+
+import os
+import shutil
+import sys
+import unittest
+from pathlib import Path
+
+from mock import patch
+
+from media_downloader.link_search.author_directory_index import AuthorDirectoryIndex
+
+
+class TestAuthorDirectoryIndex(unittest.TestCase):
+    def setUp(self):
+        self.TBP = Path("./tests/link_search/author_directory_index")
+        if self.TBP.is_dir():
+            shutil.rmtree(self.TBP)
+        self.TBP.mkdir(parents=True)
+        AuthorDirectoryIndex.reset()
+
+    def tearDown(self):
+        shutil.rmtree(self.TBP, ignore_errors=True)
+        AuthorDirectoryIndex.reset()
+
+    def _make_dirs(self, dir_names: list[str]) -> None:
+        for i, dir_name in enumerate(dir_names):
+            (self.TBP / dir_name).mkdir()
+            # 更新日時はリスト順に新しくする
+            os.utime(self.TBP / dir_name, (1000000000 + i, 1000000000 + i))
+
+    def test_AuthorDirectoryIndex(self):
+        self._make_dirs([
+            "作者名1(1111)",
+            "作者名2(2222)",
+            "作者名2_old(2222)",
+            "作者名3_new(2222)",
+            "no_author_id",
+            "()",
+        ])
+        (self.TBP / "作者名4(4444)").write_text("not directory")
+
+        index = AuthorDirectoryIndex(self.TBP)
+        self.assertEqual(self.TBP, index.base_path)
+        self.assertEqual(self.TBP / ".author_directory_index.json", index.index_path)
+        self.assertTrue(index.index_path.is_file())
+
+        self.assertEqual("作者名1(1111)", index.find(1111))
+        # 同じ作者IDのディレクトリが複数ある場合は更新日時が最も新しいもの
+        self.assertEqual("作者名3_new(2222)", index.find(2222))
+        self.assertIsNone(index.find(4444))
+        self.assertIsNone(index.find(9999))
+
+        with self.assertRaises(TypeError):
+            index = AuthorDirectoryIndex("invalid argument")
+
+    def test_get(self):
+        index = AuthorDirectoryIndex.get(self.TBP)
+        self.assertIs(index, AuthorDirectoryIndex.get(self.TBP))
+        self.assertIs(index, AuthorDirectoryIndex.get(Path(str(self.TBP) + "/")))
+
+        AuthorDirectoryIndex.reset()
+        self.assertIsNot(index, AuthorDirectoryIndex.get(self.TBP))
+
+        with self.assertRaises(TypeError):
+            index = AuthorDirectoryIndex.get("invalid argument")
+
+    def test_load(self):
+        self._make_dirs(["作者名1(1111)"])
+        index = AuthorDirectoryIndex(self.TBP)
+        index.register(2222, "作者名2(2222)")
+
+        # 索引ファイルが新しければ走査せずに読み込む
+        with patch("media_downloader.link_search.author_directory_index.os.scandir") as mock_scandir:
+            other = AuthorDirectoryIndex(self.TBP)
+            mock_scandir.assert_not_called()
+        self.assertEqual("作者名1(1111)", other.find(1111))
+
+        # ディレクトリが追加されていれば作り直す
+        self._make_dirs(["作者名3(3333)"])
+        os.utime(self.TBP)
+        os.utime(index.index_path, (1000000000, 1000000000))
+        other = AuthorDirectoryIndex(self.TBP)
+        self.assertEqual("作者名3(3333)", other.find(3333))
+
+        # 索引ファイルが壊れていれば作り直す
+        index.index_path.write_text("invalid json")
+        os.utime(index.index_path)
+        other = AuthorDirectoryIndex(self.TBP)
+        self.assertEqual("作者名1(1111)", other.find(1111))
+
+        # base_path が存在しなければ空
+        other = AuthorDirectoryIndex(self.TBP / "not_exist")
+        self.assertIsNone(other.find(1111))
+
+    def test_find(self):
+        self._make_dirs(["作者名1(1111)"])
+        index = AuthorDirectoryIndex(self.TBP)
+        self.assertEqual("作者名1(1111)", index.find(1111))
+
+        # 索引作成後にリネームされていた場合は作り直す
+        (self.TBP / "作者名1(1111)").rename(self.TBP / "作者名1_renamed(1111)")
+        self.assertEqual("作者名1_renamed(1111)", index.find(1111))
+
+        # 索引作成後に削除されていた場合
+        (self.TBP / "作者名1_renamed(1111)").rmdir()
+        self.assertIsNone(index.find(1111))
+
+    def test_resolve(self):
+        self._make_dirs(["作者名1(1111)"])
+        index = AuthorDirectoryIndex(self.TBP)
+
+        # 既存の作者ディレクトリは作者名が変わっていてもそのまま使う
+        self.assertEqual("作者名1(1111)", index.resolve(1111, "作者名1_changed"))
+
+        # 新しい作者は登録して索引ファイルにも保存する
+        self.assertEqual("作者名2(2222)", index.resolve(2222, "作者名2"))
+        AuthorDirectoryIndex.make_author_directory(self.TBP / "作者名2(2222)")
+        self.assertEqual("作者名2(2222)", index.resolve(2222, "作者名2_changed"))
+        other = AuthorDirectoryIndex(self.TBP)
+        self.assertEqual("作者名2(2222)", other.find(2222))
+
+    def test_pending(self):
+        self._make_dirs(["作者名1(1111)"])
+        index = AuthorDirectoryIndex.get(self.TBP)
+
+        # 登録直後でディレクトリが無くても、作成待ちの間は走査し直さずに同じディレクトリ名を返す
+        self.assertEqual("作者名2(2222)", index.resolve(2222, "作者名2"))
+        with patch.object(index, "rebuild", wraps=index.rebuild) as mock_rebuild:
+            self.assertEqual("作者名2(2222)", index.resolve(2222, "作者名2_changed"))
+            self.assertEqual("作者名2(2222)", index.find(2222))
+            mock_rebuild.assert_not_called()
+
+        # 他の作者の削除で作り直しても、作成待ちの登録は残す
+        (self.TBP / "作者名1(1111)").rmdir()
+        self.assertIsNone(index.find(1111))
+        self.assertEqual("作者名2(2222)", index.find(2222))
+
+        # 作成後は索引ファイルが base_path より新しいため、次回は走査せずに読み込む
+        AuthorDirectoryIndex.make_author_directory(self.TBP / "作者名2(2222)")
+        self.assertTrue((self.TBP / "作者名2(2222)").is_dir())
+        self.assertLessEqual(self.TBP.stat().st_mtime_ns, index.index_path.stat().st_mtime_ns)
+        with patch("media_downloader.link_search.author_directory_index.os.scandir") as mock_scandir:
+            other = AuthorDirectoryIndex(self.TBP)
+            mock_scandir.assert_not_called()
+        self.assertEqual("作者名2(2222)", other.find(2222))
+
+        # 作成後に削除された場合は作成待ちではないため作り直す
+        (self.TBP / "作者名2(2222)").rmdir()
+        self.assertIsNone(index.find(2222))
+
+        # 作成待ちでないディレクトリの作成、ベースパスごと作成
+        AuthorDirectoryIndex.make_author_directory(self.TBP / "作者名3(3333)")
+        self.assertEqual("作者名3(3333)", index.find(3333))
+        AuthorDirectoryIndex.make_author_directory(self.TBP / "new_base" / "作者名4(4444)")
+        self.assertEqual("作者名4(4444)", AuthorDirectoryIndex.get(self.TBP / "new_base").find(4444))
+
+        with self.assertRaises(TypeError):
+            AuthorDirectoryIndex.make_author_directory("invalid argument")
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,128 @@
+"""DownloadManifest のテスト"""
+
+import hashlib
+import shutil
+import sys
+import unittest
+from pathlib import Path
+
+from mock import patch
+
+from media_downloader.link_search.download_manifest import DownloadManifest, ManifestEntry, download_manifest
+
+
+class TestDownloadManifest(unittest.TestCase):
+    def setUp(self):
+        self.TBP = Path("./tests/link_search/download_manifest")
+        if self.TBP.is_dir():
+            shutil.rmtree(self.TBP)
+        self.TBP.mkdir(parents=True)
+        self.db_path = self.TBP / "download_manifest.db"
+
+    def tearDown(self):
+        shutil.rmtree(self.TBP, ignore_errors=True)
+
+    def test_DownloadManifest(self):
+        self.assertIsInstance(download_manifest, DownloadManifest)
+        self.assertIsNone(download_manifest.db_path)
+
+        manifest = DownloadManifest(self.db_path)
+        self.assertEqual(self.db_path, manifest.db_path)
+        self.assertTrue(self.db_path.is_file())
+
+        with self.assertRaises(TypeError):
+            manifest = DownloadManifest("invalid argument")
+
+    def test_digest(self):
+        file_path = self.TBP / "作品名1(11111111).jpg"
+        file_path.write_bytes(b"dummy_content")
+        expect = (len(b"dummy_content"), hashlib.sha256(b"dummy_content").hexdigest())
+        self.assertEqual(expect, DownloadManifest.digest(file_path))
+
+        dir_path = self.TBP / "作品名2(22222222)"
+        dir_path.mkdir()
+        contents = [b"page_001", b"page_002_content"]
+        for i, content in enumerate(contents):
+            (dir_path / f"作品名2(22222222)_{i + 1:03}.jpg").write_bytes(content)
+        sha256 = hashlib.sha256()
+        for content in contents:
+            sha256.update(hashlib.sha256(content).hexdigest().encode())
+        expect = (sum(len(c) for c in contents), sha256.hexdigest())
+        self.assertEqual(expect, DownloadManifest.digest(dir_path))
+
+    def test_commit(self):
+        manifest = DownloadManifest(self.db_path)
+        self.assertIsNone(manifest.get("pixiv", 11111111))
+        self.assertFalse(manifest.contains("pixiv", 11111111))
+
+        # 保存済のファイルを記録する
+        file_path = self.TBP / "作品名1(11111111).jpg"
+        file_path.write_bytes(b"dummy_content")
+        manifest.commit("pixiv", 11111111, file_path)
+        actual = manifest.get("pixiv", 11111111)
+        self.assertIsInstance(actual, ManifestEntry)
+        self.assertEqual(("pixiv", 11111111, file_path), (actual.site, actual.work_id, actual.path))
+        self.assertEqual(DownloadManifest.digest(file_path), (actual.size, actual.sha256))
+        self.assertTrue(manifest.contains("pixiv", 11111111))
+        # サイトが異なれば別の作品
+        self.assertFalse(manifest.contains("nijie", 11111111))
+
+        # 別のインスタンス（次回の実行を想定）からも参照できる
+        self.assertTrue(DownloadManifest(self.db_path).contains("pixiv", 11111111))
+
+        # 一時ファイルのリネームと同時に記録する
+        part_path = self.TBP / "作品名2(22222222).png.part"
+        save_path = self.TBP / "作品名2(22222222).png"
+        part_path.write_bytes(b"dummy_content_2")
+        manifest.commit("nijie", 22222222, save_path, part_path)
+        self.assertFalse(part_path.exists())
+        self.assertEqual(b"dummy_content_2", save_path.read_bytes())
+        self.assertEqual(save_path, manifest.get("nijie", 22222222).path)
+
+        # リネームに失敗した場合は記録しない
+        part_path = self.TBP / "作品名3(33333333).png.part"
+        save_path = self.TBP / "作品名3(33333333).png"
+        part_path.write_bytes(b"dummy_content_3")
+        with patch("media_downloader.link_search.download_manifest.os.replace") as mock_replace:
+            mock_replace.side_effect = OSError
+            with self.assertRaises(OSError):
+                manifest.commit("nijie", 33333333, save_path, part_path)
+        self.assertFalse(save_path.exists())
+        self.assertIsNone(manifest.get("nijie", 33333333))
+
+        # 保存先が削除されていれば記録も削除する
+        file_path.unlink()
+        self.assertIsNone(manifest.get("pixiv", 11111111))
+
+        # 記録を削除する
+        manifest.discard("nijie", 22222222)
+        self.assertIsNone(manifest.get("nijie", 22222222))
+
+    def test_disabled(self):
+        manifest = DownloadManifest()
+        file_path = self.TBP / "作品名1(11111111).jpg"
+        file_path.write_bytes(b"dummy_content")
+
+        # db_path が未設定なら記録しない
+        manifest.commit("pixiv", 11111111, file_path)
+        self.assertIsNone(manifest.get("pixiv", 11111111))
+
+        # リネームのみ行う
+        part_path = self.TBP / "作品名2(22222222).png.part"
+        save_path = self.TBP / "作品名2(22222222).png"
+        part_path.write_bytes(b"dummy_content_2")
+        manifest.commit("nijie", 22222222, save_path, part_path)
+        self.assertFalse(part_path.exists())
+        self.assertTrue(save_path.is_file())
+        manifest.discard("nijie", 22222222)
+
+        manifest.configure(self.db_path)
+        self.assertEqual(self.db_path, manifest.db_path)
+        manifest.configure(None)
+        self.assertIsNone(manifest.db_path)
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
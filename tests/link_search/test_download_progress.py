@@ -0,0 +1,64 @@
+"""DownloadProgress のテスト"""
+
+import sys
+import threading
+import unittest
+
+from media_downloader.link_search.download_progress import DownloadCancelledError, DownloadProgress
+from media_downloader.link_search.download_progress import DownloadProgressSnapshot, WorkProgress
+
+
+class TestDownloadProgress(unittest.TestCase):
+    def test_snapshot(self):
+        progress = DownloadProgress()
+        self.assertEqual(DownloadProgressSnapshot(0, {}), progress.snapshot())
+
+        # 受信バイト数は別スレッドからの記録も累計する
+        threads = [threading.Thread(target=progress.add_bytes, args=(100,)) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1000, progress.snapshot().bytes_total)
+
+        # 作品ごとのDL済ページ数
+        progress.start_work("作品名1(12345678)", 3)
+        progress.start_work("作品名2(12345679)", 2)
+        progress.page_done("作品名1(12345678)")
+        progress.page_done("作品名1(12345678)")
+        progress.page_done("未登録の作品")
+        expect = {
+            "作品名1(12345678)": WorkProgress(2, 3),
+            "作品名2(12345679)": WorkProgress(0, 2),
+        }
+        actual = progress.snapshot()
+        self.assertEqual(expect, actual.works)
+
+        # 取得後の変更は取得済の進捗に影響しない
+        progress.finish_work("作品名1(12345678)")
+        progress.finish_work("未登録の作品")
+        self.assertEqual(expect, actual.works)
+        self.assertEqual({"作品名2(12345679)": WorkProgress(0, 2)}, progress.snapshot().works)
+
+    def test_cancel(self):
+        progress = DownloadProgress()
+        self.assertFalse(progress.is_cancelled)
+        progress.raise_if_cancelled()
+
+        # reset するまでは取り消し状態のまま
+        progress.cancel()
+        self.assertTrue(progress.is_cancelled)
+        with self.assertRaises(DownloadCancelledError):
+            progress.raise_if_cancelled()
+        with self.assertRaises(DownloadCancelledError):
+            progress.raise_if_cancelled()
+
+        progress.reset()
+        self.assertFalse(progress.is_cancelled)
+        progress.raise_if_cancelled()
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
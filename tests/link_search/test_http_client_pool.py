@@ -0,0 +1,280 @@
+"""HttpClientPool のテスト"""
+
+import asyncio
+import sys
+import threading
+import time
+import unittest
+
+import httpx
+from mock import MagicMock, patch
+
+from media_downloader.link_search.http_client_pool import HttpClientPool, SessionClients, http_client_pool
+
+
+class TestHttpClientPool(unittest.TestCase):
+    def test_init(self):
+        pool = HttpClientPool()
+        self.assertEqual(
+            httpx.Limits(
+                max_connections=HttpClientPool.DEFAULT_MAX_CONNECTIONS,
+                max_keepalive_connections=HttpClientPool.DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HttpClientPool.DEFAULT_KEEPALIVE_EXPIRY,
+            ),
+            pool.limits,
+        )
+
+        # keep-alive の上限は同時接続数の上限を超えない
+        pool = HttpClientPool(4, 8, 10.0)
+        self.assertEqual(
+            httpx.Limits(max_connections=4, max_keepalive_connections=4, keepalive_expiry=10.0), pool.limits
+        )
+
+        with self.assertRaises(ValueError):
+            pool = HttpClientPool(0)
+        with self.assertRaises(ValueError):
+            pool = HttpClientPool(4, -1)
+        with self.assertRaises(ValueError):
+            pool = HttpClientPool(4, 4, -1.0)
+        with self.assertRaises(ValueError):
+            pool = HttpClientPool("invalid argument")
+        with self.assertRaises(TypeError):
+            pool = HttpClientPool(http2="invalid argument")
+        with self.assertRaises(ValueError):
+            pool = HttpClientPool(max_concurrency_per_host=0)
+
+    def test_http2(self):
+        with patch("media_downloader.link_search.http_client_pool.importlib.util.find_spec") as mock_find_spec:
+            # h2 パッケージが無い場合は HTTP/1.1 を使う
+            mock_find_spec.return_value = None
+            with patch("media_downloader.link_search.http_client_pool.logger.warning") as mock_warning:
+                pool = HttpClientPool(http2=True)
+                mock_warning.assert_called_once()
+            self.assertFalse(pool.http2)
+            mock_find_spec.assert_called_once_with("h2")
+
+            # h2 パッケージがある場合は HTTP/2 の transport で Client を生成する
+            mock_find_spec.return_value = MagicMock()
+            pool = HttpClientPool(http2=True)
+            self.assertTrue(pool.http2)
+            transport = httpx.HTTPTransport()
+            with patch("media_downloader.link_search.http_client_pool.httpx.HTTPTransport") as mock_transport:
+                mock_transport.return_value = transport
+                pool.get("nijie")
+                mock_transport.assert_called_once_with(retries=pool.RETRIES, limits=pool.limits, http2=True)
+
+                # 設定が変われば Client を作り直す
+                mock_transport.reset_mock()
+                pool.configure(http2=False)
+                pool.get("nijie")
+                mock_transport.assert_called_once_with(retries=pool.RETRIES, limits=pool.limits, http2=False)
+            pool.close()
+
+    def test_get(self):
+        pool = HttpClientPool()
+
+        # 同じサイト名に対しては同じ Client を返す
+        client = pool.get("nijie")
+        self.assertIsInstance(client, httpx.Client)
+        self.assertIs(client, pool.get("nijie"))
+        self.assertTrue(client.follow_redirects)
+        self.assertEqual(httpx.Timeout(HttpClientPool.TIMEOUT), client.timeout)
+
+        # サイト名が異なれば別の Client を返す
+        other = pool.get("pixiv")
+        self.assertIsNot(client, other)
+
+        # 閉じられていれば作り直す
+        client.close()
+        actual = pool.get("nijie")
+        self.assertIsNot(client, actual)
+        self.assertFalse(actual.is_closed)
+
+        with self.assertRaises(ValueError):
+            pool.get("")
+        with self.assertRaises(ValueError):
+            pool.get(None)
+        pool.close()
+
+    def test_get_concurrent(self):
+        pool = HttpClientPool()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(pool.get("nijie"))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # 同時に取得しても Client は1つのみ生成される
+        self.assertEqual(8, len(results))
+        self.assertTrue(all(r is results[0] for r in results))
+        pool.close()
+
+    def test_configure(self):
+        pool = HttpClientPool()
+        client = pool.get("nijie")
+
+        # 設定が変わらなければ生成済の Client をそのまま使う
+        pool.configure()
+        self.assertIs(client, pool.get("nijie"))
+        self.assertFalse(client.is_closed)
+
+        # 設定が変われば生成済の Client を閉じて作り直す
+        pool.configure(4, 2, 10.0)
+        self.assertTrue(client.is_closed)
+        actual = pool.get("nijie")
+        self.assertIsNot(client, actual)
+        self.assertEqual(
+            httpx.Limits(max_connections=4, max_keepalive_connections=2, keepalive_expiry=10.0), pool.limits
+        )
+
+        # 不正な設定の場合は何も変更しない
+        with self.assertRaises(ValueError):
+            pool.configure(0)
+        self.assertIs(actual, pool.get("nijie"))
+        pool.close()
+
+    def test_create(self):
+        pool = HttpClientPool()
+
+        # プールには登録せず、毎回新しい Client を生成する
+        client = pool.create()
+        self.assertIsInstance(client, httpx.Client)
+        self.assertIsNot(client, pool.create())
+        self.assertIsNot(client, pool.get("nico_seiga"))
+        pool.close()
+        self.assertFalse(client.is_closed)
+        client.close()
+
+    def test_create_async(self):
+        pool = HttpClientPool()
+
+        async def run() -> tuple[httpx.AsyncClient, httpx.AsyncClient]:
+            # プールには登録せず、毎回新しい AsyncClient を生成する
+            client = pool.create_async()
+            self.assertIsInstance(client, httpx.AsyncClient)
+            self.assertIsNot(client, pool.create_async())
+            self.assertIsNot(client, pool.get_async("nico_seiga"))
+
+            # 既に閉じられたものはそのままにして、まとめて閉じる
+            closed_client = pool.create_async()
+            await closed_client.aclose()
+            await pool.aclose()
+            return client, closed_client
+
+        client, closed_client = asyncio.run(run())
+        self.assertTrue(client.is_closed)
+        self.assertTrue(closed_client.is_closed)
+
+    def test_slot(self):
+        pool = HttpClientPool(max_concurrency_per_host=2)
+        lock = threading.Lock()
+        running = {"i.pximg.net": 0, "pic.nijie.net": 0}
+        max_running = dict(running)
+
+        def request(url: str, host: str) -> None:
+            with pool.slot(url):
+                with lock:
+                    running[host] += 1
+                    max_running[host] = max(max_running[host], running[host])
+                time.sleep(0.02)
+                with lock:
+                    running[host] -= 1
+
+        urls = [("https://i.pximg.net/img-original/dummy.png", "i.pximg.net")] * 6
+        urls += [("https://PIC.nijie.net/dummy.jpg", "pic.nijie.net")] * 6
+        threads = [threading.Thread(target=request, args=args) for args in urls]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # ホストごとに同時リクエスト数が上限を超えない
+        self.assertEqual({"i.pximg.net": 2, "pic.nijie.net": 2}, max_running)
+
+        # 上限が変われば作り直す
+        pool.configure(max_concurrency_per_host=3)
+        self.assertEqual(3, pool.max_concurrency_per_host)
+        with pool.slot("https://i.pximg.net/"), pool.slot("https://i.pximg.net/"), pool.slot("i.pximg.net"):
+            pass
+
+    def test_close(self):
+        pool = HttpClientPool()
+        clients = [pool.get("nijie"), pool.get("pixiv")]
+        pool.close()
+        self.assertTrue(all(client.is_closed for client in clients))
+
+        # 閉じたあとも取得すれば作り直す
+        self.assertFalse(pool.get("nijie").is_closed)
+        pool.close()
+
+
+class TestSessionClients(unittest.TestCase):
+    def test_client(self):
+        cookies = httpx.Cookies()
+        cookies.set("user_session", "dummy_value", domain=".example.com")
+
+        # クッキーを設定した Client を初回アクセス時に生成し、以降は同じものを返す
+        clients = SessionClients(cookies)
+        client = clients.client
+        self.assertIsInstance(client, httpx.Client)
+        self.assertIs(client, clients.client)
+        self.assertEqual("dummy_value", client.cookies.get("user_session"))
+
+        # 共有の Client にはクッキーを設定しない
+        self.assertIsNone(HttpClientPool().get("example").cookies.get("user_session"))
+
+        # 閉じた後は作り直さない
+        clients.close()
+        self.assertTrue(client.is_closed)
+        self.assertIs(client, clients.client)
+
+        # 生成済の Client を指定した場合はそれを使う
+        login_client = httpx.Client()
+        clients = SessionClients(client=login_client)
+        self.assertIs(login_client, clients.client)
+        clients.close()
+        self.assertTrue(login_client.is_closed)
+
+        # Client を生成する前に閉じてもエラーにならない
+        SessionClients(cookies).close()
+
+    def test_async_client(self):
+        cookies = httpx.Cookies()
+        cookies.set("user_session", "dummy_value", domain=".example.com")
+
+        async def run(clients: SessionClients) -> httpx.AsyncClient:
+            # クッキーを写した AsyncClient を初回アクセス時に生成し、以降は同じものを返す
+            async_client = clients.async_client
+            self.assertIsInstance(async_client, httpx.AsyncClient)
+            self.assertIs(async_client, clients.async_client)
+            self.assertEqual("dummy_value", async_client.cookies.get("user_session"))
+            return async_client
+
+        # Client が未生成の場合は cookies を写す
+        clients = SessionClients(cookies)
+        async_client = asyncio.run(run(clients))
+
+        # イベントループの終わりにプールから閉じられた場合は次に使う際に作り直す
+        asyncio.run(http_client_pool.aclose())
+        self.assertTrue(async_client.is_closed)
+        self.assertIsNot(async_client, asyncio.run(run(clients)))
+        asyncio.run(clients.aclose())
+
+        # 生成済の Client がある場合は、その Client のクッキーを写す
+        login_client = httpx.Client()
+        login_client.cookies.set("user_session", "dummy_value", domain=".example.com")
+        clients = SessionClients(client=login_client)
+        async_client = asyncio.run(run(clients))
+
+        # セッションを閉じると Client と AsyncClient を閉じ、以降は作り直さない
+        asyncio.run(clients.aclose())
+        self.assertTrue(login_client.is_closed)
+        self.assertTrue(async_client.is_closed)
+        self.assertIs(async_client, clients.async_client)
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,175 @@
+"""InFlightRegistry のテスト"""
+
+import asyncio
+import sys
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from logging import WARNING, getLogger
+
+from mock import MagicMock
+
+from media_downloader.link_search.in_flight_registry import InFlightRegistry
+from media_downloader.link_search.work_key import WorkKey
+
+logger = getLogger("media_downloader.link_search.in_flight_registry")
+logger.setLevel(WARNING)
+
+
+class TestInFlightRegistry(unittest.TestCase):
+    def setUp(self):
+        self.key = WorkKey("nijie", 251267)
+
+    def _blocking_func(self, result=None, exception=None):
+        """started を通知した後、release されるまで待ってから結果を返す処理を作る"""
+        started = threading.Event()
+        release = threading.Event()
+
+        def func():
+            started.set()
+            release.wait(5)
+            if exception is not None:
+                raise exception
+            return result
+
+        return MagicMock(side_effect=func), started, release
+
+    def test_run(self):
+        registry = InFlightRegistry()
+        func, started, release = self._blocking_func(result="done")
+        other_func = MagicMock(return_value="other")
+
+        with ThreadPoolExecutor(4) as executor:
+            owner = executor.submit(registry.run, self.key, func)
+            self.assertTrue(started.wait(5))
+            self.assertTrue(registry.is_running(self.key))
+
+            # 実行中の同じキーの処理は実行せずに結果を待つ
+            waiters = [executor.submit(registry.run, self.key, other_func) for _ in range(3)]
+            release.set()
+            self.assertEqual("done", owner.result(5))
+            self.assertEqual(["done"] * 3, [w.result(5) for w in waiters])
+
+        func.assert_called_once_with()
+        other_func.assert_not_called()
+
+        # 終了したキーは破棄し、次の呼び出しでは改めて実行する
+        self.assertFalse(registry.is_running(self.key))
+        self.assertEqual("other", registry.run(self.key, other_func))
+        other_func.assert_called_once_with()
+
+    def test_run_different_key(self):
+        registry = InFlightRegistry()
+        func, started, release = self._blocking_func(result="done")
+        other_func = MagicMock(return_value="other")
+
+        with ThreadPoolExecutor(2) as executor:
+            owner = executor.submit(registry.run, self.key, func)
+            self.assertTrue(started.wait(5))
+
+            # キーが異なる場合、Noneの場合はまとめない
+            self.assertEqual("other", registry.run(WorkKey("nijie", 251268), other_func))
+            self.assertEqual("other", registry.run(WorkKey("pixiv", 251267), other_func))
+            self.assertEqual("other", registry.run(None, other_func))
+            self.assertEqual(3, other_func.call_count)
+            self.assertFalse(registry.is_running(None))
+            release.set()
+            self.assertEqual("done", owner.result(5))
+
+    def test_run_exception(self):
+        registry = InFlightRegistry()
+        func, started, release = self._blocking_func(exception=ValueError("error"))
+
+        with ThreadPoolExecutor(4) as executor:
+            owner = executor.submit(registry.run, self.key, func)
+            self.assertTrue(started.wait(5))
+            waiters = [executor.submit(registry.run, self.key, MagicMock()) for _ in range(3)]
+            release.set()
+
+            # 待っていた呼び出し元にも同じ例外を送出する
+            with self.assertRaises(ValueError):
+                owner.result(5)
+            for waiter in waiters:
+                with self.assertRaises(ValueError):
+                    waiter.result(5)
+
+        func.assert_called_once_with()
+        self.assertFalse(registry.is_running(self.key))
+
+    def test_run_async(self):
+        registry = InFlightRegistry()
+        calls = []
+
+        async def download(result):
+            calls.append(result)
+            await asyncio.sleep(0.01)
+            return result
+
+        async def run():
+            tasks = [registry.run_async(self.key, lambda i=i: download(i)) for i in range(3)]
+            tasks.append(registry.run_async(None, lambda: download("no key")))
+            return await asyncio.gather(*tasks)
+
+        # 同じキーの処理は最初の1つのみ実行する
+        actual = asyncio.run(run())
+        self.assertEqual([0, 0, 0, "no key"], actual)
+        self.assertEqual([0, "no key"], calls)
+        self.assertFalse(registry.is_running(self.key))
+
+    def test_run_async_exception(self):
+        registry = InFlightRegistry()
+
+        async def download():
+            await asyncio.sleep(0.01)
+            raise ValueError("error")
+
+        async def run():
+            tasks = [registry.run_async(self.key, download) for _ in range(3)]
+            return await asyncio.gather(*tasks, return_exceptions=True)
+
+        actual = asyncio.run(run())
+        self.assertEqual(3, len(actual))
+        for result in actual:
+            self.assertIsInstance(result, ValueError)
+        self.assertFalse(registry.is_running(self.key))
+
+    def test_run_async_cancel(self):
+        registry = InFlightRegistry()
+
+        async def download():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def run():
+            owner = asyncio.create_task(registry.run_async(self.key, download))
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(registry.run_async(self.key, download))
+            other_waiter = asyncio.create_task(registry.run_async(self.key, download))
+            await asyncio.sleep(0)
+
+            # 待っている側が取り消されても、実行中の処理と他の呼び出し元には影響しない
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            self.assertEqual("done", await owner)
+            self.assertEqual("done", await other_waiter)
+
+            # 実行している側が取り消された場合は、待っている側も取り消される
+            owner = asyncio.create_task(registry.run_async(self.key, download))
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(registry.run_async(self.key, download))
+            await asyncio.sleep(0)
+            owner.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await owner
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+
+        asyncio.run(run())
+        self.assertFalse(registry.is_running(self.key))
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -4,14 +4,20 @@
 """
 
 import configparser
+import enum
 import sys
+import threading
 import unittest
 from contextlib import ExitStack
 from logging import WARNING, getLogger
 
 from mock import MagicMock, patch
 
-from media_downloader.link_search.link_searcher import LinkSearcher
+from media_downloader.link_search.in_flight_registry import InFlightRegistry
+from media_downloader.link_search.link_searcher import FetchManyResult, LinkSearcher
+from media_downloader.link_search.nijie.nijie_url import NijieURL
+from media_downloader.link_search.work_key import WorkKey
+from media_downloader.util import Result
 
 logger = getLogger("media_downloader.link_search.link_searcher")
 logger.setLevel(WARNING)
@@ -68,6 +74,104 @@ class TestLinkSearcher(unittest.TestCase):
                 invalid_url_str = "https://invalid/artworks/86704541"
                 actual = lsc.fetch(invalid_url_str)
 
+    def test_fetch_many(self):
+        with ExitStack() as stack:
+            mock_logger = stack.enter_context(patch.object(logger, "info"))
+            lsc = LinkSearcher()
+
+            class DummyResult(enum.Enum):
+                SUCCESS = enum.auto()
+                PASSED = enum.auto()
+
+            pixiv_url_str = "https://www.pixiv.net/artworks/86704541"
+            nijie_url_str = "https://nijie.info/view_popup.php?id=251267"
+            error_url_str = "https://www.pixiv.net/artworks/99999999"
+
+            def fetch(url):
+                if url == error_url_str:
+                    raise ValueError
+                return DummyResult.PASSED
+
+            fake_pixiv_fetcher = MagicMock()
+            fake_pixiv_fetcher.is_target_url = lambda url: "pixiv" in url.non_query_url
+            fake_pixiv_fetcher.fetch = MagicMock(side_effect=fetch)
+            fake_nijie_fetcher = MagicMock()
+            fake_nijie_fetcher.is_target_url = lambda url: "nijie" in url.non_query_url
+            fake_nijie_fetcher.fetch = MagicMock(return_value=None)
+            lsc.register(fake_pixiv_fetcher)
+            lsc.register(fake_nijie_fetcher)
+
+            urls = [
+                pixiv_url_str,
+                nijie_url_str,
+                error_url_str,
+                "https://invalid/artworks/86704541",
+                "invalid url",
+            ]
+            actual = lsc.fetch_many(urls, max_workers=2)
+            self.assertIsInstance(actual, FetchManyResult)
+            expect = [
+                (pixiv_url_str, DummyResult.PASSED),
+                (nijie_url_str, Result.SUCCESS),
+                (error_url_str, Result.FAILED),
+                ("https://invalid/artworks/86704541", Result.FAILED),
+                ("invalid url", Result.FAILED),
+            ]
+            self.assertEqual(expect, actual.results)
+            self.assertEqual([error_url_str, "https://invalid/artworks/86704541", "invalid url"], actual.failed_urls)
+            self.assertGreaterEqual(actual.elapsed_time, 0.0)
+            self.assertEqual(2, fake_pixiv_fetcher.fetch.call_count)
+            fake_nijie_fetcher.fetch.assert_called_once_with(nijie_url_str)
+
+            actual = lsc.fetch_many([])
+            self.assertEqual([], actual.results)
+
+            with self.assertRaises(ValueError):
+                actual = lsc.fetch_many(urls, max_workers=0)
+
+    def test_fetch_many_same_work(self):
+        registry = self.enterContext(
+            patch("media_downloader.link_search.link_searcher.in_flight_registry", InFlightRegistry())
+        )
+        self.enterContext(patch.object(logger, "info"))
+        # 同じ作品の取得を待つ呼び出し元が現れるまで、先に始まった取得を終えない
+        waiting = threading.Event()
+        mock_registry_logger = self.enterContext(patch("media_downloader.link_search.in_flight_registry.logger"))
+        mock_registry_logger.info.side_effect = lambda msg: waiting.set()
+        lsc = LinkSearcher()
+
+        view_url_str = "https://nijie.info/view.php?id=251267"
+        popup_url_str = "https://nijie.info/view_popup.php?id=251267"
+        other_url_str = "https://nijie.info/view.php?id=251268"
+
+        def fetch(url):
+            if url != other_url_str:
+                self.assertTrue(registry.is_running(WorkKey("nijie", 251267)))
+                waiting.wait(5)
+            return Result.SUCCESS
+
+        fake_fetcher = MagicMock()
+        fake_fetcher.is_target_url = lambda url: "nijie" in url.non_query_url
+        fake_fetcher.work_key = lambda url: NijieURL.create(url).work_key
+        fake_fetcher.fetch = MagicMock(side_effect=fetch)
+        lsc.register(fake_fetcher)
+
+        # 同じ作品を指すURLは1回のみ取得し、それぞれに同じ結果を記録する
+        urls = [view_url_str, popup_url_str, other_url_str]
+        actual = lsc.fetch_many(urls, max_workers=3)
+        self.assertEqual([(url, Result.SUCCESS) for url in urls], actual.results)
+        self.assertEqual(2, fake_fetcher.fetch.call_count)
+        fetched_urls = {c.args[0] for c in fake_fetcher.fetch.call_args_list}
+        self.assertIn(other_url_str, fetched_urls)
+        self.assertEqual(1, len(fetched_urls & {view_url_str, popup_url_str}))
+        self.assertFalse(registry.is_running(WorkKey("nijie", 251267)))
+
+        # fetcher が作品キーを返さない場合はまとめない
+        fake_fetcher.work_key = MagicMock(return_value=None)
+        fake_fetcher.fetch.reset_mock()
+        actual = lsc.fetch_many([view_url_str, popup_url_str])
+        self.assertEqual(2, fake_fetcher.fetch.call_count)
+
     def test_can_fetch(self):
         lsc = LinkSearcher()
 
@@ -86,6 +190,42 @@ class TestLinkSearcher(unittest.TestCase):
         actual = lsc.can_fetch(invalid_url_str)
         self.assertEqual(False, actual)
 
+    def test_find_fetcher(self):
+        lsc = LinkSearcher()
+        pixiv_url_str = "https://www.pixiv.net/artworks/86704541"
+        novel_url_str = "https://www.pixiv.net/novel/show.php?id=17668373"
+        nijie_url_str = "https://nijie.info/view_popup.php?id=251267"
+
+        def get_fetcher(hosts, pattern):
+            fetcher = MagicMock()
+            if hosts is not None:
+                fetcher.TARGET_HOSTS = hosts
+            fetcher.is_target_url = MagicMock(side_effect=lambda url: pattern in url.original_url)
+            return fetcher
+
+        fake_pixiv_fetcher = get_fetcher(("www.pixiv.net",), "artworks")
+        fake_novel_fetcher = get_fetcher(("www.pixiv.net",), "novel")
+        fake_nijie_fetcher = get_fetcher(("nijie.info",), "nijie")
+        fake_any_fetcher = get_fetcher(None, "novel")
+        with patch.object(logger, "info"):
+            for fetcher in [fake_pixiv_fetcher, fake_any_fetcher, fake_novel_fetcher, fake_nijie_fetcher]:
+                lsc.register(fetcher)
+
+        # ホスト名の一致するfetcherと担当ホスト不明のfetcherのみ、登録順に判定する
+        self.assertIs(fake_pixiv_fetcher, lsc._find_fetcher(pixiv_url_str))
+        self.assertIs(fake_any_fetcher, lsc._find_fetcher(novel_url_str))
+        self.assertIs(fake_nijie_fetcher, lsc._find_fetcher(nijie_url_str))
+        self.assertEqual(2, fake_pixiv_fetcher.is_target_url.call_count)
+        self.assertEqual(0, fake_novel_fetcher.is_target_url.call_count)
+        self.assertEqual(1, fake_nijie_fetcher.is_target_url.call_count)
+        self.assertEqual(2, fake_any_fetcher.is_target_url.call_count)
+
+        # 索引に無いホスト名は担当ホスト不明のfetcherのみ判定する
+        fake_pixiv_fetcher.is_target_url.reset_mock()
+        self.assertIsNone(lsc._find_fetcher("https://www.example.com/illust/1"))
+        fake_pixiv_fetcher.is_target_url.assert_not_called()
+        self.assertIsNone(lsc._find_fetcher("invalid url"))
+
     def test_create(self):
         with ExitStack() as stack:
             mock_notification = stack.enter_context(patch("media_downloader.link_search.link_searcher.notification"))
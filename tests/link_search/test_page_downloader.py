@@ -0,0 +1,301 @@
+"""PageDownloader のテスト"""
+
+import os
+import shutil
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from mock import MagicMock, call, patch
+
+from media_downloader.link_search.download_progress import DownloadCancelledError, DownloadProgress, WorkProgress
+from media_downloader.link_search.page_downloader import PageDownloader
+from media_downloader.link_search.stream_downloader import StreamDownloader
+
+
+class TestPageDownloader(unittest.TestCase):
+    def setUp(self):
+        self.TBP = Path("./tests/link_search/page_downloader_test")
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+        self.TBP.mkdir(parents=True)
+        self.enterContext(patch("media_downloader.link_search.page_downloader.logger.info"))
+        self.addCleanup(PageDownloader.configure)
+        self.progress = DownloadProgress()
+        self.enterContext(patch("media_downloader.link_search.page_downloader.download_progress", self.progress))
+
+    def tearDown(self):
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+
+    def _get_stream_downloader(self, delay: float = 0.0) -> MagicMock:
+        stream_downloader = MagicMock(spec=StreamDownloader)
+
+        def download(url, save_path, **kwargs):
+            time.sleep(delay)
+            save_path.write_text(url)
+            return save_path
+
+        stream_downloader.download.side_effect = download
+        return stream_downloader
+
+    def test_PageDownloader(self):
+        stream_downloader = self._get_stream_downloader()
+        actual = PageDownloader(stream_downloader)
+        self.assertTrue(actual._is_valid())
+
+        with self.assertRaises(TypeError):
+            actual = PageDownloader("invalid argument")
+
+    def test_configure(self):
+        self.assertEqual(PageDownloader.DEFAULT_MAX_WORKERS, PageDownloader.MAX_WORKERS)
+        PageDownloader.configure(8)
+        self.assertEqual(8, PageDownloader.MAX_WORKERS)
+        PageDownloader.configure()
+        self.assertEqual(PageDownloader.DEFAULT_MAX_WORKERS, PageDownloader.MAX_WORKERS)
+
+        with self.assertRaises(ValueError):
+            PageDownloader.configure(0)
+        with self.assertRaises(ValueError):
+            PageDownloader.configure("invalid argument")
+
+    def test_download(self):
+        stream_downloader = self._get_stream_downloader()
+        pages = [(f"https://dummy.host/{i}.jpg", self.TBP / f"work_{i:03}.jpg") for i in range(10)]
+        headers = {"Referer": "https://dummy.host/"}
+
+        # すべてのページをDLする、完了順は問わない
+        PageDownloader(stream_downloader).download(pages, headers=headers)
+        expect = [call(url, save_path, headers=headers) for url, save_path in pages]
+        self.assertCountEqual(expect, stream_downloader.download.call_args_list)
+        self.assertTrue(all(save_path.read_text() == url for url, save_path in pages))
+
+        # 保存済のページはスキップする
+        stream_downloader.download.reset_mock()
+        pages[3][1].unlink()
+        pages[7][1].unlink()
+        PageDownloader(stream_downloader).download(pages, headers=headers)
+        expect = [call(*pages[3], headers=headers), call(*pages[7], headers=headers)]
+        self.assertCountEqual(expect, stream_downloader.download.call_args_list)
+
+        # 1ページずつの場合は順にDLする
+        stream_downloader.download.reset_mock()
+        for _, save_path in pages:
+            save_path.unlink()
+        PageDownloader.configure(1)
+        PageDownloader(stream_downloader).download(pages)
+        expect = [call(url, save_path) for url, save_path in pages]
+        self.assertEqual(expect, stream_downloader.download.call_args_list)
+
+    def test_download_concurrent(self):
+        lock = threading.Lock()
+        running = 0
+        max_running = 0
+        stream_downloader = MagicMock(spec=StreamDownloader)
+
+        def download(url, save_path):
+            nonlocal running, max_running
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+            time.sleep(0.02)
+            save_path.write_text(url)
+            with lock:
+                running -= 1
+            return save_path
+
+        stream_downloader.download.side_effect = download
+        pages = [(f"https://dummy.host/{i}.jpg", self.TBP / f"work_{i:03}.jpg") for i in range(12)]
+
+        # 同時DLページ数は MAX_WORKERS を超えない
+        PageDownloader.configure(3)
+        PageDownloader(stream_downloader).download(pages)
+        self.assertEqual(3, max_running)
+        self.assertTrue(all(save_path.is_file() for _, save_path in pages))
+
+    def test_download_failed(self):
+        stream_downloader = self._get_stream_downloader()
+        pages = [(f"https://dummy.host/{i}.jpg", self.TBP / f"work_{i:03}.jpg") for i in range(20)]
+
+        def download(url, save_path):
+            if save_path == pages[0][1]:
+                raise ValueError("download failed.")
+            time.sleep(0.01)
+            save_path.write_text(url)
+            return save_path
+
+        stream_downloader.download.side_effect = download
+
+        # いずれかのページが失敗した場合は未着手のページを取り消して例外を送出する
+        PageDownloader.configure(2)
+        with self.assertRaises(ValueError):
+            PageDownloader(stream_downloader).download(pages)
+        self.assertFalse(pages[0][1].exists())
+        self.assertLess(stream_downloader.download.call_count, len(pages))
+
+        # 次回は残りのページのみDLする
+        done = [save_path for _, save_path in pages if save_path.is_file()]
+        stream_downloader.download.side_effect = self._get_stream_downloader().download.side_effect
+        stream_downloader.download.reset_mock()
+        PageDownloader(stream_downloader).download(pages)
+        self.assertEqual(len(pages) - len(done), stream_downloader.download.call_count)
+        self.assertTrue(all(save_path.is_file() for _, save_path in pages))
+
+    def test_download_progress(self):
+        stream_downloader = MagicMock(spec=StreamDownloader)
+        pages = [(f"https://dummy.host/{i}.jpg", self.TBP / f"work_{i:03}.jpg") for i in range(4)]
+        pages[0][1].write_text("exist")
+        snapshots = []
+
+        def download(url, save_path):
+            snapshots.append(self.progress.snapshot().works)
+            save_path.write_text(url)
+            return save_path
+
+        stream_downloader.download.side_effect = download
+
+        # 保存済のページも含めて、作品ごとのDL済ページ数を記録する
+        PageDownloader.configure(1)
+        PageDownloader(stream_downloader).download(pages, "作品名1")
+        expect = [{"作品名1": WorkProgress(i, 4)} for i in range(1, 4)]
+        self.assertEqual(expect, snapshots)
+        # 終了後は記録を消す
+        self.assertEqual({}, self.progress.snapshot().works)
+
+        # 作品名を指定しない場合は記録しない
+        snapshots.clear()
+        for _, save_path in pages[1:]:
+            save_path.unlink()
+        PageDownloader(stream_downloader).download(pages)
+        self.assertEqual([{}] * 3, snapshots)
+
+    def test_download_cancelled(self):
+        stream_downloader = self._get_stream_downloader()
+        pages = [(f"https://dummy.host/{i}.jpg", self.TBP / f"work_{i:03}.jpg") for i in range(10)]
+
+        def download(url, save_path):
+            if save_path == pages[2][1]:
+                self.progress.cancel()
+            save_path.write_text(url)
+            return save_path
+
+        stream_downloader.download.side_effect = download
+
+        # 取り消された場合は未着手のページをDLせずに中断する
+        PageDownloader.configure(1)
+        with self.assertRaises(DownloadCancelledError):
+            PageDownloader(stream_downloader).download(pages, "作品名1")
+        self.assertEqual(3, stream_downloader.download.call_count)
+        self.assertEqual({}, self.progress.snapshot().works)
+
+        # 取り消しを解除すると残りのページのみDLする
+        self.progress.reset()
+        stream_downloader.download.reset_mock()
+        PageDownloader(stream_downloader).download(pages, "作品名1")
+        self.assertEqual(7, stream_downloader.download.call_count)
+        self.assertTrue(all(save_path.is_file() for _, save_path in pages))
+
+    def test_staging_path(self):
+        save_directory = self.TBP / "作者名1(11111111)" / "作品名1(12345678)"
+        actual = PageDownloader.staging_path(save_directory)
+        self.assertEqual(self.TBP / "作者名1(11111111)" / ".作品名1(12345678).staging", actual)
+
+    def test_download_directory(self):
+        stream_downloader = self._get_stream_downloader()
+        page_downloader = PageDownloader(stream_downloader)
+        save_directory = self.TBP / "作者名1(11111111)" / "作品名1(12345678)"
+        staging_path = PageDownloader.staging_path(save_directory)
+        pages = [(f"https://www.example.com/{i}.jpg", f"作品名1(12345678)_{i:03}.jpg") for i in range(5)]
+
+        # 前回2ページ目まで隠しディレクトリにDLして中断していた
+        staging_path.mkdir(parents=True)
+        for _, name in pages[:2]:
+            (staging_path / name).write_text("dummy")
+
+        committed = []
+
+        def commit(source: Path, path: Path) -> None:
+            committed.append((source, path))
+            source.replace(path)
+
+        actual = page_downloader.download_directory(save_directory, pages, commit=commit, headers={"dummy": "dummy"})
+        self.assertEqual(save_directory, actual)
+        expect = [call(url, staging_path / name, headers={"dummy": "dummy"}) for url, name in pages[2:]]
+        self.assertCountEqual(expect, stream_downloader.download.call_args_list)
+        self.assertEqual([(staging_path, save_directory)], committed)
+        self.assertFalse(staging_path.exists())
+        self.assertEqual([name for _, name in pages], sorted(p.name for p in save_directory.iterdir()))
+
+        # いずれかのページが失敗した場合は保存先ディレクトリを作らない
+        save_directory = self.TBP / "作者名1(11111111)" / "作品名2(23456789)"
+        stream_downloader.download.side_effect = ValueError
+        with self.assertRaises(ValueError):
+            actual = page_downloader.download_directory(save_directory, pages)
+        self.assertFalse(save_directory.exists())
+        self.assertTrue(PageDownloader.staging_path(save_directory).is_dir())
+
+    def test_commit_staging(self):
+        save_directory = self.TBP / "作者名1(11111111)" / "作品名1(12345678)"
+        staging_path = PageDownloader.staging_path(save_directory)
+        staging_path.mkdir(parents=True)
+        (staging_path / "page.jpg").write_text("staging")
+
+        # 隠しディレクトリを保存先にリネームする
+        actual = PageDownloader.commit_staging(staging_path, save_directory)
+        self.assertEqual(save_directory, actual)
+        self.assertFalse(staging_path.exists())
+        self.assertEqual("staging", (save_directory / "page.jpg").read_text())
+
+        # 並行して動いていた別の処理が先に保存先を確定させていた場合は、隠しディレクトリを破棄する
+        staging_path.mkdir(parents=True)
+        (staging_path / "page.jpg").write_text("other")
+        actual = PageDownloader.commit_staging(staging_path, save_directory)
+        self.assertFalse(staging_path.exists())
+        self.assertEqual("staging", (save_directory / "page.jpg").read_text())
+
+        # 保存先が無いのにリネームに失敗した場合は例外を送出する
+        shutil.rmtree(save_directory)
+        staging_path.mkdir(parents=True)
+        with self.assertRaises(OSError):
+            actual = PageDownloader.commit_staging(staging_path, save_directory, MagicMock(side_effect=OSError))
+        self.assertTrue(staging_path.is_dir())
+
+    def test_prepare_staging(self):
+        author_path = self.TBP / "作者名1(11111111)"
+        save_directory = author_path / "作品名1(12345678)"
+        staging_path = PageDownloader.staging_path(save_directory)
+
+        # 隠しディレクトリが無い場合は作成する
+        actual = PageDownloader.prepare_staging(save_directory)
+        self.assertEqual(staging_path, actual)
+        self.assertTrue(staging_path.is_dir())
+
+        # 前回中断した隠しディレクトリは続きから再開するため残す
+        (staging_path / "page_000.jpg").write_text("dummy")
+        mock_time = self.enterContext(patch("media_downloader.link_search.page_downloader.time.time"))
+        mock_time.return_value = staging_path.stat().st_mtime + 60
+        expire = 60 * 60
+        actual = PageDownloader.prepare_staging(save_directory, expire)
+        self.assertEqual(["page_000.jpg"], [p.name for p in actual.iterdir()])
+
+        # 長期間更新されていないものは削除して作り直す
+        expired_time = mock_time.return_value - expire - 1
+        os.utime(staging_path, (expired_time, expired_time))
+        actual = PageDownloader.prepare_staging(save_directory, expire)
+        self.assertTrue(actual.is_dir())
+        self.assertEqual([], list(actual.iterdir()))
+
+        # 同じ作者の他の作品の隠しディレクトリには触れない
+        other_staging_path = PageDownloader.staging_path(author_path / "作品名2(23456789)")
+        other_staging_path.mkdir()
+        os.utime(other_staging_path, (expired_time, expired_time))
+        actual = PageDownloader.prepare_staging(save_directory, expire)
+        self.assertTrue(other_staging_path.is_dir())
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,151 @@
+"""HostRateLimiter のテスト"""
+
+import asyncio
+import sys
+import threading
+import unittest
+
+from mock import patch
+
+from media_downloader.link_search.rate_limiter import HostRateLimiter, TokenBucket, rate_limiter
+from media_downloader.link_search.url import URL
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_TokenBucket(self):
+        bucket = TokenBucket(2.0, 4)
+        self.assertEqual(2.0, bucket.rate)
+        self.assertEqual(4, bucket.capacity)
+
+        with self.assertRaises(ValueError):
+            bucket = TokenBucket(0, 4)
+        with self.assertRaises(ValueError):
+            bucket = TokenBucket(2.0, 0)
+        with self.assertRaises(ValueError):
+            bucket = TokenBucket("invalid", 4)
+
+    def test_acquire(self):
+        with patch("media_downloader.link_search.rate_limiter.time") as mock_time:
+            now = [100.0]
+            mock_time.monotonic.side_effect = lambda: now[0]
+            bucket = TokenBucket(2.0, 2)
+
+            # 容量分は待機なし
+            self.assertEqual(0.0, bucket.acquire())
+            self.assertEqual(0.0, bucket.acquire())
+            mock_time.sleep.assert_not_called()
+
+            # 容量を超えると補充されるまで待機する
+            self.assertEqual(0.5, bucket.acquire())
+            mock_time.sleep.assert_called_once_with(0.5)
+            mock_time.sleep.reset_mock()
+
+            # 待機は予約されるので、続けて取得するとさらに待つ
+            self.assertEqual(1.0, bucket.acquire())
+            mock_time.sleep.assert_called_once_with(1.0)
+            mock_time.sleep.reset_mock()
+
+            # 十分時間が経てば容量まで補充される
+            now[0] += 10.0
+            self.assertEqual(0.0, bucket.acquire())
+            self.assertEqual(0.0, bucket.acquire())
+            mock_time.sleep.assert_not_called()
+
+    def test_acquire_threads(self):
+        bucket = TokenBucket(1000.0, 1)
+        wait_times = []
+
+        def worker():
+            wait_times.append(bucket.acquire())
+
+        threads = [threading.Thread(target=worker) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # 予約された待機時間はすべて異なる（同じトークンを2回使わない）
+        self.assertEqual(10, len(wait_times))
+        positive_waits = [w for w in wait_times if w > 0]
+        self.assertEqual(len(positive_waits), len(set(positive_waits)))
+
+    def test_acquire_async(self):
+        with patch("media_downloader.link_search.rate_limiter.time") as mock_time:
+            mock_time.monotonic.return_value = 100.0
+            bucket = TokenBucket(2.0, 1)
+
+            async def run():
+                with patch("media_downloader.link_search.rate_limiter.asyncio.sleep") as mock_sleep:
+                    first = await bucket.acquire_async()
+                    second = await bucket.acquire_async()
+                    mock_sleep.assert_awaited_once_with(0.5)
+                    return first, second
+
+            self.assertEqual((0.0, 0.5), asyncio.run(run()))
+            mock_time.sleep.assert_not_called()
+
+
+class TestHostRateLimiter(unittest.TestCase):
+    def test_HostRateLimiter(self):
+        self.assertIsInstance(rate_limiter, HostRateLimiter)
+
+    def test_parse_setting(self):
+        self.assertEqual((2.0, 4.0), HostRateLimiter.parse_setting("2.0, 4"))
+        with self.assertRaises(ValueError):
+            HostRateLimiter.parse_setting("2.0")
+        with self.assertRaises(ValueError):
+            HostRateLimiter.parse_setting("0, 4")
+
+    def test_get_bucket(self):
+        limiter = HostRateLimiter()
+
+        # 同じホストは同じバケットを共有する
+        bucket1 = limiter.get_bucket("https://i.pximg.net/img-original/img/1_p0.jpg")
+        bucket2 = limiter.get_bucket(URL("https://i.pximg.net/img-original/img/1_p1.jpg"))
+        self.assertIs(bucket1, bucket2)
+        self.assertEqual((2.0, 4.0), (bucket1.rate, bucket1.capacity))
+
+        # ホスト名を直接指定できる
+        self.assertIs(limiter.get_bucket("app-api.pixiv.net"), limiter.get_bucket("https://app-api.pixiv.net/v1/"))
+
+        # サブドメインは親ドメインの設定とバケットを使う
+        bucket3 = limiter.get_bucket("https://pic03.nijie.info/dummy.jpg")
+        self.assertIs(limiter.get_bucket("http://nijie.info/view_popup.php?id=1"), bucket3)
+
+        # 設定のないホストはホストごとに default 設定のバケットを持つ
+        bucket4 = limiter.get_bucket("https://www.example.com/")
+        bucket5 = limiter.get_bucket("https://www.example.net/")
+        self.assertIsNot(bucket4, bucket5)
+        self.assertEqual(HostRateLimiter.DEFAULT_SETTING, (bucket4.rate, bucket4.capacity))
+
+    def test_configure(self):
+        limiter = HostRateLimiter()
+        bucket = limiter.get_bucket("https://i.pximg.net/")
+
+        limiter.configure({"default": "5.0, 5", "I.PXIMG.NET": "10.0, 20"})
+        actual = limiter.get_bucket("https://i.pximg.net/")
+        self.assertIsNot(bucket, actual)
+        self.assertEqual((10.0, 20.0), (actual.rate, actual.capacity))
+        actual = limiter.get_bucket("https://www.example.com/")
+        self.assertEqual((5.0, 5.0), (actual.rate, actual.capacity))
+
+        with self.assertRaises(ValueError):
+            limiter.configure({"i.pximg.net": "invalid"})
+
+    def test_acquire(self):
+        limiter = HostRateLimiter()
+        with patch.object(TokenBucket, "acquire", return_value=0.0) as mock_acquire:
+            actual = limiter.acquire("https://i.pximg.net/")
+            self.assertEqual(0.0, actual)
+            mock_acquire.assert_called_once_with()
+
+        with patch.object(TokenBucket, "acquire_async", return_value=0.0) as mock_acquire_async:
+            actual = asyncio.run(limiter.acquire_async("https://i.pximg.net/"))
+            self.assertEqual(0.0, actual)
+            mock_acquire_async.assert_awaited_once_with()
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
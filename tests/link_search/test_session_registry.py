@@ -0,0 +1,177 @@
+"""SessionRegistry のテスト"""
+
+import sys
+import threading
+import time
+import unittest
+
+from mock import MagicMock, patch
+
+from media_downloader.link_search.session_registry import SessionRegistry
+
+
+class TestSessionRegistry(unittest.TestCase):
+    def test_get(self):
+        registry = SessionRegistry()
+        login = MagicMock(return_value="session_1")
+        key = ("pixiv", "ユーザー1_ID")
+
+        # 初回はログインする
+        self.assertFalse(registry.is_logged_in(key))
+        actual = registry.get(key, login)
+        self.assertEqual("session_1", actual)
+        login.assert_called_once_with()
+        self.assertTrue(registry.is_logged_in(key))
+
+        # 2回目以降は別のログイン関数を渡しても保持しているものを返す
+        other_login = MagicMock(return_value="session_2")
+        actual = registry.get(key, other_login)
+        self.assertEqual("session_1", actual)
+        other_login.assert_not_called()
+
+        # キーが異なれば別にログインする
+        actual = registry.get(("nijie", "ユーザー1_ID"), other_login)
+        self.assertEqual("session_2", actual)
+        other_login.assert_called_once_with()
+
+    def test_get_failed(self):
+        registry = SessionRegistry()
+        key = ("pixiv", "ユーザー1_ID")
+
+        # ログインに失敗した場合は保持しない
+        login = MagicMock(side_effect=ValueError)
+        with self.assertRaises(ValueError):
+            registry.get(key, login)
+        self.assertFalse(registry.is_logged_in(key))
+
+        # 次回取得時に再度ログインする
+        login = MagicMock(return_value="session_1")
+        self.assertEqual("session_1", registry.get(key, login))
+        login.assert_called_once_with()
+
+    def test_get_concurrent(self):
+        registry = SessionRegistry()
+        key = ("pixiv", "ユーザー1_ID")
+        login_count = 0
+
+        def login() -> object:
+            nonlocal login_count
+            login_count += 1
+            time.sleep(0.05)
+            return object()
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(registry.get(key, login))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # 同時に取得してもログインは1回のみで、全員が同じセッションを受け取る
+        self.assertEqual(1, login_count)
+        self.assertEqual(8, len(results))
+        self.assertTrue(all(r is results[0] for r in results))
+
+    def test_get_expired(self):
+        registry = SessionRegistry()
+        key = ("pixiv", "ユーザー1_ID")
+        with patch("media_downloader.link_search.session_registry.time") as mock_time:
+            mock_time.time.return_value = 1000.0
+            login = MagicMock(side_effect=["session_1", "session_2"])
+            expires_at = MagicMock(return_value=1000.0 + 3600)
+
+            # ログイン直後に有効期限を取得する
+            actual = registry.get(key, login, expires_at)
+            self.assertEqual("session_1", actual)
+            expires_at.assert_called_once_with("session_1")
+            self.assertEqual(1000.0 + 3600, registry.expires_at(key))
+
+            # 有効期限の EXPIRY_MARGIN 秒前まではそのまま使う
+            mock_time.time.return_value = 1000.0 + 3600 - registry.EXPIRY_MARGIN - 1
+            self.assertEqual("session_1", registry.get(key, login, expires_at))
+            login.assert_called_once_with()
+
+            # 期限が近づいたらログインし直す
+            mock_time.time.return_value = 1000.0 + 3600 - registry.EXPIRY_MARGIN
+            self.assertFalse(registry.is_logged_in(key))
+            self.assertIsNone(registry.expires_at(key))
+            self.assertEqual("session_2", registry.get(key, login, expires_at))
+            self.assertEqual(2, login.call_count)
+
+            # 有効期限がNoneの場合は期限なしとして扱う
+            key = ("nijie", "ユーザー1_ID")
+            registry.get(key, lambda: "session_3", lambda session: None)
+            mock_time.time.return_value = 1000.0 * 1000
+            self.assertTrue(registry.is_logged_in(key))
+            self.assertIsNone(registry.expires_at(key))
+
+    def test_discard(self):
+        registry = SessionRegistry()
+        key_1 = ("pixiv", "ユーザー1_ID")
+        key_2 = ("nijie", "ユーザー1_ID")
+        registry.get(key_1, lambda: "session_1")
+        registry.get(key_2, lambda: "session_2")
+
+        registry.discard(key_1)
+        self.assertFalse(registry.is_logged_in(key_1))
+        self.assertTrue(registry.is_logged_in(key_2))
+        self.assertEqual("session_3", registry.get(key_1, lambda: "session_3"))
+
+        # 拒否されたセッションを指定した場合は、それを保持している場合のみ破棄する
+        registry.discard(key_1, "session_1")
+        self.assertTrue(registry.is_logged_in(key_1))
+        registry.discard(key_1, "session_3")
+        self.assertFalse(registry.is_logged_in(key_1))
+
+        # 保持しているものと同一の場合のみ差し替え、有効期限は引き継ぐ
+        registry.get(key_1, lambda: "session_4", lambda session: 2000000000.0)
+        registry.replace(key_1, "session_1", "session_5")
+        self.assertEqual("session_4", registry.get(key_1, lambda: "session_6"))
+        registry.replace(key_1, "session_4", "session_5")
+        self.assertEqual("session_5", registry.get(key_1, lambda: "session_6"))
+        self.assertEqual(2000000000.0, registry.expires_at(key_1))
+
+        # 保持していないキーを破棄してもエラーにならない
+        registry.discard(("nico_seiga", "ユーザー1_ID"))
+
+        registry.clear()
+        self.assertFalse(registry.is_logged_in(key_1))
+        self.assertFalse(registry.is_logged_in(key_2))
+
+    def test_close(self):
+        registry = SessionRegistry()
+        key = ("nico_seiga", "ユーザー1_ID")
+
+        # 破棄したセッションが close() を持つ場合は呼び出す
+        session_1 = MagicMock()
+        registry.get(key, lambda: session_1)
+        registry.discard(key, MagicMock())
+        session_1.close.assert_not_called()
+        registry.discard(key, session_1)
+        session_1.close.assert_called_once_with()
+
+        # 期限切れで破棄した場合も閉じる
+        with patch("media_downloader.link_search.session_registry.time") as mock_time:
+            mock_time.time.return_value = 1000.0
+            session_2 = MagicMock()
+            registry.get(key, lambda: session_2, lambda session: 1000.0 + 3600)
+            mock_time.time.return_value = 1000.0 + 3600
+            self.assertFalse(registry.is_logged_in(key))
+            session_2.close.assert_called_once_with()
+
+        # clear で破棄した場合も閉じる
+        session_3 = MagicMock()
+        registry.get(key, lambda: session_3)
+        registry.clear()
+        session_3.close.assert_called_once_with()
+
+        # close() を持たないセッションはそのまま破棄する
+        registry.get(key, lambda: "session_4")
+        registry.discard(key)
+        self.assertFalse(registry.is_logged_in(key))
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,259 @@
+"""StreamDownloader のテスト"""
+
+import shutil
+import sys
+import unittest
+from pathlib import Path
+
+import httpx
+from mock import patch
+
+from media_downloader.link_search.download_progress import DownloadCancelledError, DownloadProgress
+from media_downloader.link_search.nico_seiga.illust_extension import IllustExtension
+from media_downloader.link_search.stream_downloader import StreamDownloader
+from media_downloader.link_search.url import URL
+
+
+class TestStreamDownloader(unittest.TestCase):
+    def setUp(self):
+        self.TBP = Path("./tests/link_search/stream_downloader")
+        self.TBP.mkdir(parents=True, exist_ok=True)
+        self.mock_rate_limiter = self.enterContext(
+            patch("media_downloader.link_search.stream_downloader.rate_limiter")
+        )
+        self.progress = DownloadProgress()
+        self.enterContext(patch("media_downloader.link_search.stream_downloader.download_progress", self.progress))
+
+    def tearDown(self):
+        shutil.rmtree(self.TBP, ignore_errors=True)
+
+    def _get_session(self, content: bytes, status_code: int = 200) -> httpx.Client:
+        self.requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            return httpx.Response(status_code, content=content)
+
+        return httpx.Client(transport=httpx.MockTransport(handler))
+
+    def test_StreamDownloader(self):
+        session = self._get_session(b"")
+        stream_downloader = StreamDownloader(session)
+        self.assertEqual(session, stream_downloader.session)
+        self.assertEqual(64 * 1024, StreamDownloader.CHUNK_SIZE)
+        self.assertEqual(8, StreamDownloader.HEAD_SIZE)
+        self.assertEqual(".part", StreamDownloader.PART_SUFFIX)
+        self.assertEqual(".part.json", StreamDownloader.META_SUFFIX)
+
+        with self.assertRaises(TypeError):
+            stream_downloader = StreamDownloader("invalid argument")
+
+    def test_part_path(self):
+        save_path = self.TBP / "作品名1(12345678).jpg"
+        actual = StreamDownloader.part_path(save_path)
+        self.assertEqual(self.TBP / "作品名1(12345678).jpg.part", actual)
+        actual = StreamDownloader.meta_path(save_path)
+        self.assertEqual(self.TBP / "作品名1(12345678).jpg.part.json", actual)
+
+    def test_download(self):
+        content = b"\x89\x50\x4e\x47\x0d\x0a\x1a\x0a" + b"\x00" * (StreamDownloader.CHUNK_SIZE * 3 + 5)
+        session = self._get_session(content)
+        stream_downloader = StreamDownloader(session)
+        url = URL("https://www.example.com/sample.png")
+        headers = {"User-Agent": "dummy"}
+
+        # 保存先パス指定
+        save_path = self.TBP / "作品名1(12345678).png"
+        actual = stream_downloader.download(url, save_path, headers=headers)
+        self.assertEqual(save_path, actual)
+        self.assertEqual(content, save_path.read_bytes())
+        self.assertFalse(StreamDownloader.part_path(save_path).exists())
+        self.mock_rate_limiter.acquire.assert_called_once_with(url.original_url)
+        self.assertEqual("dummy", self.requests[-1].headers["User-Agent"])
+
+        # 拡張子を先頭のバイト列から判別
+        save_path = self.TBP / "作品名2(23456789)"
+        actual = stream_downloader.download(
+            url.original_url,
+            save_path,
+            suffix_resolver=lambda head: IllustExtension.create(head).extension,
+        )
+        self.assertEqual(self.TBP / "作品名2(23456789).png", actual)
+        self.assertEqual(content, actual.read_bytes())
+        self.assertFalse(StreamDownloader.part_path(save_path).exists())
+
+        # レスポンスがエラー
+        session = self._get_session(b"not found", status_code=404)
+        stream_downloader = StreamDownloader(session)
+        save_path = self.TBP / "作品名3(34567890).png"
+        with self.assertRaises(httpx.HTTPStatusError):
+            actual = stream_downloader.download(url, save_path)
+        self.assertFalse(save_path.exists())
+        self.assertFalse(StreamDownloader.part_path(save_path).exists())
+
+        # 拡張子が判別できない場合は一時ファイルを残さない
+        session = self._get_session(b"\x00\x00")
+        stream_downloader = StreamDownloader(session)
+        save_path = self.TBP / "作品名4(45678901)"
+        with self.assertRaises(ValueError):
+            actual = stream_downloader.download(
+                url, save_path, suffix_resolver=lambda head: IllustExtension.create(head).extension
+            )
+        self.assertEqual([], list(self.TBP.glob("作品名4*")))
+
+        # 保存先パス指定が不正
+        with self.assertRaises(TypeError):
+            actual = stream_downloader.download(url, "invalid argument")
+
+    def test_download_resume(self):
+        content = bytes(range(256)) * 1000
+        etag = '"dummy_etag"'
+        cut_size = StreamDownloader.CHUNK_SIZE
+
+        class CutStream(httpx.SyncByteStream):
+            """途中で通信が切れるストリーム"""
+
+            def __iter__(self):
+                yield content[:cut_size]
+                raise httpx.ReadError("connection lost")
+
+        state = {"cut": True, "support_range": True, "etag": etag}
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            headers = {"ETag": state["etag"]}
+            if state["cut"]:
+                headers["Content-Length"] = str(len(content))
+                return httpx.Response(200, headers=headers, stream=CutStream())
+            range_header = request.headers.get("Range")
+            if_range = request.headers.get("If-Range")
+            if range_header and state["support_range"] and if_range == state["etag"]:
+                start = int(range_header.removeprefix("bytes=").rstrip("-"))
+                if start >= len(content):
+                    return httpx.Response(416, headers=headers)
+                headers["Content-Range"] = f"bytes {start}-{len(content) - 1}/{len(content)}"
+                return httpx.Response(206, headers=headers, content=content[start:])
+            return httpx.Response(200, headers=headers, content=content)
+
+        stream_downloader = StreamDownloader(httpx.Client(transport=httpx.MockTransport(handler)))
+        url = "https://www.example.com/sample.mp4"
+        save_path = self.TBP / "作品名1(12345678).mp4"
+        part_path = StreamDownloader.part_path(save_path)
+        meta_path = StreamDownloader.meta_path(save_path)
+
+        def interrupt():
+            state["cut"] = True
+            with self.assertRaises(httpx.ReadError):
+                stream_downloader.download(url, save_path)
+            self.assertFalse(save_path.exists())
+            self.assertEqual(cut_size, part_path.stat().st_size)
+            self.assertTrue(meta_path.is_file())
+            state["cut"] = False
+            requests.clear()
+
+        # 中断したDLを Range リクエストで再開する
+        interrupt()
+        actual = stream_downloader.download(url, save_path)
+        self.assertEqual(save_path, actual)
+        self.assertEqual(content, save_path.read_bytes())
+        self.assertFalse(part_path.exists())
+        self.assertFalse(meta_path.exists())
+        self.assertEqual(f"bytes={cut_size}-", requests[0].headers["Range"])
+        self.assertEqual(etag, requests[0].headers["If-Range"])
+        save_path.unlink()
+
+        # Range 非対応のサーバーなら最初からDLし直す
+        interrupt()
+        state["support_range"] = False
+        actual = stream_downloader.download(url, save_path)
+        self.assertEqual(content, save_path.read_bytes())
+        self.assertFalse(part_path.exists())
+        state["support_range"] = True
+        save_path.unlink()
+
+        # ファイルが更新されていたら最初からDLし直す
+        interrupt()
+        state["etag"] = '"updated_etag"'
+        actual = stream_downloader.download(url, save_path)
+        self.assertEqual(content, save_path.read_bytes())
+        state["etag"] = etag
+        save_path.unlink()
+
+        # 一時ファイルがサーバー上のファイルより大きい場合は最初からDLし直す
+        interrupt()
+        part_path.write_bytes(content + b"garbage")
+        actual = stream_downloader.download(url, save_path)
+        self.assertEqual(content, save_path.read_bytes())
+        self.assertEqual(2, len(requests))
+        self.assertNotIn("Range", requests[1].headers)
+        save_path.unlink()
+
+        # 別のurlの一時ファイルは使わない
+        interrupt()
+        other_url = "https://www.example.com/other.mp4"
+        actual = stream_downloader.download(other_url, save_path)
+        self.assertEqual(content, save_path.read_bytes())
+        self.assertNotIn("Range", requests[0].headers)
+        save_path.unlink()
+
+        # resume=False の場合は中断時に一時ファイルを残さない
+        state["cut"] = True
+        with self.assertRaises(httpx.ReadError):
+            stream_downloader.download(url, save_path, resume=False)
+        self.assertFalse(part_path.exists())
+        self.assertFalse(meta_path.exists())
+
+    def test_download_incomplete(self):
+        content = b"\x00" * 1000
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            headers = {"Content-Length": str(len(content) * 2)}
+            return httpx.Response(200, headers=headers, stream=httpx.ByteStream(content))
+
+        stream_downloader = StreamDownloader(httpx.Client(transport=httpx.MockTransport(handler)))
+        save_path = self.TBP / "作品名1(12345678).mp4"
+
+        # Content-Length に満たない場合は保存先にリネームせず、再開できるように残す
+        with self.assertRaises(ValueError):
+            stream_downloader.download("https://www.example.com/sample.mp4", save_path)
+        self.assertFalse(save_path.exists())
+        self.assertEqual(len(content), StreamDownloader.part_path(save_path).stat().st_size)
+        self.assertTrue(StreamDownloader.meta_path(save_path).is_file())
+
+    def test_download_cancelled(self):
+        content = b"\x00" * (StreamDownloader.CHUNK_SIZE * 3)
+        stream_downloader = StreamDownloader(self._get_session(content))
+        url = "https://www.example.com/sample.mp4"
+        save_path = self.TBP / "作品名1(12345678).mp4"
+
+        # 受信したバイト数を記録する
+        stream_downloader.download(url, save_path)
+        self.assertEqual(len(content), self.progress.snapshot().bytes_total)
+        save_path.unlink()
+
+        # 取り消された場合はチャンクの区切りで中断し、続きから再開できるように残す
+        self.progress.cancel()
+        with self.assertRaises(DownloadCancelledError):
+            stream_downloader.download(url, save_path)
+        self.assertFalse(save_path.exists())
+        part_size = StreamDownloader.part_path(save_path).stat().st_size
+        self.assertLess(part_size, len(content))
+        self.assertTrue(StreamDownloader.meta_path(save_path).is_file())
+
+        # 再開しない場合は残さない
+        with self.assertRaises(DownloadCancelledError):
+            stream_downloader.download(url, save_path, resume=False)
+        self.assertFalse(StreamDownloader.part_path(save_path).exists())
+        self.assertFalse(StreamDownloader.meta_path(save_path).exists())
+
+        # 取り消しを解除すると続きからDLする
+        self.progress.reset()
+        stream_downloader.download(url, save_path)
+        self.assertEqual(content, save_path.read_bytes())
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
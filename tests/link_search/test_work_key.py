@@ -0,0 +1,35 @@
+"""WorkKey のテスト"""
+
+import sys
+import unittest
+
+from media_downloader.link_search.work_key import WorkKey
+
+
+class TestWorkKey(unittest.TestCase):
+    def test_WorkKey(self):
+        # 正常系
+        actual = WorkKey("nijie", 251267)
+        self.assertEqual("nijie", actual.site)
+        self.assertEqual(251267, actual.work_id)
+
+        # サイト名と作品IDが同じならば同じキー
+        self.assertEqual(WorkKey("nijie", 251267), actual)
+        self.assertEqual(hash(WorkKey("nijie", 251267)), hash(actual))
+        self.assertNotEqual(WorkKey("nijie", 251268), actual)
+        self.assertNotEqual(WorkKey("pixiv", 251267), actual)
+        self.assertEqual(1, len({actual, WorkKey("nijie", 251267)}))
+
+        # 異常系
+        with self.assertRaises(TypeError):
+            actual = WorkKey(None, 251267)
+        with self.assertRaises(TypeError):
+            actual = WorkKey("nijie", "251267")
+        with self.assertRaises(ValueError):
+            actual = WorkKey("", 251267)
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,129 @@
+"""WorkURLExtractor のテスト"""
+
+import io
+import sys
+import unittest
+
+from mock import patch
+
+from media_downloader.link_search.nico_seiga.nico_seiga_url import NicoSeigaURL
+from media_downloader.link_search.nijie.nijie_url import NijieURL
+from media_downloader.link_search.url import URL
+from media_downloader.link_search.work_key import WorkKey
+from media_downloader.link_search.work_url_extractor import ExtractedWorkURL, WorkURLExtractor
+
+
+class TestWorkURLExtractor(unittest.TestCase):
+    def setUp(self):
+        self.text = "\n".join([
+            "<!DOCTYPE NETSCAPE-Bookmark-file-1>",
+            '<DT><A HREF="https://www.pixiv.net/artworks/86704541?p=1" ADD_DATE="1">作品1</A>',
+            "[12:00] user: これ見て http://nijie.info/view_popup.php?id=251267 と https://nijie.info/view.php?id=251267",
+            '{"uri": "https://seiga.nicovideo.jp/seiga/im5360137", "title": "作品3"} (http://nico.ms/im5360137)',
+            "https://www.pixiv.net/novel/show.php?id=17668373&amp;mode=cover",
+            "https://www.pixiv.net/artworks/86704541 https://www.example.com/artworks/1",
+            "[作品](https://www.pixiv.net/artworks/12345678)",
+        ])
+        self.expect = [
+            ExtractedWorkURL("pixiv", 86704541, "https://www.pixiv.net/artworks/86704541"),
+            ExtractedWorkURL("nijie", 251267, "https://nijie.info/view.php?id=251267"),
+            ExtractedWorkURL("nico_seiga", 5360137, "https://seiga.nicovideo.jp/seiga/im5360137"),
+            ExtractedWorkURL("pixiv_novel", 17668373, "https://www.pixiv.net/novel/show.php?id=17668373"),
+            ExtractedWorkURL("pixiv", 12345678, "https://www.pixiv.net/artworks/12345678"),
+        ]
+
+    def test_ExtractedWorkURL(self):
+        actual = ExtractedWorkURL("pixiv", 86704541, "https://www.pixiv.net/artworks/86704541")
+        self.assertEqual(("pixiv", 86704541), (actual.site, actual.work_id))
+
+        with self.assertRaises(ValueError):
+            actual = ExtractedWorkURL("invalid site", 1, "https://www.pixiv.net/artworks/1")
+        with self.assertRaises(TypeError):
+            actual = ExtractedWorkURL("pixiv", "1", "https://www.pixiv.net/artworks/1")
+        with self.assertRaises(TypeError):
+            actual = ExtractedWorkURL("pixiv", 1, None)
+
+    def test_init(self):
+        self.assertEqual(WorkURLExtractor.DEFAULT_CHUNK_SIZE, WorkURLExtractor().chunk_size)
+        self.assertEqual(16, WorkURLExtractor(16).chunk_size)
+
+        with self.assertRaises(ValueError):
+            WorkURLExtractor(0)
+        with self.assertRaises(ValueError):
+            WorkURLExtractor("invalid argument")
+
+    def test_sites(self):
+        # 正規化した作品ページURLは各URLクラスが受け入れ、同じ作品キーを返す
+        for site, (url_format, url_class) in WorkURLExtractor.SITES.items():
+            with self.subTest(site=site):
+                work_url = url_class(URL(url_format.format(12345678)))
+                self.assertEqual(WorkKey(site, 12345678), work_url.work_key)
+
+        # 抽出元のURLと抽出したURLは同じ作品キーになる
+        extracted = list(
+            WorkURLExtractor().extract(["http://nico.ms/im5360137 http://nijie.info/view_popup.php?id=1"])
+        )
+        self.assertEqual(NicoSeigaURL.create("http://nico.ms/im5360137").work_key, extracted[0].work_key)
+        self.assertEqual(NijieURL.create("http://nijie.info/view_popup.php?id=1").work_key, extracted[1].work_key)
+
+    def test_extract(self):
+        extractor = WorkURLExtractor()
+        self.assertEqual(self.expect, list(extractor.extract([self.text])))
+        self.assertEqual([], list(extractor.extract([])))
+        self.assertEqual([], list(extractor.extract(["no url here"])))
+
+        # 各URLクラスが受け入れないURLは抽出しない
+        params = [
+            "http://www.pixiv.net/artworks/86704541",
+            "https://www.pixiv.net/artworks/",
+            "https://www.pixiv.net/novel/show.php?mode=cover&id=17668373",
+            "https://nijie.info/view.php?uid=251267",
+            "https://nico.ms/im5360137",
+            "https://seiga.nicovideo.jp/seiga/5360137",
+        ]
+        for text in params:
+            with self.subTest(text=text):
+                self.assertEqual([], list(extractor.extract([text])))
+
+        # パターンに一致しても URLクラスの is_valid が False ならば抽出しない
+        with patch.object(NijieURL, "is_valid", return_value=False) as mock_is_valid:
+            expect = [e for e in self.expect if e.site != "nijie"]
+            self.assertEqual(expect, list(extractor.extract([self.text])))
+            mock_is_valid.assert_any_call("http://nijie.info/view_popup.php?id=251267")
+
+    def test_extract_chunks(self):
+        # チャンクの分割位置によらず同じ結果になる
+        for chunk_size in [1, 2, 7, 31, 255, 256, 257, 1000]:
+            with self.subTest(chunk_size=chunk_size):
+                chunks = [self.text[i : i + chunk_size] for i in range(0, len(self.text), chunk_size)]
+                self.assertEqual(self.expect, list(WorkURLExtractor().extract(chunks)))
+
+        # チャンクの境界をまたぐURL
+        padding = "x" * (WorkURLExtractor.OVERLAP * 3)
+        text = padding + "https://www.pixiv.net/artworks/86704541" + padding
+        for cut in range(len(padding) - 10, len(padding) + 50):
+            with self.subTest(cut=cut):
+                actual = list(WorkURLExtractor().extract([text[:cut], text[cut:]]))
+                self.assertEqual([self.expect[0]], actual)
+
+    def test_extract_file(self):
+        # chunk_size 文字ずつ読み込む
+        fin = io.StringIO(self.text)
+        read_sizes = []
+        original_read = fin.read
+
+        def read(size):
+            read_sizes.append(size)
+            return original_read(size)
+
+        fin.read = read
+        actual = list(WorkURLExtractor(64).extract_file(fin))
+        self.assertEqual(self.expect, actual)
+        self.assertEqual({64}, set(read_sizes))
+        self.assertGreater(len(read_sizes), len(self.text) // 64)
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,105 @@
+import io
+import sys
+import unittest
+from pathlib import Path
+
+from mock import MagicMock, patch
+
+from media_downloader.batch_main import batch_main, read_urls
+from media_downloader.link_search.link_searcher import FetchManyResult
+from media_downloader.link_search.pixiv.ugoira_encoder import UgoiraEncodeStats
+from media_downloader.util import Result
+
+
+class TestBatchMain(unittest.TestCase):
+    def setUp(self):
+        self.TBP = Path("./tests")
+        self.url_file = self.TBP / "batch_urls.txt"
+
+    def tearDown(self):
+        self.url_file.unlink(missing_ok=True)
+
+    def test_read_urls(self):
+        lines = [
+            "https://www.pixiv.net/artworks/86704541\n",
+            "\n",
+            "# comment\n",
+            "  http://nijie.info/view_popup.php?id=251267  \n",
+        ]
+        actual = list(read_urls(lines))
+        expect = [
+            "https://www.pixiv.net/artworks/86704541",
+            "http://nijie.info/view_popup.php?id=251267",
+        ]
+        self.assertEqual(expect, actual)
+
+    def test_batch_main(self):
+        mock_config = self.enterContext(patch("media_downloader.batch_main.configparser.ConfigParser"))
+        mock_logging = self.enterContext(patch("media_downloader.batch_main.logging"))
+        mock_logger = self.enterContext(patch("media_downloader.batch_main.logger"))
+        mock_link_searcher = self.enterContext(patch("media_downloader.batch_main.LinkSearcher"))
+        mock_async_link_searcher = self.enterContext(patch("media_downloader.batch_main.AsyncLinkSearcher"))
+        mock_ugoira_encoder = self.enterContext(patch("media_downloader.batch_main.ugoira_encoder"))
+        mock_ugoira_encoder.stats.return_value = UgoiraEncodeStats(0, 1, 0, 1.0)
+
+        mock_config.return_value.read.side_effect = lambda f, encoding: True
+        mock_logging.root.manager.loggerDict = ["media_downloader", ""]
+        mock_link_searcher.MAX_WORKERS = 4
+
+        urls = [
+            "https://www.pixiv.net/artworks/86704541",
+            "http://nijie.info/view_popup.php?id=251267",
+        ]
+        mock_fetch_many = mock_link_searcher.create.return_value.fetch_many
+
+        # ファイルから読み込む
+        self.url_file.write_text("\n".join(urls), encoding="utf8")
+        mock_fetch_many.return_value = FetchManyResult([(url, Result.SUCCESS) for url in urls], 1.0)
+        actual = batch_main([str(self.url_file), "-w", "8"])
+        self.assertEqual(Result.SUCCESS, actual)
+        mock_link_searcher.create.assert_called_once_with(mock_config.return_value)
+        mock_fetch_many.assert_called_once_with(urls, 8)
+        # 別プロセスで生成中のうごイラの保存を待ってから終了する
+        mock_ugoira_encoder.wait.assert_called_once_with()
+
+        # 標準入力から読み込む、失敗あり
+        mock_fetch_many.reset_mock()
+        mock_fetch_many.return_value = FetchManyResult([(urls[0], Result.SUCCESS), (urls[1], Result.FAILED)], 1.0)
+        actual = batch_main([], io.StringIO("\n".join(urls)))
+        self.assertEqual(Result.FAILED, actual)
+        mock_fetch_many.assert_called_once_with(urls, 4)
+
+        # async エンジン
+        mock_fetch_many.reset_mock()
+        mock_async_run = mock_async_link_searcher.from_link_searcher.return_value.run
+        mock_async_run.return_value = FetchManyResult([(url, Result.SUCCESS) for url in urls], 1.0)
+        actual = batch_main([str(self.url_file), "-e", "async", "--in-flight", "32"])
+        self.assertEqual(Result.SUCCESS, actual)
+        mock_async_link_searcher.from_link_searcher.assert_called_once_with(mock_link_searcher.create.return_value, 4)
+        mock_async_run.assert_called_once_with(urls, 32)
+        mock_fetch_many.assert_not_called()
+
+        # 任意のテキストから作品URLを抽出する
+        mock_fetch_many.reset_mock()
+        mock_fetch_many.return_value = FetchManyResult([(url, Result.SUCCESS) for url in urls], 1.0)
+        text = f'<a href="{urls[0]}?p=1">作品1</a> {urls[1]} {urls[0]}'
+        self.url_file.write_text(text, encoding="utf8")
+        expect = ["https://www.pixiv.net/artworks/86704541", "https://nijie.info/view.php?id=251267"]
+        actual = batch_main([str(self.url_file), "-x"])
+        self.assertEqual(Result.SUCCESS, actual)
+        mock_fetch_many.assert_called_once_with(expect, 4)
+
+        mock_fetch_many.reset_mock()
+        actual = batch_main(["--extract"], io.StringIO(text))
+        mock_fetch_many.assert_called_once_with(expect, 4)
+
+        # configファイルが読み込めない
+        mock_config.return_value.read.side_effect = lambda f, encoding: False
+        with self.assertRaises(IOError):
+            actual = batch_main([str(self.url_file)])
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,192 @@
+"""GuiJobRunner のテスト"""
+
+import sys
+import threading
+import time
+import unittest
+
+from mock import MagicMock, patch
+
+from media_downloader.gui_job_runner import GuiJobRunner, JobProgress, JobResult
+from media_downloader.link_search.download_progress import DownloadProgress, WorkProgress
+
+
+class TestGuiJobRunner(unittest.TestCase):
+    def setUp(self):
+        self.progress = DownloadProgress()
+        self.enterContext(patch("media_downloader.gui_job_runner.download_progress", self.progress))
+        self.enterContext(patch("media_downloader.gui_job_runner.logger.info"))
+        self.events: list[tuple[str, dict]] = []
+        self.events_lock = threading.Lock()
+
+    def _post_event(self, key: str, values: dict) -> None:
+        with self.events_lock:
+            self.events.append((key, values))
+
+    def _done_events(self) -> list[tuple[str, JobResult]]:
+        with self.events_lock:
+            return [(v["name"], v["result"]) for k, v in self.events if k == GuiJobRunner.DONE_EVENT]
+
+    def _wait_until(self, predicate, timeout: float = 5.0) -> None:
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            if time.monotonic() > deadline:
+                self.fail("timeout")
+            time.sleep(0.01)
+
+    def _get_runner(self, max_workers: int = 2, interval: float = 60) -> GuiJobRunner:
+        runner = GuiJobRunner(self._post_event, max_workers, interval)
+        self.addCleanup(runner.shutdown)
+        return runner
+
+    def _blocking_job(self, name: str, started: threading.Event) -> MagicMock:
+        # 取り消されるまでページ単位でDLを続ける擬似的なジョブ
+        def run():
+            self.progress.start_work(name, 100)
+            started.set()
+            try:
+                for _ in range(100):
+                    self.progress.raise_if_cancelled()
+                    time.sleep(0.01)
+                    self.progress.page_done(name)
+            finally:
+                self.progress.finish_work(name)
+
+        return MagicMock(side_effect=run)
+
+    def test_init(self):
+        runner = GuiJobRunner(self._post_event)
+        self.assertEqual(GuiJobRunner.DEFAULT_MAX_WORKERS, runner.max_workers)
+        self.assertEqual(GuiJobRunner.DEFAULT_INTERVAL, runner.interval)
+        self.assertEqual(JobProgress(0, 0, 0, 0, 0, 0.0, {}), runner.progress())
+        # スレッドは最初の依頼まで起動しない
+        self.assertEqual([], runner._threads)
+
+        with self.assertRaises(TypeError):
+            GuiJobRunner("invalid argument")
+        with self.assertRaises(ValueError):
+            GuiJobRunner(self._post_event, 0)
+        with self.assertRaises(ValueError):
+            GuiJobRunner(self._post_event, "invalid argument")
+        with self.assertRaises(ValueError):
+            GuiJobRunner(self._post_event, 1, 0)
+
+    def test_submit(self):
+        runner = self._get_runner()
+        job_success = MagicMock()
+        job_failed = MagicMock(side_effect=ValueError("failed"))
+        runner.submit("https://dummy.host/1", job_success)
+        runner.submit("https://dummy.host/2", job_failed)
+        self._wait_until(lambda: len(self._done_events()) == 2)
+
+        # 各ジョブの結果を通知する
+        job_success.assert_called_once_with()
+        job_failed.assert_called_once_with()
+        expect = [
+            ("https://dummy.host/1", JobResult.SUCCESS),
+            ("https://dummy.host/2", JobResult.FAILED),
+        ]
+        self.assertCountEqual(expect, self._done_events())
+        self.assertEqual(JobProgress(0, 0, 1, 1, 0, 0.0, {}), runner.progress())
+
+        # 終了後は依頼できない
+        runner.shutdown()
+        with self.assertRaises(RuntimeError):
+            runner.submit("https://dummy.host/3", job_success)
+
+    def test_submit_while_running(self):
+        runner = self._get_runner(max_workers=1)
+        started = threading.Event()
+        release = threading.Event()
+        job_first = MagicMock(side_effect=lambda: (started.set(), release.wait(5)))
+        job_second = MagicMock()
+
+        # 実行中も新たな依頼を受け付け、順に実行する
+        runner.submit("first", job_first)
+        self.assertTrue(started.wait(5))
+        runner.submit("second", job_second)
+        progress = runner.progress()
+        self.assertEqual((1, 1), (progress.queued, progress.active))
+        job_second.assert_not_called()
+
+        release.set()
+        self._wait_until(lambda: len(self._done_events()) == 2)
+        self.assertEqual([("first", JobResult.SUCCESS), ("second", JobResult.SUCCESS)], self._done_events())
+
+    def test_progress(self):
+        runner = self._get_runner(max_workers=1, interval=0.05)
+        started = threading.Event()
+        release = threading.Event()
+
+        def run():
+            self.progress.start_work("作品名1", 2)
+            self.progress.page_done("作品名1")
+            self.progress.add_bytes(1024)
+            started.set()
+            release.wait(5)
+            self.progress.finish_work("作品名1")
+
+        runner.submit("first", run)
+        self.assertTrue(started.wait(5))
+
+        # 実行中は interval ごとに進捗を通知する
+        def progress_events() -> list[JobProgress]:
+            with self.events_lock:
+                return [v["progress"] for k, v in self.events if k == GuiJobRunner.PROGRESS_EVENT]
+
+        self._wait_until(lambda: any(p.works for p in progress_events()))
+        progress = [p for p in progress_events() if p.works][-1]
+        self.assertEqual(1, progress.active)
+        self.assertEqual({"作品名1": WorkProgress(1, 2)}, progress.works)
+
+        # 実行が終わった直後に最終状態を通知し、以降は通知しない
+        release.set()
+        self._wait_until(lambda: progress_events() and progress_events()[-1].done == 1)
+        self.assertEqual(JobProgress(0, 0, 1, 0, 0, 0.0, {}), progress_events()[-1])
+        count = len(progress_events())
+        time.sleep(0.2)
+        self.assertEqual(count, len(progress_events()))
+
+    def test_cancel(self):
+        runner = self._get_runner(max_workers=1)
+
+        # 何も実行していない場合
+        self.assertEqual(0, runner.cancel())
+        self.assertFalse(self.progress.is_cancelled)
+
+        # 実行待ちのジョブは破棄し、実行中のジョブは中断させる
+        started = threading.Event()
+        job_running = self._blocking_job("作品名1", started)
+        job_queued = MagicMock()
+        runner.submit("running", job_running)
+        self.assertTrue(started.wait(5))
+        runner.submit("queued1", job_queued)
+        runner.submit("queued2", job_queued)
+        self.assertEqual(2, runner.cancel())
+        self._wait_until(lambda: len(self._done_events()) == 1)
+        self.assertEqual([("running", JobResult.CANCELLED)], self._done_events())
+        job_queued.assert_not_called()
+        self.assertEqual(JobProgress(0, 0, 0, 0, 3, 0.0, {}), runner.progress())
+
+        # 実行中のジョブがすべて中断したら取り消し要求を解除し、以降の依頼は実行する
+        self.assertFalse(self.progress.is_cancelled)
+        job_after = MagicMock()
+        runner.submit("after", job_after)
+        self._wait_until(lambda: len(self._done_events()) == 2)
+        job_after.assert_called_once_with()
+        self.assertEqual(("after", JobResult.SUCCESS), self._done_events()[-1])
+
+    def test_job_progress_str(self):
+        progress = JobProgress(1, 2, 3, 4, 5, 1.5 * 1024 * 1024)
+        self.assertEqual("待機 1 / 実行中 2 / 完了 3（失敗 4, 中止 5）  1.50 MB/s", str(progress))
+
+        works = {"作品名1": WorkProgress(1, 3), "作品名2": WorkProgress(0, 2)}
+        progress = JobProgress(0, 2, 0, 0, 0, 0.0, works)
+        expect = "待機 0 / 実行中 2 / 完了 0（失敗 0, 中止 0）  0.00 MB/s\n作品名1: 1/3, 作品名2: 0/2"
+        self.assertEqual(expect, str(progress))
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
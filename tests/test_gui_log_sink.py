@@ -0,0 +1,141 @@
+"""GuiLogSink のテスト"""
+
+import sys
+import threading
+import unittest
+
+from mock import MagicMock, call, patch
+
+from media_downloader.gui_log_sink import GuiLogSink
+
+
+class TestGuiLogSink(unittest.TestCase):
+    def _get_window(self, readonly: bool = True) -> tuple[MagicMock, MagicMock]:
+        mock_window = MagicMock()
+        mock_multiline = MagicMock()
+        mock_multiline.readonly = readonly
+        mock_window.__getitem__.side_effect = lambda key: {"-OUTPUT-": mock_multiline}[key]
+        return mock_window, mock_multiline
+
+    def test_init(self):
+        sink = GuiLogSink()
+        self.assertEqual(GuiLogSink.DEFAULT_INTERVAL, sink.interval)
+        self.assertEqual(GuiLogSink.DEFAULT_MAX_LINES, sink.max_lines)
+        self.assertFalse(sink.is_attached)
+
+        sink = GuiLogSink(1, 10)
+        self.assertEqual(1, sink.interval)
+        self.assertEqual(10, sink.max_lines)
+
+        with self.assertRaises(ValueError):
+            sink = GuiLogSink(0)
+        with self.assertRaises(ValueError):
+            sink = GuiLogSink("invalid argument")
+        with self.assertRaises(ValueError):
+            sink = GuiLogSink(1, 0)
+
+    def test_attach(self):
+        sink = GuiLogSink(0.1)
+        mock_window, mock_multiline = self._get_window()
+
+        # 設定前のログは捨てる
+        sink.write("before attach")
+        sink.attach(mock_window)
+        self.assertTrue(sink.is_attached)
+        mock_window.set_timeout.assert_called_once_with(sink._tick, 100)
+        mock_multiline.print.assert_not_called()
+
+        # タイマーで表示待ちのログを追記し、次の追記を予約する
+        with patch.object(sink, "_last_flush", float("inf")):
+            sink.write("message1")
+        mock_window.set_timeout.reset_mock()
+        sink._tick()
+        mock_multiline.print.assert_called_once_with("message1", autoscroll=True)
+        mock_window.set_timeout.assert_called_once_with(sink._tick, 100)
+
+        # 解除後は追記も予約もしない
+        sink.detach()
+        self.assertFalse(sink.is_attached)
+        mock_window.set_timeout.reset_mock()
+        mock_multiline.reset_mock()
+        sink.write("after detach")
+        sink._tick()
+        mock_multiline.print.assert_not_called()
+        mock_window.set_timeout.assert_not_called()
+
+    def test_write(self):
+        sink = GuiLogSink(60)
+        mock_window, mock_multiline = self._get_window()
+        sink.attach(mock_window)
+        mock_window.reset_mock()
+
+        # 前回の追記から interval 経過していない場合は表示待ちに溜める
+        sink.write("message1")
+        sink.write("message2")
+        mock_multiline.print.assert_not_called()
+        mock_window.refresh.assert_not_called()
+
+        # 別スレッドからの書き込みは Tk を操作しない
+        thread = threading.Thread(target=sink.write, args=("message3",))
+        with patch.object(sink, "_last_flush", 0.0):
+            thread.start()
+            thread.join()
+        mock_multiline.print.assert_not_called()
+        mock_window.refresh.assert_not_called()
+
+        # Tk のスレッドで interval 経過していた場合はまとめて追記して画面を更新する
+        sink._last_flush = 0.0
+        sink.write("message4")
+        mock_multiline.print.assert_called_once_with("message1\nmessage2\nmessage3\nmessage4", autoscroll=True)
+        mock_window.refresh.assert_called_once_with()
+
+    def test_flush(self):
+        sink = GuiLogSink(60, 3)
+        mock_window, mock_multiline = self._get_window()
+
+        # 設定前
+        self.assertEqual(0, sink.flush())
+
+        sink.attach(mock_window)
+        self.assertEqual(0, sink.flush())
+        mock_multiline.print.assert_not_called()
+
+        # 読み取り専用を一時的に解除して追記する
+        sink.write("message1")
+        sink.write("message2")
+        self.assertEqual(2, sink.flush())
+        self.assertEqual(
+            [
+                call.set_readonly(False),
+                call.print("message1\nmessage2", autoscroll=True),
+                call.set_readonly(True),
+            ],
+            mock_multiline.mock_calls,
+        )
+
+        # max_lines を超えた分は古い行から削除する
+        mock_multiline.reset_mock()
+        sink.write("message3\nmessage3-2")
+        self.assertEqual(1, sink.flush())
+        mock_multiline.widget.delete.assert_called_once_with("1.0", "2.0")
+
+        # 表示待ちのログも max_lines まで
+        mock_multiline.reset_mock()
+        for i in range(5):
+            sink.write(f"message{i}")
+        self.assertEqual(3, sink.flush())
+        mock_multiline.print.assert_called_once_with("message2\nmessage3\nmessage4", autoscroll=True)
+        mock_multiline.widget.delete.assert_called_once_with("1.0", "4.0")
+
+        # 読み取り専用でない場合
+        mock_window, mock_multiline = self._get_window(False)
+        sink.attach(mock_window)
+        sink.write("message1")
+        self.assertEqual(1, sink.flush())
+        self.assertEqual([call.print("message1", autoscroll=True)], mock_multiline.mock_calls)
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
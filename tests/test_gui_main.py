@@ -7,6 +7,7 @@ from pathlib import Path
 import TkEasyGUI as sg
 from mock import call, patch
 
+from media_downloader.gui_job_runner import GuiJobRunner, JobProgress, JobResult
 from media_downloader.gui_main import gui_main
 from media_downloader.util import Result
 
@@ -48,6 +49,7 @@ class TestGuiMain(unittest.TestCase):
                 sg.Text("作品ページURL", size=(18, 1)),
                 sg.InputText(key="-WORK_URL-", default_text="", size=(61, 1)),
                 sg.Button("実行", key="-RUN-"),
+                sg.Button("中止", key="-CANCEL-"),
             ],
             [
                 sg.Text("チェック対象", size=(18, 1)),
@@ -63,7 +65,7 @@ class TestGuiMain(unittest.TestCase):
                 sg.FolderBrowse("参照", initial_folder=save_base_path),
                 sg.Button("開く", key="-FOLDER_OPEN-", pad=((7, 2), (0, 0))),
             ],
-            [sg.Text("", size=(70, 2))],
+            [sg.Text("", key="-STATUS-", size=(70, 2))],
             [
                 sg.Multiline(
                     key="-OUTPUT-",
@@ -92,6 +94,11 @@ class TestGuiMain(unittest.TestCase):
         mock_window = self.enterContext(patch("media_downloader.gui_main.sg.Window"))
         mock_link_searcher = self.enterContext(patch("media_downloader.gui_main.LinkSearcher.create"))
         mock_subprocess = self.enterContext(patch("media_downloader.gui_main.subprocess"))
+        mock_job_runner = self.enterContext(patch("media_downloader.gui_main.GuiJobRunner"))
+        mock_job_runner.PROGRESS_EVENT = GuiJobRunner.PROGRESS_EVENT
+        mock_job_runner.DONE_EVENT = GuiJobRunner.DONE_EVENT
+        # DLは別スレッドに依頼せず、その場で実行する
+        mock_job_runner.return_value.submit.side_effect = lambda name, job: job()
 
         mock_logging.config.fileConfig.side_effect = lambda f, disable_existing_loggers: True
         mock_logging.root.manager.loggerDict = ["media_downloader", ""]
@@ -112,6 +119,7 @@ class TestGuiMain(unittest.TestCase):
 
             mock_link_searcher.reset_mock()
             mock_subprocess.reset_mock()
+            mock_job_runner.reset_mock()
             pass
 
         def post_rum(is_valid_config, is_valid_save_path, event):
@@ -140,10 +148,23 @@ class TestGuiMain(unittest.TestCase):
 
             actual_layout = mock_window.mock_calls[0][1][1]
             self._check_layout(layout, actual_layout)
-            expect_call_window = [call().read()] * len(event)
+            expect_call_window = []
+            for key, values in event:
+                expect_call_window.append(call().read())
+                if key == GuiJobRunner.PROGRESS_EVENT:
+                    expect_call_window.append(call().__getitem__("-STATUS-"))
+                    expect_call_window.append(call().__getitem__().set_text(str(values["progress"])))
             expect_call_window.append(call().close())
             self.assertEqual(expect_call_window, mock_window.mock_calls[1:])
 
+            # DLは別スレッドで実行し、ウィンドウを閉じる際に終了させる
+            mock_job_runner.assert_called_once_with(mock_window.return_value.post_event)
+            mock_job_runner.return_value.shutdown.assert_called_once_with()
+            if "-CANCEL-" in event_keys:
+                mock_job_runner.return_value.cancel.assert_called_once_with()
+            else:
+                mock_job_runner.return_value.cancel.assert_not_called()
+
             if "-RUN-" in event_keys:
                 s_values = [ele[1] for ele in event if ele[0] == "-RUN-"][0]
                 if "-WORK_URL-" in s_values:
@@ -160,8 +181,11 @@ class TestGuiMain(unittest.TestCase):
                         ],
                         mock_link_searcher.mock_calls,
                     )
+                    mock_job_runner.return_value.submit.assert_called_once()
+                    self.assertEqual(work_url, mock_job_runner.return_value.submit.call_args.args[0])
                 else:
                     mock_link_searcher.assert_not_called()
+                    mock_job_runner.return_value.submit.assert_not_called()
             if "-FOLDER_OPEN-" in event_keys:
                 s_values = [ele[1] for ele in event if ele[0] == "-FOLDER_OPEN-"][0]
                 save_path = s_values["-SAVE_PATH-"]
@@ -183,12 +207,25 @@ class TestGuiMain(unittest.TestCase):
         folder_values = {
             "-SAVE_PATH-": "save_path",
         }
+        progress_values = {"progress": JobProgress(1, 1, 0, 0, 0, 0.0)}
+        done_values = {"name": "work_url", "result": JobResult.SUCCESS}
         Params = namedtuple("Params", ["is_valid_config", "is_valid_save_path", "event", "result"])
         params_list = [
             Params(True, True, [("-EXIT-", {})], Result.SUCCESS),
             Params(True, True, [("-RUN-", run_values), ("-EXIT-", {})], Result.SUCCESS),
             Params(True, True, [("-FOLDER_OPEN-", folder_values), ("-EXIT-", {})], Result.SUCCESS),
             Params(True, True, [("-RUN-", error_run_values), ("-EXIT-", {})], Result.SUCCESS),
+            Params(True, True, [("-CANCEL-", {}), ("-EXIT-", {})], Result.SUCCESS),
+            Params(
+                True,
+                True,
+                [
+                    (GuiJobRunner.PROGRESS_EVENT, progress_values),
+                    (GuiJobRunner.DONE_EVENT, done_values),
+                    ("-EXIT-", {}),
+                ],
+                Result.SUCCESS,
+            ),
             Params(True, False, [("-EXIT-", {})], Result.SUCCESS),
             Params(False, True, [("-EXIT-", {})], IOError),
         ]